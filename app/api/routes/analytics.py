@@ -7,7 +7,6 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.services.analytics_formatter import format_report_as_text
 from app.services.analytics_service import AnalyticsService
 
 logger = structlog.get_logger(__name__)
@@ -29,16 +28,15 @@ async def get_analytics_report(
     service = AnalyticsService(session)
 
     try:
-        report = await service.get_comprehensive_report(days)
+        rendered = await service.get_report_view(days, view)
     except Exception:
         logger.exception("Failed to generate analytics report", days=days)
         raise HTTPException(status_code=503, detail="Analytics report unavailable")
 
-    if not report:
+    if not rendered:
         raise HTTPException(status_code=503, detail="Analytics report unavailable")
 
     if view == "summary":
-        summary = format_report_as_text(report)
-        return {"summary": summary, "period_days": report.get("period_days", days)}
+        return {"summary": rendered, "period_days": days}
 
-    return report
+    return rendered
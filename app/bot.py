@@ -18,9 +18,18 @@ from app.middlewares.manual_dialog import ManualDialogMiddleware
 from app.middlewares.rate_limit import RateLimitMiddleware
 from app.middlewares.anti_spam import AntiSpamMiddleware
 from app.middlewares.dialog_mirror import DialogsMirrorMiddleware, DialogsChannelRequestMiddleware
+from app.middlewares.outbound_rate_limit import OutboundRateLimitMiddleware
 # from app.middlewares.reask_middleware import ReaskMiddleware
 from app.middlewares.state_reset_middleware import StateResetMiddleware
+from app.db import AsyncSessionLocal
+from app.services.activity_buffer import activity_buffer
+from app.services.dialog_mirror import dialog_mirror
+from app.services.loop_lag import loop_lag_monitor
+from app.services.openai_client import openai_clients
+from app.services.script_index import script_index
 from app.services.sentiment_service import sentiment_service
+from app.services.state_backend import StateBackendStorage, state_backend
+from app.services.turn_coalescer import turn_coalescer
 from app.handlers import (
     start,
     application,
@@ -44,11 +53,20 @@ bot = Bot(
     default=DefaultBotProperties(parse_mode=ParseMode.HTML),
 )
 
+# Pace every outbound call through the shared scheduler (registered first = outermost)
+bot.session.middleware(OutboundRateLimitMiddleware())
+
 # Mirror all bot messages to dialogs channel at API layer
 bot.session.middleware(DialogsChannelRequestMiddleware(settings.dialogs_channel_id))
 
-# Create dispatcher
-dp = Dispatcher()
+# Create dispatcher; FSM state lives in the shared backend so replicas agree
+dp = Dispatcher(
+    storage=StateBackendStorage(
+        state_backend,
+        state_ttl=settings.fsm_state_ttl,
+        data_ttl=settings.fsm_state_ttl,
+    )
+)
 
 # Register middlewares
 # dp.update.middleware(IdempotencyMiddleware())
@@ -127,6 +145,15 @@ async def on_startup() -> None:
             pass
 
         await sentiment_service.start()
+        await activity_buffer.start()
+        loop_lag_monitor.start()
+
+        if settings.scripts_enabled and settings.script_index_enabled:
+            try:
+                async with AsyncSessionLocal() as session:
+                    await script_index.load(session)
+            except Exception as exc:
+                logger.warning("script_index_startup_load_failed", error=str(exc))
         
         logger.info("Bot started successfully", mode="webhook" if not settings.debug else "polling")
         
@@ -138,14 +165,22 @@ async def on_startup() -> None:
 async def on_shutdown() -> None:
     """Execute on bot shutdown."""
     try:
+        # Let replies that are already being delivered finish; pending bursts are dropped
+        await turn_coalescer.stop()
         await sentiment_service.stop()
+        await activity_buffer.stop()
+        await loop_lag_monitor.stop()
 
         # Remove webhook if in debug mode
         if settings.debug:
             await remove_webhook()
         
+        # Post what is still queued for the dialogs channel before the session closes
+        await dialog_mirror.stop()
+
         # Close bot session
         await bot.session.close()
+        await openai_clients.aclose()
         
         logger.info("Bot shutdown completed")
         
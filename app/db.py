@@ -1,27 +1,53 @@
 """Database configuration and connection management."""
 
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Optional
 
+from prometheus_client import Gauge, Histogram
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
 
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+)
+
 
 class Base(DeclarativeBase):
     """Base class for all database models."""
     pass
 
 
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
+    poolclass=InstrumentedAsyncQueuePool,
     pool_size=settings.db_pool_size,
     max_overflow=settings.db_max_overflow,
     pool_pre_ping=True,
     pool_recycle=3600,
 )
+DB_POOL_IN_USE.set_function(lambda: engine.pool.checkedout())
 
 # Create session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -44,6 +70,18 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def release_connection(session: Optional[AsyncSession]) -> None:
+    """Commit the open transaction so its pooled connection goes back to the pool.
+
+    Call before awaiting anything slow that does not touch the database
+    (LLM requests, Telegram sends, typing delays). The session stays usable:
+    the next query checks a connection out again, and loaded objects keep
+    their state because sessions use ``expire_on_commit=False``.
+    """
+    if session is not None and session.in_transaction():
+        await session.commit()
+
+
 async def init_db() -> None:
     """Initialize database tables."""
     async with engine.begin() as conn:
@@ -57,7 +57,6 @@ from ..services.analytics_formatter import (
     AB_STATUS_LABELS,
     clean_enum_value,
     format_percent,
-    format_report_for_telegram,
     format_broadcast_metrics,
 )
 from ..services.bonus_content_manager import BonusContentManager
@@ -1180,18 +1179,16 @@ async def admin_toggle_sentiment(callback: CallbackQuery, **kwargs):
 async def manager_dashboard(message: Message):
     """Provide quick analytics dashboard for managers."""
     try:
-        report = {}
+        stats_text = None
         async for session in get_db():
             service = AnalyticsService(session)
-            report = await service.get_comprehensive_report()
+            stats_text = await service.get_report_view(view="telegram")
             break
 
-        if not report:
+        if not stats_text:
             await message.answer("❌ Не удалось получить аналитику. Попробуйте позже.")
             return
 
-        stats_text = format_report_for_telegram(report)
-
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_analytics")],
             [InlineKeyboardButton(text="🧪 A/B тесты", callback_data="admin_abtests")],
@@ -1211,25 +1208,29 @@ async def manager_dashboard(message: Message):
 async def show_analytics(callback: CallbackQuery):
     """Show comprehensive analytics."""
     try:
-        report = {}
+        stats_text = None
         async for session in get_db():
             service = AnalyticsService(session)
-            report = await service.get_comprehensive_report()
+            stats_text = await service.get_report_view(view="telegram")
             break
 
-        if not report:
+        if not stats_text:
             await callback.answer("❌ Не удалось получить аналитику", show_alert=True)
             return
 
-        stats_text = format_report_for_telegram(report)
-
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_analytics")],
             [InlineKeyboardButton(text="🧪 A/B тесты", callback_data="admin_abtests")],
             [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_back")]
         ])
 
-        await callback.message.edit_text(stats_text, reply_markup=keyboard, parse_mode="HTML")
+        try:
+            await callback.message.edit_text(stats_text, reply_markup=keyboard, parse_mode="HTML")
+        except TelegramBadRequest as exc:
+            # "Обновить" within the report cache TTL renders the same text.
+            if "message is not modified" not in str(exc):
+                raise
+            await callback.answer("Данные актуальны")
 
     except Exception:
         logger.exception("Error showing analytics")
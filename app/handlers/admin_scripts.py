@@ -7,6 +7,7 @@ from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.services.script_index import script_index
 from app.services.script_service import ScriptService
 from app.services.script_exceptions import ScriptError
 
@@ -26,6 +27,10 @@ async def reindex_scripts(message: Message, session: AsyncSession):
     try:
         script_service = ScriptService(session)
         stats = await script_service.index_scripts_from_file(settings.scripts_index_path)
+        # The in-memory index must only ever serve committed rows.
+        await session.commit()
+        if settings.scripts_enabled and settings.script_index_enabled:
+            await script_index.load(session)
         await message.answer(
             f"Re-indexing complete! ✅\n"
             f"Processed: {stats['processed']}\n"
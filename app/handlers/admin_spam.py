@@ -6,6 +6,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 
 from app.config import settings
+from app.services.anti_spam_service import AntiSpamService, ban_key as spam_ban_key
 from app.services.redis_service import redis_service
 from app.logging_spam import spam_events_logger
 
@@ -28,10 +29,10 @@ async def handle_spam_action(callback_query: CallbackQuery):
         await callback_query.answer("Ошибка: Redis недоступен.", show_alert=True)
         return
 
-    ban_key = f"ban:{target_user_id}"
+    ban_key = spam_ban_key(target_user_id)
     
     if action == "unban":
-        await redis.delete(ban_key)
+        await AntiSpamService(redis).unban(target_user_id)
         await callback_query.answer(f"Пользователь {target_user_id} разбанен.", show_alert=True)
         logger.info("Admin unbanned user", admin_id=callback_query.from_user.id, target_user_id=target_user_id)
         spam_events_logger.info(json.dumps({
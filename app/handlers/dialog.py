@@ -2,6 +2,7 @@
 
 import asyncio
 import random
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
 
@@ -11,17 +12,20 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
 from app.config import settings
+from app.db import AsyncSessionLocal, release_connection
 from app.models import User, LeadStatus
+from app.services.dialog_context import DialogContext
 from app.services.logging_service import ConversationLoggingService
 from app.services.manual_dialog_service import manual_dialog_service
 # from app.services.script_service import ScriptService
 from app.services.stt_service import SttService
+from app.services.reply_streamer import REPLY_FIRST_VISIBLE, ReplyStreamer
 from app.services.sales_dialog_service import SalesDialogService
+from app.services.turn_coalescer import Turn, turn_coalescer
 from app.services.llm_service import LLMService
 from app.repositories.user_repository import UserRepository
 from app.services.purchase_intent_service import PurchaseIntentService
 from app.services.inquiry_intent_service import InquiryIntentService
-from app.services.lead_profile_service import LeadProfileService
 from app.services.lead_service import LeadService
 from app.services.manager_notification_service import ManagerNotificationService
 from app.safety.validator import SafetyValidator
@@ -32,8 +36,19 @@ stt_service = SttService()
 safety_validator = SafetyValidator()
 
 
-async def _simulate_typing(bot, chat_id: int, *, min_delay: float = 3.0, max_delay: float = 7.0) -> None:
-    """Simulate human-like typing indicator for a random duration."""
+async def _simulate_typing(
+    bot,
+    chat_id: int,
+    *,
+    session: Any = None,
+    min_delay: float = 3.0,
+    max_delay: float = 7.0,
+) -> None:
+    """Simulate human-like typing indicator for a random duration.
+
+    The session's connection is returned to the pool first; nothing here needs it.
+    """
+    await release_connection(session)
     delay = random.uniform(min_delay, max_delay)
     loop = asyncio.get_event_loop()
     deadline = loop.time() + delay
@@ -46,6 +61,129 @@ async def _simulate_typing(bot, chat_id: int, *, min_delay: float = 3.0, max_del
         await asyncio.sleep(min(4.0, remaining))
 
 
+async def _reply_with_sales_dialog(
+    message: Message,
+    user: User,
+    session: Any,
+    conversation_logger: ConversationLoggingService,
+    dialog_context: DialogContext,
+    turn: Optional[Turn] = None,
+) -> None:
+    """Generate the next sales reply and send it, streaming it when enabled.
+
+    Within a coalesced ``turn`` the reply is claimed only right before its
+    final delivery, so a newer message can still cancel it until then.
+    """
+    dialog_service = SalesDialogService(session=session, user=user, context=dialog_context)
+    started = time.monotonic()
+
+    if settings.llm_streaming_enabled:
+        streamer = ReplyStreamer(message.bot, message.chat.id, validator=safety_validator)
+        try:
+            outcome = await dialog_service.generate_reply(on_partial=streamer.update)
+        except (Exception, asyncio.CancelledError):
+            await streamer.finish("")
+            raise
+        if turn is not None:
+            turn.claim()
+        sent_message = await streamer.finish(outcome.reply_text)
+    else:
+        outcome = await dialog_service.generate_reply()
+        if not outcome.reply_text:
+            return
+        await _simulate_typing(message.bot, message.chat.id, session=session)
+        if turn is not None:
+            turn.claim()
+        sent_message = await message.answer(outcome.reply_text)
+        REPLY_FIRST_VISIBLE.labels("buffered").observe(time.monotonic() - started)
+
+    if sent_message is None:
+        return
+    await conversation_logger.log_bot_message(
+        user_id=user.id,
+        text=outcome.reply_text,
+        metadata=outcome.metadata,
+        bot=message.bot,
+        user=user,
+        source_message=sent_message,
+    )
+
+
+async def _answer(
+    message: Message,
+    text_payload: str,
+    user: User,
+    session: Any,
+    conversation_logger: ConversationLoggingService,
+    dialog_context: DialogContext,
+    *,
+    check_inquiry: bool,
+    turn: Optional[Turn] = None,
+) -> None:
+    """Route one dialog turn: purchase intent, optionally info intent, then the sales dialog."""
+    if await _handle_purchase_intent(
+        message, text_payload, user, session, conversation_logger, dialog_context, turn
+    ):
+        return
+    if check_inquiry and await _handle_inquiry_intent(
+        message, text_payload, user, session, conversation_logger, dialog_context, turn
+    ):
+        return
+    await _reply_with_sales_dialog(message, user, session, conversation_logger, dialog_context, turn)
+
+
+async def _run_coalesced_turn(message: Message, user_id: int, check_inquiry: bool, turn: Turn) -> None:
+    """Answer a burst of messages in the background with a session of its own."""
+    async with AsyncSessionLocal() as session:
+        user = await UserRepository(session).get_by_id(user_id)
+        if user is None or await manual_dialog_service.is_user_in_manual_mode(user.id):
+            return
+        dialog_context = DialogContext(session, user)
+        conversation_logger = ConversationLoggingService(session, context=dialog_context)
+        await _answer(
+            message,
+            turn.text,
+            user,
+            session,
+            conversation_logger,
+            dialog_context,
+            check_inquiry=check_inquiry,
+            turn=turn,
+        )
+        await session.commit()
+    logger.info("dialog_turn_answered", user_id=user_id, messages=len(turn.texts))
+
+
+async def _answer_or_coalesce(
+    message: Message,
+    text_payload: str,
+    user: User,
+    session: Any,
+    conversation_logger: ConversationLoggingService,
+    dialog_context: DialogContext,
+    *,
+    check_inquiry: bool,
+) -> None:
+    """Answer now, or queue the message into the chat's next coalesced turn."""
+    if not turn_coalescer.enabled:
+        await _answer(
+            message,
+            text_payload,
+            user,
+            session,
+            conversation_logger,
+            dialog_context,
+            check_inquiry=check_inquiry,
+        )
+        return
+    user_id = user.id
+    turn_coalescer.submit(
+        message.chat.id,
+        text_payload,
+        lambda turn: _run_coalesced_turn(message, user_id, check_inquiry, turn),
+    )
+
+
 async def _try_answer_from_script(
     message: Message, text: str, user: User, session: Any
 ) -> bool:
@@ -90,6 +228,8 @@ async def _handle_purchase_intent(
     user: User,
     session: Any,
     conversation_logger: ConversationLoggingService,
+    dialog_context: DialogContext,
+    turn: Optional[Turn] = None,
 ) -> bool:
     """Detect purchase intent and route to managers if needed."""
     intent_service = PurchaseIntentService()
@@ -105,6 +245,7 @@ async def _handle_purchase_intent(
         context_parts.append(f"{prefix}: {text}")
     context_str = " | ".join(context_parts[-4:])
 
+    await release_connection(session)
     try:
         has_intent = await intent_service.has_purchase_intent(
             text_payload,
@@ -116,6 +257,8 @@ async def _handle_purchase_intent(
 
     if not has_intent:
         return False
+    if turn is not None:
+        turn.claim()
 
     lead_service = LeadService(session)
     existing_leads = await lead_service.repository.get_user_leads(user.id)
@@ -145,8 +288,7 @@ async def _handle_purchase_intent(
                     manager_display = f"ID {manager_id_candidate}"
                 break
 
-    profile_service = LeadProfileService(session)
-    profile = await profile_service.get_or_create(user)
+    profile = await dialog_context.profile()
     is_repeat = bool(existing_active)
     if is_repeat:
         summary = (
@@ -164,10 +306,12 @@ async def _handle_purchase_intent(
         conversation_summary=summary,
     )
 
+    # Commit the lead before managers are pinged so they can act on it at once.
+    await release_connection(session)
     manager_service = ManagerNotificationService(message.bot, session)
     await manager_service.notify_new_lead(lead, user)
 
-    await _simulate_typing(message.bot, message.chat.id)
+    await _simulate_typing(message.bot, message.chat.id, session=session)
     if is_repeat:
         acknowledgement = (
             "Я передал вашу заявку менеджерам повторно. "
@@ -206,6 +350,8 @@ async def _handle_inquiry_intent(
     user: User,
     session: Any,
     conversation_logger: ConversationLoggingService,
+    dialog_context: DialogContext,
+    turn: Optional[Turn] = None,
 ) -> bool:
     """Detect information-request intent and notify managers."""
     intent_service = InquiryIntentService()
@@ -221,6 +367,7 @@ async def _handle_inquiry_intent(
         context_parts.append(f"{prefix}: {text}")
     context_str = " | ".join(context_parts[-4:])
 
+    await release_connection(session)
     try:
         has_intent = await intent_service.has_info_intent(text_payload, context=context_str)
     except Exception as exc:  # pragma: no cover - defensive logging
@@ -229,6 +376,8 @@ async def _handle_inquiry_intent(
 
     if not has_intent:
         return False
+    if turn is not None:
+        turn.claim()
 
     lead_service = LeadService(session)
     existing_leads = await lead_service.repository.get_user_leads(user.id)
@@ -258,8 +407,7 @@ async def _handle_inquiry_intent(
                     manager_display = f"ID {manager_id_candidate}"
                 break
 
-    profile_service = LeadProfileService(session)
-    profile = await profile_service.get_or_create(user)
+    profile = await dialog_context.profile()
     is_repeat = bool(existing_active)
     if is_repeat:
         summary = (
@@ -277,10 +425,12 @@ async def _handle_inquiry_intent(
         conversation_summary=summary,
     )
 
+    # Commit the lead before managers are pinged so they can act on it at once.
+    await release_connection(session)
     manager_service = ManagerNotificationService(message.bot, session)
     await manager_service.notify_new_lead(lead, user)
 
-    await _simulate_typing(message.bot, message.chat.id)
+    await _simulate_typing(message.bot, message.chat.id, session=session)
     if is_repeat:
         acknowledgement = (
             "Я передал ваш запрос эксперту повторно. Менеджер свяжется с вами в ближайшее время."
@@ -327,7 +477,8 @@ async def _process_text_payload(
     # if await _try_answer_from_script(message, text_payload, user, session):
     #     return
 
-    conversation_logger = ConversationLoggingService(session)
+    dialog_context = DialogContext(session, user)
+    conversation_logger = ConversationLoggingService(session, context=dialog_context)
     await conversation_logger.log_user_message(
         user_id=user.id,
         text=text_payload,
@@ -338,27 +489,15 @@ async def _process_text_payload(
         source_message=message,
     )
 
-    if await _handle_purchase_intent(message, text_payload, user, session, conversation_logger):
-        return
-
-    if await _handle_inquiry_intent(message, text_payload, user, session, conversation_logger):
-        return
-
-    dialog_service = SalesDialogService(session=session, user=user)
-    outcome = await dialog_service.generate_reply()
-
-    if outcome.reply_text:
-        await _simulate_typing(message.bot, message.chat.id)
-        sent_message = await message.answer(outcome.reply_text)
-        metadata = outcome.metadata
-        await conversation_logger.log_bot_message(
-            user_id=user.id,
-            text=outcome.reply_text,
-            metadata=metadata,
-            bot=message.bot,
-            user=user,
-            source_message=sent_message,
-        )
+    await _answer_or_coalesce(
+        message,
+        text_payload,
+        user,
+        session,
+        conversation_logger,
+        dialog_context,
+        check_inquiry=True,
+    )
 
     logger.info(
         "text_message_processed_by_sales_dialog",
@@ -376,7 +515,7 @@ async def handle_text_message(
     """Handle arbitrary text messages and forward them to the LLM."""
     # If this is a manager working in manual dialog mode, skip automatic handling
     manager_session = (
-        manual_dialog_service.get_session_by_manager(message.from_user.id)
+        await manual_dialog_service.get_session_by_manager(message.from_user.id)
         if message.from_user
         else None
     )
@@ -393,7 +532,7 @@ async def handle_text_message(
         logger.warning("Text message handler missing session or user.", user_id=getattr(user, "id", None))
         return
 
-    if manual_dialog_service.is_user_in_manual_mode(user.id):
+    if await manual_dialog_service.is_user_in_manual_mode(user.id):
         logger.info("Manual dialog is active, skipping LLM handler.", user_id=user.id)
         return
 
@@ -413,7 +552,8 @@ async def handle_text_message(
         )
         return
     
-    logging_service = ConversationLoggingService(session)
+    dialog_context = DialogContext(session, user)
+    logging_service = ConversationLoggingService(session, context=dialog_context)
     await logging_service.log_user_message(
         user_id=user.id,
         text=message.text,
@@ -424,24 +564,15 @@ async def handle_text_message(
         source_message=message,
     )
 
-    if await _handle_purchase_intent(message, text_payload, user, session, logging_service):
-        return
-
-    dialog_service = SalesDialogService(session=session, user=user)
-    outcome = await dialog_service.generate_reply()
-
-    if outcome.reply_text:
-        await _simulate_typing(message.bot, message.chat.id)
-        sent_message = await message.answer(outcome.reply_text)
-        metadata = outcome.metadata
-        await logging_service.log_bot_message(
-            user_id=user.id,
-            text=outcome.reply_text,
-            metadata=metadata,
-            bot=message.bot,
-            user=user,
-            source_message=sent_message,
-        )
+    await _answer_or_coalesce(
+        message,
+        text_payload,
+        user,
+        session,
+        logging_service,
+        dialog_context,
+        check_inquiry=False,
+    )
 
 
 @router.message(F.voice)
@@ -8,11 +8,12 @@ from aiogram.types import CallbackQuery, InlineKeyboardButton, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.models import Lead, User
+from app.services.activity_buffer import activity_buffer
 from app.services.lead_service import LeadService
 from app.services.manager_notification_service import ManagerNotificationService
 from app.services.event_service import EventService
 from app.repositories.admin_repository import AdminRepository
-from app.repositories.user_repository import UserRepository
+from app.repositories.user_repository import USER_DETAIL, UserRepository
 from app.services.sales_script_service import SalesScriptService
 from app.models import AdminRole
 from app.services.script_service import ScriptService
@@ -401,7 +402,7 @@ async def handle_lead_profile(callback: CallbackQuery, **kwargs):
         # Get user data
         from app.repositories.user_repository import UserRepository
         user_repo = UserRepository(kwargs.get("session"))
-        user = await user_repo.get_by_id(user_id)
+        user = await user_repo.get_by_id(user_id, profile=USER_DETAIL)
         
         if not user:
             await callback.answer("❌ Пользователь не найден")
@@ -411,16 +412,17 @@ async def handle_lead_profile(callback: CallbackQuery, **kwargs):
         event_service = EventService(kwargs.get("session"))
         engagement_score = await event_service.get_engagement_score(user_id, hours=24)
         
-        total_scored = user.scored_total or 0
+        counters = await activity_buffer.fresh_counters(user)
+        total_scored = counters["scored_total"]
         if user.lead_level_percent is None or total_scored < 10:
             lead_level_display = f"недостаточно данных ({total_scored}/10)"
         else:
             lead_level_display = f"{user.lead_level_percent}%"
 
-        counter_value = user.counter or 0
-        pos_count = user.pos_count or 0
-        neu_count = user.neu_count or 0
-        neg_count = user.neg_count or 0
+        counter_value = counters["counter"]
+        pos_count = counters["pos_count"]
+        neu_count = counters["neu_count"]
+        neg_count = counters["neg_count"]
 
         sentiment_updated = (
             user.lead_level_updated_at.strftime('%d.%m.%Y %H:%M')
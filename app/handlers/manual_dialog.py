@@ -139,7 +139,7 @@ async def handle_manual_dialog_stop(callback: CallbackQuery) -> None:
         await callback.answer("Не удалось определить менеджера.", show_alert=True)
         return
 
-    session = manual_dialog_service.get_session_by_manager(manager.id)
+    session = await manual_dialog_service.get_session_by_manager(manager.id)
     if not session:
         await callback.answer("У вас нет активных диалогов.", show_alert=True)
         return
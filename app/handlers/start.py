@@ -13,6 +13,7 @@ from aiogram.types import (CallbackQuery, FSInputFile, InlineKeyboardButton,
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.config import settings
+from app.db import release_connection
 from app.constants.start_messages import (
     DEFAULT_START_MESSAGE,
     START_MESSAGE_SETTING_KEY,
@@ -102,6 +103,7 @@ async def give_bonus(callback: CallbackQuery, **kwargs):
         logger.info("Bonus file sent", user_id=callback.from_user.id)
 
         # Wait a bit before sending the follow-up
+        await release_connection(session)
         await asyncio.sleep(settings.bonus_followup_delay)
 
         opening_prompt = (
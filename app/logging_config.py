@@ -2,12 +2,18 @@
 
 from __future__ import annotations
 
+import atexit
+import copy
 import logging
+import logging.handlers
+import os
+import queue
 import sys
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, List
 
 import structlog
+from prometheus_client import Counter
 from structlog.types import Processor
 
 from app.config import settings
@@ -19,6 +25,149 @@ log_file_path = project_root / "logs/bot_interactions.log"
 INTERACTION_LOGGER_PREFIX = "bot.interactions"
 
 _logging_configured = False
+_listeners: List[logging.handlers.QueueListener] = []
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records discarded because the logging queue was full",
+    ["level"],
+)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotate on the ``when`` schedule and additionally whenever the file exceeds ``max_bytes``.
+
+    Several rotations inside one period get ``.1``, ``.2``... appended to the
+    dated name instead of overwriting each other.
+    """
+
+    def __init__(
+        self,
+        filename: os.PathLike | str,
+        *,
+        max_bytes: int,
+        when: str = "midnight",
+        backup_count: int = 0,
+        encoding: str = "utf-8",
+    ) -> None:
+        super().__init__(filename, when=when, backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            return True
+        # The file may overshoot by one record; that avoids formatting it twice.
+        return self.max_bytes > 0 and self.stream is not None and self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name: str) -> str:
+        name = super().rotation_filename(default_name)
+        index = 0
+        candidate = name
+        while os.path.exists(candidate):
+            index += 1
+            candidate = f"{name}.{index}"
+        return candidate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to a bounded queue drained by a ``QueueListener`` thread.
+
+    Formatting and disk or stdout writes happen in the listener thread. When
+    the queue is full the ``drop`` policy discards INFO and below at once and
+    waits up to ``block_timeout`` only for warnings and errors; ``block``
+    waits for every record. Records still not queued are counted in
+    ``log_records_dropped_total``.
+    """
+
+    def __init__(self, log_queue: queue.Queue, *, policy: str = "drop", block_timeout: float = 1.0) -> None:
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, keep the structlog event dict intact:
+        # ProcessorFormatter renders it in the listener thread.
+        record = copy.copy(record)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block" or record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(record.levelname).inc()
+
+
+class DebugSampler(logging.Filter):
+    """Pass one of every ``every`` DEBUG records per logger and event; other levels always pass."""
+
+    MAX_KEYS = 10_000
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._seen: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.every == 1:
+            return True
+        event = record.msg.get("event") if isinstance(record.msg, dict) else record.msg
+        key = (record.name, str(event))
+        if len(self._seen) >= self.MAX_KEYS and key not in self._seen:
+            self._seen.clear()
+        seen = self._seen.get(key, 0)
+        self._seen[key] = seen + 1
+        return seen % self.every == 0
+
+
+class _FanOutHandler(logging.Handler):
+    """Synchronous stand-in for the queue handler."""
+
+    def __init__(self, handlers) -> None:
+        super().__init__()
+        self.handlers = list(handlers)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def build_queue_handler(*handlers: logging.Handler) -> logging.Handler:
+    """Put ``handlers`` behind a background writer thread configured from settings.
+
+    With ``LOG_ASYNC=false`` the handlers are used directly in a plain
+    pass-through handler, which is the baseline for event-loop lag comparisons.
+    """
+    if not settings.log_async:
+        return _FanOutHandler(handlers)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=max(1, settings.log_queue_size))
+    queue_handler = NonBlockingQueueHandler(
+        log_queue,
+        policy=settings.log_overflow_policy,
+        block_timeout=settings.log_block_timeout,
+    )
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return queue_handler
+
+
+def shutdown_logging() -> None:
+    """Stop writer threads after they have drained their queues."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(shutdown_logging)
 
 
 def _russian_message_renderer(
@@ -86,7 +235,8 @@ def setup_logging(*, enable_tracing: bool = False) -> None:
 
     The configuration writes verbose diagnostics to stdout while only user-facing
     interaction logs are persisted in ``logs/bot_interactions.log`` in a
-    human-readable Russian format.
+    human-readable Russian format. Both outputs are written from a background
+    thread (see ``build_queue_handler``) so slow disks never stall the event loop.
     """
 
     global _logging_configured
@@ -143,8 +293,13 @@ def setup_logging(*, enable_tracing: bool = False) -> None:
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(console_formatter)
 
-    # Create file handler writing to a single consolidated file
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
+    # Create file handler writing to a single consolidated file, rotated by size and time
+    file_handler = SizeAndTimeRotatingFileHandler(
+        log_file_path,
+        max_bytes=settings.log_file_max_bytes,
+        when=settings.log_rotate_when,
+        backup_count=settings.log_file_backup_count,
+    )
     file_handler.setFormatter(file_formatter)
     file_handler.addFilter(logging.Filter(INTERACTION_LOGGER_PREFIX))
 
@@ -153,9 +308,10 @@ def setup_logging(*, enable_tracing: bool = False) -> None:
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
 
-    # Add our configured handlers
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    # Console and file output are written by one background thread
+    queue_handler = build_queue_handler(console_handler, file_handler)
+    queue_handler.addFilter(DebugSampler(settings.log_debug_sample_every))
+    root_logger.addHandler(queue_handler)
     root_logger.setLevel(log_level)
 
     # Reduce noise from third-party libraries in file logs
@@ -167,6 +323,8 @@ def setup_logging(*, enable_tracing: bool = False) -> None:
         "Логирование настроено",
         level=log_level,
         file_path=str(log_file_path),
+        async_writer=settings.log_async,
+        overflow_policy=settings.log_overflow_policy,
     )
 
     _logging_configured = True
@@ -3,6 +3,9 @@
 import logging
 import sys
 
+from app.config import settings
+from app.logging_config import SizeAndTimeRotatingFileHandler, build_queue_handler
+
 def setup_spam_logging():
     """
     Configures a dedicated logger for spam events.
@@ -14,19 +17,24 @@ def setup_spam_logging():
     # Prevent spam logs from propagating to the root logger
     spam_logger.propagate = False
 
-    # Create a handler for the spam log file
-    # In a real production environment, consider using RotatingFileHandler
-    file_handler = logging.FileHandler("spam_events.log", mode='a', encoding='utf-8')
-    
-    # Create a formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(message)s'
-    )
-    file_handler.setFormatter(formatter)
-
     # Add the handler to the logger
     if not spam_logger.handlers:
-        spam_logger.addHandler(file_handler)
+        # Create a rotating handler for the spam log file
+        file_handler = SizeAndTimeRotatingFileHandler(
+            "spam_events.log",
+            max_bytes=settings.log_file_max_bytes,
+            when=settings.log_rotate_when,
+            backup_count=settings.log_file_backup_count,
+        )
+
+        # Create a formatter
+        formatter = logging.Formatter(
+            '%(asctime)s - %(message)s'
+        )
+        file_handler.setFormatter(formatter)
+
+        # Written from a background thread, like the main log
+        spam_logger.addHandler(build_queue_handler(file_handler))
 
     return spam_logger
 
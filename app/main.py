@@ -10,8 +10,10 @@ from app.logging_config import setup_logging
 setup_logging()
 
 import structlog
+from aiogram.types import Update
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from app.api import api_router
@@ -20,6 +22,7 @@ from app.db import close_db, init_db, get_db
 from app.bot import bot, dp, on_startup, on_shutdown
 from app.services.scheduler_service import scheduler_service
 from app.services.redis_service import redis_service
+from app.services.update_queue import extract_chat_key, update_queue
 
 logger = structlog.get_logger(__name__)
 
@@ -32,12 +35,14 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     await init_db()
     await redis_service.initialize()
     await on_startup()
+    update_queue.start(lambda update: dp.feed_update(bot, update))
     scheduler_service.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down Telegram Sales Bot application")
+    await update_queue.stop(timeout=settings.webhook_drain_timeout)
     scheduler_service.stop()
     await on_shutdown()
     await redis_service.close()
@@ -106,7 +111,7 @@ async def metrics() -> Response:
 
 @app.post("/telegram/webhook")
 async def telegram_webhook(request: Request) -> dict:
-    """Handle Telegram webhook updates."""
+    """Validate a Telegram update and queue it for background processing."""
     try:
         # Verify webhook secret
         secret_header = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
@@ -116,16 +121,29 @@ async def telegram_webhook(request: Request) -> dict:
         
         # Get update data
         update_data = await request.json()
+        if not isinstance(update_data, dict):
+            return JSONResponse({"status": "error", "detail": "invalid update"}, status_code=400)
+        update = Update.model_validate(update_data, context={"bot": bot})
         
-        # Process update
-        await dp.feed_webhook_update(bot, update_data)
-        
-        return {"status": "ok"}
-        
+    except (ValueError, ValidationError) as e:
+        logger.warning("Rejected malformed webhook update", error=str(e))
+        return JSONResponse({"status": "error", "detail": "invalid update"}, status_code=400)
     except Exception as e:
         logger.error("Webhook processing error", error=str(e), exc_info=True)
         return JSONResponse({"status": "error"}, status_code=500)
 
+    # Acknowledge immediately; handlers run in the update worker pool.
+    if not update_queue.enqueue(update, extract_chat_key(update_data)):
+        logger.warning(
+            "Webhook update queue is full",
+            update_id=update.update_id,
+            pending=update_queue.pending,
+        )
+        # Telegram redelivers updates answered with a non-2xx status.
+        return JSONResponse({"status": "busy"}, status_code=503)
+
+    return {"status": "ok"}
+
 
 # GetCourse webhook integration removed
 
@@ -1,16 +1,16 @@
 """Anti-spam middleware with progressive banning."""
 
-import time
 import json
 import hashlib
-from datetime import datetime, timedelta
-from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 import structlog
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject, User
 
 from app.config import settings
+from app.services.anti_spam_service import AntiSpamService, SpamVerdict
 from app.services.redis_service import redis_service
 from app.services.spam_notification_service import send_ban_notification
 from app.logging_spam import spam_events_logger
@@ -24,6 +24,7 @@ class AntiSpamMiddleware(BaseMiddleware):
 
     def __init__(self):
         self.redis = redis_service.get_client()
+        self.spam_service = AntiSpamService(self.redis) if self.redis else None
 
     async def __call__(
         self,
@@ -38,46 +39,30 @@ class AntiSpamMiddleware(BaseMiddleware):
         if not user or user.id in settings.admin_ids_list:
             return await handler(event, data)
 
-        if not self.redis:
+        if not self.spam_service:
             logger.warning("Redis is not available. Anti-spam is in fail-safe mode (warnings only).")
             # In fail-safe mode, we might implement a simple in-memory check or just warn.
             # For now, we'll just pass through. A warning is already logged.
             return await handler(event, data)
 
-        # 1. Check if user is already banned
-        is_banned, ban_details = await self._is_user_banned(user.id)
-        if is_banned:
-            # Optionally, send a single notification at the beginning of the ban.
-            # This logic can be enhanced to avoid spamming the user with "you are banned" messages.
+        # Ban lookup, counters and ban bookkeeping run in one script call.
+        verdict = await self.spam_service.check(user.id, self._get_message_hash(event))
+        if verdict.banned:
             # For now, we just drop the update.
-            logger.info("Dropping update from banned user", user_id=user.id, banned_until=ban_details.get("banned_until"))
+            logger.info(
+                "Dropping update from banned user",
+                user_id=user.id,
+                banned_until=datetime.fromtimestamp(verdict.banned_until_ts).isoformat(),
+            )
             return None
 
-        # 2. Check spam thresholds
-        reason, stats = await self._check_spam_thresholds(user.id, event)
-        if reason:
-            logger.warning("Spam detected", user_id=user.id, reason=reason)
-            await self._apply_progressive_ban(user, reason, stats)
+        if verdict.reason:
+            logger.warning("Spam detected", user_id=user.id, reason=verdict.reason)
+            await self._report_ban(user, verdict)
             return None
 
         return await handler(event, data)
 
-    async def _is_user_banned(self, user_id: int) -> Tuple[bool, Dict[str, Any]]:
-        """Check if a user is currently banned."""
-        ban_key = f"ban:{user_id}"
-        ban_data_raw = await self.redis.get(ban_key)
-        if not ban_data_raw:
-            return False, {}
-
-        ban_data = json.loads(ban_data_raw)
-        banned_until_ts = ban_data.get("banned_until_ts", 0)
-
-        if time.time() < banned_until_ts:
-            return True, ban_data
-        
-        # Ban has expired, but the key might still exist.
-        return False, {}
-
     def _get_message_hash(self, event: TelegramObject) -> Optional[str]:
         """Generate a hash for message content to detect duplicates."""
         if isinstance(event, Message):
@@ -95,103 +80,44 @@ class AntiSpamMiddleware(BaseMiddleware):
                 return event.document.file_unique_id
         return None
 
-    async def _check_spam_thresholds(self, user_id: int, event: TelegramObject) -> Tuple[Optional[str], Dict[str, int]]:
-        """Check user activity against defined spam thresholds."""
-        stats = {}
-        # Burst check (10s)
-        burst_key = f"spam:cnt10:{user_id}"
-        burst_count = await self.redis.incr(burst_key)
-        stats['burst10'] = burst_count
-        if burst_count == 1:
-            await self.redis.expire(burst_key, 10)
-        if burst_count >= settings.spam_threshold_burst10:
-            return "burst10", stats
-
-        # Minute check (60s)
-        minute_key = f"spam:cnt60:{user_id}"
-        minute_count = await self.redis.incr(minute_key)
-        stats['minute60'] = minute_count
-        if minute_count == 1:
-            await self.redis.expire(minute_key, 60)
-        if minute_count >= settings.spam_threshold_minute60:
-            return "minute60", stats
-
-        # Duplicates check (30s)
-        msg_hash = self._get_message_hash(event)
-        if msg_hash:
-            dupe_key = f"spam:dupe:{user_id}:{msg_hash}"
-            dupe_count = await self.redis.incr(dupe_key)
-            stats['dupes'] = dupe_count
-            if dupe_count == 1:
-                await self.redis.expire(dupe_key, 30)
-            if dupe_count >= settings.spam_threshold_dupe30:
-                return "dupes", stats
-        
-        return None, stats
-
-    async def _apply_progressive_ban(self, user: User, reason: str, stats: Dict[str, int]) -> None:
-        """Apply a progressive ban to the user."""
-        ban_key = f"ban:{user.id}"
-        ban_data_raw = await self.redis.get(ban_key)
-        ban_data = json.loads(ban_data_raw) if ban_data_raw else {}
-
-        # Decay logic
-        last_violation_ts = ban_data.get("last_violation_ts", 0)
-        if time.time() - last_violation_ts > timedelta(days=settings.spam_decay_days).total_seconds():
-            ban_data["ban_level"] = 0
-
-        ban_level = ban_data.get("ban_level", 0) + 1
-        
-        ban_hours = settings.spam_ban_base_hours * (settings.spam_ban_multiplier ** (ban_level - 1))
-        ban_hours = min(ban_hours, settings.spam_ban_max_hours)
-        
-        ban_duration = timedelta(hours=ban_hours)
-        banned_until = datetime.now() + ban_duration
-        
-        new_ban_data = {
-            "ban_level": ban_level,
-            "banned_until_ts": banned_until.timestamp(),
+    async def _report_ban(self, user: User, verdict: SpamVerdict) -> None:
+        """Notify the user and admins about a ban the check script just applied."""
+        banned_until = datetime.fromtimestamp(verdict.banned_until_ts)
+        ban_details = {
+            "ban_level": verdict.ban_level,
+            "banned_until_ts": verdict.banned_until_ts,
             "banned_until": banned_until.isoformat(),
-            "last_violation_ts": time.time(),
-            "reason": reason,
+            "reason": verdict.reason,
         }
 
-        await self.redis.set(ban_key, json.dumps(new_ban_data), ex=int(ban_duration.total_seconds()) + 60) # Add a grace period
-
         logger.info(
             "User has been banned",
             user_id=user.id,
             username=user.username,
-            ban_level=ban_level,
-            ban_hours=ban_hours,
-            reason=reason,
+            ban_level=verdict.ban_level,
+            ban_hours=verdict.ban_hours,
+            reason=verdict.reason,
         )
 
         # Notify user
         try:
             await user.bot.send_message(
                 user.id,
-                f"Слишком частые сообщения. Доступ временно ограничен на {int(ban_hours)} ч. Попробуйте позже."
+                f"Слишком частые сообщения. Доступ временно ограничен на {int(verdict.ban_hours)} ч. Попробуйте позже."
             )
         except Exception as e:
             logger.warning("Failed to notify user about ban", user_id=user.id, error=str(e))
 
         # Notify admins
-        # Get latest stats for notification
-        full_stats = {
-            "burst10": await self.redis.get(f"spam:cnt10:{user.id}") or stats.get('burst10', 0),
-            "minute60": await self.redis.get(f"spam:cnt60:{user.id}") or stats.get('minute60', 0),
-            "dupes": stats.get('dupes', 0)
-        }
-        await send_ban_notification(user.bot, user, new_ban_data, full_stats)
+        await send_ban_notification(user.bot, user, ban_details, verdict.stats)
 
         # Log the event
         spam_events_logger.info(json.dumps({
             "user_id": user.id,
             "username": user.username,
-            "reason": reason,
-            "counts": full_stats,
-            "ban_level": new_ban_data['ban_level'],
-            "banned_until": new_ban_data['banned_until'],
+            "reason": verdict.reason,
+            "counts": verdict.stats,
+            "ban_level": verdict.ban_level,
+            "banned_until": ban_details["banned_until"],
             "action": "ban"
-        }))
\ No newline at end of file
+        }))
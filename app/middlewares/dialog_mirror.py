@@ -12,11 +12,9 @@ from aiogram.methods import TelegramMethod
 from aiogram.methods.base import TelegramType
 from aiogram.types import Message, TelegramObject
 
-from app.config import settings
-from app.db import AsyncSessionLocal
 from app.models import User as AppUser
+from app.services.dialog_mirror import dialog_mirror
 from app.services.logging_service import ConversationLoggingService
-from app.services.user_service import UserService
 
 
 class DialogsMirrorMiddleware(BaseMiddleware):
@@ -73,7 +71,7 @@ class DialogsMirrorMiddleware(BaseMiddleware):
             await conversation_logger.log_user_message(
                 user_id=user.id,
                 text=fallback_text,
-                 metadata={"source": "auto_mirror"},
+                metadata={"source": "auto_mirror"},
                 bot=bot_instance,
                 user=user,
                 telegram_user=telegram_user,
@@ -84,7 +82,12 @@ class DialogsMirrorMiddleware(BaseMiddleware):
 
 
 class DialogsChannelRequestMiddleware(BaseRequestMiddleware):
-    """Mirror outbound bot messages to the dialogs channel at the HTTP API layer."""
+    """Queue outbound bot messages for the dialogs channel at the HTTP API layer.
+
+    Nothing is awaited here besides the request itself: messages go to
+    ``dialog_mirror`` as fallbacks that are logged and mirrored in the
+    background unless a handler already did it.
+    """
 
     def __init__(self, dialogs_channel_id: int) -> None:
         self._dialogs_channel_id = dialogs_channel_id
@@ -96,18 +99,23 @@ class DialogsChannelRequestMiddleware(BaseRequestMiddleware):
         bot: Bot,
         method: TelegramMethod[TelegramType],
     ) -> TelegramType:
-        """Intercept bot API requests, mirror resulting messages, and return original response."""
+        """Intercept bot API requests, queue resulting messages, and return original response."""
         result = await make_request(bot, method)
 
         if not self._dialogs_channel_id:
             return result
 
-        results = self._extract_messages(result)
-        if not results:
-            return result
-
-        for telegram_message in results:
-            await self._mirror_outbound(bot, telegram_message)
+        for telegram_message in self._extract_messages(result):
+            if getattr(telegram_message, "_mirrored_to_dialogs", False):
+                continue
+            try:
+                dialog_mirror.submit_outbound(bot, telegram_message)
+            except Exception as exc:  # pragma: no cover - defensive logging
+                self._logger.warning(
+                    "dialogs_channel_forward_failed",
+                    error=str(exc),
+                    chat_id=getattr(telegram_message.chat, "id", None),
+                )
 
         return result
 
@@ -122,56 +130,5 @@ class DialogsChannelRequestMiddleware(BaseRequestMiddleware):
 
         return ()
 
-    async def _mirror_outbound(self, bot: Bot, message: Message) -> None:
-        """Mirror a single outbound message if it targets a user dialog."""
-        if getattr(message, "_mirrored_to_dialogs", False):
-            return
-
-        chat = message.chat
-        if chat is None or chat.id == self._dialogs_channel_id or chat.type != "private":
-            return
-
-        # Ensure we do not mirror service notifications without users
-        if message.from_user and message.from_user.is_bot and message.from_user.id != bot.id:
-            return
-
-        async with AsyncSessionLocal() as session:
-            user_service = UserService(session)
-            try:
-                app_user = await user_service.repository.get_by_telegram_id(chat.id)
-                if app_user is None:
-                    await session.rollback()
-                    return
-
-                text_payload = message.text or message.caption or ""
-                if not text_payload:
-                    text_payload = f"[{message.content_type}]"
-
-                conversation_logger = ConversationLoggingService(session)
-                await conversation_logger.log_bot_message(
-                    user_id=app_user.id,
-                    text=text_payload,
-                    bot=bot,
-                    user=app_user,
-                    source_message=message,
-                    mirror=False,
-                )
-                await conversation_logger._mirror_message(
-                    sender="bot",
-                    bot=bot,
-                    user=app_user,
-                    user_id=app_user.id,
-                    text=text_payload,
-                    source_message=message,
-                )
-                await session.commit()
-            except Exception as exc:  # pragma: no cover - defensive logging
-                await session.rollback()
-                self._logger.warning(
-                    "dialogs_channel_forward_failed",
-                    error=str(exc),
-                    chat_id=getattr(chat, "id", None),
-                )
-
 
 __all__ = ["DialogsMirrorMiddleware", "DialogsChannelRequestMiddleware"]
@@ -32,20 +32,26 @@ class ManualDialogMiddleware(BaseMiddleware):
         session = data.get("session")
 
         # Route messages from managers first
-        manager_session = manual_dialog_service.get_session_by_manager(event.from_user.id) if event.from_user else None
+        manager_session = (
+            await manual_dialog_service.get_session_by_manager(event.from_user.id)
+            if event.from_user
+            else None
+        )
         if manager_session:
             processed = await self._forward_manager_message(event, manager_session, session)
+            await manual_dialog_service.touch_session(manager_session)
             if processed:
                 return None
 
         if not user:
             return await handler(event, data)
 
-        user_session = manual_dialog_service.get_session_by_user(user.id)
+        user_session = await manual_dialog_service.get_session_by_user(user.id)
         if not user_session:
             return await handler(event, data)
 
         processed = await self._forward_user_message(event, user_session, session, user)
+        await manual_dialog_service.touch_session(user_session)
         if processed:
             return None
 
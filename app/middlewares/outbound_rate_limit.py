@@ -0,0 +1,127 @@
+"""Request middleware that routes every outbound message through the shared scheduler."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import structlog
+from aiogram.client.bot import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    CopyMessages,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    ForwardMessages,
+    SendAnimation,
+    SendAudio,
+    SendContact,
+    SendDice,
+    SendDocument,
+    SendLocation,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendPoll,
+    SendSticker,
+    SendVenue,
+    SendVideo,
+    SendVideoNote,
+    SendVoice,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+from app.config import settings
+from app.services.outbound_scheduler import OutboundScheduler, outbound_scheduler
+
+RATE_LIMITED_METHODS = (
+    SendMessage,
+    SendPhoto,
+    SendVideo,
+    SendDocument,
+    SendAudio,
+    SendVoice,
+    SendAnimation,
+    SendVideoNote,
+    SendSticker,
+    SendLocation,
+    SendVenue,
+    SendContact,
+    SendPoll,
+    SendDice,
+    SendMediaGroup,
+    CopyMessage,
+    CopyMessages,
+    ForwardMessage,
+    ForwardMessages,
+    EditMessageText,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+)
+
+
+def outbound_cost(method: TelegramMethod) -> int:
+    """Return how many messages a Bot API call counts as; 0 means not limited."""
+    if not isinstance(method, RATE_LIMITED_METHODS):
+        return 0
+    if isinstance(method, SendMediaGroup):
+        return max(1, len(method.media))
+    if isinstance(method, (CopyMessages, ForwardMessages)):
+        return max(1, len(method.message_ids))
+    return 1
+
+
+class OutboundRateLimitMiddleware(BaseRequestMiddleware):
+    """Acquire a scheduler permit before sending and retry on RetryAfter."""
+
+    def __init__(
+        self,
+        scheduler: Optional[OutboundScheduler] = None,
+        max_retries: Optional[int] = None,
+        max_retry_after: Optional[float] = None,
+    ) -> None:
+        self._scheduler = scheduler or outbound_scheduler
+        self._max_retries = settings.outbound_max_retries if max_retries is None else max_retries
+        self._max_retry_after = (
+            settings.outbound_max_retry_after if max_retry_after is None else max_retry_after
+        )
+        self._logger = structlog.get_logger(__name__)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        """Pace the request and transparently retry RetryAfter responses."""
+        cost = outbound_cost(method)
+        if not cost:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        attempt = 0
+        while True:
+            await self._scheduler.acquire(chat_id, cost=cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                self._scheduler.pause(exc.retry_after, chat_id)
+                attempt += 1
+                if attempt > self._max_retries or exc.retry_after > self._max_retry_after:
+                    raise
+                self._logger.info(
+                    "telegram_retry_scheduled",
+                    method=type(method).__name__,
+                    chat_id=chat_id,
+                    retry_after=exc.retry_after,
+                    attempt=attempt,
+                )
+
+
+__all__ = ["OutboundRateLimitMiddleware", "outbound_cost"]
@@ -1,51 +1,51 @@
 """Rate limiting middleware to prevent abuse."""
 
-import time
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 import structlog
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
 
 from app.config import settings
+from app.services.rate_limiter import RateLimit, RateLimiter, build_rate_limiter, default_profiles
 
 
 class RateLimitMiddleware(BaseMiddleware):
-    """Middleware for rate limiting user requests."""
-    
-    def __init__(self):
+    """Middleware for rate limiting user requests.
+
+    Each update is mapped to a route (``message``, ``callback``, ``voice``)
+    with its own GCRA limit; the limiter keeps one timestamp per user and
+    route, in process memory or in Redis (``RATE_LIMIT_BACKEND``).
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[RateLimiter] = None,
+        profiles: Optional[Dict[str, RateLimit]] = None,
+    ):
         self.logger = structlog.get_logger()
-        self.requests = {}  # user_id -> list of timestamps
-        self.max_requests = settings.rate_limit_requests
-        self.window_seconds = settings.rate_limit_window
-    
-    def _clean_old_requests(self, user_id: int) -> None:
-        """Remove old requests outside the time window."""
-        current_time = time.time()
-        if user_id in self.requests:
-            self.requests[user_id] = [
-                timestamp for timestamp in self.requests[user_id]
-                if current_time - timestamp < self.window_seconds
-            ]
-    
-    def _is_rate_limited(self, user_id: int) -> bool:
-        """Check if user is rate limited."""
-        current_time = time.time()
-        
-        # Clean old requests
-        self._clean_old_requests(user_id)
-        
-        # Check if user has exceeded the limit
-        if user_id not in self.requests:
-            self.requests[user_id] = []
-        
-        if len(self.requests[user_id]) >= self.max_requests:
-            return True
-        
-        # Add current request
-        self.requests[user_id].append(current_time)
-        return False
-    
+        self.limiter = limiter or build_rate_limiter(settings.rate_limit_backend)
+        self.profiles = profiles or default_profiles()
+
+    @staticmethod
+    def _route(event: TelegramObject) -> str:
+        if isinstance(event, CallbackQuery):
+            return "callback"
+        if isinstance(event, Message) and (event.voice or event.video_note or event.audio):
+            return "voice"
+        return "message"
+
+    async def _is_rate_limited(self, user_id: int, route: str) -> bool:
+        """Check if user is rate limited on ``route``; allowed requests are counted."""
+        limit = self.profiles.get(route) or self.profiles["message"]
+        try:
+            result = await self.limiter.hit(f"{route}:{user_id}", limit)
+        except Exception as exc:
+            # Fail open: a limiter outage must not take the bot down with it.
+            self.logger.warning("rate_limit_backend_failed", error=str(exc), user_id=user_id)
+            return False
+        return not result.allowed
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -53,30 +53,32 @@ class RateLimitMiddleware(BaseMiddleware):
         data: Dict[str, Any],
     ) -> Any:
         """Process the event with rate limiting."""
-        
+
         # Only rate limit messages and callback queries
         if not isinstance(event, (Message, CallbackQuery)):
             return await handler(event, data)
-        
+
         user = event.from_user
         if not user:
             return await handler(event, data)
-        
+
         # Check rate limit
-        if self._is_rate_limited(user.id):
+        route = self._route(event)
+        if await self._is_rate_limited(user.id, route):
             self.logger.warning(
                 "Rate limit exceeded",
                 user_id=user.id,
                 username=user.username,
+                route=route,
             )
-            
+
             # Send rate limit message for regular messages only
             if isinstance(event, Message):
                 await event.answer(
                     "⚠️ Слишком много запросов. Пожалуйста, подождите немного."
                 )
-            
+
             return None
-        
+
         # Process the event
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
@@ -5,11 +5,10 @@ from typing import Any, Awaitable, Callable, Dict
 import structlog
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
-from sqlalchemy.sql import func
-
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.db import AsyncSessionLocal
+from app.db import AsyncSessionLocal, release_connection
+from app.services.activity_buffer import activity_buffer
 from app.services.user_service import UserService
 from app.services.ab_testing_service import ABTestingService, ABEventType
 
@@ -36,7 +35,8 @@ class UserContextMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
         
-        # Create database session
+        # Create database session; handlers release its connection around
+        # external waits with ``release_connection``.
         async with AsyncSessionLocal() as session:
             data["session"] = session
             
@@ -50,7 +50,8 @@ class UserContextMiddleware(BaseMiddleware):
                     last_name=user.last_name,
                 )
                 
-                db_user.last_user_activity_at = func.now()
+                # Buffered and written in bulk instead of rewriting the row per update.
+                await activity_buffer.touch(db_user.id)
 
                 data["user"] = db_user
                 data["user_service"] = user_service
@@ -92,6 +93,10 @@ class UserContextMiddleware(BaseMiddleware):
                         user_id=db_user.id,
                     )
 
+                # Return the connection before the handler: most of its time is
+                # spent in LLM calls, Telegram sends and typing delays.
+                await release_connection(session)
+
                 # Process the event
                 result = await handler(event, data)
                 
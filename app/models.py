@@ -174,7 +174,10 @@ class User(Base):
         "UserMessageScore",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        # Unbounded history: load it explicitly when needed; rows go with
+        # the user through ON DELETE CASCADE.
+        lazy="raise",
+        passive_deletes=True,
     )
     
     __table_args__ = (
@@ -192,7 +195,8 @@ class Event(Base):
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"), nullable=False)
     type: Mapped[str] = mapped_column(String(100), nullable=False)
     payload: Mapped[dict] = mapped_column(JSON)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the monthly partitions (see partition_service).
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="events")
@@ -212,11 +216,17 @@ class Message(Base):
     role: Mapped[MessageRole] = mapped_column(String(10), nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=False)
     meta: Mapped[Optional[dict]] = mapped_column(JSON)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the monthly partitions (see partition_service).
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="messages")
 
+    __table_args__ = (
+        # Conversation history: latest N per user and keyset pages further back.
+        Index("ix_messages_user_created", "user_id", "created_at", "id"),
+    )
+
 
 class UserMessageScore(Base):
     """Audit record for user message sentiment classification."""
@@ -224,7 +234,13 @@ class UserMessageScore(Base):
     __table_args__ = (
         UniqueConstraint("hash", name="uq_user_message_scores_hash"),
         UniqueConstraint("user_id", "message_id", name="uq_user_message_scores_message"),
-        Index("ix_user_message_scores_user_id", "user_id"),
+        # Serves "last ten scores of a user" (lead level) without touching the heap.
+        Index(
+            "ix_user_message_scores_user_evaluated",
+            "user_id",
+            "evaluated_at",
+            postgresql_include=["score"],
+        ),
         Index("ix_user_message_scores_evaluated_at", "evaluated_at"),
     )
 
@@ -423,7 +439,8 @@ class ProductMatchLog(Base):
     score: Mapped[float] = mapped_column(Float, nullable=False)
     top3: Mapped[dict] = mapped_column(JSON, nullable=False)
     explanation: Mapped[Optional[str]] = mapped_column(Text)
-    matched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the monthly partitions (see partition_service).
+    matched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     threshold_used: Mapped[Optional[float]] = mapped_column(Float)
     trigger: Mapped[Optional[str]] = mapped_column(String(50))
 
@@ -758,7 +775,8 @@ class ABEvent(Base):
     assignment_id: Mapped[int] = mapped_column(Integer, ForeignKey("ab_assignments.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     event_type: Mapped[ABEventType] = mapped_column(String(40), nullable=False)
-    occurred_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the monthly partitions (see partition_service).
+    occurred_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     meta: Mapped[Optional[dict]] = mapped_column(JSON)
 
     # Relationships
@@ -865,16 +883,19 @@ class BroadcastDelivery(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     broadcast_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("broadcasts.id"), nullable=False)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"), nullable=False)
-    status: Mapped[str] = mapped_column(String(20), nullable=False)  # sent, failed, pending
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # pending, sending, sent, failed
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     failed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     error_message: Mapped[Optional[str]] = mapped_column(Text)
+    message_id: Mapped[Optional[int]] = mapped_column(BigInteger)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
         UniqueConstraint("broadcast_id", "user_id", name="uq_broadcast_user_delivery"),
         Index("ix_broadcast_deliveries_status", "status"),
         Index("ix_broadcast_deliveries_broadcast_id", "broadcast_id"),
+        Index("ix_broadcast_deliveries_broadcast_status_id", "broadcast_id", "status", "id"),
+        Index("ix_broadcast_deliveries_created_at", "created_at"),
     )
 
 
@@ -887,6 +908,17 @@ class SystemSetting(Base):
     description: Mapped[Optional[str]] = mapped_column(String(255))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+class AnalyticsDailyRollup(Base):
+    """Per-day counters pre-aggregated from raw tables for analytics reports."""
+    __tablename__ = "analytics_daily_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    metric: Mapped[str] = mapped_column(String(64), primary_key=True)
+    dimension: Mapped[str] = mapped_column(String(100), primary_key=True, default="")
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class AdminOutboundStatus(str, Enum):
     """Status of a message sent via /sendto."""
     SENT = "sent"
@@ -11,6 +11,7 @@ from app.models import (
     Broadcast, ABTest, ABVariant, ABResult, ABTestStatus, ABTestMetric,
     User, UserSegment
 )
+from app.repositories.user_repository import USER_CONTACT
 
 
 class BroadcastRepository:
@@ -69,7 +70,7 @@ class BroadcastRepository:
         segment_filter: Optional[Dict[str, Any]] = None
     ) -> List[User]:
         """Get users matching broadcast segment filter."""
-        stmt = select(User).where(User.is_blocked == False)
+        stmt = select(User).where(User.is_blocked == False).options(*USER_CONTACT)
         
         if segment_filter:
             # Apply segment filtering
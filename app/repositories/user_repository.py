@@ -1,14 +1,40 @@
 """User repository for database operations."""
 
-from typing import Optional, List
+from typing import Optional, List, Sequence
 
 import structlog
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload, selectinload
+from sqlalchemy.sql.base import ExecutableOption
 
 from app.models import User, UserSegment, FunnelStage
 
 
+# Loader profiles. None of them loads a relationship implicitly; touching one
+# that was not loaded raises instead of issuing a hidden query.
+# The users row handed to every handler by the middleware: columns only.
+USER_CONTEXT: Sequence[ExecutableOption] = (raiseload("*"),)
+# What an outbound send needs.
+USER_CONTACT: Sequence[ExecutableOption] = (
+    load_only(
+        User.id,
+        User.telegram_id,
+        User.username,
+        User.first_name,
+        User.last_name,
+        User.is_blocked,
+        raiseload=True,
+    ),
+    raiseload("*"),
+)
+# Admin cards.
+USER_DETAIL: Sequence[ExecutableOption] = (
+    selectinload(User.lead_profile),
+    raiseload("*"),
+)
+
+
 class UserRepository:
     """Repository for user database operations."""
     
@@ -16,15 +42,23 @@ class UserRepository:
         self.session = session
         self.logger = structlog.get_logger()
     
-    async def get_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+    async def get_by_telegram_id(
+        self,
+        telegram_id: int,
+        profile: Sequence[ExecutableOption] = USER_CONTEXT,
+    ) -> Optional[User]:
         """Get user by Telegram ID."""
-        stmt = select(User).where(User.telegram_id == telegram_id)
+        stmt = select(User).where(User.telegram_id == telegram_id).options(*profile)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def get_by_id(self, user_id: int) -> Optional[User]:
+    async def get_by_id(
+        self,
+        user_id: int,
+        profile: Sequence[ExecutableOption] = USER_CONTEXT,
+    ) -> Optional[User]:
         """Get user by ID."""
-        stmt = select(User).where(User.id == user_id)
+        stmt = select(User).where(User.id == user_id).options(*profile)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
@@ -12,7 +12,7 @@ from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo, InputMediaDocument
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select, func, and_, text
+from sqlalchemy import bindparam, select, func, and_, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -28,6 +28,7 @@ from app.models import (
     User,
 )
 from app.repositories.user_repository import UserRepository
+from app.services.outbound_scheduler import bulk_outbound
 
 VARIANT_CODES = ("A", "B", "C")
 UNIQUE_EVENT_TYPES = {
@@ -128,7 +129,7 @@ class ABTestingService:
         )
         return ab_test
 
-    async def start_pilot_phase(self, test_id: int, bot: Bot, throttle: float = 0.1) -> Dict[str, Any]:
+    async def start_pilot_phase(self, test_id: int, bot: Bot, throttle: float = 0.0) -> Dict[str, Any]:
         """Initiate the pilot sending phase for an A/B test."""
         test = await self.session.get(
             ABTest,
@@ -201,7 +202,7 @@ class ABTestingService:
         *,
         bot: Bot,
         send_messages: bool = True,
-        throttle: float = 0.1,
+        throttle: float = 0.0,
     ) -> Dict[str, Any]:
         """Backward-compatible entrypoint to launch pilot phase and deliver messages."""
         if not send_messages:
@@ -212,8 +213,9 @@ class ABTestingService:
         summary.setdefault("assignments", summary.get("pilot_size", 0))
         return summary
 
-    async def deliver_assignments(self, assignments: List[ABAssignment], bot: Bot, throttle: float = 0.1) -> Dict[str, int]:
-        """Deliver messages for a list of assignments."""
+    @bulk_outbound
+    async def deliver_assignments(self, assignments: List[ABAssignment], bot: Bot, throttle: float = 0.0) -> Dict[str, int]:
+        """Deliver messages for a list of assignments; pacing comes from the outbound scheduler."""
         sent = failed = 0
         for assignment in assignments:
             try:
@@ -239,7 +241,8 @@ class ABTestingService:
                 failed += 1
             
             await self.session.flush()
-            await asyncio.sleep(throttle)
+            if throttle > 0:
+                await asyncio.sleep(throttle)
         
         return {"sent": sent, "failed": failed, "total": len(assignments)}
 
@@ -352,24 +355,65 @@ class ABTestingService:
 
     async def analyze_test_results(self, test_id: int) -> Dict[str, Any]:
         """Calculate analytics for test without mutating snapshot."""
+        test = await self.session.get(ABTest, test_id)
+        analyses = await self.analyze_tests_results([test])
+        return analyses[test.id]
+
+    async def analyze_tests_results(self, tests: Sequence[ABTest]) -> Dict[int, Dict[str, Any]]:
+        """Calculate analytics for several tests with a single aggregate query."""
+        if not tests:
+            return {}
         stmt = text("""
+            WITH test_variants AS (
+                SELECT id, ab_test_id, variant_code
+                FROM ab_variants
+                WHERE ab_test_id IN :test_ids
+            ),
+            assigned AS (
+                SELECT
+                    a.variant_id,
+                    COUNT(a.id) as intended,
+                    SUM(CASE WHEN a.delivery_status = 'SENT' OR a.delivered_at IS NOT NULL THEN 1 ELSE 0 END) as delivered
+                FROM ab_assignments a
+                WHERE a.variant_id IN (SELECT id FROM test_variants)
+                GROUP BY a.variant_id
+            ),
+            engaged AS (
+                SELECT
+                    e.variant_id,
+                    COUNT(DISTINCT e.user_id) FILTER (WHERE e.event_type = 'clicked') as clicks,
+                    COUNT(DISTINCT e.user_id) FILTER (WHERE e.event_type = 'lead_created') as conversions,
+                    COUNT(DISTINCT e.user_id) FILTER (WHERE e.event_type = 'replied') as responses,
+                    COUNT(DISTINCT e.user_id) FILTER (WHERE e.event_type = 'unsubscribed') as unsubscribed
+                FROM ab_events e
+                WHERE e.test_id IN :test_ids
+                  AND e.variant_id IN (SELECT id FROM test_variants)
+                  -- no event predates its test; skips older ab_events partitions
+                  AND e.occurred_at >= (
+                      SELECT MIN(COALESCE(created_at, CAST('-infinity' AS timestamptz))) - INTERVAL '1 day'
+                      FROM ab_tests
+                      WHERE id IN :test_ids
+                  )
+                GROUP BY e.variant_id
+            )
             SELECT
+                v.ab_test_id as test_id,
                 v.id as variant_id,
                 v.variant_code,
-                COUNT(a.id) as intended,
-                SUM(CASE WHEN a.delivery_status = 'SENT' OR a.delivered_at IS NOT NULL THEN 1 ELSE 0 END) as delivered,
-                (SELECT COUNT(DISTINCT e.user_id) FROM ab_events e WHERE e.variant_id = v.id AND e.event_type = 'clicked') as clicks,
-                (SELECT COUNT(DISTINCT e.user_id) FROM ab_events e WHERE e.variant_id = v.id AND e.event_type = 'lead_created') as conversions,
-                (SELECT COUNT(DISTINCT e.user_id) FROM ab_events e WHERE e.variant_id = v.id AND e.event_type = 'replied') as responses,
-                (SELECT COUNT(DISTINCT e.user_id) FROM ab_events e WHERE e.variant_id = v.id AND e.event_type = 'unsubscribed') as unsubscribed
-            FROM ab_variants v
-            JOIN ab_assignments a ON a.variant_id = v.id
-            WHERE v.ab_test_id = :test_id
-            GROUP BY v.id, v.variant_code
-        """)
-        
-        result = await self.session.execute(stmt, {"test_id": test_id})
-        variants_payload = []
+                s.intended,
+                s.delivered,
+                COALESCE(g.clicks, 0) as clicks,
+                COALESCE(g.conversions, 0) as conversions,
+                COALESCE(g.responses, 0) as responses,
+                COALESCE(g.unsubscribed, 0) as unsubscribed
+            FROM test_variants v
+            JOIN assigned s ON s.variant_id = v.id
+            LEFT JOIN engaged g ON g.variant_id = v.id
+            ORDER BY v.ab_test_id, v.id
+        """).bindparams(bindparam("test_ids", expanding=True))
+
+        result = await self.session.execute(stmt, {"test_ids": [test.id for test in tests]})
+        variants_by_test: Dict[int, List[Dict[str, Any]]] = {}
         for row in result:
             row_dict = row._asdict()
             delivered = row_dict.get('delivered', 0)
@@ -385,7 +429,7 @@ class ABTestingService:
             response_rate = (responses / delivered) if delivered else 0.0
             unsubscribe_rate = (unsubscribed / delivered) if delivered else 0.0
 
-            variants_payload.append({
+            variants_by_test.setdefault(row_dict['test_id'], []).append({
                 "variant_id": row_dict['variant_id'],
                 "variant": row_dict['variant_code'],
                 "intended": intended,
@@ -403,22 +447,25 @@ class ABTestingService:
                 "unsub_rate": unsubscribe_rate,
             })
 
-        test = await self.session.get(ABTest, test_id)
-        winner_variant = None
-        if variants_payload:
-            winner_variant = max(
-                variants_payload,
-                key=lambda v: (v.get("leads", 0), v.get("ctr", 0), v.get("variant")),
-            )
+        analyses: Dict[int, Dict[str, Any]] = {}
+        for test in tests:
+            variants_payload = variants_by_test.get(test.id, [])
+            winner_variant = None
+            if variants_payload:
+                winner_variant = max(
+                    variants_payload,
+                    key=lambda v: (v.get("leads", 0), v.get("ctr", 0), v.get("variant")),
+                )
 
-        return {
-            "test_id": test.id,
-            "name": test.name,
-            "status": test.status.value if hasattr(test.status, "value") else str(test.status),
-            "metric": test.metric.value if hasattr(test.metric, "value") else str(test.metric),
-            "variants": variants_payload,
-            "winner": winner_variant,
-        }
+            analyses[test.id] = {
+                "test_id": test.id,
+                "name": test.name,
+                "status": test.status.value if hasattr(test.status, "value") else str(test.status),
+                "metric": test.metric.value if hasattr(test.metric, "value") else str(test.metric),
+                "variants": variants_payload,
+                "winner": winner_variant,
+            }
+        return analyses
 
     async def _ensure_event(
         self,
@@ -0,0 +1,388 @@
+"""Write-behind buffering of per-user activity timestamps and counter deltas.
+
+Every update used to rewrite the hot ``users`` row twice: once for
+``last_user_activity_at`` and once more for the sentiment counters. Both are
+now collected here and applied in one bulk UPDATE per flush interval.
+
+Readers that need fresh values merge the pending deltas on top of the row
+(``fresh_counters``) or flush first (the inactivity follow-ups). With the
+memory store a crash loses at most one flush interval; the Redis store keeps
+buffered data across process restarts and re-applies an unacknowledged
+batch on the next flush.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+import structlog
+from prometheus_client import Counter, Histogram
+from sqlalchemy import DateTime, Integer, bindparam, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.models import User
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+COUNTER_FIELDS = ("counter", "pos_count", "neu_count", "neg_count", "scored_total")
+
+ACTIVITY_FLUSH_USERS = Histogram(
+    "activity_flush_users",
+    "Users updated by one write-behind flush",
+    buckets=(1, 10, 50, 100, 500, 1000, 5000, 20000),
+)
+ACTIVITY_BUFFER_ERRORS = Counter(
+    "activity_buffer_errors_total",
+    "Write-behind buffer operations that failed",
+    ["operation"],
+)
+
+
+@dataclass(slots=True)
+class ActivityDelta:
+    """Pending changes for one user: latest activity time and counter increments."""
+
+    seen_at: Optional[float] = None
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: "ActivityDelta") -> None:
+        if other.seen_at is not None and (self.seen_at is None or other.seen_at > self.seen_at):
+            self.seen_at = other.seen_at
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class ActivityStore(ABC):
+    """Buffer contract: collect deltas, hand them out in batches, forget acknowledged ones.
+
+    ``drain`` moves everything pending into an in-flight batch and returns it;
+    until ``ack`` is called the same batch is returned again, so a failed
+    flush is retried instead of lost.
+    """
+
+    @abstractmethod
+    async def touch(self, user_id: int, seen_at: float) -> None:
+        """Record activity of ``user_id`` at ``seen_at`` (epoch seconds)."""
+
+    @abstractmethod
+    async def add(self, user_id: int, deltas: Mapping[str, int]) -> None:
+        """Add counter increments for ``user_id``."""
+
+    @abstractmethod
+    async def drain(self) -> Dict[int, ActivityDelta]:
+        """Return the in-flight batch, moving pending deltas into it if it is empty."""
+
+    @abstractmethod
+    async def ack(self) -> None:
+        """Forget the in-flight batch after it was written."""
+
+    @abstractmethod
+    async def peek(self, user_id: int) -> Optional[ActivityDelta]:
+        """Return pending plus in-flight changes for one user."""
+
+
+class MemoryActivityStore(ActivityStore):
+    """Process-local store; operations never await, so they are atomic in the event loop."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, ActivityDelta] = {}
+        self._inflight: Dict[int, ActivityDelta] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._inflight)
+
+    def _delta(self, user_id: int) -> ActivityDelta:
+        delta = self._pending.get(user_id)
+        if delta is None:
+            delta = self._pending[user_id] = ActivityDelta()
+        return delta
+
+    async def touch(self, user_id: int, seen_at: float) -> None:
+        delta = self._delta(user_id)
+        if delta.seen_at is None or seen_at > delta.seen_at:
+            delta.seen_at = seen_at
+
+    async def add(self, user_id: int, deltas: Mapping[str, int]) -> None:
+        counters = self._delta(user_id).counters
+        for name, value in deltas.items():
+            counters[name] = counters.get(name, 0) + value
+
+    async def drain(self) -> Dict[int, ActivityDelta]:
+        if not self._inflight:
+            self._inflight, self._pending = self._pending, {}
+        return self._inflight
+
+    async def ack(self) -> None:
+        self._inflight = {}
+
+    async def peek(self, user_id: int) -> Optional[ActivityDelta]:
+        pending = self._pending.get(user_id)
+        inflight = self._inflight.get(user_id)
+        if pending is None or inflight is None:
+            return pending or inflight
+        merged = ActivityDelta(inflight.seen_at, dict(inflight.counters))
+        merged.merge(pending)
+        return merged
+
+
+# KEYS: seen, deltas, seen in flight, deltas in flight.
+# Pending hashes are renamed into flight only when no earlier batch is still
+# unacknowledged, so a failed flush gets the same batch back.
+_DRAIN_LUA = """
+if redis.call('EXISTS', KEYS[3], KEYS[4]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('RENAME', KEYS[1], KEYS[3])
+    end
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[4])
+    end
+end
+return {redis.call('HGETALL', KEYS[3]), redis.call('HGETALL', KEYS[4])}
+"""
+
+_TOUCH_LUA = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+if not current or current < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+
+class RedisActivityStore(ActivityStore):
+    """Shared store: one hash of activity times, one of ``"<user_id>:<field>"`` increments."""
+
+    def __init__(self, prefix: str = "activity") -> None:
+        self.seen_key = f"{prefix}:seen"
+        self.delta_key = f"{prefix}:delta"
+        self.seen_inflight_key = f"{prefix}:seen:flushing"
+        self.delta_inflight_key = f"{prefix}:delta:flushing"
+        self._scripts: Any = None
+        self._script_client: Any = None
+
+    def _client(self):
+        client = redis_service.get_client()
+        if client is None:
+            raise RuntimeError("Redis is not initialized; cannot use redis activity buffer")
+        if client is not self._script_client:
+            self._scripts = (client.register_script(_TOUCH_LUA), client.register_script(_DRAIN_LUA))
+            self._script_client = client
+        return client
+
+    async def touch(self, user_id: int, seen_at: float) -> None:
+        self._client()
+        await self._scripts[0](keys=[self.seen_key], args=[user_id, repr(seen_at)])
+
+    async def add(self, user_id: int, deltas: Mapping[str, int]) -> None:
+        pipe = self._client().pipeline(transaction=False)
+        for name, value in deltas.items():
+            pipe.hincrby(self.delta_key, f"{user_id}:{name}", value)
+        await pipe.execute()
+
+    async def drain(self) -> Dict[int, ActivityDelta]:
+        self._client()
+        seen, deltas = await self._scripts[1](
+            keys=[self.seen_key, self.delta_key, self.seen_inflight_key, self.delta_inflight_key]
+        )
+        batch: Dict[int, ActivityDelta] = {}
+        for user_id, value in _pairs(seen):
+            batch.setdefault(int(user_id), ActivityDelta()).seen_at = float(value)
+        for name, value in _pairs(deltas):
+            user_id, _, counter = name.partition(":")
+            batch.setdefault(int(user_id), ActivityDelta()).counters[counter] = int(value)
+        return batch
+
+    async def ack(self) -> None:
+        await self._client().delete(self.seen_inflight_key, self.delta_inflight_key)
+
+    async def peek(self, user_id: int) -> Optional[ActivityDelta]:
+        fields = [f"{user_id}:{name}" for name in COUNTER_FIELDS]
+        pipe = self._client().pipeline(transaction=False)
+        for seen_key, delta_key in (
+            (self.seen_key, self.delta_key),
+            (self.seen_inflight_key, self.delta_inflight_key),
+        ):
+            pipe.hget(seen_key, user_id)
+            pipe.hmget(delta_key, fields)
+        seen, counts, seen_inflight, counts_inflight = await pipe.execute()
+
+        delta: Optional[ActivityDelta] = None
+        for seen_at, values in ((seen, counts), (seen_inflight, counts_inflight)):
+            counters = {
+                name: int(value) for name, value in zip(COUNTER_FIELDS, values) if value is not None
+            }
+            if seen_at is None and not counters:
+                continue
+            part = ActivityDelta(float(seen_at) if seen_at is not None else None, counters)
+            if delta is None:
+                delta = part
+            else:
+                delta.merge(part)
+        return delta
+
+
+def _pairs(flat: Iterable[Any]):
+    items = [item.decode() if isinstance(item, bytes) else item for item in flat]
+    return zip(items[0::2], items[1::2])
+
+
+_users = User.__table__
+_FLUSH_STMT = (
+    update(_users)
+    .where(_users.c.id == bindparam("b_id"))
+    .values(
+        # GREATEST ignores NULL, so rows without new activity keep their value.
+        last_user_activity_at=func.greatest(
+            _users.c.last_user_activity_at,
+            bindparam("b_seen_at", type_=DateTime(timezone=True)),
+        ),
+        **{
+            name: _users.c[name] + bindparam(f"b_{name}", type_=Integer)
+            for name in COUNTER_FIELDS
+        },
+    )
+)
+
+
+async def apply_activity(session: AsyncSession, batch: Mapping[int, ActivityDelta]) -> int:
+    """Write a drained batch with one executemany UPDATE; return the number of users."""
+    if not batch:
+        return 0
+    params = []
+    # Fixed row order keeps concurrent flushers from deadlocking each other.
+    for user_id in sorted(batch):
+        delta = batch[user_id]
+        row: Dict[str, Any] = {
+            "b_id": user_id,
+            "b_seen_at": (
+                datetime.fromtimestamp(delta.seen_at, tz=timezone.utc)
+                if delta.seen_at is not None
+                else None
+            ),
+        }
+        for name in COUNTER_FIELDS:
+            row[f"b_{name}"] = delta.counters.get(name, 0)
+        params.append(row)
+    await session.execute(_FLUSH_STMT, params)
+    return len(params)
+
+
+class ActivityBuffer:
+    """Collects activity and counter deltas and flushes them on a timer."""
+
+    def __init__(self, store: ActivityStore, flush_interval: float = 5.0) -> None:
+        self.store = store
+        self.flush_interval = max(0.1, flush_interval)
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def touch(self, user_id: int, seen_at: Optional[float] = None) -> None:
+        """Record user activity; failures are logged, never raised into the update."""
+        try:
+            await self.store.touch(user_id, time.time() if seen_at is None else seen_at)
+        except Exception as exc:
+            ACTIVITY_BUFFER_ERRORS.labels("touch").inc()
+            logger.warning("activity_touch_failed", user_id=user_id, error=str(exc))
+
+    async def add_counters(self, user_id: int, deltas: Mapping[str, int]) -> None:
+        """Buffer counter increments; ``SentimentService.reconcile`` repairs any that are lost."""
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        try:
+            await self.store.add(user_id, deltas)
+        except Exception as exc:
+            ACTIVITY_BUFFER_ERRORS.labels("add").inc()
+            logger.warning("activity_add_failed", user_id=user_id, error=str(exc))
+
+    async def pending(self, user_id: int) -> Optional[ActivityDelta]:
+        try:
+            return await self.store.peek(user_id)
+        except Exception as exc:
+            ACTIVITY_BUFFER_ERRORS.labels("peek").inc()
+            logger.warning("activity_peek_failed", user_id=user_id, error=str(exc))
+            return None
+
+    async def fresh_counters(self, user: User) -> Dict[str, int]:
+        """Counter columns of ``user`` with buffered increments applied."""
+        counters = {name: getattr(user, name) or 0 for name in COUNTER_FIELDS}
+        delta = await self.pending(user.id)
+        if delta is not None:
+            for name, value in delta.counters.items():
+                if name in counters:
+                    counters[name] += value
+        return counters
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; return the number of users updated."""
+        async with self._flush_lock:
+            try:
+                batch = await self.store.drain()
+                if not batch:
+                    return 0
+                async with AsyncSessionLocal() as session:
+                    written = await apply_activity(session, batch)
+                    await session.commit()
+                await self.store.ack()
+            except Exception as exc:
+                # The batch stays in flight and is retried on the next flush.
+                ACTIVITY_BUFFER_ERRORS.labels("flush").inc()
+                logger.warning("activity_flush_failed", error=str(exc))
+                return 0
+        ACTIVITY_FLUSH_USERS.observe(written)
+        return written
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop(), name="activity-buffer-flush")
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+def build_activity_store(kind: str) -> ActivityStore:
+    """Create the store configured by ``ACTIVITY_BUFFER_BACKEND``."""
+    if kind == "redis":
+        return RedisActivityStore()
+    if kind != "memory":
+        logger.warning("unknown_activity_buffer_backend", backend=kind, fallback="memory")
+    return MemoryActivityStore()
+
+
+activity_buffer = ActivityBuffer(
+    build_activity_store(settings.activity_buffer_backend),
+    flush_interval=settings.activity_flush_interval_seconds,
+)
+
+__all__ = [
+    "COUNTER_FIELDS",
+    "ActivityBuffer",
+    "ActivityDelta",
+    "ActivityStore",
+    "MemoryActivityStore",
+    "RedisActivityStore",
+    "activity_buffer",
+    "apply_activity",
+    "build_activity_store",
+]
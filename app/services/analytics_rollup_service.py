@@ -0,0 +1,207 @@
+"""Incremental per-day rollups that back the analytics report."""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import String, cast, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    AnalyticsDailyRollup,
+    Broadcast,
+    BroadcastDelivery,
+    Event,
+    Lead,
+    Message,
+    User,
+)
+from app.repositories.system_settings_repository import SystemSettingsRepository
+from app.services.partition_service import PARTITIONED_TABLES
+
+logger = logging.getLogger(__name__)
+
+HIGH_WATER_SETTING_KEY = "analytics_rollup_high_water"
+DELIVERIES_METRIC = "deliveries"
+# Cutoff of the last run that folded rows; bounds scans of partitioned sources.
+FOLDED_AT_MARK = "folded_at"
+# Rows younger than this wait for the next run, so a transaction that took its id
+# before a newer row but committed after it is not skipped by the id high-water mark.
+COMMIT_GRACE = timedelta(minutes=1)
+# pg advisory lock key; keeps two processes from folding the same rows twice.
+ROLLUP_LOCK_KEY = 0x616E6C79
+
+
+@dataclass(frozen=True, slots=True)
+class AppendOnlySource:
+    """Insert-only table rolled up by id high-water mark."""
+
+    metric: str
+    model: Any
+    dimension: Optional[str] = None
+
+
+APPEND_ONLY_SOURCES = (
+    AppendOnlySource("users_created", User),
+    AppendOnlySource("leads_created", Lead),
+    AppendOnlySource("broadcasts_created", Broadcast),
+    AppendOnlySource("events", Event, "type"),
+    AppendOnlySource("messages", Message, "role"),
+)
+
+
+def _utc_day(column):
+    return func.date(func.timezone("UTC", column))
+
+
+class AnalyticsRollupService:
+    """Maintains ``analytics_daily_rollups`` and answers period totals from it.
+
+    Insert-only tables are folded in incrementally: rows with ids above the
+    stored high-water mark are counted per UTC day and added to the existing
+    counters. Partitioned sources are also bounded by the last fold time
+    minus the lookback, so only recent monthly partitions are scanned.
+    Delivery statuses change after insert, so deliveries are recomputed
+    from the last refreshed day minus a short lookback instead.
+    The caller owns the transaction; counters and high-water marks are
+    committed together.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Fold new rows into the rollups and return the updated high-water marks."""
+        acquired = await self.session.scalar(
+            select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_KEY))
+        )
+        if not acquired:
+            logger.info("Analytics rollup refresh already running, skipping")
+            return {}
+
+        repo = SystemSettingsRepository(self.session)
+        stored = await repo.get_value(HIGH_WATER_SETTING_KEY, default=None) or {}
+        marks: Dict[str, Any] = dict(stored)
+        cutoff = datetime.now(timezone.utc) - COMMIT_GRACE
+        since = None
+        if marks.get(FOLDED_AT_MARK):
+            since = datetime.fromisoformat(marks[FOLDED_AT_MARK]) - timedelta(
+                days=max(1, settings.analytics_rollup_lookback_days)
+            )
+
+        advanced = False
+        for source in APPEND_ONLY_SOURCES:
+            last_id = int(marks.get(source.metric) or 0)
+            marks[source.metric] = await self._fold_append_only(source, last_id, cutoff, since)
+            advanced = advanced or marks[source.metric] != last_id
+        if advanced:
+            marks[FOLDED_AT_MARK] = cutoff.isoformat()
+        marks[DELIVERIES_METRIC] = await self._recompute_deliveries(marks.get(DELIVERIES_METRIC))
+
+        if marks != stored:
+            await repo.set_value(
+                HIGH_WATER_SETTING_KEY,
+                marks,
+                description="Last rows folded into analytics_daily_rollups",
+            )
+        return marks
+
+    async def _fold_append_only(
+        self,
+        source: AppendOnlySource,
+        last_id: int,
+        cutoff: datetime,
+        since: Optional[datetime] = None,
+    ) -> int:
+        model = source.model
+        window = [model.id > last_id]
+        if since is not None and model.__tablename__ in PARTITIONED_TABLES:
+            window.append(model.created_at >= since)
+        upper = await self.session.scalar(
+            select(func.max(model.id)).where(*window, model.created_at < cutoff)
+        )
+        if upper is None:
+            return last_id
+
+        if source.dimension:
+            dimension = func.coalesce(cast(getattr(model, source.dimension), String), "unknown")
+        else:
+            dimension = literal("")
+        day = _utc_day(model.created_at)
+        rows = (
+            select(
+                day.label("day"),
+                literal(source.metric).label("metric"),
+                dimension.label("dimension"),
+                func.count().label("value"),
+            )
+            .where(*window, model.id <= upper)
+            .group_by(day, dimension)
+        )
+        stmt = pg_insert(AnalyticsDailyRollup).from_select(
+            ["day", "metric", "dimension", "value"], rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "metric", "dimension"],
+            set_={
+                "value": AnalyticsDailyRollup.value + stmt.excluded.value,
+                "updated_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+        return int(upper)
+
+    async def _recompute_deliveries(self, last_day: Optional[str]) -> str:
+        today = datetime.now(timezone.utc).date()
+        start_day: Optional[date] = None
+        if last_day:
+            start_day = date.fromisoformat(last_day) - timedelta(
+                days=max(0, settings.analytics_rollup_lookback_days)
+            )
+
+        clear = delete(AnalyticsDailyRollup).where(AnalyticsDailyRollup.metric == DELIVERIES_METRIC)
+        day = _utc_day(BroadcastDelivery.created_at)
+        status = func.coalesce(BroadcastDelivery.status, "unknown")
+        rows = select(
+            day.label("day"),
+            literal(DELIVERIES_METRIC).label("metric"),
+            status.label("dimension"),
+            func.count().label("value"),
+        ).group_by(day, status)
+        if start_day is not None:
+            clear = clear.where(AnalyticsDailyRollup.day >= start_day)
+            rows = rows.where(
+                BroadcastDelivery.created_at
+                >= datetime.combine(start_day, time.min, tzinfo=timezone.utc)
+            )
+
+        await self.session.execute(clear)
+        await self.session.execute(
+            pg_insert(AnalyticsDailyRollup).from_select(
+                ["day", "metric", "dimension", "value"], rows
+            )
+        )
+        return today.isoformat()
+
+    async def period_counts(self, days: int) -> Dict[str, Dict[str, int]]:
+        """Return ``{metric: {dimension: total}}`` over the last ``days`` UTC days."""
+        start_day = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+        result = await self.session.execute(
+            select(
+                AnalyticsDailyRollup.metric,
+                AnalyticsDailyRollup.dimension,
+                func.sum(AnalyticsDailyRollup.value),
+            )
+            .where(AnalyticsDailyRollup.day >= start_day)
+            .group_by(AnalyticsDailyRollup.metric, AnalyticsDailyRollup.dimension)
+        )
+        counts: Dict[str, Dict[str, int]] = {}
+        for metric, dimension, total in result.all():
+            counts.setdefault(metric, {})[dimension] = int(total or 0)
+        return counts
+
+
+__all__ = ["AnalyticsRollupService", "APPEND_ONLY_SOURCES", "HIGH_WATER_SETTING_KEY"]
@@ -1,51 +1,106 @@
 """Analytics service for metrics collection and reporting."""
 
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func
 from sqlalchemy.exc import ProgrammingError, OperationalError
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models import (
     User,
     Lead,
-    Event,
     Broadcast,
     BroadcastDelivery,
     ABTest,
-    ABVariant,
-    ABResult,
     ABTestStatus,
     ABTestMetric,
 )
 from app.services.ab_testing_service import ABTestingService
+from app.services.analytics_formatter import format_report_as_text, format_report_for_telegram
+from app.services.analytics_rollup_service import AnalyticsRollupService
 
 logger = logging.getLogger(__name__)
 
+REPORT_RENDERERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "json": lambda report: report,
+    "summary": format_report_as_text,
+    "telegram": format_report_for_telegram,
+}
+
+
+class _ReportCache:
+    """Rendered reports keyed by (days, view), kept for a short TTL."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: Dict[Tuple[int, str], Tuple[float, Any]] = {}
+        self._locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+    def _fresh(self, key: Tuple[int, str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+        return None
+
+    async def get(self, key: Tuple[int, str], build: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._fresh(key)
+        if cached is not None:
+            return cached
+        # One build per key at a time; concurrent dashboard hits wait for it.
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            cached = self._fresh(key)
+            if cached is not None:
+                return cached
+            value = await build()
+            if value and self.ttl > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+
+
+report_cache = _ReportCache(settings.analytics_report_cache_ttl)
+
 
 class AnalyticsService:
-    """Service for analytics and reporting."""
+    """Service for analytics and reporting.
+
+    Period counters over growing tables (new users, leads, broadcasts,
+    deliveries, events, messages) come from ``analytics_daily_rollups`` at
+    whole-UTC-day granularity; only small snapshot tables are queried live.
+    """
 
     def __init__(self, db: AsyncSession):
         self.db = db
+        self._period_counts: Dict[int, Dict[str, Dict[str, int]]] = {}
+
+    async def _rollup_counts(self, days: int) -> Dict[str, Dict[str, int]]:
+        if days not in self._period_counts:
+            self._period_counts[days] = await AnalyticsRollupService(self.db).period_counts(days)
+        return self._period_counts[days]
 
     async def get_user_metrics(self, days: int = 30) -> Dict:
         """Get user-related metrics."""
         try:
-            now_utc = datetime.now(timezone.utc)
-            period_start = now_utc - timedelta(days=days)
-            active_threshold = now_utc - timedelta(days=7)
+            active_threshold = datetime.now(timezone.utc) - timedelta(days=7)
 
-            total_users = await self.db.scalar(select(func.count(User.id))) or 0
-            new_users = await self.db.scalar(
-                select(func.count(User.id)).where(User.created_at >= period_start)
-            ) or 0
-            active_users = await self.db.scalar(
-                select(func.count(User.id)).where(User.updated_at >= active_threshold)
-            ) or 0
+            total_users, active_users = (
+                await self.db.execute(
+                    select(
+                        func.count(User.id),
+                        func.count(User.id).filter(User.updated_at >= active_threshold),
+                    )
+                )
+            ).one()
+            counts = await self._rollup_counts(days)
+            new_users = sum(counts.get("users_created", {}).values())
 
             segments_result = await self.db.execute(
                 select(User.segment, func.count(User.id)).group_by(User.segment)
@@ -55,9 +110,9 @@ class AnalyticsService:
                 segments[str(segment or "unknown")] = count
 
             return {
-                "total_users": total_users,
+                "total_users": total_users or 0,
                 "new_users": new_users,
-                "active_users": active_users,
+                "active_users": active_users or 0,
                 "segments": segments,
             }
 
@@ -71,10 +126,10 @@ class AnalyticsService:
             period_start = datetime.now(timezone.utc) - timedelta(days=days)
 
             total_leads = await self.db.scalar(select(func.count(Lead.id))) or 0
-            new_leads = await self.db.scalar(
-                select(func.count(Lead.id)).where(Lead.created_at >= period_start)
-            ) or 0
+            counts = await self._rollup_counts(days)
+            new_leads = sum(counts.get("leads_created", {}).values())
 
+            # Status changes after insert, so it is read from the (small) leads table.
             status_result = await self.db.execute(
                 select(Lead.status, func.count(Lead.id))
                 .where(Lead.created_at >= period_start)
@@ -102,6 +157,22 @@ class AnalyticsService:
             "avg_order_value": 0,
         }
 
+    async def get_activity_metrics(self, days: int = 30) -> Dict[str, Any]:
+        """Get event and message volumes for the period."""
+        try:
+            counts = await self._rollup_counts(days)
+            events = counts.get("events", {})
+            messages = counts.get("messages", {})
+            return {
+                "events_total": sum(events.values()),
+                "events_by_type": dict(sorted(events.items(), key=lambda item: -item[1])),
+                "messages_total": sum(messages.values()),
+                "messages_by_role": messages,
+            }
+
+        except Exception as exc:
+            logger.error("Error getting activity metrics", exc_info=exc)
+            return {}
 
     async def get_broadcast_metrics(self, days: int = 30) -> Dict[str, Any]:
         """Get broadcast and delivery metrics."""
@@ -109,19 +180,9 @@ class AnalyticsService:
             period_start = datetime.now(timezone.utc) - timedelta(days=days)
 
             total_broadcasts = await self.db.scalar(select(func.count(Broadcast.id))) or 0
-            recent_broadcasts = await self.db.scalar(
-                select(func.count(Broadcast.id)).where(Broadcast.created_at >= period_start)
-            ) or 0
-
-            delivery_stmt = (
-                select(BroadcastDelivery.status, func.count(BroadcastDelivery.id))
-                .where(BroadcastDelivery.created_at >= period_start)
-                .group_by(BroadcastDelivery.status)
-            )
-            delivery_counts = {
-                status or "unknown": count
-                for status, count in (await self.db.execute(delivery_stmt)).all()
-            }
+            counts = await self._rollup_counts(days)
+            recent_broadcasts = sum(counts.get("broadcasts_created", {}).values())
+            delivery_counts = counts.get("deliveries", {})
 
             sent = delivery_counts.get("sent", 0)
             failed = delivery_counts.get("failed", 0)
@@ -129,6 +190,8 @@ class AnalyticsService:
             total_deliveries = sent + failed + pending
             failure_rate = round(failed / total_deliveries, 4) if total_deliveries else 0.0
 
+            # Distinct users cannot be summed across days, so this stays a live
+            # query (served by ix_broadcast_deliveries_created_at).
             unique_recipients = await self.db.scalar(
                 select(func.count(func.distinct(BroadcastDelivery.user_id))).where(
                     BroadcastDelivery.created_at >= period_start
@@ -208,17 +271,11 @@ class AnalyticsService:
                 ),
             }
 
+            analyses = await ab_service.analyze_tests_results(tests)
+
             tests_payload = []
             for test in tests:
-                analysis = await ab_service.analyze_test_results(test.id)
-                if analysis.get("error") == "ab_tables_missing":
-                    return {
-                        "summary": summary,
-                        "tests": [],
-                        "error": "ab_tables_missing",
-                    }
-                if analysis.get("error"):
-                    continue
+                analysis = analyses.get(test.id) or {}
                 metric_raw = analysis.get("metric") or (
                     test.metric.value if isinstance(test.metric, ABTestMetric) else str(test.metric)
                 )
@@ -281,6 +338,7 @@ class AnalyticsService:
             sales_metrics = await self.get_sales_metrics(days)
             broadcast_metrics = await self.get_broadcast_metrics(days)
             ab_test_metrics = await self.get_ab_test_metrics(days)
+            activity_metrics = await self.get_activity_metrics(days)
 
             return {
                 "period_days": days,
@@ -290,8 +348,22 @@ class AnalyticsService:
                 "sales": sales_metrics,
                 "broadcasts": broadcast_metrics,
                 "ab_tests": ab_test_metrics,
+                "activity": activity_metrics,
             }
 
         except Exception as exc:
             logger.error("Error generating comprehensive report", exc_info=exc)
             return {}
+
+    async def get_report_view(self, days: int = 30, view: str = "json") -> Any:
+        """Return the report rendered for ``view``, cached per (days, view) for a short TTL."""
+        render = REPORT_RENDERERS[view]
+
+        async def build() -> Any:
+            report = await self.get_comprehensive_report(days)
+            return render(report) if report else None
+
+        return await report_cache.get((days, view), build)
+
+
+__all__ = ["AnalyticsService", "REPORT_RENDERERS", "report_cache"]
@@ -0,0 +1,195 @@
+"""Redis-side anti-spam counters and ban index, one script call per message."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+BANS_KEY = "spam:bans"
+UNBAN_BATCH = 1000
+
+# KEYS: ban record, 10 s counter, 60 s counter, duplicate counter ("" when the
+#       update has no content hash), ban index (sorted set scored by expiry).
+# ARGV: now, user id, burst threshold, minute threshold, dupe threshold,
+#       base ban hours, multiplier, max hours, decay seconds.
+# Returns {"banned", until} for an active ban, {"ban", reason, level, hours,
+# until, burst10, minute60, dupes} when this update triggers one, otherwise
+# {"ok", burst10, minute60, dupes}. Numbers go back as strings so fractional
+# timestamps survive the Lua-to-Redis integer conversion.
+CHECK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local uid = ARGV[2]
+
+local until_ts = tonumber(redis.call('ZSCORE', KEYS[5], uid))
+if not until_ts then
+    -- Records written before the index existed.
+    local raw = redis.call('GET', KEYS[1])
+    if raw then
+        local legacy = tonumber(cjson.decode(raw)['banned_until_ts'] or 0)
+        if legacy > now then
+            redis.call('ZADD', KEYS[5], legacy, uid)
+            until_ts = legacy
+        end
+    end
+end
+if until_ts and until_ts > now then
+    return {'banned', tostring(until_ts)}
+end
+
+local function bump(key, ttl)
+    local count = redis.call('INCR', key)
+    if count == 1 then
+        redis.call('EXPIRE', key, ttl)
+    end
+    return count
+end
+
+local burst, minute, dupes = bump(KEYS[2], 10), 0, 0
+local reason = false
+if burst >= tonumber(ARGV[3]) then
+    reason = 'burst10'
+else
+    minute = bump(KEYS[3], 60)
+    if minute >= tonumber(ARGV[4]) then
+        reason = 'minute60'
+    elseif KEYS[4] ~= '' then
+        dupes = bump(KEYS[4], 30)
+        if dupes >= tonumber(ARGV[5]) then
+            reason = 'dupes'
+        end
+    end
+end
+if not reason then
+    return {'ok', tostring(burst), tostring(minute), tostring(dupes)}
+end
+
+local decay = tonumber(ARGV[9])
+local level = 0
+local raw = redis.call('GET', KEYS[1])
+if raw then
+    local previous = cjson.decode(raw)
+    if now - tonumber(previous['last_violation_ts'] or 0) <= decay then
+        level = tonumber(previous['ban_level'] or 0)
+    end
+end
+level = level + 1
+
+local hours = math.min(tonumber(ARGV[6]) * tonumber(ARGV[7]) ^ (level - 1), tonumber(ARGV[8]))
+local banned_until = now + hours * 3600
+local record = cjson.encode({
+    ban_level = level,
+    banned_until_ts = banned_until,
+    last_violation_ts = now,
+    reason = reason,
+})
+-- The record outlives the ban so the next violation within the decay window escalates.
+redis.call('SET', KEYS[1], record, 'EX', math.ceil(math.max(decay, hours * 3600 + 60)))
+redis.call('ZADD', KEYS[5], banned_until, uid)
+return {'ban', reason, tostring(level), tostring(hours), tostring(banned_until),
+        tostring(burst), tostring(minute), tostring(dupes)}
+"""
+
+UNBAN_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #expired > 0 then
+    redis.call('ZREM', KEYS[1], unpack(expired))
+end
+return expired
+"""
+
+
+def ban_key(user_id: int) -> str:
+    return f"ban:{user_id}"
+
+
+@dataclass(slots=True)
+class SpamVerdict:
+    """Outcome of checking one update."""
+
+    banned: bool = False
+    reason: Optional[str] = None
+    ban_level: int = 0
+    ban_hours: float = 0.0
+    banned_until_ts: float = 0.0
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+class AntiSpamService:
+    """Runs the anti-spam checks and ban bookkeeping as Redis scripts (EVALSHA)."""
+
+    def __init__(self, redis: Any) -> None:
+        self.redis = redis
+        self._check = redis.register_script(CHECK_SCRIPT)
+        self._unban = redis.register_script(UNBAN_SCRIPT)
+
+    async def check(self, user_id: int, content_hash: Optional[str], now: Optional[float] = None) -> SpamVerdict:
+        """Count the update and ban the sender if a threshold is crossed."""
+        now = time.time() if now is None else now
+        keys = [
+            ban_key(user_id),
+            f"spam:cnt10:{user_id}",
+            f"spam:cnt60:{user_id}",
+            f"spam:dupe:{user_id}:{content_hash}" if content_hash else "",
+            BANS_KEY,
+        ]
+        args = [
+            repr(now),
+            user_id,
+            settings.spam_threshold_burst10,
+            settings.spam_threshold_minute60,
+            settings.spam_threshold_dupe30,
+            settings.spam_ban_base_hours,
+            settings.spam_ban_multiplier,
+            settings.spam_ban_max_hours,
+            int(settings.spam_decay_days * 86400),
+        ]
+        reply = [_text(item) for item in await self._check(keys=keys, args=args)]
+
+        status = reply[0]
+        if status == "banned":
+            return SpamVerdict(banned=True, banned_until_ts=float(reply[1]))
+        if status == "ok":
+            return SpamVerdict(stats=_stats(reply[1:4]))
+        return SpamVerdict(
+            reason=reply[1],
+            ban_level=int(reply[2]),
+            ban_hours=float(reply[3]),
+            banned_until_ts=float(reply[4]),
+            stats=_stats(reply[5:8]),
+        )
+
+    async def unban_expired(self, now: Optional[float] = None) -> List[int]:
+        """Drop bans that ended by ``now`` from the index and return their user ids."""
+        now = time.time() if now is None else now
+        released: List[int] = []
+        while True:
+            batch = await self._unban(keys=[BANS_KEY], args=[repr(now), UNBAN_BATCH])
+            released.extend(int(_text(item)) for item in batch)
+            if len(batch) < UNBAN_BATCH:
+                return released
+
+    async def unban(self, user_id: int) -> None:
+        """Lift a ban immediately and forget the user's ban history."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(ban_key(user_id))
+            pipe.zrem(BANS_KEY, user_id)
+            await pipe.execute()
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _stats(values: List[str]) -> Dict[str, int]:
+    burst, minute, dupes = (int(value) for value in values)
+    return {"burst10": burst, "minute60": minute, "dupes": dupes}
+
+
+__all__ = ["AntiSpamService", "BANS_KEY", "SpamVerdict", "ban_key"]
@@ -1,18 +1,39 @@
 """Broadcast service for sending messages to users."""
 
-from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 import asyncio
 import logging
 
 import structlog
 from aiogram import Bot
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select, and_
+from sqlalchemy import Select, select, and_, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import User, Broadcast, UserSegment
+from app.config import settings
+from app.models import User, Broadcast, BroadcastDelivery, UserSegment
+from app.repositories.user_repository import USER_CONTACT
 from app.services.ab_testing_service import ABTestingService, VariantDefinition, DEFAULT_POPULATION_PERCENT
+from app.services.outbound_scheduler import bulk_outbound
+
+DELIVERY_PENDING = "pending"
+DELIVERY_SENDING = "sending"
+DELIVERY_SENT = "sent"
+DELIVERY_FAILED = "failed"
+
+# content item type -> (send_* argument name, supports caption)
+MEDIA_SENDERS: Dict[str, Tuple[str, bool]] = {
+    "photo": ("photo", True),
+    "video": ("video", True),
+    "document": ("document", True),
+    "audio": ("audio", True),
+    "voice": ("voice", False),
+    "animation": ("animation", True),
+    "video_note": ("video_note", False),
+}
 
 
 class BroadcastRepository:
@@ -141,185 +162,283 @@ class BroadcastService:
             self.logger.error("Error creating A/B broadcast", error=str(e))
             return False, "Error creating A/B test", None
     
+    @bulk_outbound
     async def send_simple_broadcast(
         self,
         broadcast_id: int,
-        delay_between_messages: float = 0.1
+        delay_between_messages: float = 0.0,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ) -> Dict[str, int]:
-        """Send simple broadcast to all target users."""
+        """Send a broadcast by streaming ``BroadcastDelivery`` rows.
+
+        Delivery rows are materialized in keyset-paged chunks of the audience
+        and sent with bounded concurrency; each chunk is committed as a
+        checkpoint, so calling this again for the same broadcast resumes
+        where the previous run stopped without re-sending delivered rows.
+        """
         try:
             broadcast = await self.repository.get_broadcast_by_id(broadcast_id)
             if not broadcast:
                 return {"error": 1, "sent": 0, "failed": 0}
-            
-            # Get target users
-            users = await self._get_target_users(broadcast.segment_filter)
-            
-            # Prepare message
+
+            chunk_size = chunk_size or settings.broadcast_chunk_size
+            concurrency = concurrency or settings.broadcast_concurrency
             keyboard = self._build_keyboard(broadcast.buttons)
 
-            sent_count = 0
-            failed_count = 0
+            await self._fail_interrupted_deliveries(broadcast_id)
+            last_user_id = await self.session.scalar(
+                select(func.coalesce(func.max(BroadcastDelivery.user_id), 0)).where(
+                    BroadcastDelivery.broadcast_id == broadcast_id
+                )
+            )
+            await self.session.commit()
 
-            # Send messages
-            for user in users:
-                user_failed = False
-                try:
-                    if broadcast.content:
-                        for index, item in enumerate(broadcast.content):
-                            item_type = item.get("type")
-                            try:
-                                if item_type == "text":
-                                    await self.bot.send_message(
-                                        chat_id=user.telegram_id,
-                                        text=item.get("text", ""),
-                                        parse_mode=item.get("parse_mode"),
-                                        reply_markup=keyboard if index == 0 else None,
-                                    )
-                                elif item_type == "photo":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "photo": item.get("file_id"),
-                                    }
-                                    if item.get("caption"):
-                                        kwargs["caption"] = item.get("caption")
-                                        kwargs["parse_mode"] = item.get("parse_mode")
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_photo(**kwargs)
-                                elif item_type == "video":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "video": item.get("file_id"),
-                                    }
-                                    if item.get("caption"):
-                                        kwargs["caption"] = item.get("caption")
-                                        kwargs["parse_mode"] = item.get("parse_mode")
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_video(**kwargs)
-                                elif item_type == "document":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "document": item.get("file_id"),
-                                    }
-                                    if item.get("caption"):
-                                        kwargs["caption"] = item.get("caption")
-                                        kwargs["parse_mode"] = item.get("parse_mode")
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_document(**kwargs)
-                                elif item_type == "audio":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "audio": item.get("file_id"),
-                                    }
-                                    if item.get("caption"):
-                                        kwargs["caption"] = item.get("caption")
-                                        kwargs["parse_mode"] = item.get("parse_mode")
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_audio(**kwargs)
-                                elif item_type == "voice":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "voice": item.get("file_id"),
-                                    }
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_voice(**kwargs)
-                                elif item_type == "animation":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "animation": item.get("file_id"),
-                                    }
-                                    if item.get("caption"):
-                                        kwargs["caption"] = item.get("caption")
-                                        kwargs["parse_mode"] = item.get("parse_mode")
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_animation(**kwargs)
-                                elif item_type == "video_note":
-                                    kwargs = {
-                                        "chat_id": user.telegram_id,
-                                        "video_note": item.get("file_id"),
-                                    }
-                                    if index == 0 and keyboard:
-                                        kwargs["reply_markup"] = keyboard
-                                    await self.bot.send_video_note(**kwargs)
-                                else:
-                                    self.logger.warning(
-                                        "Unsupported broadcast content item",
-                                        item_type=item_type,
-                                        user_id=user.id,
-                                    )
-                                    self.file_logger.warning(
-                                        "broadcast.send.unsupported_item user_id=%s item_type=%s",
-                                        user.telegram_id,
-                                        item_type,
-                                    )
-                            except Exception as item_exc:
-                                user_failed = True
-                                self.logger.warning(
-                                    "Failed to send broadcast content item",
-                                    user_id=user.id,
-                                    item_type=item_type,
-                                    error=str(item_exc),
-                                )
-                                self.file_logger.warning(
-                                    "broadcast.send.item_failed user_id=%s item_type=%s error=%s",
-                                    user.telegram_id,
-                                    item_type,
-                                    item_exc,
-                                )
-                                break
-                    else:
-                        await self.bot.send_message(
-                            chat_id=user.telegram_id,
-                            text=broadcast.body,
-                            reply_markup=keyboard,
-                            parse_mode="Markdown",
+            audience_exhausted = False
+            last_delivery_id = 0
+            while True:
+                if not audience_exhausted:
+                    materialized, last_user_id = await self._materialize_deliveries(
+                        broadcast, last_user_id, chunk_size
+                    )
+                    audience_exhausted = materialized < chunk_size
+                    await self.session.commit()
+
+                pending = (
+                    await self.session.execute(
+                        select(BroadcastDelivery.id, User.id, User.telegram_id)
+                        .join(User, User.id == BroadcastDelivery.user_id)
+                        .where(
+                            BroadcastDelivery.broadcast_id == broadcast_id,
+                            BroadcastDelivery.status == DELIVERY_PENDING,
+                            BroadcastDelivery.id > last_delivery_id,
                         )
+                        .order_by(BroadcastDelivery.id)
+                        .limit(chunk_size)
+                    )
+                ).all()
+
+                if not pending:
+                    if audience_exhausted:
+                        break
+                    continue
+
+                last_delivery_id = pending[-1][0]
+                await self._deliver_chunk(
+                    broadcast, keyboard, pending, concurrency, delay_between_messages
+                )
+
+            counts = await self._delivery_counts(broadcast_id)
+            self.logger.info(
+                "Simple broadcast completed",
+                broadcast_id=broadcast_id,
+                sent=counts["sent"],
+                failed=counts["failed"],
+            )
+            return counts
+
+        except Exception as e:
+            self.logger.error("Error sending simple broadcast", error=str(e))
+            return {"error": 1, "sent": 0, "failed": 0}
 
+    async def _fail_interrupted_deliveries(self, broadcast_id: int) -> None:
+        """Close rows left in ``sending`` by a crashed run instead of risking a double send."""
+        await self.session.execute(
+            update(BroadcastDelivery)
+            .where(
+                BroadcastDelivery.broadcast_id == broadcast_id,
+                BroadcastDelivery.status == DELIVERY_SENDING,
+            )
+            .values(
+                status=DELIVERY_FAILED,
+                failed_at=func.now(),
+                error_message="interrupted before delivery was confirmed",
+            )
+        )
+
+    async def _materialize_deliveries(
+        self,
+        broadcast: Broadcast,
+        after_user_id: int,
+        chunk_size: int,
+    ) -> Tuple[int, int]:
+        """Insert pending rows for the next audience page; return (page size, last user id)."""
+        user_ids = (
+            await self.session.execute(
+                self._target_users_stmt(broadcast.segment_filter, select(User.id))
+                .where(User.id > after_user_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+            )
+        ).scalars().all()
+        if not user_ids:
+            return 0, after_user_id
+
+        await self.session.execute(
+            pg_insert(BroadcastDelivery)
+            .values(
+                [
+                    {"broadcast_id": broadcast.id, "user_id": user_id, "status": DELIVERY_PENDING}
+                    for user_id in user_ids
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_broadcast_user_delivery")
+        )
+        return len(user_ids), user_ids[-1]
+
+    async def _deliver_chunk(
+        self,
+        broadcast: Broadcast,
+        keyboard: Optional[InlineKeyboardMarkup],
+        rows: Sequence[Any],
+        concurrency: int,
+        delay_between_messages: float,
+    ) -> None:
+        """Send one page of deliveries concurrently and persist the outcome."""
+        delivery_ids = [row[0] for row in rows]
+        await self.session.execute(
+            update(BroadcastDelivery)
+            .where(BroadcastDelivery.id.in_(delivery_ids))
+            .values(status=DELIVERY_SENDING)
+        )
+        await self.session.commit()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def deliver(delivery_id: int, user_id: int, chat_id: int) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    message_id = await self._send_broadcast_to_chat(
+                        broadcast, keyboard, chat_id, user_id
+                    )
+                    outcome = {
+                        "id": delivery_id,
+                        "status": DELIVERY_SENT,
+                        "message_id": message_id,
+                        "sent_at": datetime.now(timezone.utc),
+                        "error_message": None,
+                    }
                 except Exception as e:
-                    user_failed = True
                     self.logger.warning(
                         "Failed to send broadcast message",
-                        user_id=user.id,
+                        user_id=user_id,
                         error=str(e)
                     )
                     self.file_logger.warning(
                         "broadcast.send.user_failed user_id=%s error=%s",
-                        user.telegram_id,
+                        chat_id,
                         e,
                     )
-
-                if user_failed:
-                    failed_count += 1
-                else:
-                    sent_count += 1
-
-                # Delay to avoid rate limits
+                    outcome = {
+                        "id": delivery_id,
+                        "status": DELIVERY_FAILED,
+                        "failed_at": datetime.now(timezone.utc),
+                        "error_message": str(e)[:1000],
+                    }
+                # Pacing is handled by the outbound scheduler; optional extra delay
                 if delay_between_messages > 0:
                     await asyncio.sleep(delay_between_messages)
-            
-            self.logger.info(
-                "Simple broadcast completed",
-                broadcast_id=broadcast_id,
-                sent=sent_count,
-                failed=failed_count
+                return outcome
+
+        outcomes = await asyncio.gather(*(deliver(*row) for row in rows))
+
+        sent = [outcome for outcome in outcomes if outcome["status"] == DELIVERY_SENT]
+        failed = [outcome for outcome in outcomes if outcome["status"] == DELIVERY_FAILED]
+        for batch in (sent, failed):
+            if batch:
+                await self.session.execute(update(BroadcastDelivery), batch)
+        await self.session.commit()
+
+    async def _send_broadcast_to_chat(
+        self,
+        broadcast: Broadcast,
+        keyboard: Optional[InlineKeyboardMarkup],
+        chat_id: int,
+        user_id: int,
+    ) -> Optional[int]:
+        """Send broadcast content to one chat and return the first message id."""
+        if not broadcast.content:
+            message = await self.bot.send_message(
+                chat_id=chat_id,
+                text=broadcast.body,
+                reply_markup=keyboard,
+                parse_mode="Markdown",
             )
-            
-            return {"sent": sent_count, "failed": failed_count, "total": len(users)}
-            
-        except Exception as e:
-            self.logger.error("Error sending simple broadcast", error=str(e))
-            return {"error": 1, "sent": 0, "failed": 0}
+            return message.message_id if isinstance(message, Message) else None
+
+        first_message_id: Optional[int] = None
+        for index, item in enumerate(broadcast.content):
+            item_type = item.get("type")
+            markup = keyboard if index == 0 else None
+            try:
+                if item_type == "text":
+                    message = await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=item.get("text", ""),
+                        parse_mode=item.get("parse_mode"),
+                        reply_markup=markup,
+                    )
+                elif item_type in MEDIA_SENDERS:
+                    field_name, supports_caption = MEDIA_SENDERS[item_type]
+                    kwargs = {
+                        "chat_id": chat_id,
+                        field_name: item.get("file_id"),
+                    }
+                    if supports_caption and item.get("caption"):
+                        kwargs["caption"] = item.get("caption")
+                        kwargs["parse_mode"] = item.get("parse_mode")
+                    if markup:
+                        kwargs["reply_markup"] = markup
+                    message = await getattr(self.bot, f"send_{item_type}")(**kwargs)
+                else:
+                    self.logger.warning(
+                        "Unsupported broadcast content item",
+                        item_type=item_type,
+                        user_id=user_id,
+                    )
+                    self.file_logger.warning(
+                        "broadcast.send.unsupported_item user_id=%s item_type=%s",
+                        chat_id,
+                        item_type,
+                    )
+                    continue
+            except Exception as item_exc:
+                self.logger.warning(
+                    "Failed to send broadcast content item",
+                    user_id=user_id,
+                    item_type=item_type,
+                    error=str(item_exc),
+                )
+                self.file_logger.warning(
+                    "broadcast.send.item_failed user_id=%s item_type=%s error=%s",
+                    chat_id,
+                    item_type,
+                    item_exc,
+                )
+                raise
+
+            if first_message_id is None and isinstance(message, Message):
+                first_message_id = message.message_id
+        return first_message_id
+
+    async def _delivery_counts(self, broadcast_id: int) -> Dict[str, int]:
+        """Aggregate delivery statuses of a broadcast."""
+        rows = await self.session.execute(
+            select(BroadcastDelivery.status, func.count(BroadcastDelivery.id))
+            .where(BroadcastDelivery.broadcast_id == broadcast_id)
+            .group_by(BroadcastDelivery.status)
+        )
+        by_status = dict(rows.all())
+        return {
+            "sent": by_status.get(DELIVERY_SENT, 0),
+            "failed": by_status.get(DELIVERY_FAILED, 0),
+            "total": sum(by_status.values()),
+        }
     
     async def send_ab_test_broadcast(
         self,
         ab_test_id: int,
-        delay_between_messages: float = 0.1
+        delay_between_messages: float = 0.0
     ) -> Dict[str, Any]:
         """Send A/B test broadcast to test population."""
         try:
@@ -352,10 +471,11 @@ class BroadcastService:
             self.logger.error("Error sending A/B test broadcast", error=str(e))
             return {"error": str(e)}
     
+    @bulk_outbound
     async def send_winner_broadcast(
         self,
         ab_test_id: int,
-        delay_between_messages: float = 0.1
+        delay_between_messages: float = 0.0
     ) -> Dict[str, Any]:
         """Send winning variant to remaining users."""
         try:
@@ -419,12 +539,13 @@ class BroadcastService:
             self.logger.error("Error sending winner broadcast", error=str(e))
             return {"error": str(e)}
     
-    async def _get_target_users(
+    def _target_users_stmt(
         self,
-        segment_filter: Optional[Dict[str, Any]]
-    ) -> List[User]:
-        """Get target users based on segment filter."""
-        stmt = select(User).where(User.is_blocked == False)
+        segment_filter: Optional[Dict[str, Any]],
+        stmt: Optional[Select] = None,
+    ) -> Select:
+        """Apply the broadcast segment filter to a users query."""
+        stmt = (stmt if stmt is not None else select(User)).where(User.is_blocked == False)
         
         if segment_filter:
             # Apply segment filters
@@ -439,7 +560,16 @@ class BroadcastService:
                 stages = segment_filter["funnel_stages"]
                 stmt = stmt.where(User.funnel_stage.in_(stages))
         
-        result = await self.session.execute(stmt)
+        return stmt
+
+    async def _get_target_users(
+        self,
+        segment_filter: Optional[Dict[str, Any]]
+    ) -> List[User]:
+        """Get target users based on segment filter."""
+        result = await self.session.execute(
+            self._target_users_stmt(segment_filter).options(*USER_CONTACT)
+        )
         return result.scalars().all()
     
     def _build_keyboard(
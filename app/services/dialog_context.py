@@ -0,0 +1,112 @@
+"""Per-update snapshot of the data the dialog pipeline reads about one user."""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import LeadProfile, User
+from app.services.lead_profile_service import LeadProfileService
+from app.services.user_service import UserService, normalize_message_role
+
+
+class _CatalogPromptCache:
+    """Rendered product catalog prompt shared by all users for a short TTL."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._value: Optional[str] = None
+        self._expires_at = 0.0
+
+    async def get(self, render: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        now = time.monotonic()
+        if self._value is not None and now < self._expires_at:
+            return self._value
+        value = await render()
+        if value is not None and self.ttl > 0:
+            self._value = value
+            self._expires_at = now + self.ttl
+        return value
+
+    def invalidate(self) -> None:
+        self._value = None
+        self._expires_at = 0.0
+
+
+catalog_prompt_cache = _CatalogPromptCache(settings.dialog_catalog_prompt_ttl)
+
+
+class DialogContext:
+    """Loads user, lead profile, recent history and catalog prompt once per update.
+
+    Handlers create one context per incoming message and pass it to every
+    consumer (intent detection, the sales dialog agent, conversation logging).
+    Messages written through ``ConversationLoggingService`` with this context
+    are appended to the cached history, so later reads in the same update see
+    them without another query.
+    """
+
+    HISTORY_WINDOW = 12
+
+    def __init__(self, session: AsyncSession, user: User) -> None:
+        self.session = session
+        self.user = user
+        self._history: Optional[List[Dict[str, Any]]] = None
+        self._history_limit = 0
+        self._profile: Optional[LeadProfile] = None
+        self._catalog_prompt: Optional[str] = None
+        self._logger = structlog.get_logger(__name__)
+
+    @property
+    def user_id(self) -> int:
+        return self.user.id
+
+    async def history(self, limit: int) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` most recent messages in chronological order."""
+        if limit <= 0:
+            return []
+        if self._history is None or (
+            limit > self._history_limit and len(self._history) >= self._history_limit
+        ):
+            window = max(limit, self.HISTORY_WINDOW)
+            history = await UserService(self.session).get_conversation_history(
+                self.user_id, limit=window
+            )
+            self._history = list(history or [])
+            self._history_limit = window
+        return [dict(item) for item in self._history[-limit:]]
+
+    def record_message(self, role: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Append a freshly persisted message to the cached history."""
+        if self._history is None:
+            return
+        self._history.append(
+            {
+                # Same role as save_message stored, so cache and database agree.
+                "role": normalize_message_role(role).value,
+                "text": text,
+                "timestamp": datetime.now(timezone.utc),
+                "meta": metadata or {},
+            }
+        )
+        self._history_limit += 1
+
+    async def profile(self) -> LeadProfile:
+        """Return the user's lead profile, creating it on first access."""
+        if self._profile is None:
+            self._profile = await LeadProfileService(self.session).get_or_create(self.user)
+        return self._profile
+
+    async def catalog_prompt(self, render: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Return the product catalog prompt, rendered at most once per TTL process-wide."""
+        if self._catalog_prompt is None:
+            self._catalog_prompt = await catalog_prompt_cache.get(render)
+        return self._catalog_prompt
+
+
+__all__ = ["DialogContext", "catalog_prompt_cache"]
@@ -0,0 +1,582 @@
+"""Background mirroring of dialog messages to the dialogs channel.
+
+Senders only enqueue a ``MirrorJob``; a fixed pool of workers posts to the
+channel, so a user's reply never waits for the mirror. Channel posts are
+bulk traffic for the outbound scheduler: interactive replies always go
+first, whoever happened to start the workers. Jobs are sharded by
+chat, which keeps one dialog in order while different dialogs proceed in
+parallel. Each message (chat, message id and edit time) is mirrored once.
+
+Outbound messages seen by ``DialogsChannelRequestMiddleware`` are queued as
+fallbacks: they wait ``DIALOG_MIRROR_FALLBACK_GRACE`` seconds and are only
+written to the history if no handler logged the same message meanwhile.
+Messages registered with ``mark_streamed`` never get fallbacks: their
+intermediate edits are not history, the streaming handler logs the final text.
+
+With ``DIALOG_MIRROR_DIGEST_SECONDS`` > 0 messages of one user are collected
+for that long and posted as a single text digest (media become placeholders).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, User as TelegramUser
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.services.manual_dialog_service import ManualDialogSession, manual_dialog_service
+from app.services.outbound_scheduler import OutboundPriority, outbound_priority
+from app.services.user_service import UserService
+
+logger = structlog.get_logger(__name__)
+
+MIRROR_JOBS = Counter(
+    "dialog_mirror_jobs_total",
+    "Dialog mirror jobs by outcome",
+    ["outcome"],
+)
+MIRROR_QUEUE_DEPTH = Gauge(
+    "dialog_mirror_queue_depth",
+    "Dialog mirror jobs waiting for a worker",
+)
+
+# Telegram rejects longer texts; digests are split below this size.
+MAX_POST_LENGTH = 4000
+
+MessageKey = Tuple[int, int, int]
+
+
+def message_key(message: Optional[Message]) -> Optional[MessageKey]:
+    """Identify one version of a Telegram message: chat, message id and edit time."""
+    chat = getattr(message, "chat", None)
+    message_id = getattr(message, "message_id", None)
+    if chat is None or message_id is None:
+        return None
+    # Telegram sends ``edit_date`` as a unix timestamp.
+    return (chat.id, message_id, getattr(message, "edit_date", None) or 0)
+
+
+class _RecentKeys:
+    """Bounded set remembering the most recent keys."""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max(1, max_keys)
+        self._keys: "OrderedDict[MessageKey, None]" = OrderedDict()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def add(self, key: MessageKey) -> bool:
+        """Remember ``key``; return False if it was already known."""
+        if key in self._keys:
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+        return True
+
+
+@dataclass(slots=True)
+class MirrorJob:
+    """One message to mirror; ``user_id`` or ``chat_id`` identifies the dialog."""
+
+    sender: str
+    bot: Bot
+    text: str
+    user_id: Optional[int] = None
+    chat_id: Optional[int] = None
+    username: Optional[str] = None
+    telegram_user: Optional[TelegramUser] = None
+    manager_telegram_user: Optional[TelegramUser] = None
+    source_message: Optional[Message] = None
+    # Fallback jobs also write the message to history if nobody logged it.
+    persist: bool = False
+    not_before: float = 0.0
+
+
+@dataclass(slots=True)
+class _Digest:
+    bot: Bot
+    user_id: int
+    username: str
+    lines: List[str] = field(default_factory=list)
+
+
+def resolve_username(*, user, telegram_user: Optional[TelegramUser]) -> str:
+    """Resolve username or fallback identifier."""
+    if user and getattr(user, "username", None):
+        return f"@{user.username}"
+    if telegram_user and telegram_user.username:
+        return f"@{telegram_user.username}"
+
+    telegram_id = None
+    if user and getattr(user, "telegram_id", None):
+        telegram_id = user.telegram_id
+    elif telegram_user:
+        telegram_id = telegram_user.id
+
+    return f"ID {telegram_id}" if telegram_id else "неизвестный пользователь"
+
+
+def resolve_manager_username(manager: Optional[TelegramUser]) -> str:
+    """Resolve username or fallback identifier for the manager."""
+    if manager and manager.username:
+        return f"@{manager.username}"
+    if manager:
+        full_name = " ".join(filter(None, [manager.first_name, manager.last_name]))
+        if full_name.strip():
+            return full_name.strip()
+        return f"ID {manager.id}"
+    return "неизвестный менеджер"
+
+
+def build_dialog_keyboard(
+    user_id: int,
+    session_info: Optional[ManualDialogSession],
+) -> InlineKeyboardMarkup:
+    """Build inline keyboard with dialog control buttons."""
+    if session_info:
+        button = InlineKeyboardButton(
+            text="Завершить диалог",
+            callback_data=f"manual_dialog:stop:{user_id}",
+        )
+    else:
+        button = InlineKeyboardButton(
+            text="Продолжить диалог",
+            callback_data=f"manual_dialog:start:{user_id}",
+        )
+
+    return InlineKeyboardMarkup(inline_keyboard=[[button]])
+
+
+def build_header(
+    *,
+    sender: str,
+    username: str,
+    manager_display: Optional[str],
+    manager_user: Optional[TelegramUser],
+) -> str:
+    """Construct header text with sender and manager data."""
+    if sender == "manager":
+        manager_header = manager_display or resolve_manager_username(manager_user)
+        return f"Менеджер {manager_header} пишет пользователю {username}"
+
+    header = (
+        f"Бот пишет пользователю {username}"
+        if sender == "bot"
+        else f"Пользователь {username} пишет боту"
+    )
+    if manager_display:
+        header = f"{header}\nМенеджер: {manager_display}"
+    return header
+
+
+def _digest_line(job: MirrorJob, manager_display: Optional[str]) -> str:
+    if job.sender == "manager":
+        label = f"Менеджер {manager_display or resolve_manager_username(job.manager_telegram_user)}"
+    else:
+        label = "Бот" if job.sender == "bot" else "Пользователь"
+    source = job.source_message
+    body = job.text
+    if source is not None and not source.text:
+        body = f"[{source.content_type}] {source.caption or ''}".rstrip()
+    return f"{label}: {body or '[без текста]'}"
+
+
+def split_post(header: str, lines: List[str], limit: int = MAX_POST_LENGTH) -> List[str]:
+    """Pack ``lines`` under ``header`` into as few posts of at most ``limit`` chars as possible."""
+    posts: List[str] = []
+    current = header
+    for line in lines:
+        line = line[: limit - len(header) - 2]
+        if len(current) + 1 + len(line) > limit:
+            posts.append(current)
+            current = header
+        current = f"{current}\n{line}"
+    posts.append(current)
+    return posts
+
+
+class DialogMirror:
+    """Bounded background pipeline posting dialog messages to the dialogs channel."""
+
+    def __init__(
+        self,
+        channel_id: int,
+        *,
+        concurrency: int = 4,
+        max_pending: int = 5000,
+        digest_seconds: float = 0.0,
+        fallback_grace: float = 2.0,
+        max_keys: int = 20_000,
+    ) -> None:
+        self.channel_id = channel_id
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max(1, max_pending)
+        self.digest_seconds = max(0.0, digest_seconds)
+        self.fallback_grace = max(0.0, fallback_grace)
+        self._mirrored = _RecentKeys(max_keys)
+        self._logged = _RecentKeys(max_keys)
+        self._streamed = _RecentKeys(max_keys)
+        self._shards: List[asyncio.Queue[MirrorJob]] = []
+        self._tasks: List[asyncio.Task[None]] = []
+        self._digests: Dict[int, _Digest] = {}
+        self._digest_tasks: Dict[int, asyncio.Task[None]] = {}
+        self._pending = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.channel_id)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def mark_logged(self, message: Optional[Message]) -> bool:
+        """Record that ``message`` was written to the history; False if it already was."""
+        key = message_key(message)
+        return key is None or self._logged.add(key)
+
+    def mark_streamed(self, message: Optional[Message]) -> None:
+        """Skip fallbacks for every version of ``message``; its owner logs the final one."""
+        key = message_key(message)
+        if key is not None:
+            self._streamed.add((key[0], key[1], 0))
+
+    def _is_streamed(self, message: Optional[Message]) -> bool:
+        key = message_key(message)
+        return key is not None and (key[0], key[1], 0) in self._streamed
+
+    def submit(self, job: MirrorJob) -> bool:
+        """Queue ``job`` without waiting; return False if it was a duplicate or dropped."""
+        if not self.enabled:
+            return False
+        key = message_key(job.source_message)
+        if key is not None and not self._mirrored.add(key):
+            MIRROR_JOBS.labels("duplicate").inc()
+            return False
+        if self._pending >= self.max_pending:
+            MIRROR_JOBS.labels("dropped").inc()
+            logger.warning("dialog_mirror_queue_full", pending=self._pending)
+            return False
+
+        self._ensure_workers()
+        shard_key = job.chat_id if job.chat_id is not None else job.user_id or 0
+        self._shards[hash(shard_key) % self.concurrency].put_nowait(job)
+        self._pending += 1
+        MIRROR_QUEUE_DEPTH.set(self._pending)
+        return True
+
+    def submit_outbound(self, bot: Bot, message: Message) -> bool:
+        """Queue a fallback mirror for a message the bot sent to a user dialog."""
+        chat = message.chat
+        if chat is None or chat.id == self.channel_id or chat.type != "private":
+            return False
+        # Ensure we do not mirror service notifications without users
+        if message.from_user and message.from_user.is_bot and message.from_user.id != bot.id:
+            return False
+        if self._is_streamed(message):
+            return False
+        text = message.text or message.caption or f"[{message.content_type}]"
+        return self.submit(
+            MirrorJob(
+                sender="bot",
+                bot=bot,
+                text=text,
+                chat_id=chat.id,
+                source_message=message,
+                persist=True,
+                not_before=time.monotonic() + self.fallback_grace,
+            )
+        )
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Drain queued jobs and pending digests, then stop the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("dialog_mirror_drain_timeout", pending=self._pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for user_id in list(self._digest_tasks):
+            self._digest_tasks.pop(user_id).cancel()
+            await self._flush_digest(user_id)
+        self._tasks.clear()
+        self._shards.clear()
+        self._pending = 0
+        MIRROR_QUEUE_DEPTH.set(0)
+
+    def _ensure_workers(self) -> None:
+        if self._tasks:
+            return
+        self._shards = [asyncio.Queue() for _ in range(self.concurrency)]
+        self._tasks = [
+            asyncio.create_task(self._worker(shard), name=f"dialog-mirror-{index}")
+            for index, shard in enumerate(self._shards)
+        ]
+
+    async def _worker(self, shard: "asyncio.Queue[MirrorJob]") -> None:
+        # Workers inherit the context of the first submitter; never post as interactive.
+        with outbound_priority(OutboundPriority.BULK):
+            await self._work(shard)
+
+    async def _work(self, shard: "asyncio.Queue[MirrorJob]") -> None:
+        while True:
+            job = await shard.get()
+            try:
+                delay = job.not_before - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                MIRROR_JOBS.labels("failed").inc()
+                logger.warning("dialog_mirror_failed", error=str(exc), sender=job.sender)
+            finally:
+                self._pending -= 1
+                MIRROR_QUEUE_DEPTH.set(self._pending)
+                shard.task_done()
+
+    async def _process(self, job: MirrorJob) -> None:
+        # The first chunk of a streamed reply is queued before the streamer
+        # knows its message id, so fallbacks are checked again here.
+        if job.persist and self._is_streamed(job.source_message):
+            MIRROR_JOBS.labels("skipped").inc()
+            return
+        username = job.username
+        if job.persist or job.user_id is None or username is None:
+            if not await self._load_user(job):
+                MIRROR_JOBS.labels("skipped").inc()
+                return
+            username = job.username
+
+        session_info = await manual_dialog_service.get_session_by_user(job.user_id)
+        manager_display: Optional[str] = None
+        if session_info:
+            manager_display = session_info.manager_display
+        elif job.manager_telegram_user:
+            manager_display = resolve_manager_username(job.manager_telegram_user)
+
+        if self.digest_seconds > 0:
+            self._add_to_digest(job, username, manager_display)
+            MIRROR_JOBS.labels("digested").inc()
+            return
+
+        header = build_header(
+            sender=job.sender,
+            username=username,
+            manager_display=manager_display,
+            manager_user=job.manager_telegram_user,
+        )
+        reply_markup = build_dialog_keyboard(job.user_id, session_info)
+
+        # Prioritize copying the original message to preserve formatting/media.
+        if job.source_message is not None:
+            mirrored = await self._mirror_original_message(
+                bot=job.bot,
+                source_message=job.source_message,
+                header=header,
+                reply_markup=reply_markup,
+                fallback_text=job.text or "",
+                username=username,
+                sender=job.sender,
+            )
+        else:
+            mirrored = await self._send_text_mirror(
+                bot=job.bot,
+                text=f"{header}\nТекст сообщения:\n{job.text or '[без текста]'}",
+                reply_markup=reply_markup,
+                username=username,
+                sender=job.sender,
+            )
+        MIRROR_JOBS.labels("sent" if mirrored else "failed").inc()
+
+    async def _load_user(self, job: MirrorJob) -> bool:
+        """Resolve the dialog's user and, for fallback jobs, write the history row."""
+        async with AsyncSessionLocal() as session:
+            user_service = UserService(session)
+            if job.user_id is not None:
+                app_user = await user_service.repository.get_by_id(job.user_id)
+            else:
+                app_user = await user_service.repository.get_by_telegram_id(job.chat_id)
+            if app_user is None:
+                return False
+            job.user_id = app_user.id
+            if job.username is None:
+                job.username = resolve_username(user=app_user, telegram_user=job.telegram_user)
+
+            if (
+                job.persist
+                and settings.conversation_logging_enabled
+                and self.mark_logged(job.source_message)
+            ):
+                await user_service.save_message(
+                    user_id=app_user.id,
+                    role=job.sender,
+                    text=job.text,
+                    metadata={"source": "auto_mirror"},
+                )
+                await session.commit()
+        return True
+
+    def _add_to_digest(self, job: MirrorJob, username: str, manager_display: Optional[str]) -> None:
+        digest = self._digests.get(job.user_id)
+        if digest is None:
+            digest = self._digests[job.user_id] = _Digest(job.bot, job.user_id, username)
+            self._digest_tasks[job.user_id] = asyncio.create_task(
+                self._flush_digest_later(job.user_id), name=f"dialog-digest-{job.user_id}"
+            )
+        digest.lines.append(_digest_line(job, manager_display))
+
+    async def _flush_digest_later(self, user_id: int) -> None:
+        await asyncio.sleep(self.digest_seconds)
+        self._digest_tasks.pop(user_id, None)
+        await self._flush_digest(user_id)
+
+    async def _flush_digest(self, user_id: int) -> None:
+        digest = self._digests.pop(user_id, None)
+        if digest is None or not digest.lines:
+            return
+        session_info = await manual_dialog_service.get_session_by_user(user_id)
+        header = f"Диалог с пользователем {digest.username} ({len(digest.lines)} сообщ.)"
+        if session_info:
+            header = f"{header}\nМенеджер: {session_info.manager_display}"
+        posts = split_post(header, digest.lines)
+        for index, text in enumerate(posts):
+            await self._send_text_mirror(
+                bot=digest.bot,
+                text=text,
+                reply_markup=build_dialog_keyboard(user_id, session_info) if index == len(posts) - 1 else None,
+                username=digest.username,
+                sender="digest",
+            )
+
+    async def _mirror_original_message(
+        self,
+        *,
+        bot: Bot,
+        source_message: Message,
+        header: str,
+        reply_markup: Optional[InlineKeyboardMarkup],
+        fallback_text: str,
+        username: str,
+        sender: str,
+    ) -> bool:
+        """Try to mirror the original Telegram message to the dialogs channel."""
+        try:
+            if source_message.text:
+                text_body = f"{header}\nТекст сообщения:\n{source_message.text}"
+                return await self._send_text_mirror(
+                    bot=bot,
+                    text=text_body,
+                    reply_markup=reply_markup,
+                    username=username,
+                    sender=sender,
+                )
+
+            caption = source_message.caption or ""
+            caption_block = f"{header}\n"
+            if caption.strip():
+                caption_block += f"{caption}"
+            else:
+                caption_block += f"[{source_message.content_type}]"
+
+            await bot.copy_message(
+                chat_id=self.channel_id,
+                from_chat_id=source_message.chat.id,
+                message_id=source_message.message_id,
+                caption=caption_block,
+                reply_markup=reply_markup,
+            )
+            logger.debug(
+                "dialog_mirror_sent",
+                sender=sender,
+                username=username,
+                channel_id=self.channel_id,
+                mode="copy",
+            )
+            return True
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.warning(
+                "dialog_mirror_copy_failed",
+                error=str(exc),
+                username=username,
+                sender=sender,
+            )
+            # Fallback to text mirror with available data.
+            fallback = fallback_text or f"[{source_message.content_type}]"
+            return await self._send_text_mirror(
+                bot=bot,
+                text=f"{header}\nТекст сообщения:\n{fallback}",
+                reply_markup=reply_markup,
+                username=username,
+                sender=sender,
+            )
+
+    async def _send_text_mirror(
+        self,
+        *,
+        bot: Bot,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup],
+        username: str,
+        sender: str,
+    ) -> bool:
+        """Send textual mirror message to dialogs channel."""
+        try:
+            await bot.send_message(
+                chat_id=self.channel_id,
+                text=text,
+                reply_markup=reply_markup,
+            )
+            logger.debug(
+                "dialog_mirror_sent",
+                sender=sender,
+                username=username,
+                channel_id=self.channel_id,
+                mode="text",
+            )
+            return True
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.warning(
+                "dialog_mirror_failed",
+                error=str(exc),
+                username=username,
+                sender=sender,
+            )
+            return False
+
+
+dialog_mirror = DialogMirror(
+    settings.dialogs_channel_id,
+    concurrency=settings.dialog_mirror_concurrency,
+    max_pending=settings.dialog_mirror_queue_size,
+    digest_seconds=settings.dialog_mirror_digest_seconds,
+    fallback_grace=settings.dialog_mirror_fallback_grace,
+)
+
+__all__ = [
+    "DialogMirror",
+    "MirrorJob",
+    "build_dialog_keyboard",
+    "build_header",
+    "dialog_mirror",
+    "message_key",
+    "resolve_manager_username",
+    "resolve_username",
+    "split_post",
+]
@@ -0,0 +1,88 @@
+"""Set of users whose derived aggregates may need recomputing.
+
+Writers mark a user after committing data the aggregates are built from;
+``SentimentService.reconcile`` pops users in batches and recomputes only
+those, so the sweep costs nothing when nothing changed. The Redis set is
+shared by all processes and survives restarts; the memory set is local.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Set
+
+import structlog
+
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+
+class DirtyUserSet(ABC):
+    @abstractmethod
+    async def add(self, user_ids: Iterable[int]) -> None:
+        """Mark users as changed."""
+
+    @abstractmethod
+    async def pop(self, count: int) -> List[int]:
+        """Remove and return up to ``count`` marked users."""
+
+    @abstractmethod
+    async def size(self) -> int:
+        """Number of marked users."""
+
+
+class MemoryDirtyUserSet(DirtyUserSet):
+    def __init__(self) -> None:
+        self._ids: Set[int] = set()
+
+    async def add(self, user_ids: Iterable[int]) -> None:
+        self._ids.update(user_ids)
+
+    async def pop(self, count: int) -> List[int]:
+        popped = []
+        while self._ids and len(popped) < count:
+            popped.append(self._ids.pop())
+        return popped
+
+    async def size(self) -> int:
+        return len(self._ids)
+
+
+class RedisDirtyUserSet(DirtyUserSet):
+    def __init__(self, key: str = "sentiment:dirty_users") -> None:
+        self.key = key
+
+    def _client(self):
+        client = redis_service.get_client()
+        if client is None:
+            raise RuntimeError("Redis is not initialized; cannot use redis dirty user set")
+        return client
+
+    async def add(self, user_ids: Iterable[int]) -> None:
+        ids = list(user_ids)
+        if ids:
+            await self._client().sadd(self.key, *ids)
+
+    async def pop(self, count: int) -> List[int]:
+        popped = await self._client().spop(self.key, count)
+        return [int(user_id) for user_id in popped or []]
+
+    async def size(self) -> int:
+        return int(await self._client().scard(self.key))
+
+
+def build_dirty_user_set(kind: str) -> DirtyUserSet:
+    if kind == "redis":
+        return RedisDirtyUserSet()
+    if kind != "memory":
+        logger.warning("unknown_dirty_user_set_backend", backend=kind, fallback="memory")
+    return MemoryDirtyUserSet()
+
+
+__all__ = [
+    "DirtyUserSet",
+    "MemoryDirtyUserSet",
+    "RedisDirtyUserSet",
+    "build_dirty_user_set",
+]
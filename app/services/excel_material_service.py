@@ -3,10 +3,12 @@ Service for managing materials from Excel files.
 Handles reading, validation, and progress tracking without database interaction.
 """
 
+import asyncio
 import csv
 import json
 import logging
 import os
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
@@ -24,6 +26,7 @@ MEDIA_PATH = os.path.join(BASE_DATA_PATH, 'media')
 PROGRESS_FILE_PATH = os.path.join(BASE_DATA_PATH, 'materials_progress.json')
 LOG_FILE_PATH = os.path.join(BASE_DATA_PATH, 'materials_send_log.csv')
 CONFIG_FILE_PATH = os.path.join(BASE_DATA_PATH, 'materials_schedule_config.json')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm')
 
 
 @dataclass
@@ -50,6 +53,68 @@ class ValidationResult:
         return self.valid_rows > 0
 
 
+class MaterialMailingRun:
+    """
+    State of one mailing run: the material catalog and the progress snapshot
+    are loaded once, progress updates and log rows are buffered in memory and
+    written in batches by flush().
+    """
+
+    def __init__(self, service: "ExcelMaterialService", catalog: List[Optional[Material]], progress: Dict):
+        self._service = service
+        self._catalog = catalog
+        self._progress = progress
+        self._progress_updates: Dict[str, Dict] = {}
+        self._log_rows: List[List] = []
+        self._file_ids: Dict[str, str] = {}
+
+    @property
+    def pending_writes(self) -> int:
+        """Number of buffered progress updates and log rows."""
+        return len(self._progress_updates) + len(self._log_rows)
+
+    def next_material(self, user_id: int) -> Optional[Material]:
+        """Same rotation as get_next_material_for_user, served from memory."""
+        user_progress = self._progress_updates.get(str(user_id)) or self._progress.get(str(user_id), {})
+        return self._service._pick_next(self._catalog, user_progress.get("last_row", 0))
+
+    def media_for(self, material: Material):
+        """Telegram file_id of an already uploaded media file, else a local file to upload."""
+        from aiogram.types import FSInputFile
+
+        return self._file_ids.get(material.media_path) or FSInputFile(material.media_path)
+
+    def remember_upload(self, material: Material, message) -> None:
+        """Keep the file_id Telegram assigned so later users reuse the upload."""
+        file_id = None
+        if material.media_type == 'photo' and getattr(message, 'photo', None):
+            file_id = message.photo[-1].file_id
+        elif material.media_type == 'video' and getattr(message, 'video', None):
+            file_id = message.video.file_id
+        if file_id:
+            self._file_ids.setdefault(material.media_path, file_id)
+
+    def record_progress(self, user_id: int, row_index: int) -> None:
+        """Buffer a progress update for a successful send."""
+        self._progress_updates[str(user_id)] = {
+            "last_row": row_index,
+            "last_sent_at": datetime.utcnow().isoformat(),
+        }
+
+    def log_attempt(self, user_id: int, username: Optional[str], material: Optional[Material], status: str, error: str = "") -> None:
+        """Buffer a send-log row."""
+        self._log_rows.append(self._service._log_row(user_id, username, material, status, error))
+
+    async def flush(self) -> None:
+        """Persist buffered progress and log rows off the event loop."""
+        if not self.pending_writes:
+            return
+        updates, self._progress_updates = self._progress_updates, {}
+        rows, self._log_rows = self._log_rows, []
+        self._progress.update(updates)
+        await asyncio.to_thread(self._service._persist_batch, updates, rows)
+
+
 class ExcelMaterialService:
     """
     Manages the lifecycle of materials stored in an Excel file.
@@ -57,6 +122,8 @@ class ExcelMaterialService:
     """
 
     def __init__(self):
+        self._df_cache: Optional[Tuple[Tuple[int, int], pd.DataFrame]] = None
+        self._df_cache_lock = threading.Lock()
         # Ensure data directory and necessary files exist
         os.makedirs(BASE_DATA_PATH, exist_ok=True)
         os.makedirs(MEDIA_PATH, exist_ok=True)
@@ -77,19 +144,27 @@ class ExcelMaterialService:
                 }, f, indent=4)
 
     def get_materials_dataframe(self) -> Optional[pd.DataFrame]:
-        """Reads the Excel file into a pandas DataFrame."""
+        """Reads the Excel file into a pandas DataFrame, cached by file mtime and size."""
         try:
-            if not os.path.exists(EXCEL_FILE_PATH):
+            try:
+                stat = os.stat(EXCEL_FILE_PATH)
+            except FileNotFoundError:
                 logger.warning(f"Materials Excel file not found at {EXCEL_FILE_PATH}")
                 return None
-            
-            df = pd.read_excel(EXCEL_FILE_PATH, sheet_name='materials', engine='openpyxl')
-            
-            # Basic cleanup
-            df.dropna(how='all', inplace=True)
-            df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-            
-            return df
+
+            version = (stat.st_mtime_ns, stat.st_size)
+            with self._df_cache_lock:
+                if self._df_cache is not None and self._df_cache[0] == version:
+                    return self._df_cache[1]
+
+                df = pd.read_excel(EXCEL_FILE_PATH, sheet_name='materials', engine='openpyxl')
+
+                # Basic cleanup
+                df.dropna(how='all', inplace=True)
+                df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
+
+                self._df_cache = (version, df)
+                return df
         except Exception as e:
             logger.error(f"Failed to read or process Excel file: {e}", exc_info=True)
             return None
@@ -127,50 +202,68 @@ class ExcelMaterialService:
         
         return ValidationResult(total_rows, valid_rows, skipped_rows, reasons)
 
-    def get_next_material_for_user(self, user_id: int) -> Optional[Material]:
+    def load_catalog(self) -> List[Optional[Material]]:
         """
-        Gets the next material for a user based on their progress.
-        Handles circular iteration through the material list.
+        Resolves every Excel row into a Material, or None when the row has no
+        usable media file. Index in the list is the 0-based row position.
         """
         df = self.get_materials_dataframe()
         if df is None or df.empty:
-            return None
+            return []
 
-        progress_data = self._read_progress_file()
-        user_progress = progress_data.get(str(user_id), {"last_row": 0})
-        last_row_index = user_progress.get("last_row", 0)
-        
-        next_row_index = last_row_index
-        
-        for i in range(len(df)):
-            current_row_to_check = (next_row_index + i) % len(df)
-            row = df.iloc[current_row_to_check]
-            
+        catalog: List[Optional[Material]] = []
+        for position in range(len(df)):
+            row = df.iloc[position]
             media_filename = row.get('media_filename')
             if pd.isna(media_filename) or not media_filename:
+                catalog.append(None)
                 continue
 
             media_path = os.path.join(MEDIA_PATH, media_filename)
             if not os.path.exists(media_path):
+                catalog.append(None)
                 continue
 
-            # Found a valid row
             file_extension = os.path.splitext(media_filename)[1].lower()
-            video_extensions = ['.mp4', '.mov', '.webm']
-            media_type = 'video' if file_extension in video_extensions else 'photo'
-            
-            return Material(
-                row_index=current_row_to_check + 1, # 1-based for logs
-                title=row.get('title'),
-                text=row.get('text'),
-                media_filename=media_filename,
-                media_path=media_path,
-                media_type=media_type
+            media_type = 'video' if file_extension in VIDEO_EXTENSIONS else 'photo'
+            catalog.append(
+                Material(
+                    row_index=position + 1,  # 1-based for logs
+                    title=row.get('title'),
+                    text=row.get('text'),
+                    media_filename=media_filename,
+                    media_path=media_path,
+                    media_type=media_type,
+                )
             )
-            
-        logger.warning("No valid materials found in the Excel file after a full loop.")
+        return catalog
+
+    @staticmethod
+    def _pick_next(catalog: List[Optional[Material]], last_row_index: int) -> Optional[Material]:
+        """Circular search for the first usable row starting after the last sent one."""
+        for i in range(len(catalog)):
+            material = catalog[(last_row_index + i) % len(catalog)]
+            if material is not None:
+                return material
+        if catalog:
+            logger.warning("No valid materials found in the Excel file after a full loop.")
         return None
 
+    def get_next_material_for_user(self, user_id: int) -> Optional[Material]:
+        """
+        Gets the next material for a user based on their progress.
+        Handles circular iteration through the material list.
+        """
+        user_progress = self._read_progress_file().get(str(user_id), {"last_row": 0})
+        return self._pick_next(self.load_catalog(), user_progress.get("last_row", 0))
+
+    async def start_run(self) -> MaterialMailingRun:
+        """Loads the catalog and progress once for a whole mailing run."""
+        catalog, progress = await asyncio.to_thread(
+            lambda: (self.load_catalog(), self._read_progress_file())
+        )
+        return MaterialMailingRun(self, catalog, progress)
+
     def update_user_progress(self, user_id: int, row_index: int):
         """Updates the user's progress after a successful send."""
         with FileLock(f"{PROGRESS_FILE_PATH}.lock"):
@@ -181,21 +274,38 @@ class ExcelMaterialService:
             }
             self._write_progress_file(progress_data)
 
-    def log_send_attempt(self, user_id: int, username: Optional[str], material: Material, status: str, error: str = ""):
+    def log_send_attempt(self, user_id: int, username: Optional[str], material: Optional[Material], status: str, error: str = ""):
         """Logs a material sending attempt to the CSV file."""
-        log_entry = [
+        self._append_log_rows([self._log_row(user_id, username, material, status, error)])
+
+    @staticmethod
+    def _log_row(user_id: int, username: Optional[str], material: Optional[Material], status: str, error: str) -> List:
+        return [
             datetime.utcnow().isoformat(),
             user_id,
             username or "",
-            material.row_index,
-            material.title,
-            material.media_filename,
+            material.row_index if material else "",
+            material.title if material else "",
+            material.media_filename if material else "",
             status,
             error
         ]
+
+    def _append_log_rows(self, rows: List[List]):
+        if not rows:
+            return
         with open(LOG_FILE_PATH, 'a', encoding='utf-8', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(log_entry)
+            writer.writerows(rows)
+
+    def _persist_batch(self, progress_updates: Dict[str, Dict], log_rows: List[List]):
+        """Merges progress updates into the file under the lock and appends log rows."""
+        if progress_updates:
+            with FileLock(f"{PROGRESS_FILE_PATH}.lock"):
+                progress_data = self._read_progress_file()
+                progress_data.update(progress_updates)
+                self._write_progress_file(progress_data)
+        self._append_log_rows(log_rows)
 
     def _read_progress_file(self) -> Dict:
         try:
@@ -10,6 +10,8 @@ import structlog
 from openai import AsyncOpenAI
 
 from app.config import settings
+from app.services.llm_cache import MISS, llm_cache, prompt_version
+from app.services.openai_client import get_openai_client, openai_clients
 
 
 class InquiryIntentService:
@@ -46,11 +48,17 @@ class InquiryIntentService:
         "programs or services. Respond strictly with JSON: {\"info_intent\": true/false}."
     )
 
+    USER_TEMPLATE = (
+        "Message: {text}\n"
+        "Recent context: {context}\n"
+        "Reply with JSON {{\"info_intent\": true/false}}."
+    )
+    MODEL = "gpt-3.5-turbo"
+    PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, USER_TEMPLATE)
+
     def __init__(self) -> None:
         self.logger = structlog.get_logger(__name__)
-        self._client: Optional[AsyncOpenAI] = None
-        if settings.openai_api_key:
-            self._client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self._client: Optional[AsyncOpenAI] = get_openai_client()
 
     def _match_keywords(self, text: str) -> bool:
         text_lower = text.lower()
@@ -62,24 +70,30 @@ class InquiryIntentService:
         if not self._client:
             return False
 
+        # Repeated messages with the same context are answered from the cache.
+        cache_key = llm_cache.key("inquiry_intent", self.MODEL, self.PROMPT_VERSION, text, context)
+        cached = await llm_cache.get("inquiry_intent", cache_key)
+        if cached is not MISS:
+            return bool(cached)
+
         messages = [
             {"role": "system", "content": self.SYSTEM_PROMPT},
             {
                 "role": "user",
-                "content": (
-                    f"Message: {text}\n"
-                    f"Recent context: {context or '—'}\n"
-                    "Reply with JSON {\"info_intent\": true/false}."
-                ),
+                "content": self.USER_TEMPLATE.format(text=text, context=context or "—"),
             },
         ]
 
         try:
-            response = await self._client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=50,
-                response_format={"type": "json_object"},
+            response = await openai_clients.call(
+                "chat",
+                self.MODEL,
+                lambda: self._client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=messages,
+                    max_tokens=50,
+                    response_format={"type": "json_object"},
+                ),
             )
         except Exception as exc:  # pragma: no cover - network path
             self.logger.warning("inquiry_intent_llm_failed", error=str(exc))
@@ -95,7 +109,9 @@ class InquiryIntentService:
             self.logger.debug("inquiry_intent_json_parse_failed", raw=content)
             return False
 
-        return bool(data.get("info_intent"))
+        result = bool(data.get("info_intent"))
+        await llm_cache.set("inquiry_intent", cache_key, result)
+        return result
 
     async def has_info_intent(self, text: str, *, context: Optional[str] = None) -> bool:
         if not text:
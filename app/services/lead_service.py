@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Lead, LeadNote, LeadStatus, User, Message
 from app.services.ab_testing_service import ABTestingService, ABEventType
+from app.services.activity_buffer import activity_buffer
 from app.services.product_matching_service import ProductMatchingService, MatchResult
 from app.config import settings
 from app.services.event_service import EventService
@@ -272,7 +273,7 @@ class LeadService:
         stmt = (
             select(Message)
             .where(Message.user_id == user_id)
-            .order_by(Message.created_at.desc())
+            .order_by(Message.created_at.desc(), Message.id.desc())
             .limit(limit)
         )
         result = await self.session.execute(stmt)
@@ -657,7 +658,9 @@ class LeadService:
         if len(summary_trimmed) > 400:
             summary_trimmed = summary_trimmed[:400].rstrip() + "…"
 
-        sentiment_lines = self._build_sentiment_snapshot(user)
+        sentiment_lines = self._build_sentiment_snapshot(
+            user, await activity_buffer.fresh_counters(user)
+        )
         sentiment_block = "\n".join(sentiment_lines)
 
         lead_card = f"""👤 **Лид #{lead.id} — {heat_label}**
@@ -802,18 +805,18 @@ class LeadService:
 
         return priority
 
-    def _build_sentiment_snapshot(self, user: User) -> list[str]:
-        """Generate sentiment summary lines for lead-related messages."""
-        total = user.scored_total or 0
+    def _build_sentiment_snapshot(self, user: User, counters: Dict[str, int]) -> list[str]:
+        """Generate sentiment summary lines from ``activity_buffer.fresh_counters`` values."""
+        total = counters["scored_total"]
         if user.lead_level_percent is None or total < 10:
             lead_level = f"недостаточно данных ({total}/10)"
         else:
             lead_level = f"{user.lead_level_percent}%"
 
-        counter_value = user.counter or 0
-        pos = user.pos_count or 0
-        neu = user.neu_count or 0
-        neg = user.neg_count or 0
+        counter_value = counters["counter"]
+        pos = counters["pos_count"]
+        neu = counters["neu_count"]
+        neg = counters["neg_count"]
         lines = [
             f"• Уровень лида: {lead_level}",
             f"• Баланс сообщений: {counter_value:+d} (позитив {pos} / нейтр {neu} / негатив {neg})",
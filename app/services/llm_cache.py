@@ -0,0 +1,189 @@
+"""Content-addressed cache for deterministic LLM classifications.
+
+Keys are a hash of the use case, model, prompt version and normalized
+input, so the same question answered by the same prompt and model is never
+sent twice. A process-local LRU answers repeats without any I/O; Redis, when
+initialized, shares results between processes and restarts. Each use case
+has its own TTL (``LLM_CACHE_TTL_*``); only successful answers are stored.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+from prometheus_client import Counter
+
+from app.config import settings
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total",
+    "LLM cache lookups by use case and result (memory_hit, redis_hit, miss)",
+    ["use_case", "result"],
+)
+
+# Sentinel for "not cached": cached values may legitimately be False or None.
+MISS = object()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Fold case, Unicode forms, ``ё`` and whitespace so trivial variants share a key."""
+    if not text:
+        return ""
+    folded = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return " ".join(folded.split())
+
+
+def prompt_version(*templates: str) -> str:
+    """Fingerprint of the static prompt text; changes whenever the prompt is edited."""
+    digest = hashlib.sha256("\x1f".join(templates).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def cache_ttls() -> Dict[str, int]:
+    return {
+        "purchase_intent": settings.llm_cache_ttl_purchase_intent,
+        "inquiry_intent": settings.llm_cache_ttl_inquiry_intent,
+        "script_relevance": settings.llm_cache_ttl_script_relevance,
+        "sentiment": settings.llm_cache_ttl_sentiment,
+    }
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU, then Redis) cache of JSON-serializable LLM results."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 10_000,
+        ttls: Optional[Dict[str, int]] = None,
+        enabled: bool = True,
+        prefix: str = "llmcache",
+        clock=time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttls = ttls if ttls is not None else cache_ttls()
+        self.enabled = enabled
+        self.prefix = prefix
+        self._clock = clock
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def key(self, use_case: str, model: str, version: str, *inputs: Optional[str]) -> str:
+        """Build the content address of one request."""
+        payload = json.dumps(
+            [model, version, [normalize_text(value) for value in inputs]],
+            ensure_ascii=False,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{use_case}:{digest}"
+
+    async def get(self, use_case: str, key: str) -> Any:
+        """Return the cached value or ``MISS``."""
+        return (await self.get_many(use_case, [key]))[0]
+
+    async def get_many(self, use_case: str, keys: Sequence[str]) -> List[Any]:
+        """Look ``keys`` up in memory, then fetch the rest from Redis in one MGET."""
+        if not self.enabled or not keys:
+            return [MISS] * len(keys)
+
+        values: List[Any] = [self._memory_get(key) for key in keys]
+        hits = sum(value is not MISS for value in values)
+        if hits:
+            LLM_CACHE_REQUESTS.labels(use_case, "memory_hit").inc(hits)
+
+        missing = [index for index, value in enumerate(values) if value is MISS]
+        client = redis_service.get_client()
+        if missing and client is not None:
+            try:
+                raw_values = await client.mget([keys[index] for index in missing])
+            except Exception as exc:
+                logger.warning("llm_cache_redis_get_failed", use_case=use_case, error=str(exc))
+                raw_values = [None] * len(missing)
+            ttl = self.ttls.get(use_case, 0)
+            redis_hits = 0
+            for index, raw in zip(missing, raw_values):
+                if raw is None:
+                    continue
+                try:
+                    values[index] = json.loads(raw)
+                except ValueError:
+                    continue
+                redis_hits += 1
+                self._memory_set(keys[index], values[index], ttl)
+            if redis_hits:
+                LLM_CACHE_REQUESTS.labels(use_case, "redis_hit").inc(redis_hits)
+
+        misses = sum(value is MISS for value in values)
+        if misses:
+            LLM_CACHE_REQUESTS.labels(use_case, "miss").inc(misses)
+        return values
+
+    async def set(self, use_case: str, key: str, value: Any) -> None:
+        await self.set_many(use_case, {key: value})
+
+    async def set_many(self, use_case: str, items: Dict[str, Any]) -> None:
+        """Store results in both tiers with the use case TTL; Redis errors are only logged."""
+        ttl = self.ttls.get(use_case, 0)
+        if not self.enabled or ttl <= 0 or not items:
+            return
+        for key, value in items.items():
+            self._memory_set(key, value, ttl)
+
+        client = redis_service.get_client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+            await pipe.execute()
+        except Exception as exc:
+            logger.warning("llm_cache_redis_set_failed", use_case=use_case, error=str(exc))
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def _memory_get(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is None:
+            return MISS
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._memory[key]
+            return MISS
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, ttl: int) -> None:
+        if ttl <= 0:
+            return
+        self._memory[key] = (self._clock() + ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+llm_cache = LLMResponseCache(
+    max_entries=settings.llm_cache_max_entries,
+    enabled=settings.llm_cache_enabled,
+)
+
+__all__ = [
+    "MISS",
+    "LLMResponseCache",
+    "cache_ttls",
+    "llm_cache",
+    "normalize_text",
+    "prompt_version",
+]
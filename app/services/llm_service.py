@@ -1,23 +1,40 @@
 """LLM service for OpenAI integration with policy layer."""
 
 import json
-from typing import Dict, List, Optional, Any
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 from dataclasses import dataclass
 
 import structlog
 import openai
-from openai import AsyncOpenAI
 
 from app.config import settings
 from app.models import User, UserSegment
 from app.utils.prompt_loader import prompt_loader
 from app.utils.callbacks import Callbacks
 from app.safety.validator import SafetyValidator, SafetyIssue
+from app.services.dialog_context import DialogContext
+from app.services.llm_cache import MISS, llm_cache, prompt_version
 from app.services.logging_service import ConversationLoggingService
+from app.services.openai_client import get_openai_client, is_responses_unsupported, openai_clients
 from app.repositories.user_repository import UserRepository
  
 LOW_CONFIDENCE_THRESHOLD = 0.35
 
+VALIDATION_INSTRUCTIONS = (
+    "You are a validation expert. Your task is to determine if any of the provided answers "
+    "are a relevant and helpful response to the user's query. "
+    "Respond in JSON format with 'is_relevant' (boolean) and 'best_id' (integer ID of the best answer if relevant).\n\n"
+)
+VALIDATION_CRITERIA = (
+    "Criteria for relevance:\n"
+    "1. The answer must directly address the user's intent.\n"
+    "2. The answer must be factually consistent with the user's query.\n"
+    "3. Ignore answers that are only vaguely related.\n\n"
+    "Your JSON response:"
+)
+VALIDATION_PROMPT_VERSION = prompt_version(VALIDATION_INSTRUCTIONS, VALIDATION_CRITERIA)
+
 
 
 @dataclass
@@ -48,13 +65,211 @@ class LLMResponse:
     need_reask: bool = False
 
 
+def extract_guideline_section(prompt_text: str, header: str) -> str:
+    """Extract the section under ``header`` (up to the next upper-case ``...:`` line)."""
+    if not prompt_text:
+        structlog.get_logger().warning("guideline_prompt_missing", header=header)
+        return ""
+
+    header_upper = header.strip().upper()
+    capture = False
+    collected: List[str] = []
+
+    for line in prompt_text.splitlines():
+        stripped = line.strip()
+        if not capture:
+            if stripped.upper().startswith(header_upper):
+                capture = True
+            continue
+        if (
+            stripped
+            and stripped == stripped.upper()
+            and stripped.endswith(":")
+            and stripped.upper() != header_upper
+        ):
+            break
+        collected.append(line.rstrip())
+
+    return "\n".join(collected).strip()
+
+
+DIALOGUE_GUIDELINES_TEMPLATE = (
+    "\nАНАЛИЗ ДИАЛОГА (из подсказки FOLLOW-UPS):\n"
+    "{guidelines}\n"
+    "Следуй этим принципам, чтобы понимать ответы пользователя и реагировать по смыслу. "
+    "Если он отвечает по существу твоего вопроса (даже другими словами или синонимами), продолжай диалог в той же логике. "
+    "Если пользователь меняет тему или задает новый вопрос, переключайся на новый смысл и отвечай, опираясь на последние пять сообщений и общий контекст ниже.\n"
+)
+DEFAULT_DIALOGUE_GUIDELINES = (
+    "\nАНАЛИЗ ДИАЛОГА:\n"
+    "Внимательно анализируй последние пять сообщений и отвечай по смыслу. "
+    "Сохраняй текущую тему, если пользователь дал релевантный ответ, и переключайся, если тема изменилась.\n"
+)
+RESPONSE_CONTRACT = (
+    "\nЗАДАЧА: Твой ответ ДОЛЖЕН быть в формате JSON со следующими полями: \"answer\" (string), \"intent\" (string), "
+    "\"next_action\" (string), \"stage_transition\" (string), \"need_reask\" (boolean), \"confidence\" (float).\n"
+    "ПРАВИЛО Answer-First: Сначала ответь на смысл последней реплики. Не повторяй свой предыдущий вопрос, если пользователь пишет о другом.\n"
+    "\nНиже — данные текущего диалога.\n"
+)
+
+PROFILE_TEMPLATE = (
+    "\nПРОФИЛЬ ПОЛЬЗОВАТЕЛЯ:\n"
+    "- Имя: {first_name} {last_name}\n"
+    "- Сегмент: {segment} ({lead_score} баллов)\n"
+    "- Уровень знаний: {knowledge_level}\n"
+    "- Этап воронки: {funnel_stage}\n"
+    "- Телефон: {phone}\n"
+    "- Email: {email}\n"
+)
+SCENARIO_TEMPLATE = "\nСЦЕНАРНЫЕ УКАЗАНИЯ:\n{scenario}\n"
+MATERIAL_LINE = "- {title}: {url}\n"
+PRODUCT_LINE = "- {name}: {price} руб\n"
+RECENT_MESSAGE_LINE = "- {role}: {text} ({timestamp})"
+QA_PAIR_TEMPLATE = "{index}. Вопрос: {question}\n   Ответ: {answer}"
+ACTIVE_FUNCTION_TEMPLATE = "\nАКТИВНАЯ ФУНКЦИЯ БОТА: {name}\n"
+PRODUCT_FOCUS_TEMPLATE = (
+    "\nТЕКУЩИЙ ПРОДУКТ К ПРОДАЖЕ: {name} — цена {price}. Описание: {description}\n"
+)
+
+KNOWLEDGE_LEVELS = {
+    UserSegment.COLD: "новичок",
+    UserSegment.WARM: "продвинутый",
+    UserSegment.HOT: "эксперт",
+}
+
+
+@lru_cache(maxsize=8)
+def compile_static_prompt(
+    system_prompt: str,
+    persona_prompt: str,
+    guidelines: str,
+    sales_methodology: str,
+    safety_policies: str,
+) -> str:
+    """Join the instructions that are identical for every user and turn.
+
+    Keeping them as a byte-stable prefix lets the provider reuse its prompt
+    cache; everything that varies goes after it (see ``build_dynamic_suffix``).
+    """
+    parts = [system_prompt, "\n"]
+    if persona_prompt:
+        parts.append(f"\nПЕРСОНАЖ И СТИЛЬ:\n{persona_prompt}\n")
+    if guidelines:
+        parts.append(DIALOGUE_GUIDELINES_TEMPLATE.format(guidelines=guidelines))
+    else:
+        parts.append(DEFAULT_DIALOGUE_GUIDELINES)
+    parts.append(f"\nПРОДАЖНАЯ МЕТОДОЛОГИЯ: {sales_methodology}\n")
+    parts.append(f"ПОЛИТИКИ БЕЗОПАСНОСТИ: {safety_policies}\n")
+    parts.append(RESPONSE_CONTRACT)
+    return "".join(parts)
+
+
+@lru_cache(maxsize=8)
+def _dialog_guidelines(followups_prompt: str) -> str:
+    return extract_guideline_section(followups_prompt, header="АНАЛИЗ СООБЩЕНИЙ")
+
+
+def get_static_prompt() -> str:
+    """Static prefix for the current prompt files.
+
+    ``prompt_loader`` caches file contents, so this is a few dictionary
+    lookups; a reloaded prompt simply compiles a new prefix.
+    """
+    return compile_static_prompt(
+        prompt_loader.get_system_prompt(),
+        prompt_loader.load_prompt("system_manager") or "",
+        _dialog_guidelines(prompt_loader.load_prompt("followups") or ""),
+        prompt_loader.get_sales_methodology(),
+        prompt_loader.get_safety_policies(),
+    )
+
+
+def build_dynamic_suffix(context: LLMContext) -> str:
+    """Per-turn data in a fixed section order: stage, profile, offers, history."""
+    user = context.user
+    parts: List[str] = []
+
+    if context.scenario_prompt:
+        parts.append(SCENARIO_TEMPLATE.format(scenario=context.scenario_prompt))
+
+    parts.append(
+        PROFILE_TEMPLATE.format(
+            first_name=user.first_name or "Не указано",
+            last_name=user.last_name or "",
+            segment=user.segment or "не определен",
+            lead_score=user.lead_score,
+            knowledge_level=KNOWLEDGE_LEVELS.get(user.segment, "не определён"),
+            funnel_stage=user.funnel_stage,
+            phone="указан" if user.phone else "не указан",
+            email="указан" if user.email else "не указан",
+        )
+    )
+
+    if context.candidate_materials:
+        parts.append("\nДОСТУПНЫЕ МАТЕРИАЛЫ:\n")
+        for material in context.candidate_materials[:3]:
+            parts.append(MATERIAL_LINE.format(title=material.get("title", ""), url=material.get("url", "")))
+
+    if context.relevant_products:
+        parts.append("\nРЕЛЕВАНТНЫЕ ПРОГРАММЫ:\n")
+        for product in context.relevant_products[:2]:
+            parts.append(PRODUCT_LINE.format(name=product.get("name", ""), price=product.get("price", "")))
+
+    if context.product_focus:
+        product = context.product_focus
+        parts.append(
+            PRODUCT_FOCUS_TEMPLATE.format(
+                name=product.get("name", "Без названия"),
+                price=product.get("price", "N/A"),
+                description=product.get("description", "")[:400],
+            )
+        )
+
+    if context.active_function:
+        parts.append(ACTIVE_FUNCTION_TEMPLATE.format(name=context.active_function))
+
+    if context.recent_messages:
+        formatted = []
+        for msg in context.recent_messages:
+            timestamp = msg.get("timestamp") or msg.get("created_at")
+            if hasattr(timestamp, "isoformat"):
+                timestamp = timestamp.isoformat()
+            formatted.append(
+                RECENT_MESSAGE_LINE.format(
+                    role=msg.get("role"),
+                    text=msg.get("text", "").replace("\n", " ")[:400],
+                    timestamp=timestamp,
+                )
+            )
+        parts.append("\nПОСЛЕДНИЕ 5 СООБЩЕНИЙ:\n" + "\n".join(formatted) + "\n")
+
+    if context.conversation_pairs:
+        pairs = [
+            QA_PAIR_TEMPLATE.format(
+                index=idx,
+                question=pair.get("user", "").replace("\n", " ")[:400],
+                answer=pair.get("bot", "").replace("\n", " ")[:400],
+            )
+            for idx, pair in enumerate(context.conversation_pairs, start=1)
+        ]
+        parts.append("\nИСТОРИЯ Q/A:\n" + "\n".join(pairs) + "\n")
+
+    return "".join(parts)
+
+
 async def get_embedding(text: str, model: str = "text-embedding-3-small") -> Optional[List[float]]:
     """Generates an embedding for a given text."""
     if not text:
         return None
     try:
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        response = await client.embeddings.create(input=[text], model=model)
+        client = get_openai_client()
+        if client is None:
+            return None
+        response = await openai_clients.call(
+            "embeddings",
+            model,
+            lambda: client.embeddings.create(input=[text], model=model),
+        )
         return response.data[0].embedding
     except Exception as e:
         structlog.get_logger().error("Failed to get embedding", error=str(e))
@@ -129,21 +344,13 @@ class LLMService:
     def __init__(self, session: Optional[Any] = None, user: Optional[User] = None):
         self.session = session
         self.user = user
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = get_openai_client()
         self.policy_layer = PolicyLayer()
         self.safety_validator = SafetyValidator()
         self.logger = structlog.get_logger()
 
-        # Load system prompts
-        self.system_prompt = prompt_loader.get_system_prompt()
-        self.safety_policies = prompt_loader.get_safety_policies()
-        self.sales_methodology = prompt_loader.get_sales_methodology()
-        self.persona_prompt = prompt_loader.load_prompt("system_manager") or ""
-        followups_prompt = prompt_loader.load_prompt("followups") or ""
-        self.dialog_analysis_guidelines = self._extract_guideline_section(
-            followups_prompt,
-            header="АНАЛИЗ СООБЩЕНИЙ",
-        )
+        # Compiled once per prompt revision and shared by every instance.
+        self.static_prompt = get_static_prompt()
     
     async def generate_response(self, context: LLMContext) -> LLMResponse:
         """Generate LLM response with safety and policy validation."""
@@ -259,7 +466,11 @@ class LLMService:
         if expect_json:
             kwargs["response_format"] = {"type": "json_object"}
         try:
-            response = await self.client.chat.completions.create(**kwargs)
+            response = await openai_clients.call(
+                "chat",
+                model_to_use,
+                lambda: self.client.chat.completions.create(**kwargs),
+            )
             if not response.choices:
                 return ""
             message = response.choices[0].message
@@ -295,6 +506,36 @@ class LLMService:
             )
             raise
 
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        model: Optional[str] = None,
+        max_tokens: int = 1000,
+        expect_json: bool = False,
+    ) -> AsyncIterator[str]:
+        """Yield content deltas of a streamed chat completion."""
+        model_to_use = model or settings.openai_model
+        kwargs: Dict[str, Any] = {
+            "model": model_to_use,
+            "messages": messages,
+            "max_completion_tokens": max_tokens,
+            "stream": True,
+        }
+        if expect_json:
+            kwargs["response_format"] = {"type": "json_object"}
+        stream = await openai_clients.call(
+            "chat",
+            model_to_use,
+            lambda: self.client.chat.completions.create(**kwargs),
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = getattr(chunk.choices[0].delta, "content", None)
+            if content:
+                yield content
+
     async def _call_responses_api(
         self,
         messages: List[Dict[str, Any]],
@@ -310,11 +551,19 @@ class LLMService:
             "max_output_tokens": max_tokens,
         }
         if expect_json:
-            kwargs["response_format"] = {"type": "json_object"}
+            # The Responses API takes the output format under ``text``, not ``response_format``.
+            kwargs["text"] = {"format": {"type": "json_object"}}
         try:
-            response = await self.client.responses.create(**kwargs)
+            response = await openai_clients.call(
+                "responses",
+                settings.openai_model,
+                lambda: self.client.responses.create(**kwargs),
+            )
             return self._extract_responses_content(response)
         except openai.BadRequestError as error:
+            # Only a rejected model disables the endpoint; a bad request falls back once.
+            if is_responses_unsupported(error):
+                openai_clients.mark_responses_unsupported(settings.openai_model)
             self.logger.warning(
                 "Responses API rejected request, attempting chat completions fallback",
                 model=settings.openai_model,
@@ -332,7 +581,9 @@ class LLMService:
     def _use_responses_api(self) -> bool:
         """Determine whether to call the Responses API instead of Chat Completions."""
         model_name = settings.openai_model or ""
-        use_responses = model_name.startswith(("o", "gpt-4.1", "gpt-5"))
+        use_responses = model_name.startswith(("o", "gpt-4.1", "gpt-5")) and openai_clients.responses_supported(
+            model_name
+        )
         self.logger.debug(
             "llm_responses_api_check",
             model=model_name,
@@ -448,175 +699,10 @@ class LLMService:
 
         return messages
 
-    def _extract_guideline_section(self, prompt_text: str, header: str) -> str:
-        """Extract specific guideline section from prompt text with logging."""
-
-        has_prompt = bool(prompt_text)
-        self.logger.info(
-            "guideline_extraction_started",
-            header=header,
-            has_prompt=has_prompt,
-        )
-
-        if not has_prompt:
-            self.logger.warning(
-                "guideline_prompt_missing",
-                header=header,
-            )
-            return ""
-
-        lines = prompt_text.splitlines()
-        header_upper = header.strip().upper()
-        capture = False
-        collected: List[str] = []
-
-        for line in lines:
-            stripped = line.strip()
-            if not capture:
-                if stripped.upper().startswith(header_upper):
-                    capture = True
-                    self.logger.debug(
-                        "guideline_section_detected",
-                        header=header,
-                        line=stripped,
-                    )
-                    continue
-            else:
-                if (
-                    stripped
-                    and stripped == stripped.upper()
-                    and stripped.endswith(":")
-                    and stripped.upper() != header_upper
-                ):
-                    break
-                collected.append(line.rstrip())
-
-        extracted = "\n".join(collected).strip()
-
-        self.logger.info(
-            "guideline_extraction_completed",
-            header=header,
-            length=len(extracted),
-        )
-
-        return extracted
-
     def _build_system_message(self, context: LLMContext) -> str:
-        """Build comprehensive system message with context."""
-        user = context.user
-
-        # User profile
-        knowledge_level_map = {
-            UserSegment.COLD: "новичок",
-            UserSegment.WARM: "продвинутый",
-            UserSegment.HOT: "эксперт",
-        }
-
-        knowledge_level = knowledge_level_map.get(user.segment, "не определён")
-
-        profile_info = f"""
-ПРОФИЛЬ ПОЛЬЗОВАТЕЛЯ:
-- Имя: {user.first_name or 'Не указано'} {user.last_name or ''}
-- Сегмент: {user.segment or 'не определен'} ({user.lead_score} баллов)
-- Уровень знаний: {knowledge_level}
-- Этап воронки: {user.funnel_stage}
-- Телефон: {'указан' if user.phone else 'не указан'}
-- Email: {'указан' if user.email else 'не указан'}
-"""
-        
-        # Survey summary
-        survey_info = ""
-        
-        # Available materials
-        materials_info = ""
-        if context.candidate_materials:
-            materials_info = "\nДОСТУПНЫЕ МАТЕРИАЛЫ:\n"
-            for material in context.candidate_materials[:3]:
-                materials_info += f"- {material.get('title', '')}: {material.get('url', '')}\n"
-        
-        # Relevant products
-        products_info = ""
-        if context.relevant_products:
-            products_info = "\nРЕЛЕВАНТНЫЕ ПРОГРАММЫ:\n"
-            for product in context.relevant_products[:2]:
-                products_info += f"- {product.get('name', '')}: {product.get('price', '')} руб\n"
-        
-        scenario_block = ""
-        if context.scenario_prompt:
-            scenario_block = f"\nСЦЕНАРНЫЕ УКАЗАНИЯ:\n{context.scenario_prompt}\n"
-
-        persona_block = ""
-        if self.persona_prompt:
-            persona_block = f"\nПЕРСОНАЖ И СТИЛЬ:\n{self.persona_prompt}\n"
-
-        dialogue_guidelines_block = ""
-        if self.dialog_analysis_guidelines:
-            dialogue_guidelines_block = (
-                "\nАНАЛИЗ ДИАЛОГА (из подсказки FOLLOW-UPS):\n"
-                f"{self.dialog_analysis_guidelines}\n"
-                "Следуй этим принципам, чтобы понимать ответы пользователя и реагировать по смыслу. "
-                "Если он отвечает по существу твоего вопроса (даже другими словами или синонимами), продолжай диалог в той же логике. "
-                "Если пользователь меняет тему или задает новый вопрос, переключайся на новый смысл и отвечай, опираясь на последние пять сообщений и общий контекст ниже."
-            )
-        else:
-            dialogue_guidelines_block = (
-                "\nАНАЛИЗ ДИАЛОГА:\n"
-                "Внимательно анализируй последние пять сообщений и отвечай по смыслу. "
-                "Сохраняй текущую тему, если пользователь дал релевантный ответ, и переключайся, если тема изменилась."
-            )
-
-        recent_messages_block = ""
-        if context.recent_messages:
-            formatted = []
-            for msg in context.recent_messages:
-                role = msg.get("role")
-                text = msg.get("text", "").replace("\n", " ")
-                timestamp = msg.get("timestamp") or msg.get("created_at")
-                if hasattr(timestamp, "isoformat"):
-                    timestamp = timestamp.isoformat()
-                formatted.append(f"- {role}: {text[:400]} ({timestamp})")
-            recent_messages_block = "\nПОСЛЕДНИЕ 5 СООБЩЕНИЙ:\n" + "\n".join(formatted)
-
-        qa_block = ""
-        if context.conversation_pairs:
-            pairs = []
-            for idx, pair in enumerate(context.conversation_pairs, start=1):
-                user_q = pair.get("user", "").replace("\n", " ")
-                bot_a = pair.get("bot", "").replace("\n", " ")
-                pairs.append(f"{idx}. Вопрос: {user_q[:400]}\n   Ответ: {bot_a[:400]}")
-            qa_block = "\nИСТОРИЯ Q/A:\n" + "\n".join(pairs)
-
-        active_function_block = ""
-        if context.active_function:
-            active_function_block = f"\nАКТИВНАЯ ФУНКЦИЯ БОТА: {context.active_function}"
-
-        product_focus_block = ""
-        if context.product_focus:
-            product = context.product_focus
-            product_focus_block = (
-                "\nТЕКУЩИЙ ПРОДУКТ К ПРОДАЖЕ: "
-                f"{product.get('name', 'Без названия')} — цена {product.get('price', 'N/A')}"
-                f". Описание: {product.get('description', '')[:400]}"
-            )
+        """Static prompt prefix followed by this turn's context."""
+        return self.static_prompt + build_dynamic_suffix(context)
 
-        return f"""
-{self.system_prompt}{scenario_block}{persona_block}{dialogue_guidelines_block}
-{profile_info}
-{survey_info}
-{materials_info}
-{products_info}
-{recent_messages_block}
-{qa_block}
-{active_function_block}
-{product_focus_block}
-
-ПРОДАЖНАЯ МЕТОДОЛОГИЯ: {self.sales_methodology}
-ПОЛИТИКИ БЕЗОПАСНОСТИ: {self.safety_policies}
-
-ЗАДАЧА: Твой ответ ДОЛЖЕН быть в формате JSON со следующими полями: "answer" (string), "intent" (string), "next_action" (string), "stage_transition" (string), "need_reask" (boolean), "confidence" (float).
-ПРАВИЛО Answer-First: Сначала ответь на смысл последней реплики. Не повторяй свой предыдущий вопрос, если пользователь пишет о другом.
-"""
-    
     def _escalation_response(self, issues: Optional[List[SafetyIssue]] = None) -> LLMResponse:
         """Return a safe response that escalates the dialogue to a manager."""
         escalation_text = (
@@ -671,13 +757,19 @@ class LLMService:
             if self._use_responses_api():
                 responses_input = self._build_responses_input(messages)
                 try:
-                    response = await self.client.responses.create(
-                        model=settings.openai_model,
-                        input=responses_input,
-                        max_output_tokens=500,
+                    response = await openai_clients.call(
+                        "responses",
+                        settings.openai_model,
+                        lambda: self.client.responses.create(
+                            model=settings.openai_model,
+                            input=responses_input,
+                            max_output_tokens=500,
+                        ),
                     )
                     content = self._extract_responses_content(response).strip()
                 except Exception as api_error:
+                    if isinstance(api_error, openai.BadRequestError) and is_responses_unsupported(api_error):
+                        openai_clients.mark_responses_unsupported(settings.openai_model)
                     self.logger.warning(
                         "Responses API failed while generating summary, falling back to chat completions",
                         error=str(api_error),
@@ -731,18 +823,34 @@ class LLMService:
         if not candidates:
             return False, None
 
-        prompt = self._build_validation_prompt(user_query, candidates)
-        messages = [{"role": "system", "content": prompt}]
+        # The verdict depends on the query and the candidate answers, not on their scores.
+        cache_key = llm_cache.key(
+            "script_relevance",
+            settings.judge_model,
+            VALIDATION_PROMPT_VERSION,
+            user_query,
+            json.dumps(
+                [[cand["id"], cand["message"], cand["answer"]] for cand in candidates],
+                ensure_ascii=False,
+            ),
+        )
 
         try:
-            raw_response = await self._call_chat_completion(
-                messages, model=settings.judge_model, max_tokens=200, expect_json=True
-            )
-            result = self._try_parse_json(raw_response)
+            result = await llm_cache.get("script_relevance", cache_key)
+            if result is MISS:
+                prompt = self._build_validation_prompt(user_query, candidates)
+                messages = [{"role": "system", "content": prompt}]
+                raw_response = await self._call_chat_completion(
+                    messages, model=settings.judge_model, max_tokens=200, expect_json=True
+                )
+                result = self._try_parse_json(raw_response)
+
+                if not result or not isinstance(result, dict):
+                    self.logger.warning("LLM validation returned invalid JSON.", response=raw_response)
+                    return False, None
 
-            if not result or not isinstance(result, dict):
-                self.logger.warning("LLM validation returned invalid JSON.", response=raw_response)
-                return False, None
+                result = {"is_relevant": result.get("is_relevant", False), "best_id": result.get("best_id")}
+                await llm_cache.set("script_relevance", cache_key, result)
 
             is_relevant = result.get("is_relevant", False)
             best_id = result.get("best_id")
@@ -759,14 +867,27 @@ class LLMService:
 
         return False, None
 
+    async def _stream_text(
+        self, messages: List[Dict[str, Any]], on_partial: Callable[[str], None]
+    ) -> Optional[str]:
+        """Stream a plain-text completion; None if the stream failed before any text."""
+        text = ""
+        try:
+            async for delta in self.stream_completion(messages, max_tokens=1000):
+                text += delta
+                on_partial(text)
+        except Exception as exc:
+            self.logger.warning("llm_stream_failed", error=str(exc), received=len(text))
+            if not text:
+                return None
+        return text
+
     def _build_validation_prompt(self, user_query: str, candidates: List[Dict[str, Any]]) -> str:
         """Builds the prompt for the LLM judge."""
         prompt = (
-            "You are a validation expert. Your task is to determine if any of the provided answers "
-            "are a relevant and helpful response to the user's query. "
-            "Respond in JSON format with 'is_relevant' (boolean) and 'best_id' (integer ID of the best answer if relevant).\n\n"
-            f"User Query: \"{user_query}\"\n\n"
-            "Candidate Answers:\n"
+            VALIDATION_INSTRUCTIONS
+            + f"User Query: \"{user_query}\"\n\n"
+            + "Candidate Answers:\n"
         )
         for cand in candidates:
             prompt += (
@@ -775,32 +896,38 @@ class LLMService:
                 f"  - Proposed Answer: \"{cand['answer']}\"\n"
                 f"  - Similarity Score: {cand['similarity']:.4f}\n\n"
             )
-        prompt += (
-            "Criteria for relevance:\n"
-            "1. The answer must directly address the user's intent.\n"
-            "2. The answer must be factually consistent with the user's query.\n"
-            "3. Ignore answers that are only vaguely related.\n\n"
-            "Your JSON response:"
-        )
+        prompt += VALIDATION_CRITERIA
         return prompt
 
-    async def get_response(self, text: str, user_id: int) -> str:
+    async def get_response(
+        self,
+        text: str,
+        user_id: int,
+        context: Optional[DialogContext] = None,
+        on_partial: Optional[Callable[[str], None]] = None,
+    ) -> str:
         """
         Generates a response from the LLM for a given text message and user.
         This is a simplified method for direct dialog handling.
+        With ``on_partial`` the completion is streamed and the text generated
+        so far is passed to it after every chunk.
         """
         if not self.session:
             self.logger.error("LLMService.get_response called without a session.")
             return "Не могу сейчас ответить, технические неполадки."
 
         try:
-            user_repo = UserRepository(self.session)
-            user = await user_repo.get_user_by_id(user_id)
+            if context is not None and context.user_id == user_id:
+                user = context.user
+            else:
+                context = None
+                user_repo = UserRepository(self.session)
+                user = await user_repo.get_user_by_id(user_id)
             if not user:
                 self.logger.error("User not found for LLM response.", user_id=user_id)
                 return "Произошла ошибка, пользователь не найден."
 
-            logging_service = ConversationLoggingService(self.session)
+            logging_service = ConversationLoggingService(self.session, context=context)
             history = await logging_service.get_last_messages(user_id, limit=10)
             
             # Add current user message to history for context
@@ -811,9 +938,13 @@ class LLMService:
             messages = self._build_messages(context)
             
             # We expect a simple text response here, not a JSON object
-            raw_response = await self._call_chat_completion(
-                messages, max_tokens=1000, expect_json=False
-            )
+            raw_response = None
+            if on_partial is not None:
+                raw_response = await self._stream_text(messages, on_partial)
+            if raw_response is None:
+                raw_response = await self._call_chat_completion(
+                    messages, max_tokens=1000, expect_json=False
+                )
 
             sanitized_text, _ = self.safety_validator.validate_response(raw_response)
 
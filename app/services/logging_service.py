@@ -6,21 +6,24 @@ from typing import Any, Dict, List, Optional
 
 import structlog
 from aiogram import Bot
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, User as TelegramUser
+from aiogram.types import Message, User as TelegramUser
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.db import release_connection
 from app.models import User as AppUser
+from app.services.dialog_context import DialogContext
+from app.services.dialog_mirror import MirrorJob, dialog_mirror, resolve_username
 from app.services.user_service import UserService
-from app.services.manual_dialog_service import manual_dialog_service, ManualDialogSession
 from app.services.sentiment_service import sentiment_service
 
 
 class ConversationLoggingService:
     """Helper for persisting conversation history and mirroring bot dialogues."""
 
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: AsyncSession, context: Optional[DialogContext] = None) -> None:
         self.session = session
+        self.context = context
         self._user_service = UserService(session)
         self._logger = structlog.get_logger(__name__)
         self._dialogs_channel_id = settings.dialogs_channel_id
@@ -48,12 +51,15 @@ class ConversationLoggingService:
             return False
 
         try:
-            return await self._user_service.save_message(
+            saved = await self._user_service.save_message(
                 user_id=user_id,
                 role=role,
                 text=text,
                 metadata=metadata or {},
             )
+            if saved and self.context is not None and self.context.user_id == user_id:
+                self.context.record_message(role, text, metadata)
+            return saved
         except Exception as exc:  # pragma: no cover - defensive logging
             self._logger.warning(
                 "conversation_logging_failed",
@@ -68,6 +74,8 @@ class ConversationLoggingService:
             return []
 
         try:
+            if self.context is not None and self.context.user_id == user_id:
+                return await self.context.history(limit)
             history = await self._user_service.get_conversation_history(user_id, limit=limit)
             return history or []
         except Exception as exc:  # pragma: no cover - defensive logging
@@ -89,7 +97,14 @@ class ConversationLoggingService:
         source_message: Optional[Message] = None,
         mirror: bool = True,
     ) -> bool:
-        """Persist bot-authored message and mirror it to dialogs channel."""
+        """Persist bot-authored message and mirror it to dialogs channel.
+
+        A sent message is logged once: repeated calls for the same
+        ``source_message`` (and the outbound fallback in
+        ``DialogsChannelRequestMiddleware``) are skipped.
+        """
+        if not dialog_mirror.mark_logged(source_message):
+            return False
         result = await self.log_message(
             user_id=user_id,
             role="bot",
@@ -218,6 +233,7 @@ class ConversationLoggingService:
         if parse_mode:
             send_kwargs["parse_mode"] = parse_mode
 
+        await release_connection(self.session)
         rendered: Optional[Message] = None
         if prefer_edit and self.allow_message_editing:
             try:
@@ -264,230 +280,34 @@ class ConversationLoggingService:
         manager_telegram_user: Optional[TelegramUser] = None,
         source_message: Optional[Message] = None,
     ) -> bool:
-        """Mirror message to dialogs channel if configured."""
+        """Queue the message for the dialogs channel; never waits for Telegram."""
         if not self._dialogs_channel_id or not bot:
             return False
 
-        try:
-            target_user = user or await self._user_service.repository.get_by_id(user_id)
-        except Exception as exc:  # pragma: no cover - defensive logging
-            self._logger.debug("mirror_user_lookup_failed", error=str(exc), user_id=user_id)
-            target_user = user
+        username: Optional[str] = None
+        if user is not None or telegram_user is not None:
+            username = resolve_username(user=user, telegram_user=telegram_user)
 
-        username = self._resolve_username(
-            user=target_user,
-            telegram_user=telegram_user,
-        )
+        chat_id: Optional[int] = getattr(user, "telegram_id", None) or getattr(telegram_user, "id", None)
+        if chat_id is None and sender != "manager" and source_message is not None:
+            chat_id = source_message.chat.id
 
-        session_info: Optional[ManualDialogSession] = manual_dialog_service.get_session_by_user(user_id)
-
-        manager_display: Optional[str] = None
-        if session_info:
-            manager_display = session_info.manager_display
-        elif manager_telegram_user:
-            manager_display = self._resolve_manager_username(manager_telegram_user)
-
-        header = self._build_header(sender=sender, username=username, manager_display=manager_display, manager_user=manager_telegram_user)
-        reply_markup = self._build_dialog_keyboard(user_id, session_info)
-
-        # Prioritize copying the original message to preserve formatting/media.
-        if source_message is not None:
-            mirrored = await self._mirror_original_message(
-                bot=bot,
-                source_message=source_message,
-                header=header,
-                reply_markup=reply_markup,
-                fallback_text=text or "",
-                username=username,
+        queued = dialog_mirror.submit(
+            MirrorJob(
                 sender=sender,
-            )
-            if mirrored and source_message is not None:
-                setattr(source_message, "_mirrored_to_dialogs", True)
-            return mirrored
-
-        if not text:
-            text = "[без текста]"
-
-        relay_text = f"{header}\nТекст сообщения:\n{text}"
-
-        mirrored = await self._send_text_mirror(
-            bot=bot,
-            text=relay_text,
-            reply_markup=reply_markup,
-            username=username,
-            sender=sender,
-        )
-        if mirrored and source_message is not None:
-            setattr(source_message, "_mirrored_to_dialogs", True)
-        return mirrored
-
-    @staticmethod
-    def _resolve_username(
-        *,
-        user: Optional[AppUser],
-        telegram_user: Optional[TelegramUser],
-    ) -> str:
-        """Resolve username or fallback identifier."""
-        if user and getattr(user, "username", None):
-            return f"@{user.username}"
-        if telegram_user and telegram_user.username:
-            return f"@{telegram_user.username}"
-
-        telegram_id = None
-        if user and getattr(user, "telegram_id", None):
-            telegram_id = user.telegram_id
-        elif telegram_user:
-            telegram_id = telegram_user.id
-
-        return f"ID {telegram_id}" if telegram_id else "неизвестный пользователь"
-
-    @staticmethod
-    def _resolve_manager_username(manager: Optional[TelegramUser]) -> str:
-        """Resolve username or fallback identifier for the manager."""
-        if manager and manager.username:
-            return f"@{manager.username}"
-        if manager:
-            full_name = " ".join(filter(None, [manager.first_name, manager.last_name]))
-            if full_name.strip():
-                return full_name.strip()
-            return f"ID {manager.id}"
-        return "неизвестный менеджер"
-
-    @staticmethod
-    def _build_dialog_keyboard(
-        user_id: int,
-        session_info: Optional[ManualDialogSession],
-    ) -> Optional[InlineKeyboardMarkup]:
-        """Build inline keyboard with dialog control buttons."""
-        if session_info:
-            button = InlineKeyboardButton(
-                text="Завершить диалог",
-                callback_data=f"manual_dialog:stop:{user_id}",
-            )
-        else:
-            button = InlineKeyboardButton(
-                text="Продолжить диалог",
-                callback_data=f"manual_dialog:start:{user_id}",
-            )
-
-        return InlineKeyboardMarkup(inline_keyboard=[[button]])
-
-    def _build_header(
-        self,
-        *,
-        sender: str,
-        username: str,
-        manager_display: Optional[str],
-        manager_user: Optional[TelegramUser],
-    ) -> str:
-        """Construct header text with sender and manager data."""
-        if sender == "manager":
-            manager_header = manager_display or self._resolve_manager_username(manager_user)
-            return f"Менеджер {manager_header} пишет пользователю {username}"
-
-        header = (
-            f"Бот пишет пользователю {username}"
-            if sender == "bot"
-            else f"Пользователь {username} пишет боту"
-        )
-        if manager_display:
-            header = f"{header}\nМенеджер: {manager_display}"
-        return header
-
-    async def _mirror_original_message(
-        self,
-        *,
-        bot: Bot,
-        source_message: Message,
-        header: str,
-        reply_markup: Optional[InlineKeyboardMarkup],
-        fallback_text: str,
-        username: str,
-        sender: str,
-    ) -> bool:
-        """Try to mirror the original Telegram message to the dialogs channel."""
-        try:
-            if source_message.text:
-                text_body = f"{header}\nТекст сообщения:\n{source_message.text}"
-                return await self._send_text_mirror(
-                    bot=bot,
-                    text=text_body,
-                    reply_markup=reply_markup,
-                    username=username,
-                    sender=sender,
-                )
-
-            caption = source_message.caption or ""
-            caption_block = f"{header}\n"
-            if caption.strip():
-                caption_block += f"{caption}"
-            else:
-                caption_block += f"[{source_message.content_type}]"
-
-            await bot.copy_message(
-                chat_id=self._dialogs_channel_id,
-                from_chat_id=source_message.chat.id,
-                message_id=source_message.message_id,
-                caption=caption_block,
-                reply_markup=reply_markup,
-            )
-            self._logger.debug(
-                "dialog_mirror_sent",
-                sender=sender,
-                username=username,
-                channel_id=self._dialogs_channel_id,
-                mode="copy",
-            )
-            return True
-        except Exception as exc:  # pragma: no cover - defensive logging
-            self._logger.warning(
-                "dialog_mirror_copy_failed",
-                error=str(exc),
-                username=username,
-                sender=sender,
-            )
-            # Fallback to text mirror with available data.
-            fallback = fallback_text or f"[{source_message.content_type}]"
-            return await self._send_text_mirror(
                 bot=bot,
-                text=f"{header}\nТекст сообщения:\n{fallback}",
-                reply_markup=reply_markup,
-                username=username,
-                sender=sender,
-            )
-
-    async def _send_text_mirror(
-        self,
-        *,
-        bot: Bot,
-        text: str,
-        reply_markup: Optional[InlineKeyboardMarkup],
-        username: str,
-        sender: str,
-    ) -> bool:
-        """Send textual mirror message to dialogs channel."""
-        try:
-            await bot.send_message(
-                chat_id=self._dialogs_channel_id,
                 text=text,
-                reply_markup=reply_markup,
-            )
-            self._logger.debug(
-                "dialog_mirror_sent",
-                sender=sender,
-                username=username,
-                channel_id=self._dialogs_channel_id,
-                mode="text",
-            )
-            return True
-        except Exception as exc:  # pragma: no cover - defensive logging
-            self._logger.warning(
-                "dialog_mirror_failed",
-                error=str(exc),
+                user_id=user_id,
+                chat_id=chat_id,
                 username=username,
-                sender=sender,
+                telegram_user=telegram_user,
+                manager_telegram_user=manager_telegram_user,
+                source_message=source_message,
             )
-            return False
+        )
+        if source_message is not None:
+            setattr(source_message, "_mirrored_to_dialogs", True)
+        return queued
 
 
 __all__ = ["ConversationLoggingService"]
@@ -0,0 +1,92 @@
+"""Event loop lag probe: how late a periodic sleep wakes up."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled wake-up of the loop probe and when it ran",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_LAG_MAX = Gauge(
+    "event_loop_lag_max_seconds",
+    "Largest event loop lag seen since start",
+)
+
+
+@dataclass(slots=True)
+class LagStats:
+    samples: List[float] = field(default_factory=list)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def max(self) -> float:
+        return max(self.samples, default=0.0)
+
+
+async def probe_loop_lag(interval: float, samples: int) -> LagStats:
+    """Sleep ``samples`` times for ``interval`` seconds and record each overshoot."""
+    loop = asyncio.get_running_loop()
+    stats = LagStats()
+    for _ in range(samples):
+        started = loop.time()
+        await asyncio.sleep(interval)
+        stats.samples.append(max(0.0, loop.time() - started - interval))
+    return stats
+
+
+class LoopLagMonitor:
+    """Background probe exporting ``event_loop_lag_seconds``; ``LOOP_LAG_INTERVAL=0`` disables it."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                EVENT_LOOP_LAG_MAX.set(lag)
+            if lag >= 0.5:
+                logger.warning("event_loop_lag_high", lag_seconds=round(lag, 3))
+
+
+loop_lag_monitor = LoopLagMonitor(settings.loop_lag_interval)
+
+__all__ = ["LagStats", "LoopLagMonitor", "loop_lag_monitor", "probe_loop_lag"]
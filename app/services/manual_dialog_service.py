@@ -1,11 +1,14 @@
-"""In-memory service for managing manual dialog sessions between managers and users."""
+"""Service for managing manual dialog sessions between managers and users."""
 
 from __future__ import annotations
 
-import asyncio
-from dataclasses import dataclass, field
+import json
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, Optional
+from typing import Optional
+
+from app.config import settings
+from app.services.state_backend import StateBackend, state_backend
 
 
 @dataclass
@@ -28,6 +31,19 @@ class ManualDialogSession:
             return self.manager_full_name
         return f"ID {self.manager_telegram_id}"
 
+    def to_json(self) -> str:
+        """Serialize the session for the state backend."""
+        payload = asdict(self)
+        payload["started_at"] = self.started_at.isoformat()
+        return json.dumps(payload, ensure_ascii=False, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ManualDialogSession":
+        """Restore a session stored with :meth:`to_json`."""
+        payload = json.loads(raw)
+        payload["started_at"] = datetime.fromisoformat(payload["started_at"])
+        return cls(**payload)
+
 
 class ManualDialogError(Exception):
     """Base exception for manual dialog errors."""
@@ -42,12 +58,18 @@ class ManagerBusyError(ManualDialogError):
 
 
 class ManualDialogService:
-    """Service responsible for tracking manual dialog sessions."""
+    """Service responsible for tracking manual dialog sessions.
 
-    def __init__(self) -> None:
-        self._user_sessions: Dict[int, ManualDialogSession] = {}
-        self._manager_sessions: Dict[int, ManualDialogSession] = {}
-        self._lock = asyncio.Lock()
+    Sessions are stored twice (by user and by manager) in the shared state
+    backend, so takeover and release are atomic across processes.
+    """
+
+    USER_KEY = "manual_dialog:user:{}"
+    MANAGER_KEY = "manual_dialog:manager:{}"
+
+    def __init__(self, backend: Optional[StateBackend] = None, ttl: Optional[int] = None) -> None:
+        self._backend = backend or state_backend
+        self._ttl = settings.manual_dialog_ttl if ttl is None else ttl
 
     async def activate_dialog(
         self,
@@ -59,65 +81,96 @@ class ManualDialogService:
         manager_full_name: Optional[str],
     ) -> ManualDialogSession:
         """Activate manual dialog for the given user and manager."""
-        async with self._lock:
-            existing_user_session = self._user_sessions.get(user_id)
-            if existing_user_session:
+        session = ManualDialogSession(
+            user_id=user_id,
+            user_telegram_id=user_telegram_id,
+            manager_telegram_id=manager_telegram_id,
+            manager_username=manager_username,
+            manager_full_name=manager_full_name,
+        )
+        user_key = self.USER_KEY.format(user_id)
+        manager_key = self.MANAGER_KEY.format(manager_telegram_id)
+        payload = session.to_json()
+
+        for _ in range(2):
+            conflicts = await self._backend.set_many_if_absent(
+                {user_key: payload, manager_key: payload}, ttl=self._ttl
+            )
+            if not conflicts:
+                return session
+
+            if user_key in conflicts:
+                existing_user_session = ManualDialogSession.from_json(conflicts[user_key])
                 if existing_user_session.manager_telegram_id == manager_telegram_id:
+                    await self.touch_session(existing_user_session)
                     return existing_user_session
                 raise DialogAlreadyInProgressError(existing_user_session.manager_display)
 
-            existing_manager_session = self._manager_sessions.get(manager_telegram_id)
-            if existing_manager_session and existing_manager_session.user_id != user_id:
+            existing_manager_session = ManualDialogSession.from_json(conflicts[manager_key])
+            if existing_manager_session.user_id != user_id:
                 raise ManagerBusyError(existing_manager_session.manager_display)
 
-            session = ManualDialogSession(
-                user_id=user_id,
-                user_telegram_id=user_telegram_id,
-                manager_telegram_id=manager_telegram_id,
-                manager_username=manager_username,
-                manager_full_name=manager_full_name,
-            )
-            self._user_sessions[user_id] = session
-            self._manager_sessions[manager_telegram_id] = session
-            return session
+            # Half-expired pair pointing at the same user: drop it and claim again.
+            await self._backend.delete_many_if_equal({manager_key: conflicts[manager_key]})
+
+        raise ManagerBusyError(session.manager_display)
+
+    async def _release(self, raw: Optional[str]) -> Optional[ManualDialogSession]:
+        if raw is None:
+            return None
+        session = ManualDialogSession.from_json(raw)
+        deleted = await self._backend.delete_many_if_equal(
+            {
+                self.USER_KEY.format(session.user_id): raw,
+                self.MANAGER_KEY.format(session.manager_telegram_id): raw,
+            }
+        )
+        return session if deleted else None
 
     async def deactivate_dialog_by_user(self, user_id: int) -> Optional[ManualDialogSession]:
         """Deactivate manual dialog for the specified user."""
-        async with self._lock:
-            session = self._user_sessions.pop(user_id, None)
-            if session:
-                self._manager_sessions.pop(session.manager_telegram_id, None)
-            return session
+        return await self._release(await self._backend.get(self.USER_KEY.format(user_id)))
 
     async def deactivate_dialog_by_manager(self, manager_telegram_id: int) -> Optional[ManualDialogSession]:
         """Deactivate manual dialog handled by the specified manager."""
-        async with self._lock:
-            session = self._manager_sessions.pop(manager_telegram_id, None)
-            if session:
-                self._user_sessions.pop(session.user_id, None)
-            return session
-
-    def get_session_by_user(self, user_id: int) -> Optional[ManualDialogSession]:
+        return await self._release(
+            await self._backend.get(self.MANAGER_KEY.format(manager_telegram_id))
+        )
+
+    async def touch_session(self, session: ManualDialogSession) -> None:
+        """Extend the TTL of an active session."""
+        if not self._ttl:
+            return
+        await self._backend.expire(
+            self._ttl,
+            self.USER_KEY.format(session.user_id),
+            self.MANAGER_KEY.format(session.manager_telegram_id),
+        )
+
+    async def get_session_by_user(self, user_id: int) -> Optional[ManualDialogSession]:
         """Return manual dialog session for the user if active."""
-        return self._user_sessions.get(user_id)
+        raw = await self._backend.get(self.USER_KEY.format(user_id))
+        return ManualDialogSession.from_json(raw) if raw else None
 
-    def get_session_by_manager(self, manager_telegram_id: int) -> Optional[ManualDialogSession]:
+    async def get_session_by_manager(self, manager_telegram_id: int) -> Optional[ManualDialogSession]:
         """Return manual dialog session handled by the manager if active."""
-        return self._manager_sessions.get(manager_telegram_id)
+        raw = await self._backend.get(self.MANAGER_KEY.format(manager_telegram_id))
+        return ManualDialogSession.from_json(raw) if raw else None
 
-    def is_user_in_manual_mode(self, user_id: int) -> bool:
+    async def is_user_in_manual_mode(self, user_id: int) -> bool:
         """Check whether the user dialog is in manual mode."""
-        return user_id in self._user_sessions
+        return await self.get_session_by_user(user_id) is not None
 
-    def is_manager_busy(self, manager_telegram_id: int) -> bool:
+    async def is_manager_busy(self, manager_telegram_id: int) -> bool:
         """Check whether the manager already handles a dialog."""
-        return manager_telegram_id in self._manager_sessions
+        return await self.get_session_by_manager(manager_telegram_id) is not None
 
 
 manual_dialog_service = ManualDialogService()
 
 __all__ = [
     "manual_dialog_service",
+    "ManualDialogService",
     "ManualDialogSession",
     "ManualDialogError",
     "DialogAlreadyInProgressError",
@@ -9,6 +9,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
+from ..middlewares.outbound_rate_limit import OutboundRateLimitMiddleware
 from ..models import Lead, User, LeadStatus
 from ..utils.callbacks import Callbacks
 from .sales_script_service import SalesScriptService
@@ -21,6 +22,7 @@ class NotificationService:
 
     def __init__(self):
         self.bot = Bot(token=settings.telegram_bot_token)
+        self.bot.session.middleware(OutboundRateLimitMiddleware())
 
     async def send_lead_reminder(self, manager_id: int, leads: List[Tuple]):
         """Send daily lead reminder to manager."""
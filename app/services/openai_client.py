@@ -0,0 +1,222 @@
+"""Process-wide OpenAI client with pooled HTTP, circuit breakers and capability caching."""
+
+from __future__ import annotations
+
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+import structlog
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+
+T = TypeVar("T")
+
+OPENAI_REQUESTS = Counter(
+    "openai_requests_total",
+    "OpenAI API calls by endpoint and outcome",
+    ["endpoint", "outcome"],
+)
+OPENAI_CIRCUIT_OPEN = Gauge(
+    "openai_circuit_open",
+    "1 while the circuit breaker for an endpoint/model is open",
+    ["key"],
+)
+
+# Failures that say the endpoint is unhealthy; request errors (400/401/404) do not.
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+RESPONSES_UNSUPPORTED_TTL = 6 * 3600
+# Rejections that mean the model cannot be used with the Responses API at all.
+RESPONSES_UNSUPPORTED_CODES = frozenset({"model_not_found", "unsupported_model", "model_not_supported"})
+
+
+def is_responses_unsupported(error: openai.BadRequestError) -> bool:
+    """True if ``error`` rejects the model or endpoint rather than the shape of one request."""
+    return error.code in RESPONSES_UNSUPPORTED_CODES or error.param == "model"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, key: str, retry_in: float) -> None:
+        super().__init__(f"OpenAI circuit open for {key}, retry in {retry_in:.1f}s")
+        self.key = key
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: open after N failures, one probe after the cooldown."""
+
+    def __init__(
+        self,
+        key: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.key = key
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self._opened_at is None:
+            return
+        elapsed = self._clock() - self._opened_at
+        if elapsed < self.reset_timeout or self._probing:
+            raise CircuitOpenError(self.key, max(0.0, self.reset_timeout - elapsed))
+        self._probing = True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            OPENAI_CIRCUIT_OPEN.labels(key=self.key).set(0)
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                structlog.get_logger(__name__).warning(
+                    "openai_circuit_opened", key=self.key, failures=self._failures
+                )
+            self._opened_at = self._clock()
+            OPENAI_CIRCUIT_OPEN.labels(key=self.key).set(1)
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Let another call probe after one ended without a verdict (e.g. cancelled)."""
+        self._probing = False
+
+
+class OpenAIClientFactory:
+    """Owns the shared AsyncOpenAI client and per-endpoint state.
+
+    The SDK's own retry loop (exponential backoff honoring Retry-After) is the
+    single retry policy; breakers only see the outcome after those retries.
+    """
+
+    def __init__(self) -> None:
+        self._client: Optional[AsyncOpenAI] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._responses_unsupported: Dict[str, float] = {}
+        self._logger = structlog.get_logger(__name__)
+
+    def get_client(self) -> Optional[AsyncOpenAI]:
+        """Return the shared client, or None when no API key is configured."""
+        if self._client is None:
+            if not settings.openai_api_key:
+                return None
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.openai_max_connections,
+                    max_keepalive_connections=settings.openai_max_keepalive,
+                    keepalive_expiry=30.0,
+                ),
+                timeout=httpx.Timeout(settings.openai_timeout, connect=5.0),
+            )
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=http_client,
+                max_retries=settings.openai_max_retries,
+            )
+            self._logger.info(
+                "openai_client_created",
+                max_connections=settings.openai_max_connections,
+                max_retries=settings.openai_max_retries,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                key,
+                failure_threshold=settings.openai_breaker_failures,
+                reset_timeout=settings.openai_breaker_reset,
+            )
+            self._breakers[key] = breaker
+        return breaker
+
+    async def call(self, endpoint: str, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        """Run ``request`` behind the breaker for ``endpoint:model`` and record the outcome."""
+        breaker = self.breaker(f"{endpoint}:{model}")
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            OPENAI_REQUESTS.labels(endpoint=endpoint, outcome="circuit_open").inc()
+            raise
+        try:
+            result = await request()
+        except TRANSIENT_ERRORS:
+            breaker.record_failure()
+            OPENAI_REQUESTS.labels(endpoint=endpoint, outcome="unavailable").inc()
+            raise
+        except openai.APIStatusError:
+            # The endpoint answered; the request itself was rejected.
+            breaker.record_success()
+            OPENAI_REQUESTS.labels(endpoint=endpoint, outcome="rejected").inc()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        OPENAI_REQUESTS.labels(endpoint=endpoint, outcome="ok").inc()
+        return result
+
+    def responses_supported(self, model: str) -> bool:
+        """False while the Responses API is known to reject ``model``."""
+        until = self._responses_unsupported.get(model)
+        if until is None:
+            return True
+        if time.monotonic() >= until:
+            del self._responses_unsupported[model]
+            return True
+        return False
+
+    def mark_responses_unsupported(self, model: str) -> None:
+        """Remember that the Responses API rejected ``model`` so later calls go straight to chat."""
+        if model not in self._responses_unsupported:
+            self._logger.info("openai_responses_api_disabled_for_model", model=model)
+        self._responses_unsupported[model] = time.monotonic() + RESPONSES_UNSUPPORTED_TTL
+
+
+openai_clients = OpenAIClientFactory()
+
+
+def get_openai_client() -> Optional[AsyncOpenAI]:
+    """Shortcut for the shared client."""
+    return openai_clients.get_client()
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "OpenAIClientFactory",
+    "get_openai_client",
+    "is_responses_unsupported",
+    "openai_clients",
+]
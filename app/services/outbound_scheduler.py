@@ -0,0 +1,279 @@
+"""Process-wide pacing of outbound Telegram Bot API traffic."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar, Union
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+
+ChatId = Union[int, str, None]
+T = TypeVar("T")
+
+OUTBOUND_REQUESTS = Counter(
+    "telegram_outbound_requests_total",
+    "Outbound Bot API messages admitted by the scheduler",
+    ["priority"],
+)
+OUTBOUND_WAIT = Histogram(
+    "telegram_outbound_wait_seconds",
+    "Time a send waited for a rate-limit permit",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+OUTBOUND_RETRY_AFTER = Counter(
+    "telegram_outbound_retry_after_total",
+    "RetryAfter responses received from Telegram",
+)
+
+
+class OutboundPriority(IntEnum):
+    """Lower value is served first."""
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_current_priority: ContextVar[OutboundPriority] = ContextVar(
+    "outbound_priority", default=OutboundPriority.INTERACTIVE
+)
+
+
+@contextmanager
+def outbound_priority(priority: OutboundPriority) -> Iterator[None]:
+    """Mark every Bot API call made inside the block with ``priority``."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> OutboundPriority:
+    """Return the priority of the running context."""
+    return _current_priority.get()
+
+
+def bulk_outbound(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Decorate a coroutine whose sends are bulk traffic (mailings, broadcasts)."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        with outbound_priority(OutboundPriority.BULK):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+@dataclass(slots=True)
+class _Bucket:
+    """Token bucket; tokens may go negative so oversized sends are paid back later."""
+
+    rate: float
+    capacity: float
+    tokens: float
+    updated_at: float
+    paused_until: float = 0.0
+
+    def refill(self, now: float) -> None:
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float, cost: float) -> float:
+        self.refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        needed = min(cost, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def is_idle(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+@dataclass(slots=True, eq=False)
+class _Waiter:
+    priority: OutboundPriority
+    seq: int
+    chat_id: ChatId
+    cost: float
+
+
+class OutboundScheduler:
+    """Global token bucket plus per-chat and per-group buckets.
+
+    Callers ``await acquire(chat_id)`` before each Bot API send. Among waiters
+    whose chat is allowed to send, interactive traffic is served before bulk
+    traffic and FIFO otherwise. ``pause`` applies a RetryAfter to the chat and
+    holds back all bulk traffic for the same period.
+    """
+
+    MIN_POLL = 0.005
+    SWEEP_EVERY = 1000
+
+    def __init__(
+        self,
+        rate: float = 30.0,
+        burst: Optional[float] = None,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        group_burst: float = 20.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        capacity = burst if burst is not None else rate
+        self._global = _Bucket(rate=rate, capacity=capacity, tokens=capacity, updated_at=clock())
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._group_rate = group_rate
+        self._group_burst = group_burst
+        self._chats: Dict[ChatId, _Bucket] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._bulk_paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._grants = 0
+        self.logger = structlog.get_logger(__name__)
+
+    @staticmethod
+    def is_group(chat_id: ChatId) -> bool:
+        """Groups, supergroups and channels have negative ids or @usernames."""
+        if isinstance(chat_id, str):
+            return not chat_id.lstrip("-").isdigit() or chat_id.startswith("-")
+        return chat_id is not None and chat_id < 0
+
+    def _chat_bucket(self, chat_id: ChatId, now: float) -> Optional[_Bucket]:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if self.is_group(chat_id):
+                rate, capacity = self._group_rate, self._group_burst
+            else:
+                rate, capacity = self._chat_rate, self._chat_burst
+            bucket = _Bucket(rate=rate, capacity=capacity, tokens=capacity, updated_at=now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _own_delay(self, waiter: _Waiter, now: float) -> float:
+        delay = 0.0
+        if waiter.priority >= OutboundPriority.BULK and now < self._bulk_paused_until:
+            delay = self._bulk_paused_until - now
+        bucket = self._chat_bucket(waiter.chat_id, now)
+        if bucket is not None:
+            delay = max(delay, bucket.wait_time(now, waiter.cost))
+        return delay
+
+    def _try_grant(self, waiter: _Waiter) -> float:
+        now = self._clock()
+        delay = self._own_delay(waiter, now)
+        if delay > 0:
+            return delay
+
+        rank = (waiter.priority, waiter.seq)
+        for other in self._waiters:
+            if other is waiter or (other.priority, other.seq) > rank:
+                continue
+            if self._own_delay(other, now) <= 0:
+                # Someone ahead of us could send now; let them go first.
+                return max(self._global.wait_time(now, other.cost), self.MIN_POLL)
+
+        delay = self._global.wait_time(now, waiter.cost)
+        if delay > 0:
+            return delay
+
+        self._global.tokens -= waiter.cost
+        bucket = self._chat_bucket(waiter.chat_id, now)
+        if bucket is not None:
+            bucket.tokens -= waiter.cost
+        self._grants += 1
+        if self._grants % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        idle = [chat_id for chat_id, bucket in self._chats.items() if bucket.is_idle(now)]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def _wait(self, delay: float) -> None:
+        event = self._wakeup
+        try:
+            await asyncio.wait_for(event.wait(), timeout=max(delay, self.MIN_POLL))
+        except asyncio.TimeoutError:
+            pass
+
+    async def acquire(
+        self,
+        chat_id: ChatId = None,
+        cost: float = 1.0,
+        priority: Optional[OutboundPriority] = None,
+    ) -> float:
+        """Wait until a message to ``chat_id`` may be sent; return the time waited."""
+        if priority is None:
+            priority = current_priority()
+        waiter = _Waiter(priority=priority, seq=next(self._seq), chat_id=chat_id, cost=cost)
+        started = self._clock()
+        self._waiters.append(waiter)
+        try:
+            while True:
+                delay = self._try_grant(waiter)
+                if delay <= 0:
+                    break
+                await self._wait(delay)
+        finally:
+            self._waiters.remove(waiter)
+            self._notify()
+
+        waited = self._clock() - started
+        label = priority.name.lower()
+        OUTBOUND_REQUESTS.labels(priority=label).inc()
+        OUTBOUND_WAIT.labels(priority=label).observe(waited)
+        return waited
+
+    def pause(self, seconds: float, chat_id: ChatId = None) -> None:
+        """Honor a Telegram RetryAfter for ``chat_id`` and hold back bulk traffic."""
+        OUTBOUND_RETRY_AFTER.inc()
+        now = self._clock()
+        until = now + max(0.0, seconds)
+        bucket = self._chat_bucket(chat_id, now)
+        if bucket is not None:
+            bucket.paused_until = max(bucket.paused_until, until)
+        self._bulk_paused_until = max(self._bulk_paused_until, until)
+        self.logger.warning("telegram_retry_after", chat_id=chat_id, retry_after=seconds)
+
+
+outbound_scheduler = OutboundScheduler(
+    rate=settings.outbound_rate,
+    chat_rate=settings.outbound_chat_rate,
+    chat_burst=settings.outbound_chat_burst,
+    group_rate=settings.outbound_group_per_minute / 60,
+    group_burst=settings.outbound_group_burst,
+)
+
+__all__ = [
+    "OutboundPriority",
+    "OutboundScheduler",
+    "bulk_outbound",
+    "current_priority",
+    "outbound_priority",
+    "outbound_scheduler",
+]
@@ -0,0 +1,242 @@
+"""Monthly range partitions of the high-volume append-only tables.
+
+The partitioning migration turns each table in ``PARTITIONED_TABLES`` into
+a parent partitioned by its timestamp column. Everything written before the
+migration lives in one ``<table>_legacy`` partition, and each later month
+gets its own ``<table>_pYYYYMM`` partition. ``PartitionMaintenance`` keeps
+``PARTITION_PREMAKE_MONTHS`` future months created so inserts never miss a
+range. It also retires partitions that end before the retention window: they
+are detached into ``PARTITION_ARCHIVE_SCHEMA`` for export, or dropped.
+
+``user_message_scores`` is not partitioned. Its unique constraints would
+have to include the timestamp, and reconcile rebuilds counters from the full
+score history. Tables that are not partitioned, such as those built by
+``Base.metadata.create_all``, are skipped.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import structlog
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+PARTITIONED_TABLES: Dict[str, str] = {
+    "events": "created_at",
+    "messages": "created_at",
+    "ab_events": "occurred_at",
+    "product_match_log": "matched_at",
+}
+RETENTION_MODES = ("archive", "drop")
+# pg advisory lock key; keeps two processes from creating the same partition.
+PARTITION_LOCK_KEY = 0x70617274
+
+_quote = postgresql.dialect().identifier_preparer.quote
+
+_PARTITIONED_PARENTS_SQL = text(
+    """
+    SELECT c.relname
+    FROM pg_class c
+    WHERE c.relkind = 'p'
+      AND c.relnamespace = CAST(current_schema() AS regnamespace)
+      AND c.relname IN :tables
+    """
+).bindparams(bindparam("tables", expanding=True))
+
+# Upper bound of each range partition; NULL for MAXVALUE.
+_PARTITIONS_SQL = text(
+    r"""
+    SELECT parent.relname AS parent,
+           child.relname AS name,
+           CAST(
+               (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'TO \(''([^'']+)''\)'))[1]
+               AS timestamptz
+           ) AS upper
+    FROM pg_inherits i
+    JOIN pg_class parent ON parent.oid = i.inhparent
+    JOIN pg_class child ON child.oid = i.inhrelid
+    WHERE parent.relnamespace = CAST(current_schema() AS regnamespace)
+      AND parent.relname IN :tables
+    """
+).bindparams(bindparam("tables", expanding=True))
+
+
+@dataclass(frozen=True, slots=True)
+class Partition:
+    table: str
+    name: str
+    upper: Optional[datetime]
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the UTC month containing ``value``."""
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def missing_months(
+    partitions: Iterable[Partition], now: datetime, premake_months: int
+) -> List[datetime]:
+    """Months (as range starts) to create so ``premake_months`` ahead are covered.
+
+    New partitions continue from the highest existing upper bound, so a gap
+    left by a missed run is filled before inserts reach it.
+    """
+    partitions = list(partitions)
+    if any(partition.upper is None for partition in partitions):
+        # An open-ended partition already takes every future row.
+        return []
+    uppers = [partition.upper for partition in partitions]
+    horizon = add_months(month_start(now), max(0, premake_months) + 1)
+    start = month_start(max(uppers)) if uppers else month_start(now)
+    months = []
+    while start < horizon:
+        months.append(start)
+        start = add_months(start, 1)
+    return months
+
+
+def expired_partitions(
+    partitions: Iterable[Partition], now: datetime, retention_months: int
+) -> List[Partition]:
+    """Partitions that end at or before the retention cutoff, oldest first."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -retention_months)
+    expired = [
+        partition
+        for partition in partitions
+        if partition.upper is not None and partition.upper <= cutoff
+    ]
+    return sorted(expired, key=lambda partition: partition.upper)
+
+
+class PartitionMaintenance:
+    """Creates upcoming monthly partitions and retires expired ones.
+
+    The caller owns the transaction. Partition DDL and the advisory lock
+    commit or roll back together.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        *,
+        premake_months: Optional[int] = None,
+        retention_months: Optional[int] = None,
+        retention_mode: Optional[str] = None,
+        archive_schema: Optional[str] = None,
+    ):
+        self.session = session
+        self.premake_months = (
+            settings.partition_premake_months if premake_months is None else premake_months
+        )
+        self.retention_months = (
+            settings.partition_retention_months if retention_months is None else retention_months
+        )
+        mode = retention_mode or settings.partition_retention_mode
+        if mode not in RETENTION_MODES:
+            logger.warning("unknown_partition_retention_mode", mode=mode, fallback="archive")
+            mode = "archive"
+        self.retention_mode = mode
+        self.archive_schema = archive_schema or settings.partition_archive_schema
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, List[str]]]:
+        """Maintain every partitioned table and return created/retired partition names."""
+        acquired = await self.session.scalar(
+            select(func.pg_try_advisory_xact_lock(PARTITION_LOCK_KEY))
+        )
+        if not acquired:
+            logger.info("partition_maintenance_already_running")
+            return {}
+
+        now = now or datetime.now(timezone.utc)
+        tables = list(PARTITIONED_TABLES)
+        parents = set(
+            (await self.session.execute(_PARTITIONED_PARENTS_SQL, {"tables": tables})).scalars()
+        )
+        partitions: Dict[str, List[Partition]] = {table: [] for table in parents}
+        for row in await self.session.execute(_PARTITIONS_SQL, {"tables": tables}):
+            if row.parent in partitions:
+                partitions[row.parent].append(Partition(row.parent, row.name, row.upper))
+
+        report: Dict[str, Dict[str, List[str]]] = {}
+        for table in sorted(parents):
+            created = await self._create(table, missing_months(partitions[table], now, self.premake_months))
+            retired = await self._retire(
+                table, expired_partitions(partitions[table], now, self.retention_months)
+            )
+            report[table] = {"created": created, "retired": retired}
+            if created or retired:
+                logger.info(
+                    "partitions_maintained",
+                    table=table,
+                    created=created,
+                    retired=retired,
+                    mode=self.retention_mode,
+                )
+        return report
+
+    async def _create(self, table: str, months: List[datetime]) -> List[str]:
+        created = []
+        for month in months:
+            name = partition_name(table, month)
+            await self.session.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {_quote(name)} PARTITION OF {_quote(table)} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                )
+            )
+            created.append(name)
+        return created
+
+    async def _retire(self, table: str, expired: List[Partition]) -> List[str]:
+        if not expired:
+            return []
+        if self.retention_mode == "archive":
+            await self.session.execute(
+                text(f"CREATE SCHEMA IF NOT EXISTS {_quote(self.archive_schema)}")
+            )
+        retired = []
+        for partition in expired:
+            name = _quote(partition.name)
+            if self.retention_mode == "drop":
+                await self.session.execute(text(f"DROP TABLE {name}"))
+            else:
+                await self.session.execute(
+                    text(f"ALTER TABLE {_quote(table)} DETACH PARTITION {name}")
+                )
+                await self.session.execute(
+                    text(f"ALTER TABLE {name} SET SCHEMA {_quote(self.archive_schema)}")
+                )
+            retired.append(partition.name)
+        return retired
+
+
+__all__ = [
+    "PARTITIONED_TABLES",
+    "Partition",
+    "PartitionMaintenance",
+    "add_months",
+    "expired_partitions",
+    "missing_months",
+    "month_start",
+    "partition_name",
+]
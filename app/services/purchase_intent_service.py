@@ -10,6 +10,8 @@ import structlog
 from openai import AsyncOpenAI
 
 from app.config import settings
+from app.services.llm_cache import MISS, llm_cache, prompt_version
+from app.services.openai_client import get_openai_client, openai_clients
 
 
 class PurchaseIntentService:
@@ -61,11 +63,17 @@ class PurchaseIntentService:
         "Answer strictly in JSON with a single boolean field 'purchase_intent'."
     )
 
+    USER_TEMPLATE = (
+        "Message: {text}\n"
+        "Recent context: {context}\n"
+        "Respond with JSON like {{\"purchase_intent\": true or false}}."
+    )
+    MODEL = "gpt-3.5-turbo"
+    PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, USER_TEMPLATE)
+
     def __init__(self) -> None:
         self.logger = structlog.get_logger(__name__)
-        self._client: Optional[AsyncOpenAI] = None
-        if settings.openai_api_key:
-            self._client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self._client: Optional[AsyncOpenAI] = get_openai_client()
 
     def _match_keywords(self, text: str) -> bool:
         """Check quick keyword heuristics."""
@@ -79,24 +87,30 @@ class PurchaseIntentService:
         if not self._client:
             return False
 
+        # Repeated messages with the same context are answered from the cache.
+        cache_key = llm_cache.key("purchase_intent", self.MODEL, self.PROMPT_VERSION, text, context)
+        cached = await llm_cache.get("purchase_intent", cache_key)
+        if cached is not MISS:
+            return bool(cached)
+
         messages = [
             {"role": "system", "content": self.SYSTEM_PROMPT},
             {
                 "role": "user",
-                "content": (
-                    f"Message: {text}\n"
-                    f"Recent context: {context or '—'}\n"
-                    "Respond with JSON like {\"purchase_intent\": true or false}."
-                ),
+                "content": self.USER_TEMPLATE.format(text=text, context=context or "—"),
             },
         ]
 
         try:
-            response = await self._client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=50,
-                response_format={"type": "json_object"},
+            response = await openai_clients.call(
+                "chat",
+                self.MODEL,
+                lambda: self._client.chat.completions.create(
+                    model=self.MODEL,
+                    messages=messages,
+                    max_tokens=50,
+                    response_format={"type": "json_object"},
+                ),
             )
         except Exception as exc:  # pragma: no cover - network path
             self.logger.warning("purchase_intent_llm_failed", error=str(exc))
@@ -112,7 +126,9 @@ class PurchaseIntentService:
             self.logger.debug("purchase_intent_json_parse_failed", raw=content)
             return False
 
-        return bool(data.get("purchase_intent"))
+        result = bool(data.get("purchase_intent"))
+        await llm_cache.set("purchase_intent", cache_key, result)
+        return result
 
     async def has_purchase_intent(self, text: str, *, context: Optional[str] = None) -> bool:
         """Return True when the message implies purchase intent."""
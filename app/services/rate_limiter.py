@@ -0,0 +1,209 @@
+"""GCRA rate limiting with one stored timestamp per key."""
+
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+
+from app.config import settings
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    """``requests`` per ``period`` seconds, with up to ``burst`` back to back."""
+
+    requests: int
+    period: float
+    burst: Optional[int] = None
+    emission_interval: float = field(init=False, repr=False, compare=False)
+    tolerance: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        interval = self.period / max(1, self.requests)
+        burst = self.burst if self.burst is not None else self.requests
+        object.__setattr__(self, "emission_interval", interval)
+        object.__setattr__(self, "tolerance", interval * (max(1, burst) - 1))
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+ALLOWED = RateLimitResult(True)
+
+
+def gcra(tat: Optional[float], now: float, limit: RateLimit) -> Tuple[bool, float, float]:
+    """One GCRA step: return ``(allowed, new_tat, retry_after)``.
+
+    ``tat`` is the theoretical arrival time of the next request; a request is
+    allowed while it is no more than ``tolerance`` ahead of ``now``.
+    """
+    if tat is None or tat < now:
+        tat = now
+    ahead = tat - now
+    if ahead > limit.tolerance:
+        return False, tat, ahead - limit.tolerance
+    return True, tat + limit.emission_interval, 0.0
+
+
+class RateLimiter(ABC):
+    """Backend contract: decide and record a hit atomically."""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        """Count one request for ``key`` and say whether it is allowed."""
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Process-local limiter holding at most ``max_keys`` timestamps.
+
+    Keys are kept in LRU order and the least recently allowed key is evicted
+    past ``max_keys``. That key's TAT is usually already in the past, which
+    means it carried no state; otherwise it may burst again early.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic) -> None:
+        self.max_keys = max(1, max_keys)
+        self._clock = clock
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        # Evicted keys that still had a TAT ahead of the clock.
+        self.live_evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        return self.hit_nowait(key, limit)
+
+    def hit_nowait(self, key: str, limit: RateLimit) -> RateLimitResult:
+        now = self._clock()
+        tats = self._tats
+        allowed, tat, retry_after = gcra(tats.get(key), now, limit)
+        if not allowed:
+            return RateLimitResult(False, retry_after)
+
+        if key in tats:
+            tats.move_to_end(key)
+        tats[key] = tat
+        if len(tats) > self.max_keys:
+            self._evict(now)
+        return ALLOWED
+
+    def _evict(self, now: float) -> None:
+        while len(self._tats) > self.max_keys:
+            _, tat = self._tats.popitem(last=False)
+            if tat > now:
+                self.live_evictions += 1
+
+
+_GCRA_LUA = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+local ahead = tat - now
+if ahead > tolerance then
+    return tostring(ahead - tolerance)
+end
+tat = tat + interval
+redis.call('SET', KEYS[1], string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000) + 1)
+return '0'
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Shared limiter: one key per subject holding its TAT in microseconds of Redis time."""
+
+    def __init__(self, prefix: str = "ratelimit") -> None:
+        self.prefix = prefix
+        self._script: Any = None
+        self._script_client: Any = None
+
+    def _gcra_script(self):
+        client = redis_service.get_client()
+        if client is None:
+            raise RuntimeError("Redis is not initialized; cannot use redis rate limiter")
+        if client is not self._script_client:
+            self._script = client.register_script(_GCRA_LUA)
+            self._script_client = client
+        return self._script
+
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        script = self._gcra_script()
+        retry_after_us = float(
+            await script(
+                keys=[f"{self.prefix}:{key}"],
+                args=[
+                    int(limit.emission_interval * 1_000_000),
+                    int(limit.tolerance * 1_000_000),
+                ],
+            )
+        )
+        if retry_after_us > 0:
+            return RateLimitResult(False, retry_after_us / 1_000_000)
+        return ALLOWED
+
+
+def parse_profiles(raw: str) -> Dict[str, RateLimit]:
+    """Parse ``"callback=10/10,voice=3/60:1"`` into named limits (requests/period[:burst])."""
+    profiles: Dict[str, RateLimit] = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        try:
+            name, spec = item.split("=", 1)
+            spec, _, burst = spec.partition(":")
+            requests, period = spec.split("/", 1)
+            profiles[name.strip()] = RateLimit(
+                int(requests), float(period), int(burst) if burst else None
+            )
+        except ValueError:
+            logger.warning("rate_limit_profile_invalid", profile=item)
+    return profiles
+
+
+def default_profiles() -> Dict[str, RateLimit]:
+    """Per-route limits: ``message`` keeps RATE_LIMIT_REQUESTS/RATE_LIMIT_WINDOW."""
+    base = RateLimit(settings.rate_limit_requests, settings.rate_limit_window)
+    profiles = {
+        "message": base,
+        "callback": RateLimit(base.requests * 2, base.period),
+        # Voice goes through speech-to-text before the LLM; keep it tighter.
+        "voice": RateLimit(max(1, base.requests // 2), base.period),
+    }
+    profiles.update(parse_profiles(settings.rate_limit_profiles))
+    return profiles
+
+
+def build_rate_limiter(kind: str) -> RateLimiter:
+    """Create the backend configured by ``RATE_LIMIT_BACKEND``."""
+    if kind == "redis":
+        return RedisRateLimiter()
+    if kind != "memory":
+        logger.warning("unknown_rate_limit_backend", backend=kind, fallback="memory")
+    return MemoryRateLimiter(max_keys=settings.rate_limit_max_keys)
+
+
+__all__ = [
+    "MemoryRateLimiter",
+    "RateLimit",
+    "RateLimitResult",
+    "RateLimiter",
+    "RedisRateLimiter",
+    "build_rate_limiter",
+    "default_profiles",
+    "gcra",
+    "parse_profiles",
+]
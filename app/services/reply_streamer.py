@@ -0,0 +1,247 @@
+"""Progressive delivery of LLM replies to a Telegram chat.
+
+``ReplyStreamer`` sends the first words of a reply as soon as the model
+produces them and then edits that one message while the rest arrives.
+Updates are coalesced: at most one Bot API call is in flight and edits are
+spaced by ``LLM_STREAM_EDIT_INTERVAL`` (the outbound scheduler enforces the
+per-chat limit on top), so a fast model never floods the chat.
+
+Every version passes the safety validator before it is shown. Once a
+high-severity issue appears nothing more is shown until ``finish`` puts the
+final, sanitized text in place.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from typing import Callable, List, Optional
+
+import structlog
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+from app.safety.validator import SafetyValidator
+from app.services.dialog_mirror import dialog_mirror
+
+logger = structlog.get_logger(__name__)
+
+REPLY_FIRST_VISIBLE = Histogram(
+    "llm_reply_first_visible_seconds",
+    "Time from starting a reply to its first text being visible to the user",
+    ["mode"],
+    buckets=(0.25, 0.5, 1, 1.5, 2, 3, 5, 7.5, 10, 15, 30),
+)
+REPLY_STREAM_EDITS = Counter(
+    "llm_reply_stream_edits_total",
+    "Progressive edits of streamed replies",
+)
+REPLY_STREAM_HALTED = Counter(
+    "llm_reply_stream_halted_total",
+    "Streamed replies whose progressive display was stopped by the safety check",
+)
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringField:
+    """Incrementally decode one string field of a JSON object arriving in chunks."""
+
+    def __init__(self, name: str) -> None:
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self._chars: List[str] = []
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> str:
+        """Add ``chunk`` and return the field value decoded so far."""
+        if self.done:
+            return self.text
+        self._buffer += chunk
+        if self._pos is None:
+            match = self._pattern.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                self._chars.append(char)
+                pos += 1
+                continue
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape != "u":
+                self._chars.append(_JSON_ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+            # \uXXXX, possibly the first half of a surrogate pair.
+            if pos + 6 > len(buffer):
+                break
+            code = int(buffer[pos + 2 : pos + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if pos + 12 > len(buffer):
+                    break
+                low = int(buffer[pos + 8 : pos + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                pos += 6
+            self._chars.append(chr(code))
+            pos += 6
+        self._pos = pos
+        return self.text
+
+
+class ReplyStreamer:
+    """Show a reply in one chat while it is being generated."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        *,
+        validator: Optional[SafetyValidator] = None,
+        min_interval: Optional[float] = None,
+        min_chars: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.validator = validator or SafetyValidator()
+        self.min_interval = settings.llm_stream_edit_interval if min_interval is None else min_interval
+        self.min_chars = settings.llm_stream_min_chars if min_chars is None else min_chars
+        self.message: Optional[Message] = None
+        self.halted = False
+        self._clock = clock
+        self._started = clock()
+        self._latest = ""
+        self._shown = ""
+        self._last_update = 0.0
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def update(self, text: str) -> None:
+        """Offer the reply generated so far; never waits for Telegram."""
+        if self.halted or self._finished.is_set():
+            return
+        self._latest = text
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump(), name=f"reply-stream-{self.chat_id}")
+
+    async def finish(self, text: str) -> Optional[Message]:
+        """Stop progressive updates and put the final ``text`` in place.
+
+        Returns the message holding the reply, or None when ``text`` is empty
+        (a partial message already shown is then deleted).
+        """
+        self._finished.set()
+        self._changed.set()
+        if self._task is not None:
+            await self._task
+
+        if self.message is None:
+            if not text:
+                return None
+            self.message = await self.bot.send_message(self.chat_id, text)
+            REPLY_FIRST_VISIBLE.labels("stream").observe(self._clock() - self._started)
+            return self.message
+
+        if not text:
+            await self.bot.delete_message(chat_id=self.chat_id, message_id=self.message.message_id)
+            return None
+        if text != self._shown:
+            await self._edit(text)
+        return self.message
+
+    @staticmethod
+    def _visible(text: str) -> str:
+        """Drop the unfinished last word so phrases are validated whole."""
+        cut = max(text.rfind(" "), text.rfind("\n"))
+        return text[:cut].rstrip() if cut > 0 else ""
+
+    def _is_safe(self, text: str) -> bool:
+        _, issues = self.validator.validate_response(text)
+        return self.validator.is_safe_for_auto_send(issues)
+
+    async def _pump(self) -> None:
+        try:
+            while not self._finished.is_set():
+                await self._changed.wait()
+                self._changed.clear()
+                if self._finished.is_set():
+                    return
+                candidate = self._visible(self._latest)
+                if not candidate or len(candidate) <= len(self._shown):
+                    continue
+                if self.message is not None:
+                    if len(candidate) - len(self._shown) < self.min_chars:
+                        continue
+                    delay = self._last_update + self.min_interval - self._clock()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(self._finished.wait(), timeout=delay)
+                            return
+                        except asyncio.TimeoutError:
+                            pass
+                        candidate = self._visible(self._latest)
+                if not self._is_safe(candidate):
+                    self.halted = True
+                    REPLY_STREAM_HALTED.inc()
+                    logger.info("reply_stream_halted_by_safety", chat_id=self.chat_id)
+                    return
+                await self._show(candidate)
+        except Exception as exc:
+            # The final text is still delivered by ``finish``.
+            self.halted = True
+            logger.warning("reply_stream_update_failed", chat_id=self.chat_id, error=str(exc))
+
+    async def _show(self, text: str) -> None:
+        if self.message is None:
+            self.message = await self.bot.send_message(self.chat_id, text)
+            # Intermediate versions are not history; the caller logs the final text.
+            dialog_mirror.mark_streamed(self.message)
+            REPLY_FIRST_VISIBLE.labels("stream").observe(self._clock() - self._started)
+            self._shown = text
+            self._last_update = self._clock()
+        else:
+            await self._edit(text)
+            REPLY_STREAM_EDITS.inc()
+
+    async def _edit(self, text: str) -> None:
+        try:
+            result = await self.bot.edit_message_text(
+                text=text,
+                chat_id=self.chat_id,
+                message_id=self.message.message_id,
+            )
+        except TelegramBadRequest as exc:
+            if "message is not modified" not in str(exc).lower():
+                raise
+        else:
+            if isinstance(result, Message):
+                self.message = result
+        self._shown = text
+        self._last_update = self._clock()
+
+
+__all__ = [
+    "JsonStringField",
+    "REPLY_FIRST_VISIBLE",
+    "ReplyStreamer",
+]
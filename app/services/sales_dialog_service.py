@@ -4,18 +4,21 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import structlog
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.db import release_connection
 from app.models import LeadStatus, User
 from app.safety.validator import SafetyValidator
+from app.services.dialog_context import DialogContext
 from app.services.lead_profile_service import LeadProfileService
 from app.services.lead_service import LeadService
 from app.services.llm_service import LLMService
 from app.services.logging_service import ConversationLoggingService
+from app.services.reply_streamer import JsonStringField
 from app.repositories.product_repository import ProductRepository
 from app.utils.prompt_loader import prompt_loader
 
@@ -108,11 +111,12 @@ class SalesDialogOutcome:
 class SalesDialogService:
     """Coordinates LLM conversation, profile updates, and lead escalation."""
 
-    def __init__(self, session: AsyncSession, user: User):
+    def __init__(self, session: AsyncSession, user: User, context: Optional[DialogContext] = None):
         self.session = session
         self.user = user
+        self.context = context or DialogContext(session, user)
         self.logger = structlog.get_logger(__name__)
-        self.conversation_logger = ConversationLoggingService(session)
+        self.conversation_logger = ConversationLoggingService(session, context=self.context)
         self.lead_profile_service = LeadProfileService(session)
         self.lead_service = LeadService(session)
         self.llm_service = LLMService(session=session, user=user)
@@ -120,9 +124,16 @@ class SalesDialogService:
 
         self.system_prompt = prompt_loader.load_prompt("voronka_system") or self._default_system_prompt()
 
-    async def generate_reply(self) -> SalesDialogOutcome:
-        """Generate AI reply, update lead profile, and optionally escalate."""
-        profile = await self.lead_profile_service.get_or_create(self.user)
+    async def generate_reply(
+        self, on_partial: Optional[Callable[[str], None]] = None
+    ) -> SalesDialogOutcome:
+        """Generate AI reply, update lead profile, and optionally escalate.
+
+        With ``on_partial`` the agent's answer is streamed and the ``reply``
+        field generated so far is passed to it as it grows; the returned
+        outcome is the same as without streaming.
+        """
+        profile = await self.context.profile()
         history = await self.conversation_logger.get_last_messages(self.user.id, limit=12)
         stage_prompt = self._load_stage_prompt(profile.current_stage)
 
@@ -134,9 +145,14 @@ class SalesDialogService:
                 fallback_used=True,
             )
 
-        product_catalog_prompt = await self._build_product_catalog_prompt()
+        product_catalog_prompt = await self.context.catalog_prompt(self._build_product_catalog_prompt)
         messages = self._compose_messages(profile, stage_prompt, history, product_catalog_prompt)
-        raw_response = await self._request_agent(messages)
+        await release_connection(self.session)
+        raw_response = None
+        if on_partial is not None:
+            raw_response = await self._stream_agent(messages, on_partial)
+        if raw_response is None:
+            raw_response = await self._request_agent(messages)
 
         payload = self._parse_payload(raw_response)
         if not payload:
@@ -189,6 +205,33 @@ class SalesDialogService:
             self.logger.error("sales_dialog_llm_failure", error=str(exc), user_id=self.user.id)
             return None
 
+    async def _stream_agent(
+        self, messages: List[Dict[str, Any]], on_partial: Callable[[str], None]
+    ) -> Optional[str]:
+        """Stream the agent's JSON; None if the stream failed before any output."""
+        reply_field = JsonStringField("reply")
+        chunks: List[str] = []
+        try:
+            async for delta in self.llm_service.stream_completion(
+                messages, max_tokens=900, expect_json=True
+            ):
+                chunks.append(delta)
+                if not reply_field.done:
+                    shown = reply_field.text
+                    reply = reply_field.feed(delta)
+                    if reply != shown:
+                        on_partial(reply)
+        except Exception as exc:
+            self.logger.warning(
+                "sales_dialog_stream_failed",
+                error=str(exc),
+                user_id=self.user.id,
+                received=len(chunks),
+            )
+            if not chunks:
+                return None
+        return "".join(chunks).strip() or None
+
     def _parse_payload(self, raw_response: Optional[str]) -> Optional[Dict[str, Any]]:
         """Parse JSON payload returned by the agent."""
         if not raw_response:
@@ -20,6 +20,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.models import Lead, LeadEvent, LeadStatus, Message, MessageRole, User
+from app.services.openai_client import get_openai_client, openai_clients
 from app.services.product_matching_service import ProductMatchingService
 
 
@@ -429,18 +430,22 @@ class SalesScriptService:
         if not settings.openai_api_key:
             return self._fallback_script(bundle), "fallback"
 
-        client = self._llm_client or AsyncOpenAI(api_key=settings.openai_api_key)
+        client = self._llm_client or get_openai_client()
         try:
-            response = await client.chat.completions.create(
-                model=settings.sales_script_model,
-                temperature=settings.sales_script_temperature,
-                max_tokens=settings.sales_script_max_tokens,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
+            response = await openai_clients.call(
+                "chat",
+                settings.sales_script_model,
+                lambda: client.chat.completions.create(
+                    model=settings.sales_script_model,
+                    temperature=settings.sales_script_temperature,
+                    max_tokens=settings.sales_script_max_tokens,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt,
+                        }
+                    ],
+                ),
             )
             content = ""
             if response.choices:
@@ -3,8 +3,6 @@
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
-import json
-import time
 
 import pytz
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
@@ -22,9 +20,14 @@ from app.db import get_db
 from app.models import Lead, User, ABTest, ABTestStatus, LeadStatus
 from app.services.notification_service import NotificationService
 from app.services.ab_testing_service import ABTestingService
+from app.services.activity_buffer import activity_buffer
+from app.services.analytics_rollup_service import AnalyticsRollupService
+from app.services.anti_spam_service import AntiSpamService
 from app.services.sentiment_service import sentiment_service
 from app.services.redis_service import redis_service
 from app.services.followup_service import FollowupService
+from app.services.outbound_scheduler import bulk_outbound
+from app.services.partition_service import PartitionMaintenance
 from app.services.lead_service import LeadService
 from app.services.event_service import EventService
 
@@ -33,6 +36,8 @@ logger = logging.getLogger(__name__)
 
 SCHEDULER_REGISTRY: Dict[str, AsyncIOScheduler] = {}
 DEFAULT_SCHEDULER_ID = "scheduler_service_main"
+# Buffered progress/log writes are persisted at least this often during a mailing run.
+EXCEL_MAILING_FLUSH_EVERY = 200
 _notification_service: Optional[NotificationService] = None
 LEGACY_JOB_SIGNATURES: List[bytes] = [
     b"SchedulerService._send_daily_lead_reminders",
@@ -120,11 +125,33 @@ class SchedulerService:
 
             self.scheduler.add_job(
                 sentiment_service.reconcile,
-                IntervalTrigger(hours=1, timezone=self.timezone),
+                IntervalTrigger(
+                    hours=max(0.1, settings.sentiment_reconcile_interval_hours),
+                    timezone=self.timezone,
+                ),
                 id="sentiment_reconcile",
                 replace_existing=True,
             )
 
+            self.scheduler.add_job(
+                refresh_analytics_rollups,
+                IntervalTrigger(
+                    minutes=max(1, settings.analytics_rollup_interval_minutes),
+                    timezone=self.timezone,
+                ),
+                id="analytics_rollups",
+                next_run_time=datetime.now(self.timezone),
+                replace_existing=True,
+            )
+
+            self.scheduler.add_job(
+                maintain_partitions,
+                IntervalTrigger(hours=24, timezone=self.timezone),
+                id="partition_maintenance",
+                next_run_time=datetime.now(self.timezone),
+                replace_existing=True,
+            )
+
             self.scheduler.add_job(
                 cleanup_orphan_jobs,
                 IntervalTrigger(hours=12, timezone=self.timezone),
@@ -439,6 +466,30 @@ class SchedulerService:
 # Background job implementations
 
 
+async def refresh_analytics_rollups() -> None:
+    """Fold rows written since the last run into the analytics daily rollups."""
+    try:
+        async for db in get_db():
+            marks = await AnalyticsRollupService(db).refresh()
+            await db.commit()
+            logger.debug("Analytics rollups refreshed: %s", marks)
+            break
+    except Exception as exc:
+        logger.error("Error refreshing analytics rollups", exc_info=exc)
+
+
+async def maintain_partitions() -> None:
+    """Create upcoming monthly partitions and retire the ones past retention."""
+    try:
+        async for db in get_db():
+            report = await PartitionMaintenance(db).run()
+            await db.commit()
+            logger.debug("Partitions maintained: %s", report)
+            break
+    except Exception as exc:
+        logger.error("Error maintaining partitions", exc_info=exc)
+
+
 async def auto_unban_users():
     """Job to automatically unban users whose ban time has expired."""
     redis = redis_service.get_client()
@@ -448,22 +499,14 @@ async def auto_unban_users():
 
     logger.debug("Running auto-unban job...")
     try:
-        async for ban_key in redis.scan_iter("ban:*"):
-            ban_data_raw = await redis.get(ban_key)
-            if not ban_data_raw:
-                continue
-            
-            ban_data = json.loads(ban_data_raw)
-            banned_until_ts = ban_data.get("banned_until_ts", 0)
-
-            if time.time() > banned_until_ts:
-                user_id = ban_key.split(":")[1]
-                await redis.delete(ban_key)
-                logger.info("Automatically unbanned user", user_id=user_id)
+        released = await AntiSpamService(redis).unban_expired()
+        for user_id in released:
+            logger.info("Automatically unbanned user %s", user_id)
     except Exception as e:
-        logger.error("Error during auto-unban job", error=str(e), exc_info=True)
+        logger.error("Error during auto-unban job: %s", e, exc_info=True)
 
 
+@bulk_outbound
 async def dispatch_excel_material_mailing():
     """The actual job that sends one material to all active users."""
     from app.bot import bot
@@ -473,9 +516,9 @@ async def dispatch_excel_material_mailing():
         async for db in get_db():
             # Get all active users
             result = await db.execute(
-                select(User).where(User.is_blocked == False)
+                select(User.id, User.telegram_id, User.username).where(User.is_blocked == False)
             )
-            active_users = result.scalars().all()
+            active_users = result.all()
             break # Exit async generator
         if not active_users:
             logger.info("No active users found to send materials to.")
@@ -483,57 +526,65 @@ async def dispatch_excel_material_mailing():
         total_users = len(active_users)
         success_count = 0
         fail_count = 0
-        for user in active_users:
-            material = excel_material_service.get_next_material_for_user(user.id)
-            
-            if not material:
-                logger.warning(f"No next material found for user {user.id}. Skipping.")
-                excel_material_service.log_send_attempt(
-                    user_id=user.id,
-                    username=user.username,
-                    material=None, # Or a dummy material object
-                    status='skipped',
-                    error='No valid material available'
-                )
-                fail_count += 1
-                continue
-            try:
-                from aiogram.types import FSInputFile
-                
-                caption = material.text
+        # Catalog and progress are loaded once; writes are batched per run.
+        run = await excel_material_service.start_run()
+        try:
+            for user_id, telegram_id, username in active_users:
+                material = run.next_material(user_id)
                 
-                if material.media_type == 'photo':
-                    await bot.send_photo(
-                        chat_id=user.telegram_id,
-                        photo=FSInputFile(material.media_path),
-                        caption=caption
+                if not material:
+                    logger.warning(f"No next material found for user {user_id}. Skipping.")
+                    run.log_attempt(
+                        user_id=user_id,
+                        username=username,
+                        material=None,
+                        status='skipped',
+                        error='No valid material available'
                     )
-                elif material.media_type == 'video':
-                    await bot.send_video(
-                        chat_id=user.telegram_id,
-                        video=FSInputFile(material.media_path),
-                        caption=caption
+                    fail_count += 1
+                    continue
+                try:
+                    caption = material.text
+                    
+                    sent_message = None
+                    if material.media_type == 'photo':
+                        sent_message = await bot.send_photo(
+                            chat_id=telegram_id,
+                            photo=run.media_for(material),
+                            caption=caption
+                        )
+                    elif material.media_type == 'video':
+                        sent_message = await bot.send_video(
+                            chat_id=telegram_id,
+                            video=run.media_for(material),
+                            caption=caption
+                        )
+                    run.remember_upload(material, sent_message)
+                    
+                    run.record_progress(user_id, material.row_index)
+                    run.log_attempt(
+                        user_id=user_id,
+                        username=username,
+                        material=material,
+                        status='success'
                     )
-                
-                excel_material_service.update_user_progress(user.id, material.row_index)
-                excel_material_service.log_send_attempt(
-                    user_id=user.id,
-                    username=user.username,
-                    material=material,
-                    status='success'
-                )
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send material to user {user.id}: {e}", exc_info=True)
-                excel_material_service.log_send_attempt(
-                    user_id=user.id,
-                    username=user.username,
-                    material=material,
-                    status='failed',
-                    error=str(e)
-                )
-                fail_count += 1
+                    success_count += 1
+                    
+                except Exception as e:
+                    logger.error(f"Failed to send material to user {user_id}: {e}", exc_info=True)
+                    run.log_attempt(
+                        user_id=user_id,
+                        username=username,
+                        material=material,
+                        status='failed',
+                        error=str(e)
+                    )
+                    fail_count += 1
+
+                if run.pending_writes >= EXCEL_MAILING_FLUSH_EVERY:
+                    await run.flush()
+        finally:
+            await run.flush()
         
         logger.info(
             f"Excel material mailing finished. Total: {total_users}, Success: {success_count}, Failed: {fail_count}"
@@ -800,11 +851,14 @@ async def cleanup_orphan_jobs(scheduler_id: str) -> None:
 scheduler_service = SchedulerService()
 
 
+@bulk_outbound
 async def check_inactive_users() -> None:
     """Send follow-up messages to inactive users."""
     from app.bot import bot
     logger.info("Running job: check_inactive_users")
     try:
+        # Read-your-writes: buffered activity must be visible to the inactivity filter.
+        await activity_buffer.flush()
         async for session in get_db():
             followup_service = FollowupService(session, bot)
             
@@ -11,8 +11,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 
+from app.config import settings
 from app.models import SellScript
 from app.services.llm_service import get_embedding
+from app.services.script_index import script_index
 from app.services.script_exceptions import ScriptError, ExcelFormatError, IndexingError
 
 log = structlog.get_logger(__name__)
@@ -119,7 +121,7 @@ class ScriptService:
                 'updated_at': stmt.excluded.updated_at,
             }
         )
-        result = await self.session.execute(stmt)
+        await self.session.execute(stmt)
         
         # Note: rowcount is not reliably returned for INSERT...ON CONFLICT in asyncpg
         # We can't easily distinguish between added and updated here.
@@ -132,13 +134,26 @@ class ScriptService:
 
     async def search_similar_scripts(self, query_text: str, top_k: int) -> List[Dict[str, Any]]:
         """
-        Searches for the most similar scripts in the database using vector similarity.
+        Searches for the most similar scripts, using the in-memory index when enabled.
         """
         query_embedding = await get_embedding(query_text)
         if not query_embedding:
             log.warning("Could not generate embedding for query.", query=query_text)
             return []
 
+        if settings.script_index_enabled:
+            await script_index.ensure_loaded(self.session)
+            return script_index.search(query_embedding, top_k)
+        return await self.search_by_embedding_sql(query_embedding, top_k)
+
+    async def search_by_embedding_sql(self, query_embedding: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Nearest-neighbour search in the database by cosine distance.
+
+        With the HNSW index present the search is approximate: PostgreSQL
+        may miss some true neighbours (recall depends on ``hnsw.ef_search``).
+        Without the index it is an exact sequential scan.
+        """
         # The l2_distance operator <-> is used for distance calculation.
         # For cosine similarity, we can use 1 - (embedding <=> query_embedding)
         # Or use the dedicated cosine distance operator <=>.
@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..models import User, AdminOutboundMessage, AdminOutboundResult, AdminOutboundStatus
 from ..repositories.user_repository import UserRepository
 from .manual_dialog_service import manual_dialog_service
+from .outbound_scheduler import bulk_outbound
 
 logger = structlog.get_logger(__name__)
 
@@ -31,6 +32,7 @@ class SendToService:
         not_found = [uname for uname in usernames if uname.lower() not in found_usernames]
         return found_users, not_found
 
+    @bulk_outbound
     async def send_messages(
         self,
         admin_user_id: int,
@@ -67,7 +69,7 @@ class SendToService:
         status_counts = Counter()
 
         for user in recipients:
-            dialog_session = manual_dialog_service.get_session_by_user(user.id)
+            dialog_session = await manual_dialog_service.get_session_by_user(user.id)
             is_manual_dialog = dialog_session is not None
             target_chat_id = dialog_session.manager_telegram_id if is_manual_dialog else user.telegram_id
 
@@ -122,7 +124,8 @@ class SendToService:
                 ))
                 status_counts[AdminOutboundStatus.FAILED] += 1
             
-            await asyncio.sleep(throttle_rate)
+            if throttle_rate > 0:
+                await asyncio.sleep(throttle_rate)
 
         self.session.add_all(results)
         await self.session.commit()
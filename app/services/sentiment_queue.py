@@ -0,0 +1,388 @@
+"""Queues feeding the sentiment workers.
+
+``MemorySentimentQueue`` keeps jobs in process and loses them on restart.
+``RedisSentimentQueue`` stores them in a Redis stream read through a
+consumer group:
+
+* a job stays in the stream until a worker acknowledges it, and deliveries
+  left unacknowledged by a crashed process are reclaimed after
+  ``SENTIMENT_QUEUE_RECLAIM_IDLE`` seconds;
+* retries go to a sorted set scored by due time and are moved back to the
+  stream by ``maintain``, so a waiting retry never occupies a worker;
+* jobs that exhaust their attempts are appended to a dead-letter stream.
+
+Delivery is at least once; the service drops jobs already scored, so a
+redelivered job is harmless.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+SENTIMENT_QUEUE_JOBS = Gauge(
+    "sentiment_queue_jobs",
+    "Sentiment jobs by state (ready, inflight, delayed)",
+    ["state"],
+)
+SENTIMENT_QUEUE_LAG = Gauge(
+    "sentiment_queue_lag_seconds",
+    "Age of the oldest sentiment job not yet acknowledged",
+)
+SENTIMENT_JOBS_RETRIED = Counter(
+    "sentiment_jobs_retried_total",
+    "Sentiment jobs scheduled for a delayed retry",
+    ["reason"],
+)
+SENTIMENT_JOBS_DEAD = Counter(
+    "sentiment_jobs_dead_lettered_total",
+    "Sentiment jobs moved to the dead-letter queue",
+    ["reason"],
+)
+SENTIMENT_JOBS_RECLAIMED = Counter(
+    "sentiment_jobs_reclaimed_total",
+    "Sentiment deliveries reclaimed from crashed or stuck consumers",
+)
+
+
+@dataclass(slots=True)
+class SentimentJob:
+    """Job payload for the sentiment worker."""
+
+    user_id: int
+    message_id: int
+    text: str
+    hash_value: str
+    queued_at: datetime
+    attempts: int = 0
+    source: Optional[str] = None
+    # Set by the queue that handed the job out; needed to acknowledge it.
+    delivery_id: Optional[str] = None
+
+    def to_json(self) -> str:
+        payload = asdict(self)
+        payload.pop("delivery_id")
+        payload["queued_at"] = self.queued_at.isoformat()
+        return json.dumps(payload, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str, delivery_id: Optional[str] = None) -> "SentimentJob":
+        payload = json.loads(raw)
+        payload["queued_at"] = datetime.fromisoformat(payload["queued_at"])
+        return cls(**payload, delivery_id=delivery_id)
+
+
+@dataclass(slots=True)
+class QueueStats:
+    ready: int = 0
+    inflight: int = 0
+    delayed: int = 0
+    lag_seconds: float = 0.0
+
+
+class SentimentQueue(ABC):
+    """Job queue with acknowledgements, delayed retries and dead-lettering."""
+
+    @abstractmethod
+    async def put(self, job: SentimentJob) -> None:
+        """Add a job."""
+
+    @abstractmethod
+    async def claim(self, max_items: int, batch_wait: float, block: float = 5.0) -> List[SentimentJob]:
+        """Wait up to ``block`` seconds for a job, then up to ``batch_wait`` to fill the batch."""
+
+    @abstractmethod
+    async def ack(self, jobs: List[SentimentJob]) -> None:
+        """Mark claimed jobs as done."""
+
+    @abstractmethod
+    async def retry(self, job: SentimentJob, delay: float) -> None:
+        """Make a copy of ``job`` available again after ``delay`` seconds."""
+
+    @abstractmethod
+    async def dead_letter(self, job: SentimentJob, reason: str) -> None:
+        """Park a job that will not be retried."""
+
+    @abstractmethod
+    async def maintain(self) -> QueueStats:
+        """Release due retries and stuck deliveries; return current depths."""
+
+
+class MemorySentimentQueue(SentimentQueue):
+    """Process-local queue; pending jobs are lost when the process stops."""
+
+    def __init__(self, dead_letter_size: int = 1000, clock=time.monotonic) -> None:
+        self._queue: asyncio.Queue[SentimentJob] = asyncio.Queue()
+        self._delayed: List[Tuple[float, int, SentimentJob]] = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._clock = clock
+        self.dead: Deque[Tuple[SentimentJob, str]] = deque(maxlen=dead_letter_size)
+
+    async def put(self, job: SentimentJob) -> None:
+        self._queue.put_nowait(job)
+
+    async def claim(self, max_items: int, batch_wait: float, block: float = 5.0) -> List[SentimentJob]:
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), timeout=block)]
+        except asyncio.TimeoutError:
+            return []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + batch_wait
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        self._inflight += len(batch)
+        return batch
+
+    async def ack(self, jobs: List[SentimentJob]) -> None:
+        self._inflight = max(0, self._inflight - len(jobs))
+
+    async def retry(self, job: SentimentJob, delay: float) -> None:
+        heapq.heappush(self._delayed, (self._clock() + delay, next(self._seq), job))
+
+    async def dead_letter(self, job: SentimentJob, reason: str) -> None:
+        self.dead.append((job, reason))
+
+    async def maintain(self) -> QueueStats:
+        now = self._clock()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._queue.put_nowait(heapq.heappop(self._delayed)[2])
+        return QueueStats(ready=self._queue.qsize(), inflight=self._inflight, delayed=len(self._delayed))
+
+
+# Move retries that are due back into the stream, oldest first.
+_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, payload in ipairs(due) do
+  redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'job', payload)
+  redis.call('ZREM', KEYS[2], payload)
+end
+return #due
+"""
+
+
+class RedisSentimentQueue(SentimentQueue):
+    """Durable queue: a stream with a consumer group plus a delayed-retry sorted set."""
+
+    GROUP = "sentiment-workers"
+    PROMOTE_BATCH = 500
+
+    def __init__(
+        self,
+        prefix: str = "sentiment:jobs",
+        *,
+        max_len: int = 100_000,
+        dead_letter_max_len: int = 10_000,
+        reclaim_idle: float = 300.0,
+        max_attempts: int = 3,
+        consumer: Optional[str] = None,
+    ) -> None:
+        self.stream_key = prefix
+        self.delayed_key = f"{prefix}:delayed"
+        self.dead_key = f"{prefix}:dead"
+        self.max_len = max_len
+        self.dead_letter_max_len = dead_letter_max_len
+        self.reclaim_idle_ms = int(reclaim_idle * 1000)
+        self.max_attempts = max_attempts
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._group_client: Any = None
+        self._promote: Any = None
+
+    async def _client(self):
+        client = redis_service.get_client()
+        if client is None:
+            raise RuntimeError("Redis is not initialized; cannot use redis sentiment queue")
+        if client is not self._group_client:
+            try:
+                await client.xgroup_create(self.stream_key, self.GROUP, id="0", mkstream=True)
+            except Exception as exc:
+                if "BUSYGROUP" not in str(exc):
+                    raise
+            self._promote = client.register_script(_PROMOTE_LUA)
+            self._group_client = client
+        return client
+
+    async def put(self, job: SentimentJob) -> None:
+        client = await self._client()
+        await client.xadd(
+            self.stream_key, {"job": job.to_json()}, maxlen=self.max_len, approximate=True
+        )
+
+    async def claim(self, max_items: int, batch_wait: float, block: float = 5.0) -> List[SentimentJob]:
+        client = await self._client()
+        batch = await self._read(client, max_items, block)
+        if not batch:
+            return []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + batch_wait
+        while len(batch) < max_items:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            more = await self._read(client, max_items - len(batch), timeout)
+            if not more:
+                break
+            batch.extend(more)
+        return batch
+
+    async def _read(self, client, count: int, block: float) -> List[SentimentJob]:
+        response = await client.xreadgroup(
+            self.GROUP,
+            self.consumer,
+            {self.stream_key: ">"},
+            count=count,
+            block=max(1, int(block * 1000)),
+        )
+        jobs: List[SentimentJob] = []
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                jobs.extend(await self._decode(client, entry_id, fields))
+        return jobs
+
+    async def _decode(self, client, entry_id: str, fields: Dict[str, str]) -> List[SentimentJob]:
+        try:
+            return [SentimentJob.from_json(fields["job"], delivery_id=entry_id)]
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.error("sentiment_queue_bad_entry", entry_id=entry_id, error=str(exc))
+            await client.xadd(
+                self.dead_key,
+                {"raw": json.dumps(fields, ensure_ascii=False), "reason": "undecodable"},
+                maxlen=self.dead_letter_max_len,
+                approximate=True,
+            )
+            await self._ack_ids(client, [entry_id])
+            SENTIMENT_JOBS_DEAD.labels("undecodable").inc()
+            return []
+
+    async def ack(self, jobs: List[SentimentJob]) -> None:
+        ids = [job.delivery_id for job in jobs if job.delivery_id]
+        if ids:
+            await self._ack_ids(await self._client(), ids)
+
+    async def _ack_ids(self, client, ids: List[str]) -> None:
+        pipe = client.pipeline(transaction=True)
+        pipe.xack(self.stream_key, self.GROUP, *ids)
+        pipe.xdel(self.stream_key, *ids)
+        await pipe.execute()
+
+    async def retry(self, job: SentimentJob, delay: float) -> None:
+        client = await self._client()
+        await client.zadd(self.delayed_key, {job.to_json(): time.time() + delay})
+
+    async def dead_letter(self, job: SentimentJob, reason: str) -> None:
+        client = await self._client()
+        await client.xadd(
+            self.dead_key,
+            {"job": job.to_json(), "reason": reason},
+            maxlen=self.dead_letter_max_len,
+            approximate=True,
+        )
+
+    async def maintain(self) -> QueueStats:
+        client = await self._client()
+        await self._promote(
+            keys=[self.stream_key, self.delayed_key],
+            args=[repr(time.time()), self.PROMOTE_BATCH, self.max_len],
+        )
+        await self._reclaim(client)
+
+        pipe = client.pipeline(transaction=False)
+        pipe.xlen(self.stream_key)
+        pipe.xpending(self.stream_key, self.GROUP)
+        pipe.zcard(self.delayed_key)
+        pipe.xrange(self.stream_key, count=1)
+        length, pending, delayed, oldest = await pipe.execute()
+        inflight = int(pending.get("pending", 0)) if isinstance(pending, dict) else 0
+        lag = 0.0
+        if oldest:
+            oldest_ms = int(oldest[0][0].split("-", 1)[0])
+            lag = max(0.0, time.time() - oldest_ms / 1000)
+        return QueueStats(
+            ready=max(0, int(length) - inflight),
+            inflight=inflight,
+            delayed=int(delayed),
+            lag_seconds=lag,
+        )
+
+    async def _reclaim(self, client) -> None:
+        """Hand deliveries idle for too long back to the queue, counting an attempt."""
+        response = await client.xautoclaim(
+            self.stream_key,
+            self.GROUP,
+            self.consumer,
+            min_idle_time=self.reclaim_idle_ms,
+            start_id="0-0",
+            count=100,
+        )
+        entries = response[1] if response and len(response) > 1 else []
+        for entry_id, fields in entries:
+            if not fields:
+                # Trimmed by MAXLEN before it was processed.
+                await self._ack_ids(client, [entry_id])
+                continue
+            for job in await self._decode(client, entry_id, fields):
+                job.attempts += 1
+                if job.attempts >= self.max_attempts:
+                    await self.dead_letter(job, "reclaimed")
+                    SENTIMENT_JOBS_DEAD.labels("reclaimed").inc()
+                else:
+                    await self.put(job)
+                await self._ack_ids(client, [entry_id])
+                SENTIMENT_JOBS_RECLAIMED.inc()
+
+
+def build_sentiment_queue(kind: str, *, max_attempts: int = 3) -> SentimentQueue:
+    """Create the queue configured by ``SENTIMENT_QUEUE_BACKEND``."""
+    if kind == "redis":
+        return RedisSentimentQueue(
+            max_len=settings.sentiment_queue_max_len,
+            dead_letter_max_len=settings.sentiment_dead_letter_max_len,
+            reclaim_idle=settings.sentiment_queue_reclaim_idle,
+            max_attempts=max_attempts,
+        )
+    if kind != "memory":
+        logger.warning("unknown_sentiment_queue_backend", backend=kind, fallback="memory")
+    return MemorySentimentQueue()
+
+
+__all__ = [
+    "MemorySentimentQueue",
+    "QueueStats",
+    "RedisSentimentQueue",
+    "SENTIMENT_JOBS_DEAD",
+    "SENTIMENT_JOBS_RETRIED",
+    "SENTIMENT_QUEUE_JOBS",
+    "SENTIMENT_QUEUE_LAG",
+    "SentimentJob",
+    "SentimentQueue",
+    "build_sentiment_queue",
+]
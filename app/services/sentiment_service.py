@@ -5,7 +5,7 @@ from __future__ import annotations
 import asyncio
 import json
 import hashlib
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Any, Optional
@@ -13,7 +13,8 @@ from typing import Any, Optional
 import structlog
 import openai
 from openai import AsyncOpenAI
-from sqlalchemy import case, func, select
+from prometheus_client import Counter, Histogram
+from sqlalchemy import Integer, bindparam, case, cast, func, or_, select, tuple_, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,6 +22,103 @@ from app.config import settings
 from app.db import AsyncSessionLocal
 from app.models import User, UserMessageScore
 from app.repositories.system_settings_repository import SystemSettingsRepository
+from app.services.activity_buffer import activity_buffer
+from app.services.dirty_users import DirtyUserSet, build_dirty_user_set
+from app.services.llm_cache import MISS, llm_cache, prompt_version
+from app.services.openai_client import CircuitOpenError, get_openai_client, openai_clients
+from app.services.sentiment_queue import (
+    SENTIMENT_JOBS_DEAD,
+    SENTIMENT_JOBS_RETRIED,
+    SENTIMENT_QUEUE_JOBS,
+    SENTIMENT_QUEUE_LAG,
+    SentimentJob,
+    SentimentQueue,
+    build_sentiment_queue,
+)
+
+SENTIMENT_BATCH_SIZE = Histogram(
+    "sentiment_batch_size",
+    "Messages collected into one classification batch",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+SENTIMENT_LLM_REQUESTS = Counter(
+    "sentiment_llm_requests_total",
+    "Sentiment classification requests sent to the LLM",
+    ["status"],
+)
+SENTIMENT_LLM_TOKENS = Counter(
+    "sentiment_llm_tokens_total",
+    "Tokens billed for sentiment classification",
+)
+SENTIMENT_BATCH_SPLITS = Counter(
+    "sentiment_batch_splits_total",
+    "Batches split after a failed or incomplete LLM response",
+)
+
+BATCH_SYSTEM_PROMPT = (
+    "Ты классификатор тональности. Для каждого сообщения пользователя из поля messages "
+    "определи тональность: positive, neutral или negative. Возвращай JSON вида "
+    '{"results":[{"id":<id сообщения>,"label":"positive|neutral|negative","confidence":0.0-1.0}]} '
+    "ровно с одним элементом на каждое сообщение и тем же id. "
+    "Если сообщение без текста, вложение или sticker — выбирай neutral "
+    "с confidence 0.0. Не добавляй никакого другого текста."
+)
+BATCH_PROMPT_VERSION = prompt_version(BATCH_SYSTEM_PROMPT)
+
+_users = User.__table__
+_scores = UserMessageScore.__table__
+
+
+def _lead_level_expr():
+    """Lead level from the user's last ten scores, or NULL with fewer than ten.
+
+    ``((avg + 1) / 2) * 100`` over ten scores of -1/0/1 is ``50 + 5 * sum``.
+    The subquery reads at most ten rows through the (user_id, evaluated_at)
+    index, whatever the length of the history.
+    """
+    last_ten = (
+        select(_scores.c.score)
+        .where(_scores.c.user_id == _users.c.id)
+        .order_by(_scores.c.evaluated_at.desc())
+        .limit(10)
+        .correlate(_users)
+        .subquery("last_ten")
+    )
+    return (
+        select(
+            case(
+                (func.count() < 10, None),
+                else_=cast(50 + 5 * func.sum(last_ten.c.score), Integer),
+            )
+        )
+        .select_from(last_ten)
+        .scalar_subquery()
+    )
+
+
+_lead_level = _lead_level_expr()
+# Rows whose level is unchanged are not rewritten.
+_LEAD_LEVEL_STMT = (
+    update(_users)
+    .where(
+        _users.c.id.in_(bindparam("user_ids", expanding=True)),
+        _users.c.lead_level_percent.is_distinct_from(_lead_level),
+    )
+    .values(
+        lead_level_percent=_lead_level,
+        lead_level_updated_at=case((_lead_level.is_(None), None), else_=func.now()),
+    )
+)
+_RECONCILE_STMT = (
+    update(_users)
+    .where(_users.c.id == bindparam("b_id"))
+    .values(
+        **{
+            name: bindparam(f"b_{name}", type_=Integer)
+            for name in ("counter", "pos_count", "neu_count", "neg_count", "scored_total")
+        }
+    )
+)
 
 
 class SentimentLabel(str, Enum):
@@ -40,19 +138,6 @@ class SentimentLabel(str, Enum):
         return 0
 
 
-@dataclass(slots=True)
-class SentimentJob:
-    """Job payload for the sentiment worker."""
-
-    user_id: int
-    message_id: int
-    text: str
-    hash_value: str
-    queued_at: datetime
-    attempts: int = 0
-    source: Optional[str] = None
-
-
 @dataclass(slots=True)
 class SentimentResult:
     """Result of a sentiment classification."""
@@ -71,10 +156,27 @@ class SentimentService:
     DEFAULT_MODEL = "gpt-4o-mini"
     MAX_ATTEMPTS = 3
 
-    def __init__(self) -> None:
-        self._queue: asyncio.Queue[SentimentJob] = asyncio.Queue()
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        batch_size: Optional[int] = None,
+        batch_wait: Optional[float] = None,
+        queue: Optional[SentimentQueue] = None,
+        dirty_users: Optional[DirtyUserSet] = None,
+    ) -> None:
+        self._queue: SentimentQueue = queue or build_sentiment_queue(
+            settings.sentiment_queue_backend, max_attempts=self.MAX_ATTEMPTS
+        )
+        self._dirty_users: DirtyUserSet = dirty_users or build_dirty_user_set(
+            settings.sentiment_queue_backend
+        )
         self._workers: list[asyncio.Task[None]] = []
-        self._client: Optional[AsyncOpenAI] = None
+        self._maintainer: Optional[asyncio.Task[None]] = None
+        self._client: Optional[AsyncOpenAI] = client
+        self._batch_size = max(1, batch_size or settings.sentiment_batch_size)
+        self._batch_wait = (
+            settings.sentiment_batch_wait_ms / 1000 if batch_wait is None else batch_wait
+        )
         self._auto_enabled: bool = True
         self._started = False
         self._lock = asyncio.Lock()
@@ -88,12 +190,11 @@ class SentimentService:
 
             await self._load_auto_enabled()
 
-            worker_total = worker_count or 3
-            if settings.openai_api_key:
-                self._client = AsyncOpenAI(api_key=settings.openai_api_key)
-            else:
-                self._logger.warning("sentiment_worker_no_api_key", fallback="neutral")
-                self._client = None
+            worker_total = worker_count or settings.sentiment_workers
+            if self._client is None:
+                self._client = get_openai_client()
+                if self._client is None:
+                    self._logger.warning("sentiment_worker_no_api_key", fallback="neutral")
 
             for index in range(worker_total):
                 task = asyncio.create_task(
@@ -101,11 +202,16 @@ class SentimentService:
                     name=f"sentiment-worker-{index}",
                 )
                 self._workers.append(task)
+            self._maintainer = asyncio.create_task(
+                self._maintain_loop(), name="sentiment-queue-maintainer"
+            )
 
             self._started = True
             self._logger.info(
                 "sentiment_workers_started",
                 workers=worker_total,
+                batch_size=self._batch_size,
+                batch_wait=self._batch_wait,
                 auto_enabled=self._auto_enabled,
             )
 
@@ -115,10 +221,12 @@ class SentimentService:
             if not self._started:
                 return
 
-            for task in self._workers:
+            tasks = [*self._workers, *([self._maintainer] if self._maintainer else [])]
+            for task in tasks:
                 task.cancel()
-            await asyncio.gather(*self._workers, return_exceptions=True)
+            await asyncio.gather(*tasks, return_exceptions=True)
             self._workers.clear()
+            self._maintainer = None
             self._started = False
             self._logger.info("sentiment_workers_stopped")
 
@@ -147,7 +255,16 @@ class SentimentService:
             queued_at=datetime.now(timezone.utc),
             source=source,
         )
-        await self._queue.put(job)
+        try:
+            await self._queue.put(job)
+        except Exception as exc:
+            self._logger.error(
+                "sentiment_enqueue_failed",
+                user_id=user_id,
+                message_id=message_id,
+                error=str(exc),
+            )
+            return
         self._logger.debug(
             "sentiment_job_enqueued",
             user_id=user_id,
@@ -179,11 +296,40 @@ class SentimentService:
         """Return cached auto-classification flag."""
         return self._auto_enabled
 
-    async def reconcile(self, batch_size: int = 500) -> None:
-        """Recompute aggregates and lead levels as safety net."""
-        async with AsyncSessionLocal() as session:
-            await self._reconcile_batch(session, batch_size=batch_size)
-            await session.commit()
+    async def reconcile(self, batch_size: int = 500) -> int:
+        """Recompute aggregates and lead levels of users scored since the last run.
+
+        Returns the number of users recomputed. Users of a failed batch are
+        marked again for the next run, and so are users whose increments
+        were buffered while their batch was being recomputed.
+        """
+        total = 0
+        racing: list[int] = []
+        while True:
+            user_ids = await self._dirty_users.pop(batch_size)
+            if not user_ids:
+                break
+            try:
+                # Buffered increments are flushed first; otherwise they would be
+                # added on top of the freshly recomputed totals.
+                await activity_buffer.flush()
+                async with AsyncSessionLocal() as session:
+                    await self._reconcile_users(session, user_ids)
+                    await session.commit()
+            except Exception:
+                await self._dirty_users.add(user_ids + racing)
+                raise
+            total += len(user_ids)
+            # A score committed after the flush can be in the recomputed totals
+            # and in the buffer at once; the next run flushes and rewrites it.
+            for user_id in user_ids:
+                delta = await activity_buffer.pending(user_id)
+                if delta is not None and delta.counters:
+                    racing.append(user_id)
+        if racing:
+            await self._dirty_users.add(racing)
+        self._logger.info("sentiment_reconciled", users=total, requeued=len(racing))
+        return total
 
     async def _load_auto_enabled(self) -> None:
         """Load persisted flag, defaulting to True."""
@@ -202,71 +348,112 @@ class SentimentService:
                 self._auto_enabled = bool(value)
 
     async def _worker_loop(self, worker_index: int) -> None:
-        """Continuously process sentiment jobs."""
+        """Continuously collect, process and acknowledge micro-batches of sentiment jobs."""
         try:
             while True:
-                job = await self._queue.get()
                 try:
-                    await self._process_job(job, worker_index)
+                    batch = await self._next_batch()
                 except asyncio.CancelledError:
                     raise
-                except Exception as exc:  # pragma: no cover - defensive
+                except Exception as exc:
+                    self._logger.warning("sentiment_claim_failed", error=str(exc))
+                    await asyncio.sleep(1)
+                    continue
+                if not batch:
+                    continue
+                try:
+                    await self._process_batch(batch, worker_index)
+                except asyncio.CancelledError:
+                    # Unacknowledged jobs stay pending and are reclaimed later.
+                    raise
+                except Exception as exc:
                     self._logger.error(
-                        "sentiment_job_failed",
+                        "sentiment_batch_failed",
                         error=str(exc),
-                        user_id=job.user_id,
-                        message_id=job.message_id,
-                        attempts=job.attempts,
+                        size=len(batch),
+                        message_ids=[job.message_id for job in batch],
                         exc_info=True,
                     )
-                finally:
-                    self._queue.task_done()
+                    for job in batch:
+                        await self._retry(job, "batch_failed")
+                await self._ack(batch)
         except asyncio.CancelledError:
             self._logger.debug("sentiment_worker_cancelled", worker=worker_index)
             raise
 
-    async def _process_job(self, job: SentimentJob, worker_index: int) -> None:
-        """Process a single sentiment classification job."""
+    async def _next_batch(self) -> list[SentimentJob]:
+        """Wait for one job, then gather more until the batch is full or the wait expires."""
+        batch = await self._queue.claim(self._batch_size, self._batch_wait)
+        if batch:
+            SENTIMENT_BATCH_SIZE.observe(len(batch))
+        return batch
+
+    async def _ack(self, batch: list[SentimentJob]) -> None:
+        try:
+            await self._queue.ack(batch)
+        except Exception as exc:
+            # The deliveries are reclaimed after the idle timeout; scored ones are skipped then.
+            self._logger.warning("sentiment_ack_failed", error=str(exc), size=len(batch))
+
+    async def _maintain_loop(self) -> None:
+        """Release due retries and stuck deliveries, and publish queue depth and lag."""
+        while True:
+            try:
+                stats = await self._queue.maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._logger.warning("sentiment_queue_maintain_failed", error=str(exc))
+            else:
+                SENTIMENT_QUEUE_JOBS.labels("ready").set(stats.ready)
+                SENTIMENT_QUEUE_JOBS.labels("inflight").set(stats.inflight)
+                SENTIMENT_QUEUE_JOBS.labels("delayed").set(stats.delayed)
+                SENTIMENT_QUEUE_LAG.set(stats.lag_seconds)
+            await asyncio.sleep(settings.sentiment_queue_maintain_interval)
+
+    async def _process_batch(self, batch: list[SentimentJob], worker_index: int) -> None:
+        """Classify a batch in one LLM request and store every result in one transaction."""
         async with AsyncSessionLocal() as session:
-            existing = await session.execute(
-                select(UserMessageScore.id).where(
-                    (UserMessageScore.hash == job.hash_value)
-                    | (
-                        (UserMessageScore.user_id == job.user_id)
-                        & (UserMessageScore.message_id == job.message_id)
-                    )
-                )
-            )
-            if existing.scalar() is not None:
-                self._logger.debug(
-                    "sentiment_duplicate_skipped",
-                    user_id=job.user_id,
-                    message_id=job.message_id,
-                )
-                return
+            jobs = await self._filter_new_jobs(session, batch)
+        if not jobs:
+            return
+
+        results = await self._classify_batch(jobs)
 
-            result = await self._classify(job)
+        stored: list[tuple[SentimentJob, SentimentResult]] = []
+        for job, result in zip(jobs, results):
             if (
                 result.model.startswith("fallback:")
                 and result.model not in {"fallback:no_api_key"}
-                and job.attempts + 1 < self.MAX_ATTEMPTS
             ):
-                backoff_seconds = min(30, 2 ** (job.attempts or 0))
-                job.attempts += 1
-                await asyncio.sleep(backoff_seconds)
-                await self._queue.put(job)
-                self._logger.warning(
-                    "sentiment_requeued_after_fallback",
-                    user_id=job.user_id,
-                    message_id=job.message_id,
-                    attempts=job.attempts,
-                    model=result.model,
-                    backoff=backoff_seconds,
-                )
-                await session.rollback()
-                return
-            await self._store_result(session, job, result)
+                await self._retry(job, result.model)
+                continue
+            stored.append((job, result))
+
+        if not stored:
+            return
+
+        deltas: list[tuple[int, dict[str, int]]] = []
+        async with AsyncSessionLocal() as session:
+            for job, result in stored:
+                counters = await self._store_result(session, job, result)
+                if counters:
+                    deltas.append((job.user_id, counters))
+            touched = sorted({user_id for user_id, _ in deltas})
+            if touched:
+                await session.execute(_LEAD_LEVEL_STMT, {"user_ids": touched})
             await session.commit()
+
+        # Counters are buffered only once the audit rows are committed, so a
+        # rolled-back batch never reaches the aggregates.
+        for user_id, counters in deltas:
+            await activity_buffer.add_counters(user_id, counters)
+        try:
+            await self._dirty_users.add(touched)
+        except Exception as exc:
+            self._logger.warning("sentiment_mark_dirty_failed", users=len(touched), error=str(exc))
+
+        for job, result in stored:
             self._logger.info(
                 "sentiment_classified",
                 user_id=job.user_id,
@@ -275,105 +462,289 @@ class SentimentService:
                 confidence=result.confidence,
                 model=result.model,
                 worker=worker_index,
+                batch_size=len(jobs),
             )
 
-    async def _classify(self, job: SentimentJob) -> SentimentResult:
-        """Classify message using quick rules or LLM."""
-        if not job.text:
-            return SentimentResult(
-                label=SentimentLabel.NEUTRAL,
-                score=SentimentLabel.NEUTRAL.score,
-                confidence=0.0,
-                model="rule:empty",
+    async def _filter_new_jobs(
+        self,
+        session: AsyncSession,
+        batch: list[SentimentJob],
+    ) -> list[SentimentJob]:
+        """Drop jobs already scored, or repeated within the batch."""
+        existing = await session.execute(
+            select(
+                UserMessageScore.hash,
+                UserMessageScore.user_id,
+                UserMessageScore.message_id,
+            ).where(
+                or_(
+                    UserMessageScore.hash.in_([job.hash_value for job in batch]),
+                    tuple_(UserMessageScore.user_id, UserMessageScore.message_id).in_(
+                        [(job.user_id, job.message_id) for job in batch]
+                    ),
+                )
             )
-
-        if not await self.is_auto_enabled():
-            return SentimentResult(
-                label=SentimentLabel.NEUTRAL,
-                score=SentimentLabel.NEUTRAL.score,
-                confidence=0.0,
-                model="disabled",
+        )
+        seen_hashes: set[str] = set()
+        seen_keys: set[tuple[int, int]] = set()
+        for row in existing:
+            seen_hashes.add(row.hash)
+            seen_keys.add((row.user_id, row.message_id))
+
+        jobs: list[SentimentJob] = []
+        for job in batch:
+            key = (job.user_id, job.message_id)
+            if job.hash_value in seen_hashes or key in seen_keys:
+                self._logger.debug(
+                    "sentiment_duplicate_skipped",
+                    user_id=job.user_id,
+                    message_id=job.message_id,
+                )
+                continue
+            seen_hashes.add(job.hash_value)
+            seen_keys.add(key)
+            jobs.append(job)
+        return jobs
+
+    async def _retry(self, job: SentimentJob, reason: str) -> None:
+        """Schedule a delayed retry without holding a worker, or dead-letter the job."""
+        retry = replace(job, attempts=job.attempts + 1, delivery_id=None)
+        if retry.attempts >= self.MAX_ATTEMPTS:
+            await self._queue.dead_letter(retry, reason)
+            SENTIMENT_JOBS_DEAD.labels(reason.split(":", 1)[-1]).inc()
+            self._logger.error(
+                "sentiment_job_dead_lettered",
+                user_id=job.user_id,
+                message_id=job.message_id,
+                attempts=retry.attempts,
+                reason=reason,
             )
+            return
 
-        if self._client is None:
-            return SentimentResult(
-                label=SentimentLabel.NEUTRAL,
-                score=SentimentLabel.NEUTRAL.score,
-                confidence=0.0,
-                model="fallback:no_api_key",
-            )
+        backoff_seconds = min(30, 2 ** job.attempts)
+        await self._queue.retry(retry, backoff_seconds)
+        SENTIMENT_JOBS_RETRIED.labels(reason.split(":", 1)[-1]).inc()
+        self._logger.warning(
+            "sentiment_requeued_after_fallback",
+            user_id=job.user_id,
+            message_id=job.message_id,
+            attempts=retry.attempts,
+            model=reason,
+            backoff=backoff_seconds,
+        )
 
-        try:
-            response = await self._client.chat.completions.create(
-                model=settings.llm_model or self.DEFAULT_MODEL,
-                temperature=0,
-                max_tokens=50,
-                response_format={"type": "json_object"},
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Ты классификатор тональности. Классифицируй сообщение пользователя "
-                            "как positive, neutral или negative. Возвращай JSON вида "
-                            '{"label":"positive|neutral|negative","confidence":0.0-1.0}. '
-                            "Если сообщение без текста, вложение или sticker — выбирай neutral "
-                            "с confidence 0.0. Не добавляй никакого другого текста."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Сообщение пользователя:\n{job.text}",
-                    },
-                ],
-            )
-            payload = self._extract_json_response(response)
-            label_value = str(payload.get("label", "neutral")).strip().lower()
-            confidence_raw = payload.get("confidence", 0.0)
-            try:
-                label = SentimentLabel(label_value)
-            except ValueError:
-                label = SentimentLabel.NEUTRAL
-            confidence = self._clamp_confidence(confidence_raw)
-            return SentimentResult(
+    async def _classify(self, job: SentimentJob) -> SentimentResult:
+        """Classify a single message using quick rules or LLM."""
+        return (await self._classify_batch([job]))[0]
+
+    async def _classify_batch(self, jobs: list[SentimentJob]) -> list[SentimentResult]:
+        """Classify messages with quick rules, sending the rest to the LLM together."""
+        results: list[Optional[SentimentResult]] = [None] * len(jobs)
+        auto_enabled = await self.is_auto_enabled()
+        pending: list[int] = []
+        for index, job in enumerate(jobs):
+            if not job.text:
+                results[index] = self._neutral_result("rule:empty")
+            elif not auto_enabled:
+                results[index] = self._neutral_result("disabled")
+            elif self._client is None:
+                results[index] = self._neutral_result("fallback:no_api_key")
+            else:
+                pending.append(index)
+
+        if pending:
+            pending = await self._apply_cached(jobs, pending, results)
+        if pending:
+            classified = await self._classify_with_llm([jobs[index] for index in pending])
+            for index, result in zip(pending, classified):
+                results[index] = result
+            await self._cache_results([jobs[index] for index in pending], classified)
+        return results  # type: ignore[return-value]
+
+    def _cache_key(self, text: str) -> str:
+        model = settings.llm_model or self.DEFAULT_MODEL
+        return llm_cache.key("sentiment", model, BATCH_PROMPT_VERSION, text)
+
+    async def _apply_cached(
+        self,
+        jobs: list[SentimentJob],
+        pending: list[int],
+        results: list[Optional[SentimentResult]],
+    ) -> list[int]:
+        """Fill ``results`` from the LLM cache; return the indices still to classify."""
+        cached = await llm_cache.get_many(
+            "sentiment", [self._cache_key(jobs[index].text) for index in pending]
+        )
+        remaining: list[int] = []
+        for index, value in zip(pending, cached):
+            if value is MISS:
+                remaining.append(index)
+                continue
+            label = SentimentLabel(value["label"])
+            results[index] = SentimentResult(
                 label=label,
                 score=label.score,
-                confidence=confidence,
-                model=response.model or settings.llm_model or self.DEFAULT_MODEL,
-                raw=payload,
+                confidence=value["confidence"],
+                model=value["model"],
+                raw=value,
             )
-        except (openai.APIError, openai.APIConnectionError, openai.RateLimitError) as api_exc:
+        return remaining
+
+    async def _cache_results(
+        self, jobs: list[SentimentJob], results: list[SentimentResult]
+    ) -> None:
+        """Remember LLM verdicts; fallbacks are retried and never cached."""
+        items = {
+            self._cache_key(job.text): {
+                "label": result.label.value,
+                "confidence": result.confidence,
+                "model": result.model,
+            }
+            for job, result in zip(jobs, results)
+            if not result.model.startswith("fallback:")
+        }
+        await llm_cache.set_many("sentiment", items)
+
+    async def _classify_with_llm(self, jobs: list[SentimentJob]) -> list[SentimentResult]:
+        """Classify a batch in one request, splitting it when the response is unusable.
+
+        Transient API failures (rate limit, connection) fail the whole batch
+        because smaller requests would not help. Request errors, malformed
+        output and missing ids split the affected items in halves so one bad
+        message cannot poison the others.
+        """
+        try:
+            parsed = await self._request_batch(jobs)
+            failure_model = "fallback:incomplete"
+        except (openai.RateLimitError, openai.APIConnectionError, CircuitOpenError) as api_exc:
+            SENTIMENT_LLM_REQUESTS.labels(status="unavailable").inc()
             self._logger.warning(
                 "sentiment_llm_api_error",
                 error=str(api_exc),
-                user_id=job.user_id,
+                size=len(jobs),
+                user_ids=[job.user_id for job in jobs],
             )
-            return SentimentResult(
-                label=SentimentLabel.NEUTRAL,
-                score=SentimentLabel.NEUTRAL.score,
-                confidence=0.0,
-                model="fallback:api_error",
+            return [self._neutral_result("fallback:api_error") for _ in jobs]
+        except openai.APIError as api_exc:
+            SENTIMENT_LLM_REQUESTS.labels(status="error").inc()
+            self._logger.warning(
+                "sentiment_llm_api_error",
+                error=str(api_exc),
+                size=len(jobs),
+                user_ids=[job.user_id for job in jobs],
             )
+            parsed, failure_model = {}, "fallback:api_error"
         except Exception as exc:  # pragma: no cover - defensive
+            SENTIMENT_LLM_REQUESTS.labels(status="error").inc()
             self._logger.error(
                 "sentiment_llm_failure",
                 error=str(exc),
-                user_id=job.user_id,
+                size=len(jobs),
+                user_ids=[job.user_id for job in jobs],
                 exc_info=True,
             )
-            return SentimentResult(
-                label=SentimentLabel.NEUTRAL,
-                score=SentimentLabel.NEUTRAL.score,
-                confidence=0.0,
-                model="fallback:exception",
+            parsed, failure_model = {}, "fallback:exception"
+
+        missing = [index for index in range(len(jobs)) if index not in parsed]
+        if missing:
+            if len(jobs) == 1:
+                parsed[0] = self._neutral_result(failure_model)
+            else:
+                SENTIMENT_BATCH_SPLITS.inc()
+                middle = (len(missing) + 1) // 2
+                groups = [group for group in (missing[:middle], missing[middle:]) if group]
+                retried = await asyncio.gather(
+                    *(self._classify_with_llm([jobs[index] for index in group]) for group in groups)
+                )
+                for group, group_results in zip(groups, retried):
+                    for index, result in zip(group, group_results):
+                        parsed[index] = result
+
+        return [parsed[index] for index in range(len(jobs))]
+
+    async def _request_batch(self, jobs: list[SentimentJob]) -> dict[int, SentimentResult]:
+        """Send one structured request; return results keyed by position in ``jobs``."""
+        model = settings.llm_model or self.DEFAULT_MODEL
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": json.dumps(
+                    {"messages": [{"id": index, "text": job.text} for index, job in enumerate(jobs)]},
+                    ensure_ascii=False,
+                ),
+            },
+        ]
+        response = await openai_clients.call(
+            "chat",
+            model,
+            lambda: self._client.chat.completions.create(
+                model=model,
+                temperature=0,
+                max_tokens=20 + 30 * len(jobs),
+                response_format={"type": "json_object"},
+                messages=messages,
+            ),
+        )
+        usage = getattr(response, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if isinstance(total_tokens, int):
+            SENTIMENT_LLM_TOKENS.inc(total_tokens)
+
+        payload = self._extract_json_response(response)
+        items = payload.get("results") if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            items = []
+        model_name = getattr(response, "model", None) or model
+
+        parsed: dict[int, SentimentResult] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < len(jobs) or index in parsed:
+                continue
+            label_value = str(item.get("label", "neutral")).strip().lower()
+            try:
+                label = SentimentLabel(label_value)
+            except ValueError:
+                label = SentimentLabel.NEUTRAL
+            parsed[index] = SentimentResult(
+                label=label,
+                score=label.score,
+                confidence=self._clamp_confidence(item.get("confidence", 0.0)),
+                model=model_name,
+                raw=item,
             )
 
+        SENTIMENT_LLM_REQUESTS.labels(
+            status="ok" if len(parsed) == len(jobs) else "incomplete"
+        ).inc()
+        return parsed
+
+    @staticmethod
+    def _neutral_result(model: str) -> SentimentResult:
+        return SentimentResult(
+            label=SentimentLabel.NEUTRAL,
+            score=SentimentLabel.NEUTRAL.score,
+            confidence=0.0,
+            model=model,
+        )
+
     async def _store_result(
         self,
         session: AsyncSession,
         job: SentimentJob,
         result: SentimentResult,
-    ) -> None:
-        """Persist audit record and update user aggregates."""
+    ) -> Optional[dict[str, int]]:
+        """Persist the audit record and return the aggregate increments it implies.
+
+        The increments go through the write-behind activity buffer, which applies
+        them as ``col = col + delta``; the user row is never loaded here.
+        """
         entry = UserMessageScore(
             user_id=job.user_id,
             message_id=job.message_id,
@@ -383,64 +754,29 @@ class SentimentService:
             confidence=result.confidence,
             hash=job.hash_value,
         )
-        session.add(entry)
         try:
-            await session.flush()
+            async with session.begin_nested():
+                session.add(entry)
+                await session.flush()
         except IntegrityError:
-            await session.rollback()
             self._logger.debug(
                 "sentiment_integrity_skipped",
                 user_id=job.user_id,
                 message_id=job.message_id,
             )
-            return
+            return None
 
-        user = await session.get(User, job.user_id)
-        if user is None:
-            self._logger.warning("sentiment_user_missing", user_id=job.user_id)
-            return
-
-        user.counter = (user.counter or 0) + result.score
         if result.label is SentimentLabel.POSITIVE:
-            user.pos_count = (user.pos_count or 0) + 1
+            label_field = "pos_count"
         elif result.label is SentimentLabel.NEGATIVE:
-            user.neg_count = (user.neg_count or 0) + 1
+            label_field = "neg_count"
         else:
-            user.neu_count = (user.neu_count or 0) + 1
-        user.scored_total = (user.scored_total or 0) + 1
-
-        await self._update_lead_level(session, user)
-        await session.flush()
-
-    async def _update_lead_level(self, session: AsyncSession, user: User) -> None:
-        """Recalculate lead level percent when enough data collected."""
-        if (user.scored_total or 0) < 10:
-            user.lead_level_percent = None
-            user.lead_level_updated_at = None
-            return
-
-        scores_stmt = (
-            select(UserMessageScore.score)
-            .where(UserMessageScore.user_id == user.id)
-            .order_by(UserMessageScore.evaluated_at.desc())
-            .limit(10)
-        )
-        results = await session.execute(scores_stmt)
-        last_ten = [row[0] for row in results.fetchall()]
-        if len(last_ten) < 10:
-            user.lead_level_percent = None
-            user.lead_level_updated_at = None
-            return
+            label_field = "neu_count"
+        return {"counter": result.score, label_field: 1, "scored_total": 1}
 
-        avg = sum(last_ten) / 10
-        percent = round(((avg + 1) / 2) * 100)
-        percent = max(0, min(100, percent))
-        user.lead_level_percent = percent
-        user.lead_level_updated_at = datetime.now(timezone.utc)
-
-    async def _reconcile_batch(self, session: AsyncSession, batch_size: int) -> None:
-        """Reconcile aggregates with user_message_scores audit records."""
-        aggregates_stmt = (
+    async def _reconcile_users(self, session: AsyncSession, user_ids: list[int]) -> None:
+        """Rewrite the aggregates of ``user_ids`` from their user_message_scores rows."""
+        aggregates = await session.execute(
             select(
                 UserMessageScore.user_id,
                 func.count().label("total"),
@@ -454,24 +790,28 @@ class SentimentService:
                     case((UserMessageScore.label == SentimentLabel.NEGATIVE.value, 1), else_=0)
                 ).label("neg"),
                 func.sum(UserMessageScore.score).label("net"),
-                func.max(UserMessageScore.evaluated_at).label("last_scored"),
             )
+            .where(UserMessageScore.user_id.in_(user_ids))
             .group_by(UserMessageScore.user_id)
-            .order_by(func.max(UserMessageScore.evaluated_at).desc())
-            .limit(batch_size)
         )
-
-        aggregates = await session.execute(aggregates_stmt)
-        for row in aggregates:
-            user = await session.get(User, row.user_id)
-            if user is None:
-                continue
-            user.pos_count = row.pos or 0
-            user.neu_count = row.neu or 0
-            user.neg_count = row.neg or 0
-            user.scored_total = row.total or 0
-            user.counter = row.net or 0
-            await self._update_lead_level(session, user)
+        rows = {row.user_id: row for row in aggregates}
+
+        params = []
+        # Fixed row order keeps concurrent writers from deadlocking each other.
+        for user_id in sorted(user_ids):
+            row = rows.get(user_id)
+            params.append(
+                {
+                    "b_id": user_id,
+                    "b_counter": (row.net or 0) if row else 0,
+                    "b_pos_count": (row.pos or 0) if row else 0,
+                    "b_neu_count": (row.neu or 0) if row else 0,
+                    "b_neg_count": (row.neg or 0) if row else 0,
+                    "b_scored_total": (row.total or 0) if row else 0,
+                }
+            )
+        await session.execute(_RECONCILE_STMT, params)
+        await session.execute(_LEAD_LEVEL_STMT, {"user_ids": sorted(user_ids)})
 
     def _extract_json_response(self, response: Any) -> dict[str, Any]:
         """Extract JSON payload from OpenAI response object."""
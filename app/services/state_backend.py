@@ -0,0 +1,327 @@
+"""Pluggable key-value backends for conversation state shared between processes."""
+
+from __future__ import annotations
+
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import structlog
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from app.config import settings
+from app.services.redis_service import redis_service
+
+logger = structlog.get_logger(__name__)
+
+
+class StateBackend(ABC):
+    """Minimal atomic key-value contract used by FSM storage and manual dialogs."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the value stored under ``key``."""
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """Store ``value`` under ``key`` with an optional TTL in seconds."""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Remove the given keys."""
+
+    @abstractmethod
+    async def expire(self, ttl: int, *keys: str) -> None:
+        """Reset the TTL of existing keys."""
+
+    @abstractmethod
+    async def set_many_if_absent(
+        self, mapping: Mapping[str, str], ttl: Optional[int] = None
+    ) -> Dict[str, str]:
+        """Atomically store all keys only if none of them exists.
+
+        Returns the existing values of conflicting keys; an empty dict means
+        the values were written.
+        """
+
+    @abstractmethod
+    async def delete_many_if_equal(self, mapping: Mapping[str, str]) -> int:
+        """Atomically delete every key whose current value equals the expected one."""
+
+    async def close(self) -> None:
+        """Release backend resources."""
+
+
+class MemoryStateBackend(StateBackend):
+    """Process-local backend; operations never await, so they are atomic in the event loop."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._writes = 0
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _store(self, key: str, value: str, ttl: Optional[int]) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, (_, expires_at) in self._data.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        for key in expired:
+            del self._data[key]
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._lookup(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self._store(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def expire(self, ttl: int, *keys: str) -> None:
+        for key in keys:
+            value = self._lookup(key)
+            if value is not None:
+                self._data[key] = (value, time.monotonic() + ttl)
+
+    async def set_many_if_absent(
+        self, mapping: Mapping[str, str], ttl: Optional[int] = None
+    ) -> Dict[str, str]:
+        existing = {key: value for key in mapping if (value := self._lookup(key)) is not None}
+        if existing:
+            return existing
+        for key, value in mapping.items():
+            self._store(key, value, ttl)
+        return {}
+
+    async def delete_many_if_equal(self, mapping: Mapping[str, str]) -> int:
+        deleted = 0
+        for key, expected in mapping.items():
+            if self._lookup(key) == expected:
+                del self._data[key]
+                deleted += 1
+        return deleted
+
+
+_SET_MANY_IF_ABSENT_LUA = """
+local existing = {}
+for _, key in ipairs(KEYS) do
+    local value = redis.call('GET', key)
+    if value then
+        table.insert(existing, key)
+        table.insert(existing, value)
+    end
+end
+if #existing > 0 then
+    return existing
+end
+local ttl = tonumber(ARGV[#KEYS + 1])
+for i, key in ipairs(KEYS) do
+    if ttl > 0 then
+        redis.call('SET', key, ARGV[i], 'EX', ttl)
+    else
+        redis.call('SET', key, ARGV[i])
+    end
+end
+return existing
+"""
+
+_DELETE_MANY_IF_EQUAL_LUA = """
+local deleted = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[i] then
+        redis.call('DEL', key)
+        deleted = deleted + 1
+    end
+end
+return deleted
+"""
+
+
+class RedisStateBackend(StateBackend):
+    """Backend on top of the shared ``RedisService`` pool; multi-key ops run as Lua scripts."""
+
+    def __init__(self, prefix: str = "state") -> None:
+        self.prefix = prefix
+        self._scripts: Dict[str, Any] = {}
+        self._scripts_client: Any = None
+
+    def _client(self):
+        client = redis_service.get_client()
+        if client is None:
+            raise RuntimeError("Redis is not initialized; cannot use redis state backend")
+        return client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _script(self, name: str, source: str):
+        client = self._client()
+        if client is not self._scripts_client:
+            self._scripts = {}
+            self._scripts_client = client
+        script = self._scripts.get(name)
+        if script is None:
+            script = client.register_script(source)
+            self._scripts[name] = script
+        return script
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client().get(self._key(key))
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        await self._client().set(self._key(key), value, ex=ttl or None)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client().delete(*(self._key(key) for key in keys))
+
+    async def expire(self, ttl: int, *keys: str) -> None:
+        if not keys:
+            return
+        async with self._client().pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.expire(self._key(key), ttl)
+            await pipe.execute()
+
+    async def set_many_if_absent(
+        self, mapping: Mapping[str, str], ttl: Optional[int] = None
+    ) -> Dict[str, str]:
+        keys = list(mapping)
+        script = self._script("set_many_if_absent", _SET_MANY_IF_ABSENT_LUA)
+        raw = await script(
+            keys=[self._key(key) for key in keys],
+            args=[mapping[key] for key in keys] + [int(ttl or 0)],
+        )
+        prefix_len = len(self.prefix) + 1
+        return {raw[i][prefix_len:]: raw[i + 1] for i in range(0, len(raw), 2)}
+
+    async def delete_many_if_equal(self, mapping: Mapping[str, str]) -> int:
+        keys = list(mapping)
+        script = self._script("delete_many_if_equal", _DELETE_MANY_IF_EQUAL_LUA)
+        return int(
+            await script(
+                keys=[self._key(key) for key in keys],
+                args=[mapping[key] for key in keys],
+            )
+        )
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(payload: Dict[str, Any]) -> Any:
+    if len(payload) == 1:
+        if "__datetime__" in payload:
+            return datetime.fromisoformat(payload["__datetime__"])
+        if "__date__" in payload:
+            return date.fromisoformat(payload["__date__"])
+        if "__decimal__" in payload:
+            return Decimal(payload["__decimal__"])
+    return payload
+
+
+def dump_state_data(data: Dict[str, Any]) -> str:
+    """Serialize FSM data, keeping datetimes and decimals round-trippable."""
+    return json.dumps(data, default=_encode_value, ensure_ascii=False)
+
+
+def load_state_data(raw: Optional[str]) -> Dict[str, Any]:
+    """Inverse of :func:`dump_state_data`."""
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=_decode_object)
+
+
+class StateBackendStorage(BaseStorage):
+    """aiogram FSM storage that keeps state and data in a :class:`StateBackend`."""
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        key_builder: Optional[KeyBuilder] = None,
+        state_ttl: Optional[int] = None,
+        data_ttl: Optional[int] = None,
+    ) -> None:
+        self.backend = backend
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix="fsm")
+        self.state_ttl = state_ttl
+        self.data_ttl = data_ttl
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key, "state")
+        if state is None:
+            await self.backend.delete(storage_key)
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.backend.set(storage_key, value, ttl=self.state_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.backend.get(self.key_builder.build(key, "state"))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.backend.delete(storage_key)
+            return
+        await self.backend.set(storage_key, dump_state_data(data), ttl=self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return load_state_data(await self.backend.get(self.key_builder.build(key, "data")))
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def build_state_backend(kind: str) -> StateBackend:
+    """Create the backend configured by ``STATE_BACKEND``."""
+    if kind == "redis":
+        return RedisStateBackend()
+    if kind != "memory":
+        logger.warning("unknown_state_backend", backend=kind, fallback="memory")
+    return MemoryStateBackend()
+
+
+state_backend = build_state_backend(settings.state_backend)
+
+__all__ = [
+    "StateBackend",
+    "MemoryStateBackend",
+    "RedisStateBackend",
+    "StateBackendStorage",
+    "build_state_backend",
+    "dump_state_data",
+    "load_state_data",
+    "state_backend",
+]
@@ -5,9 +5,8 @@ from typing import Optional
 
 import structlog
 from aiogram import Bot
-from openai import AsyncOpenAI
-
 from app.config import settings
+from app.services.openai_client import get_openai_client, openai_clients
 
 logger = structlog.get_logger()
 
@@ -18,7 +17,7 @@ class SttService:
     def __init__(self):
         if not settings.openai_api_key:
             raise ValueError("OpenAI API key is not configured.")
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = get_openai_client()
         self.logger = structlog.get_logger()
 
     async def transcribe_audio(
@@ -50,9 +49,13 @@ class SttService:
             audio_buffer = BytesIO(file_content.read())
             audio_buffer.name = "voice.ogg"
 
-            response = await self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_buffer,
+            response = await openai_clients.call(
+                "audio",
+                "whisper-1",
+                lambda: self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_buffer,
+                ),
             )
             
             transcribed_text = response.text
@@ -0,0 +1,197 @@
+"""Per-chat coalescing of rapid user messages into one dialog turn.
+
+Users often split one thought over several short messages. Instead of
+running the intent checks and a full LLM generation for each of them,
+``TurnCoalescer`` waits until a chat has been quiet for
+``DIALOG_DEBOUNCE_SECONDS`` (but no longer than ``DIALOG_DEBOUNCE_MAX_WAIT``
+after the first message) and runs a single turn for the whole burst.
+
+A message that arrives while a turn is still generating cancels it, and the
+next turn answers the cancelled messages too, so only the latest reply is
+delivered. Once a turn starts delivering (``Turn.claim``) it is no longer
+cancelled; the following turn waits for it to finish.
+
+Turns run in background tasks, so the update handler returns at once and a
+per-chat ordered update queue is free to deliver the next message.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+
+logger = structlog.get_logger(__name__)
+
+DIALOG_LLM_CALLS_SAVED = Counter(
+    "dialog_llm_calls_saved_total",
+    "Dialog turns (intent checks and LLM generation) avoided by merging messages",
+)
+DIALOG_GENERATIONS_CANCELLED = Counter(
+    "dialog_generations_cancelled_total",
+    "In-flight dialog turns cancelled because a newer message arrived",
+)
+DIALOG_TURNS = Counter(
+    "dialog_turns_total",
+    "Coalesced dialog turns by outcome",
+    ["outcome"],
+)
+DIALOG_TURN_MESSAGES = Histogram(
+    "dialog_turn_messages",
+    "User messages answered by one dialog turn",
+    buckets=(1, 2, 3, 4, 5, 8, 13),
+)
+
+
+@dataclass(slots=True)
+class Turn:
+    """Messages of one chat answered together."""
+
+    chat_id: int
+    texts: List[str]
+    claimed: bool = False
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.texts)
+
+    def claim(self) -> None:
+        """Mark the start of delivery; newer messages no longer cancel this turn."""
+        self.claimed = True
+
+
+TurnRunner = Callable[[Turn], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class _ChatState:
+    texts: List[str] = field(default_factory=list)
+    first_at: float = 0.0
+    runner: Optional[TurnRunner] = None
+    timer: Optional[asyncio.Task[None]] = None
+    turn: Optional[Turn] = None
+    task: Optional[asyncio.Task[None]] = None
+
+
+class TurnCoalescer:
+    """Debounce user messages per chat and run one turn per burst."""
+
+    def __init__(
+        self,
+        window: float,
+        max_wait: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = max(0.0, window)
+        self.max_wait = max(self.window, max_wait)
+        self._clock = clock
+        self._chats: Dict[int, _ChatState] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def submit(self, chat_id: int, text: str, runner: TurnRunner) -> None:
+        """Add a message to the chat's next turn; ``runner`` of the latest message runs it."""
+        now = self._clock()
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState()
+
+        if state.texts:
+            DIALOG_LLM_CALLS_SAVED.inc()
+        else:
+            state.first_at = now
+
+        turn = state.turn
+        if turn is not None and not turn.claimed and state.task is not None and not state.task.done():
+            # The reply being generated is already stale: answer its messages
+            # together with the new one instead.
+            state.task.cancel()
+            state.turn = None
+            state.texts[:0] = turn.texts
+            state.first_at = now
+            DIALOG_GENERATIONS_CANCELLED.inc()
+
+        state.texts.append(text)
+        state.runner = runner
+        if state.timer is not None:
+            state.timer.cancel()
+        delay = max(0.0, min(self.window, state.first_at + self.max_wait - now))
+        state.timer = asyncio.create_task(
+            self._start_later(chat_id, state, delay), name=f"dialog-turn-timer-{chat_id}"
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drop pending bursts, cancel undelivered turns and wait for deliveries."""
+        tasks = []
+        for state in self._chats.values():
+            if state.timer is not None:
+                state.timer.cancel()
+            if state.task is not None and not state.task.done():
+                if state.turn is None or not state.turn.claimed:
+                    state.task.cancel()
+                tasks.append(state.task)
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._chats.clear()
+
+    async def _start_later(self, chat_id: int, state: _ChatState, delay: float) -> None:
+        await asyncio.sleep(delay)
+        turn = Turn(chat_id=chat_id, texts=state.texts)
+        state.texts = []
+        state.timer = None
+        previous = state.task
+        state.turn = turn
+        state.task = asyncio.create_task(
+            self._run(chat_id, state, turn, state.runner, previous),
+            name=f"dialog-turn-{chat_id}",
+        )
+
+    async def _run(
+        self,
+        chat_id: int,
+        state: _ChatState,
+        turn: Turn,
+        runner: TurnRunner,
+        previous: Optional[asyncio.Task[None]],
+    ) -> None:
+        try:
+            if previous is not None and not previous.done():
+                # A delivering turn is never interleaved with the next one.
+                await asyncio.wait({previous})
+            DIALOG_TURN_MESSAGES.observe(len(turn.texts))
+            await runner(turn)
+            DIALOG_TURNS.labels("completed").inc()
+        except asyncio.CancelledError:
+            DIALOG_TURNS.labels("cancelled").inc()
+            raise
+        except Exception as exc:
+            DIALOG_TURNS.labels("failed").inc()
+            logger.error("dialog_turn_failed", chat_id=chat_id, error=str(exc), exc_info=True)
+        finally:
+            if state.turn is turn:
+                state.turn = None
+                if not state.texts and state.timer is None and self._chats.get(chat_id) is state:
+                    del self._chats[chat_id]
+
+
+turn_coalescer = TurnCoalescer(
+    window=settings.dialog_debounce_seconds,
+    max_wait=settings.dialog_debounce_max_wait,
+)
+
+__all__ = [
+    "Turn",
+    "TurnCoalescer",
+    "turn_coalescer",
+]
@@ -0,0 +1,242 @@
+"""Background processing of webhook updates with per-chat ordering."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
+
+UpdateHandler = Callable[[Any], Awaitable[Any]]
+
+UPDATE_QUEUE_DEPTH = Gauge(
+    "webhook_update_queue_depth",
+    "Updates accepted by the webhook and not yet processed",
+)
+UPDATE_QUEUE_WAIT = Histogram(
+    "webhook_update_queue_wait_seconds",
+    "Time an update spends in the queue before a worker picks it up",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPDATE_WORKERS_BUSY = Gauge(
+    "webhook_update_workers_busy",
+    "Workers currently processing an update",
+)
+UPDATE_WORKERS_TOTAL = Gauge(
+    "webhook_update_workers_total",
+    "Size of the webhook worker pool",
+)
+UPDATE_QUEUE_REJECTED = Counter(
+    "webhook_update_queue_rejected_total",
+    "Updates rejected because the queue was full or stopped",
+)
+UPDATE_PROCESSED = Counter(
+    "webhook_updates_processed_total",
+    "Updates processed by the worker pool",
+    ["status"],
+)
+
+_CHAT_CARRIERS = (
+    "message",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+    "business_message",
+    "edited_business_message",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "message_reaction",
+    "message_reaction_count",
+    "chat_boost",
+    "removed_chat_boost",
+)
+
+
+def extract_chat_key(update_data: Dict[str, Any]) -> Optional[int]:
+    """Return the chat (or sender) id updates must be serialized on."""
+    for carrier in _CHAT_CARRIERS:
+        payload = update_data.get(carrier)
+        if isinstance(payload, dict):
+            chat = payload.get("chat")
+            if isinstance(chat, dict) and chat.get("id") is not None:
+                return chat["id"]
+
+    callback = update_data.get("callback_query")
+    if isinstance(callback, dict):
+        message = callback.get("message")
+        if isinstance(message, dict):
+            chat = message.get("chat")
+            if isinstance(chat, dict) and chat.get("id") is not None:
+                return chat["id"]
+        sender = callback.get("from")
+        if isinstance(sender, dict) and sender.get("id") is not None:
+            return sender["id"]
+
+    for payload in update_data.values():
+        if isinstance(payload, dict):
+            sender = payload.get("from") or payload.get("user")
+            if isinstance(sender, dict) and sender.get("id") is not None:
+                return sender["id"]
+    return None
+
+
+@dataclass(slots=True)
+class _QueuedUpdate:
+    """Update waiting in a chat lane."""
+
+    payload: Any
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class UpdateQueue:
+    """Bounded worker pool that keeps updates of one chat in order.
+
+    Each chat gets its own FIFO lane. A lane is handed to at most one worker
+    at a time, so updates of the same chat never overlap while different
+    chats are processed concurrently.
+    """
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.logger = structlog.get_logger(__name__)
+        self._lanes: Dict[Hashable, Deque[_QueuedUpdate]] = {}
+        self._ready: "asyncio.Queue[Hashable]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[UpdateHandler] = None
+        self._pending = 0
+        self._busy = 0
+        self._accepting = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._anonymous_seq = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of accepted updates that are not finished yet."""
+        return self._pending
+
+    @property
+    def busy(self) -> int:
+        """Number of workers currently running a handler."""
+        return self._busy
+
+    @property
+    def is_running(self) -> bool:
+        """Return True while the pool accepts updates."""
+        return self._accepting
+
+    def start(self, handler: UpdateHandler) -> None:
+        """Spawn worker tasks that feed updates into ``handler``."""
+        if self._tasks:
+            return
+        self._handler = handler
+        self._accepting = True
+        for index in range(self.workers):
+            self._tasks.append(
+                asyncio.create_task(self._worker(index), name=f"update-worker-{index}")
+            )
+        UPDATE_WORKERS_TOTAL.set(self.workers)
+        self.logger.info(
+            "update_queue_started", workers=self.workers, max_pending=self.max_pending
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting updates, drain what is queued and cancel workers."""
+        if not self._tasks:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("update_queue_drain_timeout", pending=self._pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._lanes.clear()
+        self._ready = asyncio.Queue()
+        self._pending = 0
+        self._busy = 0
+        self._idle.set()
+        UPDATE_QUEUE_DEPTH.set(0)
+        UPDATE_WORKERS_BUSY.set(0)
+        UPDATE_WORKERS_TOTAL.set(0)
+        self.logger.info("update_queue_stopped")
+
+    def enqueue(self, payload: Any, chat_key: Optional[Hashable]) -> bool:
+        """Queue an update; return False when it cannot be accepted."""
+        if not self._accepting or self._pending >= self.max_pending:
+            UPDATE_QUEUE_REJECTED.inc()
+            return False
+
+        if chat_key is None:
+            # Updates without a chat have nothing to be ordered against.
+            self._anonymous_seq += 1
+            chat_key = ("anonymous", self._anonymous_seq)
+
+        lane = self._lanes.get(chat_key)
+        if lane is None:
+            lane = deque()
+            self._lanes[chat_key] = lane
+            self._ready.put_nowait(chat_key)
+        lane.append(_QueuedUpdate(payload=payload))
+
+        self._pending += 1
+        self._idle.clear()
+        UPDATE_QUEUE_DEPTH.set(self._pending)
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            chat_key = await self._ready.get()
+            lane = self._lanes.get(chat_key)
+            if not lane:
+                self._lanes.pop(chat_key, None)
+                continue
+
+            item = lane.popleft()
+            UPDATE_QUEUE_WAIT.observe(time.monotonic() - item.enqueued_at)
+            self._busy += 1
+            UPDATE_WORKERS_BUSY.set(self._busy)
+            try:
+                await self._handler(item.payload)
+                UPDATE_PROCESSED.labels(status="ok").inc()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                UPDATE_PROCESSED.labels(status="error").inc()
+                self.logger.error(
+                    "update_processing_failed",
+                    worker=index,
+                    chat_key=str(chat_key),
+                    error=str(exc),
+                    exc_info=True,
+                )
+            finally:
+                self._busy -= 1
+                self._pending -= 1
+                UPDATE_WORKERS_BUSY.set(self._busy)
+                UPDATE_QUEUE_DEPTH.set(self._pending)
+                if lane:
+                    # Requeue at the tail so one chatty user cannot starve others.
+                    self._ready.put_nowait(chat_key)
+                else:
+                    self._lanes.pop(chat_key, None)
+                if self._pending == 0:
+                    self._idle.set()
+
+
+update_queue = UpdateQueue(
+    workers=settings.webhook_workers,
+    max_pending=settings.webhook_queue_size,
+)
+
+__all__ = ["UpdateQueue", "extract_chat_key", "update_queue"]
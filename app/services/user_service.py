@@ -1,10 +1,11 @@
 """User service for business logic operations."""
 
-from typing import Optional, Dict
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
 
 
 import structlog
-from sqlalchemy import select, delete
+from sqlalchemy import Select, select, delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import (
@@ -21,6 +22,45 @@ from app.models import (
 from app.repositories.user_repository import UserRepository
 
 
+# (created_at, id) of the oldest message of a history page.
+HistoryCursor = Tuple[datetime, int]
+
+
+def normalize_message_role(role: str) -> MessageRole:
+    """Map a caller's role name ("assistant", "bot", ...) to the stored ``MessageRole``."""
+    try:
+        return MessageRole(role)
+    except ValueError:
+        return MessageRole.BOT if role in {"bot", "assistant"} else MessageRole.USER
+
+
+def conversation_history_stmt(
+    user_id: int,
+    limit: int,
+    before: Optional[HistoryCursor] = None,
+) -> Select:
+    """Newest ``limit`` messages of a user older than ``before``.
+
+    Rows come in (created_at, id) DESC order straight from the
+    ix_messages_user_created index, so any page costs one short range scan.
+    The plain created_at bound lets monthly partitions newer than the
+    cursor be pruned; the row comparison alone cannot.
+    """
+    stmt = select(
+        Message.id,
+        Message.role,
+        Message.text,
+        Message.meta,
+        Message.created_at,
+    ).where(Message.user_id == user_id)
+    if before is not None:
+        stmt = stmt.where(
+            Message.created_at <= before[0],
+            tuple_(Message.created_at, Message.id) < tuple_(*before),
+        )
+    return stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+
+
 class UserService:
     """Service for user-related business logic."""
     
@@ -134,8 +174,12 @@ class UserService:
                 rowcount = 0
             stats[label] = rowcount
 
-        await self.session.delete(user)
-        await self.session.flush()
+        # A Core DELETE: the ORM would first load every relationship of the
+        # user (loader profiles refuse that); the remaining child rows go
+        # through ON DELETE CASCADE.
+        if user in self.session:
+            self.session.expunge(user)
+        await self.session.execute(delete(User).where(User.id == user_id))
         stats["user"] = 1
 
         self.logger.info("User data purged", user_id=user_id, stats=stats)
@@ -155,37 +199,44 @@ class UserService:
     async def get_conversation_history(self, user_id: int, limit: int = 10) -> list:
         """Get recent conversation history for user."""
         try:
-            stmt = (
-                select(Message)
-                .where(Message.user_id == user_id)
-                .order_by(Message.created_at.desc())
-                .limit(limit)
-            )
-            result = await self.session.execute(stmt)
-            messages = list(result.scalars())
-
-            history = []
-            for message_obj in reversed(messages):
-                role_value = (
-                    message_obj.role.value
-                    if isinstance(message_obj.role, MessageRole)
-                    else message_obj.role
-                )
-                history.append(
-                    {
-                        "role": role_value,
-                        "text": message_obj.text,
-                        "timestamp": message_obj.created_at,
-                        "meta": message_obj.meta or {},
-                    }
-                )
-
+            history, _ = await self.get_conversation_page(user_id, limit=limit)
             return history
 
         except Exception as e:
             self.logger.error("Error getting conversation history", error=str(e))
             return []
 
+    async def get_conversation_page(
+        self,
+        user_id: int,
+        limit: int = 10,
+        before: Optional[HistoryCursor] = None,
+    ) -> Tuple[List[dict], Optional[HistoryCursor]]:
+        """Return one page of history in chronological order and the cursor of the previous page.
+
+        Pass the returned cursor as ``before`` to read further back; it is None
+        once the beginning of the conversation is reached.
+        """
+        if limit <= 0:
+            return [], None
+        result = await self.session.execute(conversation_history_stmt(user_id, limit, before))
+        rows = result.all()
+
+        history = []
+        for row in reversed(rows):
+            role_value = row.role.value if isinstance(row.role, MessageRole) else row.role
+            history.append(
+                {
+                    "role": role_value,
+                    "text": row.text,
+                    "timestamp": row.created_at,
+                    "meta": row.meta or {},
+                }
+            )
+
+        cursor = (rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+        return history, cursor
+
     async def get_user_funnel_state(self, user_id: int) -> Optional[UserFunnelState]:
         """Get user funnel state."""
         try:
@@ -205,14 +256,9 @@ class UserService:
     ) -> bool:
         """Persist message to conversation history."""
         try:
-            try:
-                role_enum = MessageRole(role)
-            except ValueError:
-                role_enum = MessageRole.BOT if role in {"bot", "assistant"} else MessageRole.USER
-
             message_record = Message(
                 user_id=user_id,
-                role=role_enum,
+                role=normalize_message_role(role),
                 text=text,
                 meta=metadata or {},
             )
@@ -0,0 +1,47 @@
+"""Add analytics daily rollups.
+
+Revision ID: 3e9a6f1c4b27
+Revises: 8c41d7e2a9b3
+Create Date: 2025-10-29 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e9a6f1c4b27"
+down_revision: Union[str, None] = "8c41d7e2a9b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the rollup table and the delivery index used by period queries."""
+    op.create_table(
+        "analytics_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("metric", sa.String(length=64), nullable=False),
+        sa.Column("dimension", sa.String(length=100), nullable=False, server_default=""),
+        sa.Column("value", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("day", "metric", "dimension"),
+    )
+    op.create_index(
+        "ix_broadcast_deliveries_created_at",
+        "broadcast_deliveries",
+        ["created_at"],
+    )
+
+
+def downgrade() -> None:
+    """Drop analytics rollups."""
+    op.drop_index("ix_broadcast_deliveries_created_at", table_name="broadcast_deliveries")
+    op.drop_table("analytics_daily_rollups")
@@ -0,0 +1,38 @@
+"""Index user message scores by user and evaluation time.
+
+Revision ID: 5b2d8e4f7a13
+Revises: 3e9a6f1c4b27
+Create Date: 2025-11-03 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b2d8e4f7a13"
+down_revision: Union[str, None] = "3e9a6f1c4b27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Replace the plain user_id index with (user_id, evaluated_at) INCLUDE (score).
+
+    The unique (user_id, message_id) constraint already covers lookups by
+    user_id alone.
+    """
+    op.create_index(
+        "ix_user_message_scores_user_evaluated",
+        "user_message_scores",
+        ["user_id", "evaluated_at"],
+        postgresql_include=["score"],
+    )
+    op.drop_index("ix_user_message_scores_user_id", table_name="user_message_scores")
+
+
+def downgrade() -> None:
+    """Restore the plain user_id index."""
+    op.create_index("ix_user_message_scores_user_id", "user_message_scores", ["user_id"])
+    op.drop_index("ix_user_message_scores_user_evaluated", table_name="user_message_scores")
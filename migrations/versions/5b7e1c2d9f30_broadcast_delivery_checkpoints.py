@@ -0,0 +1,34 @@
+"""Track message ids and resume position for broadcast deliveries.
+
+Revision ID: 5b7e1c2d9f30
+Revises: 1fdb56327a6d, 22c07c66a3d4
+Create Date: 2025-10-27 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b7e1c2d9f30"
+down_revision: Union[str, None] = ("1fdb56327a6d", "22c07c66a3d4")
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add message_id and the keyset index used to stream pending deliveries."""
+    op.add_column("broadcast_deliveries", sa.Column("message_id", sa.BigInteger(), nullable=True))
+    op.create_index(
+        "ix_broadcast_deliveries_broadcast_status_id",
+        "broadcast_deliveries",
+        ["broadcast_id", "status", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Drop broadcast delivery checkpoint columns."""
+    op.drop_index("ix_broadcast_deliveries_broadcast_status_id", table_name="broadcast_deliveries")
+    op.drop_column("broadcast_deliveries", "message_id")
@@ -0,0 +1,45 @@
+"""Add an HNSW index for cosine search on sell_scripts.embedding.
+
+Revision ID: 8c41d7e2a9b3
+Revises: 5b7e1c2d9f30
+Create Date: 2025-10-28 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c41d7e2a9b3"
+down_revision: Union[str, None] = "5b7e1c2d9f30"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_sell_scripts_embedding_hnsw"
+
+
+def _pgvector_supports_hnsw() -> bool:
+    version = op.get_bind().execute(
+        sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    if not version:
+        return False
+    major, minor = (int(part) for part in version.split(".")[:2])
+    return (major, minor) >= (0, 5)
+
+
+def upgrade() -> None:
+    """Create the HNSW index when the installed pgvector supports it (0.5+)."""
+    if not _pgvector_supports_hnsw():
+        return
+    op.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON sell_scripts "
+        "USING hnsw (embedding vector_cosine_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Drop the HNSW index."""
+    op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
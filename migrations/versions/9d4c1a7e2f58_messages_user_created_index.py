@@ -0,0 +1,31 @@
+"""Index messages by user and creation time.
+
+Revision ID: 9d4c1a7e2f58
+Revises: 5b2d8e4f7a13
+Create Date: 2025-11-05 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d4c1a7e2f58"
+down_revision: Union[str, None] = "5b2d8e4f7a13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Serve per-user history reads ordered by (created_at, id) from one index range."""
+    op.create_index(
+        "ix_messages_user_created",
+        "messages",
+        ["user_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Drop the history index."""
+    op.drop_index("ix_messages_user_created", table_name="messages")
@@ -0,0 +1,164 @@
+"""Partition append-only tables by month.
+
+Revision ID: c4f8a2d6e913
+Revises: 9d4c1a7e2f58
+Create Date: 2025-11-10 10:00:00.000000
+"""
+
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f8a2d6e913"
+down_revision: Union[str, None] = "9d4c1a7e2f58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> partition key; mirrors app.services.partition_service.PARTITIONED_TABLES
+TABLES = (
+    ("events", "created_at"),
+    ("messages", "created_at"),
+    ("ab_events", "occurred_at"),
+    ("product_match_log", "matched_at"),
+)
+PREMAKE_MONTHS = 3
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _indexes(table: str):
+    """Secondary index definitions of ``table`` (the primary key is rebuilt separately)."""
+    return op.get_bind().execute(
+        sa.text(
+            """
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = current_schema()
+              AND i.tablename = :table
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint c
+                  WHERE c.conrelid = CAST(:table AS regclass)
+                    AND c.contype = 'p'
+                    AND c.conname = i.indexname
+              )
+            ORDER BY i.indexname
+            """
+        ),
+        {"table": table},
+    ).all()
+
+
+def _foreign_keys(table: str):
+    return op.get_bind().execute(
+        sa.text(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+            ORDER BY conname
+            """
+        ),
+        {"table": table},
+    ).all()
+
+
+def _primary_key(table: str):
+    return op.get_bind().scalar(
+        sa.text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"
+        ),
+        {"table": table},
+    )
+
+
+def _id_sequence(table: str):
+    return op.get_bind().scalar(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table})
+
+
+def upgrade() -> None:
+    """Turn each table into a monthly range-partitioned parent without copying rows.
+
+    Existing rows stay where they are: the old table is attached as the
+    ``<table>_legacy`` partition covering everything before next month, and
+    monthly partitions are created after it. PostgreSQL requires the partition
+    key in the primary key, so it becomes (id, <timestamp>); ids stay unique
+    through the shared sequence.
+    """
+    boundary = _add_months(
+        datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0), 1
+    )
+    for table, column in TABLES:
+        legacy = f"{table}_legacy"
+        indexes = _indexes(table)
+        foreign_keys = _foreign_keys(table)
+        primary_key = _primary_key(table)
+        sequence = _id_sequence(table)
+
+        op.execute(f"UPDATE {table} SET {column} = now() WHERE {column} IS NULL")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        if primary_key:
+            op.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {primary_key} TO {legacy}_pkey")
+        for name, _ in indexes:
+            op.execute(f"ALTER INDEX {name} RENAME TO {name}_legacy")
+
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({column})"
+        )
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})")
+        for _, definition in indexes:
+            op.execute(definition)
+        for name, definition in foreign_keys:
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        if sequence:
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')"
+        )
+        for offset in range(PREMAKE_MONTHS + 1):
+            start = _add_months(boundary, offset)
+            op.execute(
+                f"CREATE TABLE {table}_p{start:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_add_months(start, 1).isoformat()}')"
+            )
+
+
+def downgrade() -> None:
+    """Copy rows back into plain tables.
+
+    Partitions already detached into the archive schema are not restored.
+    """
+    for table, column in reversed(TABLES):
+        flat = f"{table}_flat"
+        indexes = _indexes(table)
+        foreign_keys = _foreign_keys(table)
+        sequence = _id_sequence(table)
+
+        op.execute(
+            f"CREATE TABLE {flat} (LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS)"
+        )
+        op.execute(f"INSERT INTO {flat} SELECT * FROM {table}")
+        if sequence:
+            # Re-own the sequence first, or dropping the parent drops it too.
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {flat}.id")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {flat} RENAME TO {table}")
+
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} DROP NOT NULL")
+        for _, definition in indexes:
+            op.execute(definition)
+        for name, definition in foreign_keys:
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
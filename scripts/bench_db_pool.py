@@ -0,0 +1,87 @@
+"""Load test: concurrent conversations against a small connection pool.
+
+Usage: python scripts/bench_db_pool.py [conversations] [pool_size] [external_wait_seconds]
+
+Each simulated update does what the dialog handler does: a couple of
+queries, a long external wait (LLM call + typing delay), then a write.
+"held" keeps the session's connection across the wait like the old
+middleware; "released" calls ``release_connection`` before waiting.
+Needs DATABASE_URL (or TEST_DATABASE_URL) pointing at PostgreSQL.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.db import InstrumentedAsyncQueuePool, release_connection  # noqa: E402
+
+POOL_TIMEOUT = 30.0
+
+
+async def conversation(factory, wait: float, release: bool, checkout_waits: list) -> bool:
+    async with factory() as session:
+        try:
+            started = time.perf_counter()
+            await session.execute(text("SELECT 1"))
+            checkout_waits.append(time.perf_counter() - started)
+            await session.execute(text("SELECT pg_sleep(0.005)"))
+            if release:
+                await release_connection(session)
+            await asyncio.sleep(wait)
+            started = time.perf_counter()
+            await session.execute(text("SELECT 1"))
+            checkout_waits.append(time.perf_counter() - started)
+            await session.commit()
+            return True
+        except PoolTimeoutError:
+            return False
+
+
+async def run(mode: str, conversations: int, pool_size: int, wait: float) -> None:
+    url = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("Set DATABASE_URL or TEST_DATABASE_URL")
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    checkout_waits: list = []
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(conversation(factory, wait, mode == "released", checkout_waits) for _ in range(conversations))
+    )
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    waits = sorted(checkout_waits) or [0.0]
+    p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+    print(
+        f"{mode:>8}: {conversations} conversations, pool={pool_size}, wait={wait}s -> "
+        f"{elapsed:6.2f}s total, {sum(results)} ok, "
+        f"effective concurrency {conversations * wait / elapsed:6.1f}, "
+        f"first-query wait p50={statistics.median(waits) * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+    )
+
+
+def main() -> None:
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    wait = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    for mode in ("held", "released"):
+        asyncio.run(run(mode, conversations, pool_size, wait))
+
+
+if __name__ == "__main__":
+    main()
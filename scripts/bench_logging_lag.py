@@ -0,0 +1,125 @@
+"""Event loop lag with interaction logging off, synchronous and queued.
+
+Usage: python scripts/bench_logging_lag.py [write_delay_ms] [updates_per_second]
+
+A stand-in for LoggingMiddleware emits two interaction records per update
+while a probe measures how late 5 ms sleeps wake up. ``write_delay_ms``
+simulates a slow disk (default 2 ms per write).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import structlog  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.logging_config import (  # noqa: E402
+    NonBlockingQueueHandler,
+    _russian_message_renderer,
+    build_queue_handler,
+    shutdown_logging,
+)
+from app.services.loop_lag import probe_loop_lag  # noqa: E402
+
+
+class SlowStream:
+    """File-like sink whose writes take ``delay`` seconds, like a saturated disk."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, _: str) -> None:
+        time.sleep(self.delay)
+        self.writes += 1
+
+    def flush(self) -> None:
+        pass
+
+
+SHARED_PROCESSORS = [
+    structlog.stdlib.add_log_level,
+    structlog.stdlib.add_logger_name,
+    structlog.processors.TimeStamper(fmt="%d.%m.%Y %H:%M:%S"),
+]
+
+
+def install(mode: str, delay: float):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    shutdown_logging()
+    if mode == "off":
+        root.setLevel(logging.WARNING)
+        return None, None
+
+    settings.log_async = mode != "sync"
+    settings.log_overflow_policy = "block" if mode == "queued-block" else "drop"
+    stream = SlowStream(delay)
+    sink = logging.StreamHandler(stream)
+    sink.setFormatter(
+        structlog.stdlib.ProcessorFormatter(
+            processor=_russian_message_renderer,
+            foreign_pre_chain=SHARED_PROCESSORS,
+        )
+    )
+    handler = build_queue_handler(sink)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return stream, handler
+
+
+async def simulate_updates(rate: float, duration: float) -> int:
+    log = structlog.get_logger("bot.interactions.middleware")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    updates = 0
+    while loop.time() < deadline:
+        bound = log.bind(request_id=str(updates), user_id=updates % 500, event_type="Message")
+        bound.info("Получено сообщение от пользователя", text="привет", content_type="text")
+        bound.info("Событие обработано успешно", status="успешно")
+        updates += 1
+        await asyncio.sleep(1 / rate)
+    return updates
+
+
+async def run(mode: str, delay: float, rate: float) -> None:
+    stream, handler = install(mode, delay)
+    interval, samples = 0.005, 300
+    probe = asyncio.create_task(probe_loop_lag(interval, samples))
+    updates = await simulate_updates(rate, interval * samples)
+    stats = await probe
+    shutdown_logging()
+    dropped = handler.dropped if isinstance(handler, NonBlockingQueueHandler) else 0
+    written = stream.writes if stream else 0
+    print(
+        f"  {mode:<13} p50 {stats.percentile(0.5) * 1000:6.2f} ms  p99 {stats.percentile(0.99) * 1000:7.2f} ms"
+        f"  max {stats.max * 1000:7.2f} ms  updates {updates:5d}  written {written:5d}  dropped {dropped}"
+    )
+
+
+def main() -> None:
+    delay = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.002
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 200.0
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            *SHARED_PROCESSORS,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+    )
+    settings.log_queue_size = 1000
+    print(f"write delay {delay * 1000:.1f} ms, {rate:.0f} updates/s, 2 records per update")
+    for mode in ("off", "sync", "queued-drop", "queued-block"):
+        asyncio.run(run(mode, delay, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Micro-benchmarks: sliding-log RateLimitMiddleware vs the GCRA limiter.
+
+Usage: python scripts/bench_rate_limiter.py [distinct_users] [--redis redis://host:6379/0]
+
+Reports per-check cost for one hot user at several limits, and memory and
+per-check cost across many distinct users. With --redis the shared backend
+is timed too (one EVALSHA per check).
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.rate_limiter import MemoryRateLimiter, RateLimit, RedisRateLimiter  # noqa: E402
+from app.services.redis_service import redis_service  # noqa: E402
+
+
+class SlidingLogLimiter:
+    """The previous middleware's algorithm: a list of timestamps per user."""
+
+    def __init__(self, max_requests: int, window_seconds: float) -> None:
+        self.requests = {}
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def is_rate_limited(self, user_id) -> bool:
+        current_time = time.time()
+        if user_id in self.requests:
+            self.requests[user_id] = [
+                timestamp for timestamp in self.requests[user_id]
+                if current_time - timestamp < self.window_seconds
+            ]
+        if user_id not in self.requests:
+            self.requests[user_id] = []
+        if len(self.requests[user_id]) >= self.max_requests:
+            return True
+        self.requests[user_id].append(current_time)
+        return False
+
+
+def per_call_ns(fn, calls: int) -> float:
+    started = time.perf_counter_ns()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter_ns() - started) / calls
+
+
+def bench_hot_user(calls: int = 200_000) -> None:
+    print("hot user (same key every call)")
+    for requests in (5, 100, 1000):
+        limit = RateLimit(requests, 10)
+        legacy = SlidingLogLimiter(requests, 10)
+        gcra = MemoryRateLimiter()
+        legacy_ns = per_call_ns(lambda _: legacy.is_rate_limited(1), calls)
+        gcra_ns = per_call_ns(lambda _: gcra.hit_nowait("message:1", limit), calls)
+        print(f"  limit {requests:>4}/10s: sliding log {legacy_ns:8.0f} ns  gcra {gcra_ns:6.0f} ns")
+
+
+def bench_many_users(users: int) -> None:
+    print(f"{users} distinct users, one request each")
+    limit = RateLimit(5, 10)
+    for name, factory in (
+        ("sliding log", lambda: SlidingLogLimiter(5, 10)),
+        ("gcra (max_keys=100k)", lambda: MemoryRateLimiter(max_keys=100_000)),
+    ):
+        def run(limiter):
+            if isinstance(limiter, SlidingLogLimiter):
+                return per_call_ns(limiter.is_rate_limited, users)
+            return per_call_ns(lambda i: limiter.hit_nowait(f"message:{i}", limit), users)
+
+        ns = run(factory())
+        # Separate pass: tracemalloc slows allocation down too much to time under it.
+        tracemalloc.start()
+        limiter = factory()
+        run(limiter)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name:<22} {ns:6.0f} ns/check  retained {current / 1e6:7.1f} MB")
+
+
+async def bench_redis(url: str, calls: int = 5_000) -> None:
+    from app.config import settings
+
+    settings.redis_url = url
+    await redis_service.initialize()
+    limiter = RedisRateLimiter(prefix="bench:ratelimit")
+    limit = RateLimit(1_000_000, 1)
+    started = time.perf_counter()
+    for i in range(calls):
+        await limiter.hit(f"message:{i % 100}", limit)
+    sequential = (time.perf_counter() - started) / calls
+    started = time.perf_counter()
+    await asyncio.gather(*(limiter.hit(f"message:{i % 100}", limit) for i in range(calls)))
+    concurrent = (time.perf_counter() - started) / calls
+    print(f"redis: {sequential * 1e6:.0f} us/check sequential, {concurrent * 1e6:.0f} us/check concurrent")
+    await redis_service.close()
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    redis_url = None
+    if "--redis" in args:
+        index = args.index("--redis")
+        redis_url = args[index + 1]
+        del args[index:index + 2]
+    users = int(args[0]) if args else 1_000_000
+
+    bench_hot_user()
+    bench_many_users(users)
+    if redis_url:
+        asyncio.run(bench_redis(redis_url))
+
+
+if __name__ == "__main__":
+    main()
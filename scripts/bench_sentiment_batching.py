@@ -0,0 +1,105 @@
+"""Throughput and per-message cost of sentiment micro-batching against a fake LLM.
+
+Usage: python scripts/bench_sentiment_batching.py [messages] [workers]
+
+The fake client charges a fixed latency and prompt size per request plus a
+small amount per message, which is roughly how chat completions are billed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.llm_cache import llm_cache  # noqa: E402
+from app.services.sentiment_queue import MemorySentimentQueue  # noqa: E402
+from app.services.sentiment_service import SentimentJob, SentimentService  # noqa: E402
+
+REQUEST_LATENCY = 0.3
+PER_MESSAGE_LATENCY = 0.01
+PROMPT_TOKENS = 120
+TOKENS_PER_MESSAGE = 35
+
+
+class FakeCompletions:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.tokens = 0
+
+    async def create(self, **kwargs):
+        messages = json.loads(kwargs["messages"][1]["content"])["messages"]
+        self.requests += 1
+        self.tokens += PROMPT_TOKENS + TOKENS_PER_MESSAGE * len(messages)
+        await asyncio.sleep(REQUEST_LATENCY + PER_MESSAGE_LATENCY * len(messages))
+        results = [{"id": item["id"], "label": "neutral", "confidence": 0.5} for item in messages]
+        return SimpleNamespace(
+            model="fake",
+            usage=None,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"results": results})))],
+        )
+
+
+async def run(batch_size: int, total: int, workers: int) -> None:
+    # Every batch size must pay for its own classifications.
+    llm_cache.clear()
+    completions = FakeCompletions()
+    service = SentimentService(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        batch_size=batch_size,
+        batch_wait=0.05,
+        queue=MemorySentimentQueue(),
+    )
+    for i in range(total):
+        await service._queue.put(
+            SentimentJob(
+                user_id=i % 50,
+                message_id=i,
+                text=f"message {i}",
+                hash_value=str(i),
+                queued_at=datetime.now(timezone.utc),
+            )
+        )
+
+    done = 0
+    finished = asyncio.Event()
+
+    async def worker() -> None:
+        nonlocal done
+        while done < total:
+            batch = await service._next_batch()
+            if not batch:
+                continue
+            await service._classify_batch(batch)
+            await service._ack(batch)
+            done += len(batch)
+            if done >= total:
+                finished.set()
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    await finished.wait()
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(
+        f"batch={batch_size:>3}  {total / elapsed:8.1f} msg/s  "
+        f"requests={completions.requests:>4}  tokens/msg={completions.tokens / total:6.1f}"
+    )
+
+
+async def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for batch_size in (1, 5, 20, 50):
+        await run(batch_size, total, workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
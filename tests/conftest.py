@@ -51,3 +51,12 @@ async def override_get_db(db_session):
     async def _get_db():
         yield db_session
     return _get_db
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    from app.services.llm_cache import llm_cache
+
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
@@ -0,0 +1,84 @@
+"""Tests for write-behind buffering of user activity and counters."""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from app.models import User
+from app.services.activity_buffer import (
+    ActivityBuffer,
+    MemoryActivityStore,
+    RedisActivityStore,
+    apply_activity,
+)
+
+
+@pytest.mark.asyncio
+async def test_memory_store_merges_and_keeps_failed_batch_in_flight():
+    store = MemoryActivityStore()
+    await store.touch(1, 200.0)
+    await store.touch(1, 100.0)
+    await store.add(1, {"counter": 1, "pos_count": 1})
+    await store.add(1, {"counter": -1, "neg_count": 1})
+
+    batch = await store.drain()
+    assert batch[1].seen_at == 200.0
+    assert batch[1].counters == {"counter": 0, "pos_count": 1, "neg_count": 1}
+
+    # Writes during a flush land in the next batch; an unacked batch is returned again.
+    await store.add(1, {"scored_total": 1})
+    assert await store.drain() is batch
+    assert (await store.peek(1)).counters["scored_total"] == 1
+    assert (await store.peek(1)).counters["pos_count"] == 1
+
+    await store.ack()
+    assert (await store.drain())[1].counters == {"scored_total": 1}
+
+
+@pytest.mark.asyncio
+async def test_fresh_counters_apply_pending_increments():
+    buffer = ActivityBuffer(MemoryActivityStore())
+    user = SimpleNamespace(id=5, counter=3, pos_count=4, neu_count=None, neg_count=1, scored_total=5)
+    await buffer.add_counters(5, {"counter": -1, "neg_count": 1, "scored_total": 1, "pos_count": 0})
+
+    assert await buffer.fresh_counters(user) == {
+        "counter": 2,
+        "pos_count": 4,
+        "neu_count": 0,
+        "neg_count": 2,
+        "scored_total": 6,
+    }
+
+
+@pytest.mark.asyncio
+async def test_touch_does_not_raise_when_store_is_down():
+    buffer = ActivityBuffer(RedisActivityStore())
+
+    await buffer.touch(1)
+    assert await buffer.pending(1) is None
+
+
+@pytest.mark.asyncio
+async def test_apply_activity_is_one_bulk_update(db_session):
+    users = [User(telegram_id=100 + i, counter=1, pos_count=1, scored_total=1) for i in range(3)]
+    db_session.add_all(users)
+    await db_session.flush()
+    older = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    users[2].last_user_activity_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    await db_session.flush()
+
+    store = MemoryActivityStore()
+    for user in users:
+        await store.touch(user.id, older.timestamp())
+    await store.add(users[0].id, {"counter": -1, "neg_count": 1, "scored_total": 1})
+
+    assert await apply_activity(db_session, await store.drain()) == 3
+    db_session.expire_all()
+    rows = (await db_session.execute(select(User).order_by(User.id))).scalars().all()
+
+    assert (rows[0].counter, rows[0].neg_count, rows[0].scored_total) == (0, 1, 2)
+    assert rows[1].last_user_activity_at == older
+    # A newer timestamp already in the row is never moved backwards.
+    assert rows[2].last_user_activity_at.year == 2030
@@ -0,0 +1,105 @@
+"""Tests for analytics rollups and the rendered report cache."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import Event, User
+from app.repositories.system_settings_repository import SystemSettingsRepository
+from app.services import scheduler_service
+from app.services.analytics_rollup_service import HIGH_WATER_SETTING_KEY, AnalyticsRollupService
+from app.services.analytics_service import AnalyticsService, _ReportCache
+
+
+@pytest.mark.asyncio
+async def test_report_cache_builds_once_per_key_within_ttl():
+    cache = _ReportCache(ttl=60)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0)
+        return {"period_days": 30}
+
+    results = await asyncio.gather(*(cache.get((30, "json"), build) for _ in range(5)))
+    await cache.get((7, "json"), build)
+
+    assert all(result == {"period_days": 30} for result in results)
+    assert len(builds) == 2
+
+
+@pytest.mark.asyncio
+async def test_report_cache_skips_empty_reports_and_expired_entries():
+    cache = _ReportCache(ttl=60)
+    values = iter([{}, "first", "second"])
+
+    async def build():
+        return next(values)
+
+    assert await cache.get((30, "summary"), build) == {}
+    assert await cache.get((30, "summary"), build) == "first"
+    cache._entries[(30, "summary")] = (0.0, "first")
+    assert await cache.get((30, "summary"), build) == "second"
+
+
+@pytest.mark.asyncio
+async def test_rollup_refresh_is_incremental(db_session):
+    old = datetime.now(timezone.utc) - timedelta(hours=2)
+    users = [User(telegram_id=900 + idx, created_at=old) for idx in range(3)]
+    db_session.add_all(users)
+    await db_session.flush()
+    db_session.add_all(
+        [
+            Event(user_id=users[0].id, type="start", payload={}, created_at=old),
+            Event(user_id=users[1].id, type="start", payload={}, created_at=old),
+            Event(user_id=users[1].id, type="lead", payload={}, created_at=old),
+        ]
+    )
+    await db_session.flush()
+
+    service = AnalyticsRollupService(db_session)
+    await service.refresh()
+    # A second run without new rows must not count anything twice.
+    await service.refresh()
+
+    db_session.add(Event(user_id=users[2].id, type="start", payload={}, created_at=old))
+    # Too fresh to be folded yet.
+    db_session.add(User(telegram_id=999))
+    await db_session.flush()
+    marks = await service.refresh()
+
+    counts = await service.period_counts(7)
+    assert sum(counts["users_created"].values()) == 3
+    assert counts["events"] == {"start": 3, "lead": 1}
+    assert marks["users_created"] == users[-1].id
+
+    report = await AnalyticsService(db_session).get_comprehensive_report(7)
+    assert report["users"]["new_users"] == 3
+    assert report["activity"]["events_total"] == 4
+
+
+@pytest.mark.asyncio
+async def test_scheduled_refresh_commits_rollups(engine, monkeypatch):
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def _get_db():
+        # The job breaks out after the first session, like with app.db.get_db.
+        async with session_factory() as session:
+            yield session
+
+    old = datetime.now(timezone.utc) - timedelta(hours=2)
+    async with session_factory() as session:
+        user = User(telegram_id=7001, created_at=old)
+        session.add(user)
+        await session.commit()
+
+    monkeypatch.setattr(scheduler_service, "get_db", _get_db)
+    await scheduler_service.refresh_analytics_rollups()
+
+    async with session_factory() as session:
+        marks = await SystemSettingsRepository(session).get_value(HIGH_WATER_SETTING_KEY)
+        counts = await AnalyticsRollupService(session).period_counts(7)
+    assert marks["users_created"] == user.id
+    assert sum(counts["users_created"].values()) == 1
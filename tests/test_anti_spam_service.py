@@ -0,0 +1,72 @@
+"""Tests for the script-backed anti-spam service."""
+
+import pytest
+
+from app.services.anti_spam_service import BANS_KEY, UNBAN_BATCH, AntiSpamService
+
+
+class FakeScript:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def __call__(self, keys=None, args=None, client=None):
+        self.calls.append((keys, args))
+        return self.replies.pop(0)
+
+
+class FakeRedis:
+    def __init__(self, check_replies=(), unban_replies=()):
+        self.scripts = [FakeScript(check_replies), FakeScript(unban_replies)]
+
+    def register_script(self, source):
+        return self.scripts.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_check_is_one_script_call_per_message():
+    redis = FakeRedis(check_replies=[["ok", "3", "3", "1"]])
+    service = AntiSpamService(redis)
+    script = service._check
+
+    verdict = await service.check(42, "abc", now=1000.5)
+
+    assert len(script.calls) == 1
+    keys, args = script.calls[0]
+    assert keys == ["ban:42", "spam:cnt10:42", "spam:cnt60:42", "spam:dupe:42:abc", BANS_KEY]
+    assert args[:2] == ["1000.5", 42]
+    assert not verdict.banned and verdict.reason is None
+    assert verdict.stats == {"burst10": 3, "minute60": 3, "dupes": 1}
+
+
+@pytest.mark.asyncio
+async def test_check_parses_new_and_active_bans():
+    redis = FakeRedis(
+        check_replies=[
+            [b"ban", b"burst10", b"2", b"4", b"15400.25", b"8", b"0", b"0"],
+            ["banned", "15400.25"],
+        ]
+    )
+    service = AntiSpamService(redis)
+
+    new_ban = await service.check(7, None, now=1000.0)
+    assert service._check.calls[0][0][3] == ""
+    assert (new_ban.reason, new_ban.ban_level, new_ban.ban_hours) == ("burst10", 2, 4.0)
+    assert new_ban.banned_until_ts == 15400.25
+    assert new_ban.stats["burst10"] == 8
+
+    active = await service.check(7, None, now=1001.0)
+    assert active.banned and active.banned_until_ts == 15400.25
+
+
+@pytest.mark.asyncio
+async def test_unban_expired_pages_through_the_index():
+    first_page = [str(user_id) for user_id in range(UNBAN_BATCH)]
+    redis = FakeRedis(unban_replies=[first_page, ["5000"]])
+    service = AntiSpamService(redis)
+
+    released = await service.unban_expired(now=2000.0)
+
+    assert len(released) == UNBAN_BATCH + 1
+    assert released[-1] == 5000
+    assert service._unban.calls[0] == ([BANS_KEY], ["2000.0", UNBAN_BATCH])
@@ -5,7 +5,15 @@ from unittest.mock import AsyncMock, ANY
 
 import pytest
 
-from app.models import User, UserSegment, ABAssignment, ABEvent, ABEventType, ABVariant
+from app.models import (
+    User,
+    UserSegment,
+    ABAssignment,
+    ABEvent,
+    ABEventType,
+    ABVariant,
+    BroadcastDelivery,
+)
 from app.services.broadcast_service import BroadcastService
 from app.services.ab_testing_service import ABTestingService, VariantDefinition
 from sqlalchemy import select
@@ -41,6 +49,77 @@ async def test_send_simple_broadcast(db_session):
     )
 
 
+@pytest.mark.asyncio
+async def test_send_simple_broadcast_resumes_from_delivery_rows(db_session):
+    """Повторный запуск рассылки не дублирует доставленные сообщения и продолжает с чекпоинта."""
+    bot_mock = AsyncMock()
+    bot_mock.send_message = AsyncMock()
+    service = BroadcastService(bot_mock, db_session)
+
+    users = [User(telegram_id=700 + idx, segment=UserSegment.COLD) for idx in range(5)]
+    db_session.add_all(users)
+    await db_session.flush()
+
+    broadcast = await service.create_simple_broadcast(title="Resume", body="Hello")
+    # Previous run: first user delivered, second was in flight when the process died.
+    db_session.add_all(
+        [
+            BroadcastDelivery(broadcast_id=broadcast.id, user_id=users[0].id, status="sent", message_id=1),
+            BroadcastDelivery(broadcast_id=broadcast.id, user_id=users[1].id, status="sending"),
+        ]
+    )
+    await db_session.flush()
+
+    result = await service.send_simple_broadcast(broadcast.id, chunk_size=2, concurrency=2)
+
+    assert result == {"sent": 4, "failed": 1, "total": 5}
+    sent_to = sorted(call.kwargs["chat_id"] for call in bot_mock.send_message.await_args_list)
+    assert sent_to == [702, 703, 704]
+
+    deliveries = {
+        row.user_id: row
+        for row in (
+            await db_session.execute(
+                select(BroadcastDelivery)
+                .where(BroadcastDelivery.broadcast_id == broadcast.id)
+                .execution_options(populate_existing=True)
+            )
+        ).scalars()
+    }
+    assert deliveries[users[1].id].status == "failed"
+    assert all(deliveries[user.id].sent_at is not None for user in users[2:])
+
+    rerun = await service.send_simple_broadcast(broadcast.id)
+    assert rerun == result
+    assert bot_mock.send_message.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_send_simple_broadcast_records_failures(db_session):
+    """Ошибка отправки фиксируется в строке доставки вместе с текстом ошибки."""
+    bot_mock = AsyncMock()
+    bot_mock.send_message = AsyncMock(side_effect=[RuntimeError("chat not found"), None])
+    service = BroadcastService(bot_mock, db_session)
+
+    db_session.add_all([User(telegram_id=801), User(telegram_id=802)])
+    await db_session.flush()
+    broadcast = await service.create_simple_broadcast(title="Errors", body="Hi")
+
+    result = await service.send_simple_broadcast(broadcast.id, concurrency=1)
+
+    assert result == {"sent": 1, "failed": 1, "total": 2}
+    failed = (
+        await db_session.execute(
+            select(BroadcastDelivery).where(
+                BroadcastDelivery.broadcast_id == broadcast.id,
+                BroadcastDelivery.status == "failed",
+            )
+        )
+    ).scalar_one()
+    assert failed.error_message == "chat not found"
+    assert failed.failed_at is not None
+
+
 @pytest.mark.asyncio
 async def test_send_simple_broadcast_with_rich_content(db_session):
     """BroadcastService корректно рассылает текст и вложения из content."""
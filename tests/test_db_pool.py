@@ -0,0 +1,68 @@
+"""Tests for connection release around external waits."""
+
+import asyncio
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db import InstrumentedAsyncQueuePool, release_connection
+from tests.conftest import TEST_DATABASE_URL
+
+
+class _Session:
+    def __init__(self, active: bool) -> None:
+        self.active = active
+        self.commits = 0
+
+    def in_transaction(self) -> bool:
+        return self.active
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_release_connection_commits_only_open_transactions():
+    idle, active = _Session(False), _Session(True)
+
+    await release_connection(None)
+    await release_connection(idle)
+    await release_connection(active)
+
+    assert (idle.commits, active.commits) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_not_capped_by_pool_size(engine):
+    """Twenty conversations with a 0.3 s external wait share a two-connection pool."""
+    small_engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=1,
+    )
+    factory = async_sessionmaker(small_engine, class_=AsyncSession, expire_on_commit=False)
+    checkouts_before = REGISTRY.get_sample_value("db_pool_checkout_seconds_count") or 0
+
+    async def conversation() -> None:
+        async with factory() as session:
+            await session.execute(text("SELECT 1"))
+            await release_connection(session)
+            await asyncio.sleep(0.3)
+            await session.execute(text("SELECT 1"))
+            await session.commit()
+
+    started = time.perf_counter()
+    try:
+        # Holding connections across the wait would need 20 * 0.3 / 2 = 3 s and
+        # trip the 1 s pool timeout.
+        await asyncio.gather(*(conversation() for _ in range(20)))
+    finally:
+        await small_engine.dispose()
+
+    assert time.perf_counter() - started < 1.5
+    assert REGISTRY.get_sample_value("db_pool_checkout_seconds_count") >= checkouts_before + 40
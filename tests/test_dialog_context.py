@@ -0,0 +1,105 @@
+"""Per-update dialog context: one history/profile/catalog load shared by consumers."""
+
+import pytest
+
+from app.models import User
+from app.services import dialog_context as dialog_context_module
+from app.services.dialog_context import DialogContext, _CatalogPromptCache
+from app.services.lead_profile_service import LeadProfileService
+from app.services.logging_service import ConversationLoggingService
+from app.services.user_service import UserService
+
+
+@pytest.fixture
+def history_calls(monkeypatch):
+    stored = [{"role": "user", "text": f"m{i}", "timestamp": None, "meta": {}} for i in range(20)]
+    calls = []
+
+    async def fake_history(self, user_id, limit=10):
+        calls.append(limit)
+        return [dict(item) for item in stored[-limit:]]
+
+    async def fake_save(self, user_id, role, text, metadata=None):
+        stored.append({"role": role, "text": text, "timestamp": None, "meta": metadata or {}})
+        return True
+
+    monkeypatch.setattr(UserService, "get_conversation_history", fake_history)
+    monkeypatch.setattr(UserService, "save_message", fake_save)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_history_is_loaded_once_and_sees_appended_messages(history_calls):
+    user = User(id=5, telegram_id=500)
+    context = DialogContext(session=None, user=user)
+    logger = ConversationLoggingService(None, context=context)
+
+    assert [item["text"] for item in await logger.get_last_messages(5, limit=6)] == [
+        f"m{i}" for i in range(14, 20)
+    ]
+    await logger.log_message(user_id=5, role="user", text="new")
+    twelve = await logger.get_last_messages(5, limit=12)
+
+    assert history_calls == [DialogContext.HISTORY_WINDOW]
+    assert twelve[-1]["text"] == "new"
+    assert len(twelve) == 12
+
+    # Asking for more than the loaded window goes back to the database once.
+    assert len(await context.history(15)) == 15
+    assert history_calls == [DialogContext.HISTORY_WINDOW, 15]
+
+
+@pytest.mark.asyncio
+async def test_other_users_history_bypasses_context(history_calls):
+    context = DialogContext(session=None, user=User(id=5, telegram_id=500))
+    logger = ConversationLoggingService(None, context=context)
+
+    await logger.get_last_messages(6, limit=3)
+    await logger.get_last_messages(6, limit=3)
+
+    assert history_calls == [3, 3]
+
+
+@pytest.mark.asyncio
+async def test_profile_loaded_once(monkeypatch):
+    calls = []
+
+    async def fake_get_or_create(self, user):
+        calls.append(user.id)
+        return object()
+
+    monkeypatch.setattr(LeadProfileService, "get_or_create", fake_get_or_create)
+    context = DialogContext(session=None, user=User(id=7, telegram_id=700))
+
+    assert await context.profile() is await context.profile()
+    assert calls == [7]
+
+
+@pytest.mark.asyncio
+async def test_catalog_prompt_is_shared_across_contexts(monkeypatch):
+    monkeypatch.setattr(dialog_context_module, "catalog_prompt_cache", _CatalogPromptCache(ttl=60))
+    renders = []
+
+    async def render():
+        renders.append(1)
+        return "catalog"
+
+    for user_id in (1, 2, 3):
+        context = DialogContext(session=None, user=User(id=user_id, telegram_id=user_id))
+        assert await context.catalog_prompt(render) == "catalog"
+    assert len(renders) == 1
+
+    dialog_context_module.catalog_prompt_cache.invalidate()
+    await DialogContext(session=None, user=User(id=4, telegram_id=4)).catalog_prompt(render)
+    assert len(renders) == 2
+
+
+@pytest.mark.asyncio
+async def test_recorded_messages_use_the_persisted_role(history_calls):
+    context = DialogContext(session=None, user=User(id=5, telegram_id=500))
+    await context.history(3)
+
+    context.record_message("assistant", "Здравствуйте")
+    context.record_message("client", "Привет")
+
+    assert [item["role"] for item in await context.history(2)] == ["bot", "user"]
@@ -0,0 +1,124 @@
+"""Tests for background mirroring to the dialogs channel."""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from aiogram.types import Chat, Message
+
+from app.services.dialog_mirror import DialogMirror, MirrorJob, split_post
+from app.services.logging_service import ConversationLoggingService
+from app.services.outbound_scheduler import OutboundPriority, current_priority
+
+CHANNEL_ID = -100500
+
+
+class FakeBot:
+    id = 1
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.sent = []
+        self.priorities = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        await asyncio.sleep(self.delay)
+        self.priorities.append(current_priority())
+        self.sent.append((chat_id, text))
+
+    async def copy_message(self, **kwargs):
+        self.sent.append((kwargs["chat_id"], kwargs["caption"]))
+
+
+def _message(message_id: int, text: str, edited: bool = False) -> Message:
+    return Message(
+        message_id=message_id,
+        date=datetime.now(timezone.utc),
+        edit_date=1700000000 if edited else None,
+        chat=Chat(id=77, type="private"),
+        text=text,
+    )
+
+
+def _job(bot, message, sender="bot"):
+    return MirrorJob(
+        sender=sender,
+        bot=bot,
+        text=message.text,
+        user_id=5,
+        chat_id=77,
+        username="@client",
+        source_message=message,
+    )
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_immediately_and_dedupes_by_message():
+    bot = FakeBot(delay=0.2)
+    mirror = DialogMirror(CHANNEL_ID, concurrency=2)
+    first = _message(10, "Здравствуйте")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert mirror.submit(_job(bot, first))
+    assert not mirror.submit(_job(bot, first))
+    # An edit is a new version of the message and is mirrored again.
+    assert mirror.submit(_job(bot, _message(10, "Здравствуйте!", edited=True)))
+    assert loop.time() - started < 0.05
+
+    await mirror.stop()
+    assert len(bot.sent) == 2
+    assert all(chat_id == CHANNEL_ID for chat_id, _ in bot.sent)
+    assert "Бот пишет пользователю @client" in bot.sent[0][1]
+    # Submitted from an interactive handler, yet posted behind user replies.
+    assert bot.priorities == [OutboundPriority.BULK, OutboundPriority.BULK]
+
+
+@pytest.mark.asyncio
+async def test_digest_merges_a_burst_into_one_post():
+    bot = FakeBot()
+    mirror = DialogMirror(CHANNEL_ID, digest_seconds=0.05)
+
+    mirror.submit(_job(bot, _message(1, "Привет"), sender="user"))
+    mirror.submit(_job(bot, _message(2, "Добрый день!")))
+    mirror.submit(_job(bot, _message(3, "Сколько стоит курс?"), sender="user"))
+    await asyncio.sleep(0.15)
+
+    assert len(bot.sent) == 1
+    post = bot.sent[0][1]
+    assert post.startswith("Диалог с пользователем @client (3 сообщ.)")
+    assert post.endswith("Пользователь: Привет\nБот: Добрый день!\nПользователь: Сколько стоит курс?")
+    await mirror.stop()
+
+
+def test_split_post_respects_the_limit():
+    posts = split_post("H", ["a" * 6, "b" * 6, "c" * 6], limit=16)
+
+    assert posts == ["H\naaaaaa\nbbbbbb", "H\ncccccc"]
+    assert all(len(post) <= 16 for post in posts)
+
+
+class _UntouchableSession:
+    def __getattr__(self, name):
+        raise AssertionError(f"session.{name} used for an already logged message")
+
+
+@pytest.mark.asyncio
+async def test_bot_message_is_logged_once(monkeypatch):
+    from app.services import logging_service
+
+    monkeypatch.setattr(logging_service, "dialog_mirror", DialogMirror(0))
+    message = _message(42, "Ответ")
+    logging_service.dialog_mirror.mark_logged(message)
+
+    conversation_logger = ConversationLoggingService(_UntouchableSession())
+    assert not await conversation_logger.log_bot_message(user_id=5, text="Ответ", source_message=message)
+
+
+def test_streamed_reply_gets_no_fallback_for_any_version():
+    mirror = DialogMirror(CHANNEL_ID)
+    bot = FakeBot()
+    mirror.mark_streamed(_message(7, "Первые слова"))
+
+    assert not mirror.submit_outbound(bot, _message(7, "Первые слова и продолжение", edited=True))
+    assert mirror.pending == 0
@@ -0,0 +1,83 @@
+"""Excel materials: catalog caching and batched progress writes."""
+
+import csv
+import json
+
+import pandas as pd
+import pytest
+
+from app.services import excel_material_service as module
+from app.services.excel_material_service import ExcelMaterialService
+
+
+@pytest.fixture
+def materials_dir(tmp_path, monkeypatch):
+    media = tmp_path / "media"
+    media.mkdir()
+    for name in ("a.jpg", "c.mp4"):
+        (media / name).write_bytes(b"x")
+
+    excel = tmp_path / "materials.xlsx"
+    pd.DataFrame(
+        {
+            "title": ["A", "B", "C"],
+            "text": ["text a", "text b", "text c"],
+            "media_filename": ["a.jpg", "missing.jpg", "c.mp4"],
+        }
+    ).to_excel(excel, sheet_name="materials", index=False)
+
+    monkeypatch.setattr(module, "BASE_DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(module, "EXCEL_FILE_PATH", str(excel))
+    monkeypatch.setattr(module, "MEDIA_PATH", str(media))
+    monkeypatch.setattr(module, "PROGRESS_FILE_PATH", str(tmp_path / "progress.json"))
+    monkeypatch.setattr(module, "LOG_FILE_PATH", str(tmp_path / "log.csv"))
+    monkeypatch.setattr(module, "CONFIG_FILE_PATH", str(tmp_path / "config.json"))
+    return tmp_path
+
+
+def test_dataframe_is_parsed_once_per_file_version(materials_dir, monkeypatch):
+    service = ExcelMaterialService()
+    calls = []
+    real_read_excel = pd.read_excel
+
+    def counting_read_excel(*args, **kwargs):
+        calls.append(args)
+        return real_read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(module.pd, "read_excel", counting_read_excel)
+
+    for _ in range(5):
+        service.get_next_material_for_user(1)
+    assert len(calls) == 1
+
+    pd.DataFrame(
+        {"title": ["D"], "text": ["text d"], "media_filename": ["a.jpg"]}
+    ).to_excel(module.EXCEL_FILE_PATH, sheet_name="materials", index=False)
+    assert service.get_next_material_for_user(1).title == "D"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_run_rotation_matches_per_user_lookup_and_flushes_in_batch(materials_dir):
+    service = ExcelMaterialService()
+    service.update_user_progress(7, 1)
+
+    run = await service.start_run()
+    material = run.next_material(7)
+    assert material == service.get_next_material_for_user(7)
+    assert (material.title, material.media_type) == ("C", "video")
+
+    run.record_progress(7, material.row_index)
+    run.log_attempt(7, "seven", material, "success")
+    run.log_attempt(8, None, None, "skipped", "no_valid_material")
+    assert run.next_material(7).title == "A"
+    assert run.pending_writes == 3
+
+    await run.flush()
+    assert run.pending_writes == 0
+
+    with open(module.PROGRESS_FILE_PATH, encoding="utf-8") as f:
+        assert json.load(f)["7"]["last_row"] == 3
+    with open(module.LOG_FILE_PATH, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["user_id"], row["status"]) for row in rows] == [("7", "success"), ("8", "skipped")]
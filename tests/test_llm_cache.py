@@ -0,0 +1,85 @@
+"""Tests for the content-addressed LLM response cache."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm_cache import MISS, LLMResponseCache, llm_cache, normalize_text
+from app.services.purchase_intent_service import PurchaseIntentService
+from app.services.sentiment_service import SentimentService
+from tests.test_sentiment_batching import FakeCompletions, _client, _job
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_trivial_variants_share_a_key():
+    cache = LLMResponseCache(ttls={"sentiment": 60})
+
+    assert normalize_text("  Ещё   РАЗ\n") == "еще раз"
+    assert cache.key("sentiment", "m", "v1", "Ещё  раз") == cache.key("sentiment", "m", "v1", "еще раз")
+    assert cache.key("sentiment", "m", "v1", "еще раз") != cache.key("sentiment", "m", "v2", "еще раз")
+    assert cache.key("sentiment", "m", "v1", "a", "b c") != cache.key("sentiment", "m", "v1", "a b", "c")
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_is_bounded_and_expires():
+    clock = FakeClock()
+    cache = LLMResponseCache(max_entries=2, ttls={"sentiment": 10}, clock=clock)
+
+    await cache.set_many("sentiment", {"a": 1, "b": False})
+    assert await cache.get("sentiment", "a") == 1
+    await cache.set("sentiment", "c", 3)
+
+    # "b" was the least recently used entry.
+    assert await cache.get_many("sentiment", ["a", "b", "c"]) == [1, MISS, 3]
+    clock.now = 11
+    assert await cache.get("sentiment", "a") is MISS
+    assert len(cache) == 1
+
+
+class FakeIntentCompletions:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        content = json.dumps({"purchase_intent": True})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.mark.asyncio
+async def test_repeated_intent_question_skips_the_llm():
+    completions = FakeIntentCompletions()
+    service = PurchaseIntentService()
+    service._client = _client(completions)
+
+    assert await service._llm_classify("Хочу купить курс", "Бот: привет")
+    assert await service._llm_classify("хочу  купить курс", "Бот: привет")
+    assert completions.calls == 1
+
+    assert await service._llm_classify("Хочу купить курс", "Бот: другой контекст")
+    assert completions.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_sentiment_sends_only_uncached_texts():
+    completions = FakeCompletions(poison="POISON")
+    service = SentimentService(client=_client(completions))
+
+    await service._classify_batch([_job(1, "круто"), _job(2, "POISON")])
+    first_batch_calls = len(completions.calls)
+    results = await service._classify_batch([_job(3, "Круто"), _job(4, "плохо"), _job(5, "POISON")])
+
+    # The failed item is retried, the cached one is not sent again.
+    assert completions.calls[first_batch_calls] == ["плохо", "POISON"]
+    assert results[0].model == "fake-model"
+    assert [result.label.value for result in results[:2]] == ["positive", "negative"]
+    assert results[2].model == "fallback:api_error"
+    assert len(llm_cache) == 2
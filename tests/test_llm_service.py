@@ -6,7 +6,13 @@ from unittest.mock import AsyncMock
 import pytest
 
 from app.models import User, UserSegment
-from app.services.llm_service import LLMContext, LLMResponse, LLMService
+from app.services.llm_service import (
+    LLMContext,
+    LLMResponse,
+    LLMService,
+    extract_guideline_section,
+    get_static_prompt,
+)
 from app.safety.validator import SafetyIssue
 from app.config import settings
 
@@ -119,3 +125,36 @@ async def test_generate_response_high_risk_safety_triggers_escalation(monkeypatc
     assert response.next_action == "escalate_to_manager"
     assert response.safety_issues == issues
     assert any(btn["callback"] == "manager:request" for btn in response.buttons)
+
+
+def test_system_message_prefix_is_identical_across_users():
+    """Статический префикс не должен зависеть от пользователя и этапа."""
+    first = LLMService()._build_system_message(
+        LLMContext(
+            user=User(telegram_id=5005, first_name="Зоя", segment=UserSegment.COLD, lead_score=1),
+            messages_history=[],
+            scenario_prompt="Этап знакомства",
+        )
+    )
+    second = LLMService()._build_system_message(
+        LLMContext(
+            user=User(telegram_id=6006, first_name="Иван", segment=UserSegment.HOT, lead_score=9),
+            messages_history=[],
+            recent_messages=[{"role": "user", "text": "Сколько стоит?"}],
+            product_focus={"name": "Курс", "price": 1000},
+        )
+    )
+    prefix = get_static_prompt()
+
+    assert prefix is get_static_prompt()
+    assert first.encode("utf-8")[: len(prefix.encode("utf-8"))] == prefix.encode("utf-8")
+    assert second.startswith(prefix)
+    assert "Зоя" not in prefix and "Иван" not in prefix
+    assert first[len(prefix):].startswith("\nСЦЕНАРНЫЕ УКАЗАНИЯ:")
+
+
+def test_extract_guideline_section_stops_at_next_header():
+    text = "ВСТУПЛЕНИЕ:\nx\nАНАЛИЗ СООБЩЕНИЙ:\n- слушай\n- уточняй\nФОРМАТ:\ny"
+
+    assert extract_guideline_section(text, "АНАЛИЗ СООБЩЕНИЙ") == "- слушай\n- уточняй"
+    assert extract_guideline_section("", "АНАЛИЗ СООБЩЕНИЙ") == ""
@@ -0,0 +1,74 @@
+"""Tests for the queued logging pipeline."""
+
+import io
+import logging
+import queue
+
+import structlog
+
+from app.logging_config import (
+    DebugSampler,
+    NonBlockingQueueHandler,
+    SizeAndTimeRotatingFileHandler,
+    _russian_message_renderer,
+    build_queue_handler,
+    shutdown_logging,
+)
+
+
+def _record(level=logging.INFO, msg="event"):
+    return logging.LogRecord("bot.interactions.test", level, __file__, 1, msg, (), None)
+
+
+def test_drop_policy_sheds_info_and_bounds_warning_wait():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1), policy="drop", block_timeout=0.01)
+
+    handler.handle(_record())
+    handler.handle(_record())
+    handler.handle(_record(logging.WARNING))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_debug_sampler_keeps_one_in_n_per_event():
+    sampler = DebugSampler(3)
+    kept = [sampler.filter(_record(logging.DEBUG, {"event": "tick"})) for _ in range(6)]
+
+    assert kept == [True, False, False, True, False, False]
+    assert sampler.filter(_record(logging.DEBUG, {"event": "other"}))
+    assert all(sampler.filter(_record(logging.INFO, {"event": "tick"})) for _ in range(3))
+
+
+def test_size_rotation_keeps_every_file_of_the_period(tmp_path):
+    handler = SizeAndTimeRotatingFileHandler(tmp_path / "bot.log", max_bytes=10, backup_count=10)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for _ in range(4):
+        handler.emit(_record(msg="0123456789"))
+    handler.close()
+
+    rotated = sorted(path.name for path in tmp_path.iterdir() if path.name != "bot.log")
+    assert len(rotated) == 3
+    assert rotated[1].endswith(".1") and rotated[2].endswith(".2")
+
+
+def test_structlog_events_are_rendered_by_the_writer_thread():
+    stream = io.StringIO()
+    sink = logging.StreamHandler(stream)
+    sink.setFormatter(structlog.stdlib.ProcessorFormatter(processor=_russian_message_renderer))
+    stdlib_logger = logging.getLogger("bot.interactions.test_pipeline")
+    stdlib_logger.propagate = False
+    stdlib_logger.setLevel(logging.INFO)
+    stdlib_logger.addHandler(build_queue_handler(sink))
+    log = structlog.wrap_logger(
+        stdlib_logger,
+        processors=[structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+        wrapper_class=structlog.stdlib.BoundLogger,
+    )
+    try:
+        log.info("Получено сообщение", user_id=7)
+    finally:
+        shutdown_logging()
+        stdlib_logger.handlers.clear()
+
+    assert "Получено сообщение | пользователь: 7" in stream.getvalue()
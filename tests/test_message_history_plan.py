@@ -0,0 +1,66 @@
+"""Query plans of conversation history reads on a large messages table."""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.models import User
+from app.services.user_service import UserService, conversation_history_stmt
+
+USERS = 1_000
+MESSAGES = 1_000_000
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+async def _explain(session, stmt):
+    connection = await session.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await connection.exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + compiled.string, params
+    )
+    raw = result.scalar()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+@pytest.mark.asyncio
+async def test_history_pages_use_the_user_created_index(db_session):
+    users = [User(telegram_id=900_000 + index) for index in range(USERS)]
+    db_session.add_all(users)
+    await db_session.flush()
+    await db_session.execute(
+        text(
+            """
+            INSERT INTO messages (user_id, role, text, meta, created_at)
+            SELECT (CAST(:ids AS BIGINT[]))[1 + g % :users], 'user', 'message ' || g, '{}',
+                   now() - make_interval(secs => g)
+            FROM generate_series(1, :messages) AS g
+            """
+        ),
+        {"ids": [user.id for user in users], "users": USERS, "messages": MESSAGES},
+    )
+    await db_session.execute(text("ANALYZE messages"))
+
+    user_id = users[USERS // 2].id
+    service = UserService(db_session)
+    _, cursor = await service.get_conversation_page(user_id, limit=12)
+    assert cursor is not None
+
+    for stmt in (
+        conversation_history_stmt(user_id, 12),
+        conversation_history_stmt(user_id, 12, before=cursor),
+    ):
+        nodes = list(_nodes(await _explain(db_session, stmt)))
+        node_types = {node["Node Type"] for node in nodes}
+        scans = [node for node in nodes if node["Node Type"] in {"Index Scan", "Index Only Scan"}]
+
+        assert scans and scans[0]["Index Name"] == "ix_messages_user_created"
+        # Rows arrive in index order: no full scan and no sort.
+        assert "Seq Scan" not in node_types
+        assert "Sort" not in node_types
@@ -0,0 +1,119 @@
+"""Shared OpenAI client: circuit breaker and Responses API negative caching."""
+
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config import settings
+from app.models import User, UserSegment
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMContext, LLMService
+from app.services.openai_client import CircuitBreaker, CircuitOpenError, OpenAIClientFactory
+
+REQUEST = httpx.Request("POST", "https://api.openai.test/v1/chat/completions")
+
+
+def _error(cls, status, body=None):
+    return cls("boom", response=httpx.Response(status, request=REQUEST), body=body)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_threshold_and_probes_once_after_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker("chat:m", failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now = 10
+    breaker.before_call()  # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # nobody else while probing
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_only_transient_errors_trip_the_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "openai_breaker_failures", 2)
+    factory = OpenAIClientFactory()
+
+    async def bad_request():
+        raise _error(openai.BadRequestError, 400)
+
+    async def server_error():
+        raise _error(openai.InternalServerError, 500)
+
+    for _ in range(5):
+        with pytest.raises(openai.BadRequestError):
+            await factory.call("chat", "m", bad_request)
+    assert not factory.breaker("chat:m").is_open
+
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            await factory.call("chat", "m", server_error)
+    with pytest.raises(CircuitOpenError):
+        await factory.call("chat", "m", bad_request)
+    # Other models keep working.
+    with pytest.raises(openai.BadRequestError):
+        await factory.call("chat", "other", bad_request)
+
+
+@pytest.mark.parametrize(
+    "body, remembered",
+    [
+        ({"code": "unsupported_model", "param": "model", "message": "not supported"}, True),
+        ({"code": "unknown_parameter", "param": "temperature", "message": "bad request"}, False),
+        (None, False),
+    ],
+)
+@pytest.mark.asyncio
+async def test_only_model_rejections_disable_the_responses_api(monkeypatch, body, remembered):
+    monkeypatch.setattr(llm_service_module, "openai_clients", OpenAIClientFactory())
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "openai_model", "gpt-4.1-mini")
+
+    calls = {"responses": 0, "chat": 0}
+
+    async def responses_create(**kwargs):
+        calls["responses"] += 1
+        assert "response_format" not in kwargs
+        raise _error(openai.BadRequestError, 400, body)
+
+    async def chat_create(**kwargs):
+        calls["chat"] += 1
+        payload = {"reply_text": "Привет", "buttons": [], "next_action": "ask", "confidence": 0.9}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))])
+
+    service = LLMService()
+    service.client = SimpleNamespace(
+        responses=SimpleNamespace(create=responses_create),
+        chat=SimpleNamespace(completions=SimpleNamespace(create=chat_create)),
+    )
+    context = LLMContext(user=User(telegram_id=1, segment=UserSegment.COLD, lead_score=0), messages_history=[])
+
+    await service.generate_response(context)
+    await service.generate_response(context)
+
+    # A request-shape error falls back for that call only.
+    assert calls == {"responses": 1 if remembered else 2, "chat": 2}
@@ -0,0 +1,124 @@
+"""Rate-limit harness for the outbound scheduler using a fake Telegram endpoint."""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMediaGroup, SendMessage, SendPhoto
+from aiogram.types import InputMediaPhoto
+
+from app.middlewares.outbound_rate_limit import OutboundRateLimitMiddleware, outbound_cost
+from app.services.outbound_scheduler import (
+    OutboundPriority,
+    OutboundScheduler,
+    outbound_priority,
+)
+
+
+class FakeTelegram:
+    """Stands in for the Bot API: records when each call was accepted."""
+
+    def __init__(self, retry_after: Optional[Dict[int, int]] = None) -> None:
+        self.calls: List[tuple] = []
+        self._retry_after = dict(retry_after or {})
+
+    async def __call__(self, bot, method):
+        chat_id = method.chat_id
+        if self._retry_after.get(chat_id):
+            seconds = self._retry_after.pop(chat_id)
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=seconds)
+        self.calls.append((time.monotonic(), chat_id, outbound_cost(method), getattr(method, "text", None)))
+        return True
+
+
+def _assert_bucket_respected(events: List[tuple], rate: float, burst: float) -> None:
+    """No window [t_i, t_j] may contain more than burst + rate * (t_j - t_i) messages."""
+    events = sorted(events)
+    for i in range(len(events)):
+        total = 0
+        for j in range(i, len(events)):
+            total += events[j][1]
+            elapsed = events[j][0] - events[i][0]
+            # One message of slack for timer jitter between grant and record.
+            assert total <= burst + rate * elapsed + 1, (i, j, total, elapsed)
+
+
+@pytest.mark.asyncio
+async def test_global_chat_and_group_limits_are_never_exceeded():
+    scheduler = OutboundScheduler(
+        rate=50, burst=5, chat_rate=10, chat_burst=2, group_rate=4, group_burst=1
+    )
+    fake = FakeTelegram()
+    middleware = OutboundRateLimitMiddleware(scheduler, max_retries=0)
+
+    chats = [101, 102, 103, 104, -1001]
+    sends = [
+        middleware(fake, None, SendMessage(chat_id=chats[i % len(chats)], text=str(i)))
+        for i in range(40)
+    ]
+    sends.append(
+        middleware(
+            fake,
+            None,
+            SendMediaGroup(chat_id=105, media=[InputMediaPhoto(media="a"), InputMediaPhoto(media="b")]),
+        )
+    )
+    await asyncio.gather(*sends)
+
+    assert len(fake.calls) == 41
+    _assert_bucket_respected([(t, cost) for t, _, cost, _ in fake.calls], rate=50, burst=5)
+
+    per_chat: Dict[int, List[tuple]] = defaultdict(list)
+    for t, chat_id, cost, _ in fake.calls:
+        per_chat[chat_id].append((t, cost))
+    for chat_id, events in per_chat.items():
+        if chat_id < 0:
+            _assert_bucket_respected(events, rate=4, burst=1)
+        else:
+            _assert_bucket_respected(events, rate=10, burst=2)
+
+
+@pytest.mark.asyncio
+async def test_interactive_replies_overtake_queued_bulk_traffic():
+    scheduler = OutboundScheduler(rate=20, burst=1, chat_rate=100, chat_burst=100)
+    fake = FakeTelegram()
+    middleware = OutboundRateLimitMiddleware(scheduler, max_retries=0)
+
+    async def bulk(i: int):
+        with outbound_priority(OutboundPriority.BULK):
+            await middleware(fake, None, SendMessage(chat_id=1000 + i, text=f"bulk-{i}"))
+
+    bulk_tasks = [asyncio.create_task(bulk(i)) for i in range(10)]
+    await asyncio.sleep(0.06)
+    sent_before = len(fake.calls)
+    await middleware(fake, None, SendMessage(chat_id=7, text="reply"))
+    await asyncio.gather(*bulk_tasks)
+
+    texts = [text for *_, text in fake.calls]
+    assert texts.index("reply") <= sent_before + 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_request_is_retried():
+    scheduler = OutboundScheduler(rate=100, chat_rate=100, chat_burst=100)
+    fake = FakeTelegram(retry_after={55: 1})
+    middleware = OutboundRateLimitMiddleware(scheduler, max_retries=2)
+
+    started = time.monotonic()
+    assert await middleware(fake, None, SendPhoto(chat_id=55, photo="file")) is True
+    assert time.monotonic() - started >= 0.95
+    assert [chat_id for _, chat_id, _, _ in fake.calls] == [55]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_raised_when_retries_exhausted():
+    scheduler = OutboundScheduler(rate=100, chat_rate=100, chat_burst=100)
+    fake = FakeTelegram(retry_after={56: 120})
+    middleware = OutboundRateLimitMiddleware(scheduler, max_retries=3, max_retry_after=60)
+
+    with pytest.raises(TelegramRetryAfter):
+        await middleware(fake, None, SendMessage(chat_id=56, text="x"))
+    assert fake.calls == []
@@ -0,0 +1,141 @@
+"""Monthly partition planning and maintenance of append-only tables."""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.services import scheduler_service
+from app.services.partition_service import (
+    Partition,
+    PartitionMaintenance,
+    add_months,
+    expired_partitions,
+    missing_months,
+    month_start,
+    partition_name,
+)
+
+
+def _utc(year: int, month: int, day: int = 1) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+def test_missing_months_continue_from_last_bound_and_cross_years():
+    partitions = [
+        Partition("events", "events_legacy", _utc(2025, 11)),
+        Partition("events", "events_p202511", _utc(2025, 12)),
+    ]
+
+    months = missing_months(partitions, _utc(2025, 11, 20), premake_months=2)
+
+    assert months == [_utc(2025, 12), _utc(2026, 1)]
+    assert [partition_name("events", month) for month in months] == ["events_p202512", "events_p202601"]
+    assert add_months(_utc(2026, 1), -2) == _utc(2025, 11)
+    # A table already covered to the horizon needs nothing.
+    assert missing_months(partitions, _utc(2025, 10, 5), premake_months=1) == []
+
+
+def test_only_partitions_ending_before_cutoff_expire():
+    partitions = [
+        Partition("messages", "messages_p202503", _utc(2025, 4)),
+        Partition("messages", "messages_legacy", _utc(2025, 3)),
+        Partition("messages", "messages_p202504", _utc(2025, 5)),
+    ]
+
+    assert expired_partitions(partitions, _utc(2025, 7, 10), retention_months=0) == []
+    expired = expired_partitions(partitions, _utc(2025, 7, 10), retention_months=3)
+    assert [partition.name for partition in expired] == ["messages_legacy", "messages_p202503"]
+
+
+@pytest.mark.asyncio
+async def test_maintenance_creates_ahead_and_archives_expired_partitions(db_session):
+    for statement in (
+        "ALTER TABLE product_match_log RENAME TO product_match_log_legacy",
+        "CREATE TABLE product_match_log (LIKE product_match_log_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (matched_at)",
+        "ALTER TABLE product_match_log_legacy ALTER COLUMN matched_at SET NOT NULL",
+        "ALTER TABLE product_match_log ATTACH PARTITION product_match_log_legacy "
+        "FOR VALUES FROM (MINVALUE) TO ('2025-02-01 00:00:00+00')",
+    ):
+        await db_session.execute(text(statement))
+
+    maintenance = PartitionMaintenance(
+        db_session,
+        premake_months=1,
+        retention_months=3,
+        retention_mode="archive",
+        archive_schema="partition_archive_test",
+    )
+    report = await maintenance.run(now=_utc(2025, 6, 15))
+
+    # Plain tables from create_all are left alone.
+    assert list(report) == ["product_match_log"]
+    assert report["product_match_log"]["created"] == [
+        f"product_match_log_p2025{month:02d}" for month in range(2, 8)
+    ]
+    assert report["product_match_log"]["retired"] == ["product_match_log_legacy"]
+
+    report = await maintenance.run(now=_utc(2025, 6, 15))
+    assert report["product_match_log"] == {"created": [], "retired": ["product_match_log_p202502"]}
+    attached = set(
+        (
+            await db_session.execute(
+                text(
+                    "SELECT CAST(CAST(inhrelid AS regclass) AS text) FROM pg_inherits "
+                    "WHERE inhparent = CAST('product_match_log' AS regclass)"
+                )
+            )
+        ).scalars()
+    )
+    assert attached == {f"product_match_log_p2025{month:02d}" for month in range(3, 8)}
+    assert await db_session.scalar(
+        text("SELECT to_regclass('partition_archive_test.product_match_log_legacy') IS NOT NULL")
+    )
+
+
+@pytest.mark.asyncio
+async def test_scheduled_maintenance_commits_new_partitions(engine, monkeypatch):
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def _get_db():
+        # The job breaks out after the first session, like with app.db.get_db.
+        async with session_factory() as session:
+            yield session
+
+    current = month_start(datetime.now(timezone.utc))
+    async with session_factory() as session:
+        for statement in (
+            "ALTER TABLE product_match_log RENAME TO product_match_log_legacy",
+            "CREATE TABLE product_match_log (LIKE product_match_log_legacy INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (matched_at)",
+            "ALTER TABLE product_match_log_legacy ALTER COLUMN matched_at SET NOT NULL",
+            "ALTER TABLE product_match_log ATTACH PARTITION product_match_log_legacy "
+            f"FOR VALUES FROM (MINVALUE) TO ('{current.isoformat()}')",
+        ):
+            await session.execute(text(statement))
+        await session.commit()
+
+    monkeypatch.setattr(settings, "partition_premake_months", 1)
+    monkeypatch.setattr(settings, "partition_retention_months", 0)
+    monkeypatch.setattr(scheduler_service, "get_db", _get_db)
+    await scheduler_service.maintain_partitions()
+
+    async with session_factory() as session:
+        attached = set(
+            (
+                await session.execute(
+                    text(
+                        "SELECT CAST(CAST(inhrelid AS regclass) AS text) FROM pg_inherits "
+                        "WHERE inhparent = CAST('product_match_log' AS regclass)"
+                    )
+                )
+            ).scalars()
+        )
+    assert attached == {
+        "product_match_log_legacy",
+        partition_name("product_match_log", current),
+        partition_name("product_match_log", add_months(current, 1)),
+    }
@@ -0,0 +1,64 @@
+"""Tests for the GCRA rate limiter and its middleware."""
+
+import pytest
+
+from app.middlewares.rate_limit import RateLimitMiddleware
+from app.services.rate_limiter import MemoryRateLimiter, RateLimit, parse_profiles
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_gcra_allows_burst_then_one_per_interval():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(clock=clock)
+    limit = RateLimit(5, 10)
+
+    results = [await limiter.hit("message:1", limit) for _ in range(6)]
+    assert [result.allowed for result in results] == [True] * 5 + [False]
+    assert results[-1].retry_after == pytest.approx(2.0)
+
+    clock.now += 2.0
+    assert (await limiter.hit("message:1", limit)).allowed
+    assert not (await limiter.hit("message:1", limit)).allowed
+    # Other keys are independent.
+    assert (await limiter.hit("message:2", limit)).allowed
+
+
+def test_memory_limiter_is_bounded():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(max_keys=3, clock=clock)
+    limit = RateLimit(1, 1)
+
+    for user_id in range(10):
+        assert limiter.hit_nowait(f"message:{user_id}", limit).allowed
+        clock.now += 0.1
+
+    assert len(limiter) == 3
+    # Only keys still inside their interval count as live evictions.
+    assert limiter.live_evictions == 7
+
+
+def test_parse_profiles_skips_invalid_entries():
+    profiles = parse_profiles("callback=10/10, voice=3/60:1,broken,bad=x/1")
+
+    assert profiles == {"callback": RateLimit(10, 10.0), "voice": RateLimit(3, 60.0, 1)}
+    assert profiles["voice"].tolerance == 0
+
+
+class FailingLimiter:
+    async def hit(self, key, limit):
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_middleware_fails_open_when_backend_is_down():
+    middleware = RateLimitMiddleware(limiter=FailingLimiter(), profiles={"message": RateLimit(1, 1)})
+
+    assert not await middleware._is_rate_limited(1, "message")
@@ -0,0 +1,86 @@
+"""Tests for progressive delivery of streamed replies."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from aiogram.types import Chat, Message
+
+from app.safety.validator import SafetyValidator
+from app.services.reply_streamer import JsonStringField, ReplyStreamer
+
+
+def test_json_field_is_decoded_across_chunk_boundaries():
+    payload = json.dumps({"reply": 'Привет, "друг"!\nКак дела? 🙂', "scenario": "engaged"})
+    field = JsonStringField("reply")
+
+    seen = [field.feed(payload[index : index + 3]) for index in range(0, len(payload), 3)]
+
+    assert field.done
+    assert seen[-1] == 'Привет, "друг"!\nКак дела? 🙂'
+    # The decoded prefix only ever grows.
+    assert all(later.startswith(earlier) for earlier, later in zip(seen, seen[1:]))
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def _message(self, text: str, edited: bool = False) -> Message:
+        return Message(
+            message_id=1,
+            date=datetime.now(timezone.utc),
+            edit_date=1700000000 if edited else None,
+            chat=Chat(id=77, type="private"),
+            text=text,
+        )
+
+    async def send_message(self, chat_id, text):
+        self.calls.append(("send", asyncio.get_running_loop().time(), text))
+        return self._message(text)
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.calls.append(("edit", asyncio.get_running_loop().time(), text))
+        return self._message(text, edited=True)
+
+
+@pytest.mark.asyncio
+async def test_first_words_are_sent_at_once_and_edits_are_coalesced():
+    bot = FakeBot()
+    streamer = ReplyStreamer(bot, 77, validator=SafetyValidator(), min_interval=0.1, min_chars=5)
+    words = [f"слово{index} " for index in range(60)]
+
+    text = ""
+    for word in words:
+        text += word
+        streamer.update(text)
+        await asyncio.sleep(0.005)
+    message = await streamer.finish(text.strip())
+
+    assert bot.calls[0][0] == "send" and bot.calls[0][2] == "слово0"
+    edits = [call for call in bot.calls if call[0] == "edit"]
+    # Sixty updates are shown in a handful of edits spaced by the interval.
+    assert 1 <= len(edits) <= 5
+    assert all(b[1] - a[1] >= 0.09 for a, b in zip(bot.calls, bot.calls[1:-1]))
+    assert bot.calls[-1][2] == text.strip()
+    assert message.text == text.strip()
+
+
+@pytest.mark.asyncio
+async def test_unsafe_partial_text_stops_progressive_display():
+    bot = FakeBot()
+    streamer = ReplyStreamer(bot, 77, validator=SafetyValidator(), min_interval=0, min_chars=1)
+
+    streamer.update("Курс даёт ")
+    await asyncio.sleep(0.01)
+    streamer.update("Курс даёт гарантированная прибыль и ")
+    await asyncio.sleep(0.01)
+    streamer.update("Курс даёт гарантированная прибыль и ещё больше ")
+    await asyncio.sleep(0.01)
+
+    assert streamer.halted
+    assert [call[2] for call in bot.calls] == ["Курс даёт"]
+
+    await streamer.finish("Курс даёт изучение потенциальных возможностей.")
+    assert bot.calls[-1][2] == "Курс даёт изучение потенциальных возможностей."
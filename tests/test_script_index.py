@@ -0,0 +1,89 @@
+"""In-memory sell script vector index."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.handlers import admin_scripts
+from app.services.script_index import ScriptVectorIndex
+from app.services.script_service import ScriptService
+
+
+def _rows(count, dim=64, seed=1):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors, [(i + 1, f"q{i}", f"a{i}", vectors[i]) for i in range(count)]
+
+
+def _exact_top(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [int(i) + 1 for i in np.argsort(scores)[::-1][:k]], scores
+
+
+def test_float_index_matches_exact_cosine_order():
+    vectors, rows = _rows(500)
+    index = ScriptVectorIndex()
+    index.build(rows)
+    query = np.random.default_rng(7).normal(size=64)
+
+    results = index.search(query.tolist(), top_k=5)
+
+    expected_ids, scores = _exact_top(vectors, query, 5)
+    assert [item["id"] for item in results] == expected_ids
+    assert results[0]["similarity"] == pytest.approx(float(scores[expected_ids[0] - 1]), rel=1e-5)
+    assert results[0]["message"] == f"q{expected_ids[0] - 1}"
+
+
+def test_small_and_empty_indexes():
+    index = ScriptVectorIndex()
+    assert index.search([1.0, 0.0], top_k=3) == []
+
+    index.build([(1, "a", "x", [1.0, 0.0]), (2, "b", "y", [0.0, 1.0]), (3, "c", "z", None)])
+    assert index.size == 2
+    assert [item["id"] for item in index.search([0.2, 1.0], top_k=10)] == [2, 1]
+
+
+
+class _Session:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def commit(self):
+        self.calls.append("commit")
+
+
+class _AdminMessage:
+    def __init__(self, user_id):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.answers = []
+
+    async def answer(self, text):
+        self.answers.append(text)
+
+
+@pytest.mark.parametrize("index_enabled, expected", [(True, ["upsert", "commit", "load"]), (False, ["upsert", "commit"])])
+@pytest.mark.asyncio
+async def test_reindex_rebuilds_the_index_only_after_commit(monkeypatch, index_enabled, expected):
+    calls = []
+
+    async def upsert(self, file_path, sheet_name="scripts"):
+        calls.append("upsert")
+        return {"processed": 3, "added": -1, "updated": -1}
+
+    async def load(session):
+        calls.append("load")
+
+    monkeypatch.setattr(ScriptService, "index_scripts_from_file", upsert)
+    monkeypatch.setattr(admin_scripts.script_index, "load", load)
+    monkeypatch.setattr(settings, "admin_ids", "42")
+    monkeypatch.setattr(settings, "scripts_enabled", True)
+    monkeypatch.setattr(settings, "script_index_enabled", index_enabled)
+
+    message = _AdminMessage(42)
+    await admin_scripts.reindex_scripts(message, _Session(calls))
+
+    assert calls == expected
+    assert message.answers[-1].startswith("Re-indexing complete!")
@@ -0,0 +1,95 @@
+"""Sentiment aggregates: SQL lead level and dirty-set reconciliation."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+from app.models import User, UserMessageScore
+from app.services.activity_buffer import activity_buffer
+from app.services.dirty_users import MemoryDirtyUserSet
+from app.services.sentiment_service import _LEAD_LEVEL_STMT, SentimentService
+
+
+def _score(user_id: int, index: int, score: int, label: str) -> UserMessageScore:
+    return UserMessageScore(
+        user_id=user_id,
+        message_id=index,
+        label=label,
+        score=score,
+        model="test",
+        confidence=1.0,
+        hash=f"{user_id}-{index}",
+        evaluated_at=datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index),
+    )
+
+
+@pytest.mark.asyncio
+async def test_reconcile_recomputes_only_dirty_users_and_requeues_failures(monkeypatch):
+    dirty = MemoryDirtyUserSet()
+    service = SentimentService(client=None, dirty_users=dirty)
+    seen = []
+
+    async def fail(session, user_ids):
+        seen.append(sorted(user_ids))
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(service, "_reconcile_users", fail)
+    assert await service.reconcile() == 0
+    assert seen == []
+
+    await dirty.add([3, 1, 3])
+    with pytest.raises(RuntimeError):
+        await service.reconcile(batch_size=10)
+    assert seen == [[1, 3]]
+    assert await dirty.size() == 2
+
+
+@pytest.mark.asyncio
+async def test_reconcile_users_rewrites_counters_and_lead_level(db_session):
+    user = User(telegram_id=4242, counter=99, pos_count=99, scored_total=99)
+    quiet = User(telegram_id=4243, counter=5, scored_total=5, lead_level_percent=70)
+    db_session.add_all([user, quiet])
+    await db_session.flush()
+    # An old negative score falls outside the last ten.
+    db_session.add(_score(user.id, 0, -1, "negative"))
+    db_session.add_all(_score(user.id, index, 1, "positive") for index in range(1, 8))
+    db_session.add_all(_score(user.id, index, 0, "neutral") for index in range(8, 11))
+    await db_session.flush()
+
+    await SentimentService(client=None)._reconcile_users(db_session, [user.id, quiet.id])
+    db_session.expire_all()
+    rows = {row.id: row for row in (await db_session.execute(select(User))).scalars()}
+
+    fresh = rows[user.id]
+    assert (fresh.counter, fresh.pos_count, fresh.neu_count, fresh.neg_count, fresh.scored_total) == (6, 7, 3, 1, 11)
+    # ((0.7 + 1) / 2) * 100
+    assert fresh.lead_level_percent == 85
+    assert fresh.lead_level_updated_at is not None
+    assert (rows[quiet.id].scored_total, rows[quiet.id].lead_level_percent) == (0, None)
+
+    # An unchanged level leaves the row alone.
+    stamp = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    await db_session.execute(update(User).where(User.id == user.id).values(lead_level_updated_at=stamp))
+    await db_session.execute(_LEAD_LEVEL_STMT, {"user_ids": [user.id]})
+    db_session.expire_all()
+    assert (await db_session.get(User, user.id)).lead_level_updated_at == stamp
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_users_dirty_when_increments_race_the_recompute(monkeypatch):
+    dirty = MemoryDirtyUserSet()
+    service = SentimentService(client=None, dirty_users=dirty)
+
+    async def recompute_while_a_worker_buffers(session, user_ids):
+        # A worker commits a score and buffers its increment after the flush.
+        await activity_buffer.add_counters(7, {"counter": 1, "pos_count": 1, "scored_total": 1})
+
+    monkeypatch.setattr(service, "_reconcile_users", recompute_while_a_worker_buffers)
+    await dirty.add([7, 8])
+    try:
+        assert await service.reconcile() == 2
+        assert await dirty.pop(10) == [7]
+    finally:
+        await activity_buffer.store.drain()
+        await activity_buffer.store.ack()
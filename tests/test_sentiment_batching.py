@@ -0,0 +1,141 @@
+"""Micro-batched sentiment classification against a fake OpenAI client."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services.sentiment_service import SentimentJob, SentimentLabel, SentimentService
+
+
+class FakeCompletions:
+    """Labels messages by keyword; can fail on poison text or drop ids from the answer."""
+
+    def __init__(self, poison=None, drop_ids_once=(), rate_limited=False):
+        self.calls = []
+        self._poison = poison
+        self._drop_ids_once = set(drop_ids_once)
+        self._rate_limited = rate_limited
+
+    async def create(self, **kwargs):
+        messages = json.loads(kwargs["messages"][1]["content"])["messages"]
+        self.calls.append([item["text"] for item in messages])
+        request = httpx.Request("POST", "https://api.openai.test/v1/chat/completions")
+        if self._rate_limited:
+            raise openai.RateLimitError(
+                "slow down", response=httpx.Response(429, request=request), body=None
+            )
+        if self._poison and any(self._poison in item["text"] for item in messages):
+            raise openai.BadRequestError(
+                "invalid content", response=httpx.Response(400, request=request), body=None
+            )
+
+        results = []
+        for item in messages:
+            if item["id"] in self._drop_ids_once and len(messages) > 1:
+                continue
+            text = item["text"]
+            label = "positive" if "круто" in text else "negative" if "плохо" in text else "neutral"
+            results.append({"id": item["id"], "label": label, "confidence": 0.9})
+        self._drop_ids_once.clear()
+        return SimpleNamespace(
+            model="fake-model",
+            usage=SimpleNamespace(total_tokens=10 * len(messages)),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"results": results})))],
+        )
+
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+def _job(message_id, text, user_id=1):
+    return SentimentJob(
+        user_id=user_id,
+        message_id=message_id,
+        text=text,
+        hash_value=f"{user_id}:{message_id}",
+        queued_at=datetime.now(timezone.utc),
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_is_classified_in_one_request_and_mapped_back_by_id():
+    completions = FakeCompletions()
+    service = SentimentService(client=_client(completions))
+    jobs = [_job(1, "круто"), _job(2, "плохо"), _job(3, ""), _job(4, "ок")]
+
+    results = await service._classify_batch(jobs)
+
+    assert len(completions.calls) == 1
+    assert completions.calls[0] == ["круто", "плохо", "ок"]
+    assert [result.label for result in results] == [
+        SentimentLabel.POSITIVE,
+        SentimentLabel.NEGATIVE,
+        SentimentLabel.NEUTRAL,
+        SentimentLabel.NEUTRAL,
+    ]
+    assert results[2].model == "rule:empty"
+    assert results[0].model == "fake-model"
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_splits_so_poison_item_does_not_fail_others():
+    completions = FakeCompletions(poison="POISON")
+    service = SentimentService(client=_client(completions))
+    jobs = [_job(i, "круто" if i % 2 else "плохо") for i in range(7)]
+    jobs.insert(3, _job(99, "POISON"))
+
+    results = await service._classify_batch(jobs)
+
+    assert results[3].model == "fallback:api_error"
+    others = [result for index, result in enumerate(results) if index != 3]
+    assert all(result.model == "fake-model" for result in others)
+    # Binary search isolates the bad item in O(log n) extra requests.
+    assert len(completions.calls) <= 1 + 2 * 3
+
+
+@pytest.mark.asyncio
+async def test_ids_missing_from_response_are_requested_again():
+    completions = FakeCompletions(drop_ids_once={1})
+    service = SentimentService(client=_client(completions))
+
+    results = await service._classify_batch([_job(1, "круто"), _job(2, "плохо"), _job(3, "ок")])
+
+    assert [result.label for result in results] == [
+        SentimentLabel.POSITIVE,
+        SentimentLabel.NEGATIVE,
+        SentimentLabel.NEUTRAL,
+    ]
+    assert completions.calls == [["круто", "плохо", "ок"], ["плохо"]]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_batch_is_not_split():
+    completions = FakeCompletions(rate_limited=True)
+    service = SentimentService(client=_client(completions))
+
+    results = await service._classify_batch([_job(i, "круто") for i in range(5)])
+
+    assert len(completions.calls) == 1
+    assert {result.model for result in results} == {"fallback:api_error"}
+
+
+@pytest.mark.asyncio
+async def test_next_batch_honours_size_and_wait():
+    service = SentimentService(client=_client(FakeCompletions()), batch_size=3, batch_wait=0.05)
+    for i in range(4):
+        await service._queue.put(_job(i, "ок"))
+
+    first = await service._next_batch()
+    assert [job.message_id for job in first] == [0, 1, 2]
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    second = await service._next_batch()
+    assert [job.message_id for job in second] == [3]
+    assert loop.time() - started >= 0.04
@@ -0,0 +1,78 @@
+"""Acknowledgements, delayed retries and dead-lettering of sentiment jobs."""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.sentiment_queue import MemorySentimentQueue, SentimentJob
+from app.services.sentiment_service import SentimentService
+
+
+def _job(message_id: int, attempts: int = 0) -> SentimentJob:
+    return SentimentJob(
+        user_id=1,
+        message_id=message_id,
+        text="ок",
+        hash_value=f"hash-{message_id}",
+        queued_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        attempts=attempts,
+    )
+
+
+def test_job_survives_serialization():
+    job = _job(5, attempts=2)
+    job.source = "voice"
+
+    restored = SentimentJob.from_json(job.to_json(), delivery_id="1-0")
+
+    assert restored.delivery_id == "1-0"
+    assert (restored.message_id, restored.attempts, restored.source) == (5, 2, "voice")
+    assert restored.queued_at == job.queued_at
+
+
+@pytest.mark.asyncio
+async def test_delayed_retry_is_released_only_when_due():
+    now = [0.0]
+    queue = MemorySentimentQueue(clock=lambda: now[0])
+    await queue.retry(_job(1, attempts=1), delay=4)
+
+    stats = await queue.maintain()
+    assert (stats.ready, stats.delayed) == (0, 1)
+    assert await queue.claim(5, 0, block=0.01) == []
+
+    now[0] = 4.0
+    stats = await queue.maintain()
+    assert (stats.ready, stats.delayed) == (1, 0)
+    [job] = await queue.claim(5, 0, block=0.01)
+    assert job.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_then_dead_lettered_without_blocking_workers(monkeypatch):
+    queue = MemorySentimentQueue()
+    service = SentimentService(client=None, batch_size=10, batch_wait=0, queue=queue)
+
+    async def failing_batch(batch, worker_index):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(service, "_process_batch", failing_batch)
+    await queue.put(_job(1))
+    await queue.put(_job(2, attempts=service.MAX_ATTEMPTS - 1))
+
+    worker = asyncio.create_task(service._worker_loop(0))
+    try:
+        for _ in range(50):
+            stats = await queue.maintain()
+            if stats.delayed and queue.dead:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    # Both deliveries are acknowledged; the retry waits outside the worker.
+    assert (stats.ready, stats.inflight, stats.delayed) == (0, 0, 1)
+    assert queue._delayed[0][2].attempts == 1
+    [(dead_job, reason)] = queue.dead
+    assert (dead_job.message_id, dead_job.attempts, reason) == (2, service.MAX_ATTEMPTS, "batch_failed")
@@ -0,0 +1,104 @@
+"""Tests for the shared state backend, FSM storage and manual dialog sessions."""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from app.services.manual_dialog_service import (
+    DialogAlreadyInProgressError,
+    ManagerBusyError,
+    ManualDialogService,
+)
+from app.services.state_backend import MemoryStateBackend, StateBackendStorage
+
+
+class _Form(StatesGroup):
+    waiting = State()
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_atomic_pair_ops_and_ttl(monkeypatch):
+    backend = MemoryStateBackend()
+
+    assert await backend.set_many_if_absent({"a": "1", "b": "1"}, ttl=10) == {}
+    assert await backend.set_many_if_absent({"b": "2", "c": "2"}) == {"b": "1"}
+    assert await backend.get("c") is None
+
+    assert await backend.delete_many_if_equal({"a": "1", "b": "other"}) == 1
+    assert await backend.get("a") is None
+    assert await backend.get("b") == "1"
+
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("app.services.state_backend.time.monotonic", lambda: clock["now"])
+    await backend.set("ttl", "x", ttl=5)
+    clock["now"] += 6
+    assert await backend.get("ttl") is None
+
+
+@pytest.mark.asyncio
+async def test_fsm_storage_round_trips_state_and_rich_data():
+    storage = StateBackendStorage(MemoryStateBackend(), state_ttl=60, data_ttl=60)
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+    send_at = datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+    await storage.set_state(key, _Form.waiting)
+    await storage.update_data(key, {"send_at": send_at, "price": Decimal("9.90"), "name": "Тест"})
+
+    assert await storage.get_state(key) == _Form.waiting.state
+    data = await storage.get_data(key)
+    assert data == {"send_at": send_at, "price": Decimal("9.90"), "name": "Тест"}
+
+    await storage.set_state(key, None)
+    await storage.set_data(key, {})
+    assert await storage.get_state(key) is None
+    assert await storage.get_data(key) == {}
+
+
+@pytest.mark.asyncio
+async def test_manual_dialog_takeover_and_release():
+    service = ManualDialogService(backend=MemoryStateBackend(), ttl=60)
+
+    session = await service.activate_dialog(
+        user_id=1,
+        user_telegram_id=101,
+        manager_telegram_id=900,
+        manager_username="boss",
+        manager_full_name=None,
+    )
+    again = await service.activate_dialog(
+        user_id=1,
+        user_telegram_id=101,
+        manager_telegram_id=900,
+        manager_username="boss",
+        manager_full_name=None,
+    )
+    assert again.started_at == session.started_at
+
+    with pytest.raises(DialogAlreadyInProgressError):
+        await service.activate_dialog(
+            user_id=1,
+            user_telegram_id=101,
+            manager_telegram_id=901,
+            manager_username=None,
+            manager_full_name="Other",
+        )
+    with pytest.raises(ManagerBusyError):
+        await service.activate_dialog(
+            user_id=2,
+            user_telegram_id=102,
+            manager_telegram_id=900,
+            manager_username="boss",
+            manager_full_name=None,
+        )
+
+    assert await service.is_user_in_manual_mode(1)
+    assert (await service.get_session_by_manager(900)).user_telegram_id == 101
+
+    released = await service.deactivate_dialog_by_manager(900)
+    assert released.user_id == 1
+    assert not await service.is_user_in_manual_mode(1)
+    assert not await service.is_manager_busy(900)
+    assert await service.deactivate_dialog_by_user(1) is None
@@ -0,0 +1,73 @@
+"""Tests for per-chat coalescing of rapid user messages."""
+
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.turn_coalescer import TurnCoalescer
+
+
+class Recorder:
+    def __init__(self, generation_time: float = 0.0) -> None:
+        self.generation_time = generation_time
+        self.started = []
+        self.delivered = []
+
+    async def __call__(self, turn):
+        self.started.append(turn.text)
+        await asyncio.sleep(self.generation_time)
+        turn.claim()
+        self.delivered.append(turn.text)
+
+
+def _saved() -> float:
+    return REGISTRY.get_sample_value("dialog_llm_calls_saved_total") or 0
+
+
+@pytest.mark.asyncio
+async def test_burst_is_answered_as_one_turn():
+    coalescer = TurnCoalescer(window=0.05, max_wait=1)
+    runner = Recorder()
+    saved_before = _saved()
+
+    for text in ("Привет", "хочу узнать", "про курс"):
+        coalescer.submit(1, text, runner)
+        await asyncio.sleep(0.01)
+    coalescer.submit(2, "Другой чат", runner)
+    await asyncio.sleep(0.1)
+
+    assert sorted(runner.delivered) == ["Другой чат", "Привет\nхочу узнать\nпро курс"]
+    assert _saved() - saved_before == 2
+    await coalescer.stop()
+
+
+@pytest.mark.asyncio
+async def test_newer_message_cancels_stale_generation():
+    coalescer = TurnCoalescer(window=0.02, max_wait=1)
+    runner = Recorder(generation_time=0.1)
+
+    coalescer.submit(1, "Сколько стоит?", runner)
+    await asyncio.sleep(0.05)
+    assert runner.started == ["Сколько стоит?"]
+    coalescer.submit(1, "И есть ли рассрочка?", runner)
+    await asyncio.sleep(0.2)
+
+    # Only the reply covering both messages is delivered.
+    assert runner.delivered == ["Сколько стоит?\nИ есть ли рассрочка?"]
+    await coalescer.stop()
+
+
+@pytest.mark.asyncio
+async def test_max_wait_bounds_a_never_ending_burst():
+    coalescer = TurnCoalescer(window=0.05, max_wait=0.1)
+    runner = Recorder()
+
+    for index in range(8):
+        coalescer.submit(1, str(index), runner)
+        await asyncio.sleep(0.03)
+    await asyncio.sleep(0.1)
+
+    assert len(runner.delivered) >= 2
+    assert "\n".join(runner.delivered) == "\n".join(str(index) for index in range(8))
+    await coalescer.stop()
@@ -0,0 +1,85 @@
+"""Tests for the webhook update worker pool."""
+
+import asyncio
+
+import pytest
+
+from app.services.update_queue import UpdateQueue, extract_chat_key
+
+
+def test_extract_chat_key_from_message_and_callback():
+    assert extract_chat_key({"update_id": 1, "message": {"chat": {"id": 42}}}) == 42
+    assert (
+        extract_chat_key(
+            {"update_id": 2, "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": 9}}}}
+        )
+        == 9
+    )
+    assert extract_chat_key({"update_id": 3, "callback_query": {"from": {"id": 7}}}) == 7
+    assert extract_chat_key({"update_id": 4, "pre_checkout_query": {"from": {"id": 5}}}) == 5
+    assert extract_chat_key({"update_id": 5}) is None
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_are_processed_in_order():
+    queue = UpdateQueue(workers=4, max_pending=100)
+    processed: list[tuple[int, int]] = []
+
+    async def handler(payload):
+        chat_id, seq = payload
+        # Earlier updates sleep longer; ordering must still hold.
+        await asyncio.sleep(0.01 * (5 - seq))
+        processed.append(payload)
+
+    queue.start(handler)
+    for seq in range(5):
+        assert queue.enqueue((1, seq), 1)
+    await queue.stop(timeout=5)
+
+    assert [seq for chat_id, seq in processed if chat_id == 1] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_different_chats_run_in_parallel():
+    queue = UpdateQueue(workers=3, max_pending=100)
+    active = 0
+    peak = 0
+
+    async def handler(payload):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+
+    queue.start(handler)
+    for chat_id in range(3):
+        assert queue.enqueue(chat_id, chat_id)
+    await queue.stop(timeout=5)
+
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_enqueue_rejects_when_full_and_survives_handler_errors():
+    queue = UpdateQueue(workers=1, max_pending=2)
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(payload):
+        await release.wait()
+        handled.append(payload)
+        if payload == "boom":
+            raise RuntimeError("handler failed")
+
+    queue.start(handler)
+    assert queue.enqueue("boom", 1)
+    assert queue.enqueue("next", 1)
+    assert not queue.enqueue("overflow", 2)
+
+    release.set()
+    await queue.stop(timeout=5)
+
+    assert handled == ["boom", "next"]
+    assert queue.pending == 0
+    assert not queue.enqueue("late", 1)
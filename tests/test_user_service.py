@@ -2,8 +2,10 @@
 
 import asyncio
 import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
 
-from app.models import FunnelStage, UserSegment
+from app.models import FunnelStage, UserMessageScore, UserSegment
 from app.services.user_service import UserService
 
 
@@ -40,6 +42,44 @@ async def test_get_or_create_user_creates_and_updates(db_session):
     assert updated.last_name == "User"
 
 
+@pytest.mark.asyncio
+async def test_middleware_user_load_is_one_row_without_history(db_session):
+    """Загрузка пользователя в middleware — один запрос и одна строка, без истории оценок."""
+    service = UserService(db_session)
+    user = await service.get_or_create_user(telegram_id=444, username="regular")
+    db_session.add_all(
+        UserMessageScore(
+            user_id=user.id,
+            message_id=index,
+            label="neutral",
+            score=0,
+            model="test",
+            hash=f"444-{index}",
+        )
+        for index in range(50)
+    )
+    await db_session.flush()
+    db_session.expunge_all()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        loaded = await service.get_or_create_user(telegram_id=444, username="regular")
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+    assert "user_message_scores" not in statements[0]
+    assert list(db_session.identity_map.values()) == [loaded]
+    with pytest.raises(InvalidRequestError):
+        loaded.sentiment_scores
+
+
 @pytest.mark.asyncio
 async def test_update_user_segment_sets_score_and_segment(db_session):
     """Сегмент и скоринг обновляются в соответствии с вычисленным сегментом."""
@@ -85,3 +125,22 @@ async def test_save_message_handles_unknown_roles(db_session):
     history = await service.get_conversation_history(user.id, limit=1)
     assert history[0]["role"] == "bot"
     assert history[0]["text"] == "Ответ бота"
+
+
+@pytest.mark.asyncio
+async def test_conversation_pages_walk_back_without_gaps(db_session):
+    """Страницы истории по курсору идут назад без пропусков и повторов."""
+    service = UserService(db_session)
+    user = await service.get_or_create_user(telegram_id=555)
+    for index in range(7):
+        await service.save_message(user_id=user.id, role="user", text=f"m{index}")
+
+    seen = []
+    page, cursor = await service.get_conversation_page(user.id, limit=3)
+    while True:
+        seen[:0] = [entry["text"] for entry in page]
+        if cursor is None:
+            break
+        page, cursor = await service.get_conversation_page(user.id, limit=3, before=cursor)
+
+    assert seen == [f"m{index}" for index in range(7)]